@@ -9,12 +9,12 @@ from datetime import datetime, date, timedelta
 from decimal import Decimal
 import json
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update, delete, and_, or_, func, text
+from sqlalchemy import select, update, delete, and_, or_, func, text, case
 from sqlalchemy.orm import selectinload
 
 from .models import (
     User, Party, Product, StockLedgerEntry, Invoice, InvoiceItem,
-    Purchase, PurchaseItem, Expense, AuditTrail
+    Purchase, PurchaseItem, Expense, AuditTrail, DailyRollup
 )
 from .tenant_config import tenant_config_manager
 from .security_manager import security_manager
@@ -564,47 +564,24 @@ class AnalyticsManager:
             current_month = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
             last_month = (current_month - timedelta(days=1)).replace(day=1)
             
-            # Revenue analysis
-            current_revenue_query = select(func.sum(Invoice.total_amount)).where(
-                and_(
-                    Invoice.tenant_id == tenant_id,
-                    Invoice.invoice_date >= current_month,
-                    Invoice.status == 'paid'
-                )
-            )
-            current_revenue_result = await session.execute(current_revenue_query)
-            current_revenue = current_revenue_result.scalar() or 0
-            
-            last_revenue_query = select(func.sum(Invoice.total_amount)).where(
-                and_(
-                    Invoice.tenant_id == tenant_id,
-                    Invoice.invoice_date >= last_month,
-                    Invoice.invoice_date < current_month,
-                    Invoice.status == 'paid'
-                )
-            )
-            last_revenue_result = await session.execute(last_revenue_query)
-            last_revenue = last_revenue_result.scalar() or 0
-            
-            # Expense analysis
-            current_expense_query = select(func.sum(Expense.amount)).where(
-                and_(
-                    Expense.tenant_id == tenant_id,
-                    Expense.expense_date >= current_month
-                )
-            )
-            current_expense_result = await session.execute(current_expense_query)
-            current_expense = current_expense_result.scalar() or 0
-            
-            last_expense_query = select(func.sum(Expense.amount)).where(
+            # Revenue and expenses for both months from the daily rollups
+            this_month = DailyRollup.day >= current_month.date()
+            monthly_query = select(
+                func.coalesce(func.sum(case((this_month, DailyRollup.paid_invoiced), else_=0)), 0).label('current_revenue'),
+                func.coalesce(func.sum(case((this_month, 0), else_=DailyRollup.paid_invoiced)), 0).label('last_revenue'),
+                func.coalesce(func.sum(case((this_month, DailyRollup.expenses), else_=0)), 0).label('current_expense'),
+                func.coalesce(func.sum(case((this_month, 0), else_=DailyRollup.expenses)), 0).label('last_expense')
+            ).where(
                 and_(
-                    Expense.tenant_id == tenant_id,
-                    Expense.expense_date >= last_month,
-                    Expense.expense_date < current_month
+                    DailyRollup.tenant_id == tenant_id,
+                    DailyRollup.day >= last_month.date()
                 )
             )
-            last_expense_result = await session.execute(last_expense_query)
-            last_expense = last_expense_result.scalar() or 0
+            monthly = (await session.execute(monthly_query)).one()
+            current_revenue = monthly.current_revenue
+            last_revenue = monthly.last_revenue
+            current_expense = monthly.current_expense
+            last_expense = monthly.last_expense
             
             # Calculate changes
             revenue_change = current_revenue - last_revenue
@@ -0,0 +1,169 @@
+"""
+Audit writer
+Security and audit events are queued in memory and written by a background
+task in batches: a batch is flushed once it holds ``batch_size`` events or
+``flush_interval`` seconds after its first event, with one multi-row INSERT
+per tenant. Logging an event from a request is just an enqueue.
+
+The queue is bounded. When the writer falls behind, new events are dropped and
+counted instead of slowing requests down.
+"""
+
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Minimum seconds between "queue full" warnings
+DROP_WARNING_INTERVAL = 60.0
+
+# store(tenant_id, events) writes one tenant's events
+AuditStore = Callable[[Any, List[Dict[str, Any]]], Awaitable[None]]
+
+# Queued by stop(): the writer finishes its current batch and exits
+_STOP = object()
+
+
+class AuditWriter:
+    """Bounded queue plus a background task that writes events in batches"""
+
+    def __init__(
+        self,
+        store: AuditStore,
+        max_queue: int = settings.audit_queue_size,
+        batch_size: int = settings.audit_batch_size,
+        flush_interval: float = settings.audit_flush_interval_ms / 1000
+    ):
+        self.store = store
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: Optional[asyncio.Queue] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._last_drop_warning = 0.0
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def _ensure_started(self) -> asyncio.Queue:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._task is None or self._task.done():
+            pending = []
+            if self._queue is not None and self._loop is not loop:
+                # Carry events over from a loop that has gone away
+                while not self._queue.empty():
+                    pending.append(self._queue.get_nowait())
+            if self._queue is None or self._loop is not loop:
+                self._queue = asyncio.Queue(maxsize=self.max_queue)
+                for event in pending:
+                    self._queue.put_nowait(event)
+            self._loop = loop
+            self._task = loop.create_task(self._run())
+        return self._queue
+
+    def enqueue(self, event: Dict[str, Any]) -> bool:
+        """Queue ``event`` for writing; returns False if it was dropped because the queue is full"""
+        queue = self._ensure_started()
+        try:
+            queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+            now = time.monotonic()
+            if now - self._last_drop_warning >= DROP_WARNING_INTERVAL:
+                self._last_drop_warning = now
+                logger.warning(f"Audit queue full ({self.max_queue}); dropped {self.dropped} events so far")
+            return False
+        self.enqueued += 1
+        return True
+
+    async def _next_batch(self, queue: asyncio.Queue) -> Tuple[List[Dict[str, Any]], bool]:
+        """Next batch to write, and whether stop() was requested while taking it"""
+        event = await queue.get()
+        if event is _STOP:
+            return [], True
+        batch = [event]
+        deadline = self._loop.time() + self.flush_interval
+        while len(batch) < self.batch_size:
+            if not queue.empty():
+                event = queue.get_nowait()
+            else:
+                remaining = deadline - self._loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    event = await asyncio.wait_for(queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+            if event is _STOP:
+                return batch, True
+            batch.append(event)
+        return batch, False
+
+    async def _run(self) -> None:
+        queue = self._queue
+        stopping = False
+        while not stopping:
+            batch, stopping = await self._next_batch(queue)
+            if batch:
+                await self._write(batch)
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> None:
+        by_tenant: Dict[Any, List[Dict[str, Any]]] = defaultdict(list)
+        for event in batch:
+            by_tenant[event.get('tenant_id')].append(event)
+        for tenant_id, events in by_tenant.items():
+            try:
+                await self.store(tenant_id, events)
+                self.written += len(events)
+            except Exception as e:
+                self.failed += len(events)
+                logger.error(f"Failed to write {len(events)} audit events for tenant {tenant_id}: {e}")
+
+    async def flush(self) -> None:
+        """Write everything still queued"""
+        if self._queue is None:
+            return
+        batch = []
+        while not self._queue.empty():
+            event = self._queue.get_nowait()
+            if event is _STOP:
+                continue
+            batch.append(event)
+            if len(batch) >= self.batch_size:
+                await self._write(batch)
+                batch = []
+        if batch:
+            await self._write(batch)
+
+    async def stop(self) -> None:
+        """Stop the background task and write what is left
+
+        The task is asked to stop rather than cancelled, so a batch it has
+        already taken off the queue is still written.
+        """
+        task = self._task
+        if task is not None and not task.done() and self._loop is asyncio.get_running_loop():
+            await self._queue.put(_STOP)
+            await task
+        self._task = None
+        await self.flush()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            'queued': self._queue.qsize() if self._queue is not None else 0,
+            'max_queue': self.max_queue,
+            'batch_size': self.batch_size,
+            'flush_interval_ms': int(self.flush_interval * 1000),
+            'enqueued': self.enqueued,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed': self.failed,
+            'running': self._task is not None and not self._task.done(),
+        }
@@ -1,25 +1,40 @@
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Optional
+from typing import Optional, Tuple
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt
 from passlib.context import CryptContext
 from pydantic import BaseModel
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect, update
+from sqlalchemy.orm import ORMExecuteState, Session
+from starlette.concurrency import run_in_threadpool
 
 from .config import settings
 from .db import get_db
-from .models import User, Role
+from .models import RefreshToken, User, Role
 
 
 ALGORITHM = "HS256"
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+REFRESH_TOKEN_TYPE = "refresh"
+logger = logging.getLogger(__name__)
 # Updated CryptContext to handle bcrypt compatibility issues
 pwd_context = CryptContext(
     schemes=["bcrypt"],
     deprecated="auto",
-    bcrypt__rounds=12,
+    bcrypt__rounds=settings.auth_bcrypt_rounds,
+    # Hashes of any other cost need an update, so logins migrate them
+    bcrypt__min_rounds=settings.auth_bcrypt_rounds,
+    bcrypt__max_rounds=settings.auth_bcrypt_rounds,
     bcrypt__ident="2b"  # Explicitly set bcrypt identifier
 )
 
@@ -29,6 +44,122 @@ class TokenData(BaseModel):
     exp: int
 
 
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user as endpoints see it: ids, tenant and role name, no credentials"""
+    id: int
+    username: str
+    tenant_id: Optional[int]
+    role_id: int
+    role_name: str
+
+
+class PrincipalCache:
+    """Thread-safe LRU cache of principals by token subject, each kept for ``ttl`` seconds
+
+    Changes to users and roles committed through a Session drop the affected
+    entries (see the session events below); the TTL bounds how long a change
+    made by another process can go unnoticed.
+    """
+
+    def __init__(self, ttl: float = settings.auth_principal_cache_ttl, max_entries: int = 10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[Principal]:
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[subject]
+                return None
+            self._entries.move_to_end(subject)
+            return entry[1]
+
+    def put(self, subject: str, principal: Principal) -> None:
+        if self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[subject] = (time.monotonic() + self.ttl, principal)
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate_users(self, user_ids) -> None:
+        user_ids = set(user_ids)
+        with self._lock:
+            for subject in [s for s, (_, p) in self._entries.items() if p.id in user_ids]:
+                del self._entries[subject]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+_CHANGED_USERS_KEY = "principal_cache_changed_users"
+_CHANGED_ALL_KEY = "principal_cache_changed_all"
+_REHASHED_USERS_KEY = "refresh_tokens_rehashed_users"
+
+
+@event.listens_for(Session, "after_flush")
+def _track_changed_principals(session: Session, flush_context) -> None:
+    for obj in (*session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            session.info.setdefault(_CHANGED_USERS_KEY, set()).add(obj.id)
+        elif isinstance(obj, Role):
+            session.info[_CHANGED_ALL_KEY] = True
+
+
+@event.listens_for(Session, "after_flush")
+def _revoke_refresh_tokens_on_password_change(session: Session, flush_context) -> None:
+    """A new password revokes the user's refresh tokens in the same transaction
+
+    Rehashing the same password at another bcrypt cost (see
+    ``_store_password_hash``) leaves them alone.
+    """
+    rehashed = session.info.pop(_REHASHED_USERS_KEY, set())
+    user_ids = [
+        obj.id for obj in session.dirty
+        if isinstance(obj, User) and obj.id not in rehashed
+        and inspect(obj).attrs.password_hash.history.has_changes()
+    ]
+    if user_ids:
+        session.connection().execute(
+            update(RefreshToken.__table__)
+            .where(RefreshToken.user_id.in_(user_ids), RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=datetime.utcnow())
+        )
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_principal_changes(state: ORMExecuteState):
+    mapper = state.bind_mapper
+    if (state.is_update or state.is_delete) and mapper is not None and mapper.class_ in (User, Role):
+        state.session.info[_CHANGED_ALL_KEY] = True
+    return None
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session: Session) -> None:
+    user_ids = session.info.pop(_CHANGED_USERS_KEY, None)
+    if session.info.pop(_CHANGED_ALL_KEY, False):
+        principal_cache.clear()
+    elif user_ids:
+        principal_cache.invalidate_users(user_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_principals(session: Session) -> None:
+    session.info.pop(_CHANGED_USERS_KEY, None)
+    session.info.pop(_CHANGED_ALL_KEY, None)
+    session.info.pop(_REHASHED_USERS_KEY, None)
+
+
 def verify_password(plain_password: str, password_hash: str) -> bool:
     """Verify password with error handling for hash compatibility issues"""
     try:
@@ -49,6 +180,60 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password; also returns a new hash when the stored one uses an outdated cost"""
+    try:
+        return pwd_context.verify_and_update(plain_password, password_hash)
+    except Exception as e:
+        logger.warning(f"Password verification error: {e}")
+        return False, None
+
+
+class PasswordHashQueueFull(RuntimeError):
+    """Raised when every hashing worker is busy and the queue is full"""
+
+
+class PasswordVerifier:
+    """Dedicated, bounded thread pool for bcrypt
+
+    bcrypt releases the GIL, so ``workers`` threads use at most that many cores
+    however many logins arrive, and waiting logins hold neither a request
+    thread nor the event loop. At most ``workers + queue_size`` checks are in
+    flight; beyond that ``PasswordHashQueueFull`` is raised straight away.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.workers = max(1, workers if workers is not None else settings.auth_hash_workers)
+        self.queue_size = queue_size if queue_size is not None else settings.auth_hash_queue_size
+        self._slots = threading.BoundedSemaphore(self.workers + self.queue_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+            return self._executor
+
+    async def verify_and_update(self, plain_password: str, password_hash: str) -> Tuple[bool, Optional[str]]:
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashQueueFull("Password verification queue is full")
+        try:
+            future = self._get_executor().submit(verify_and_update_password, plain_password, password_hash)
+            return await asyncio.wrap_future(future)
+        finally:
+            self._slots.release()
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+password_verifier = PasswordVerifier()
+
+
 def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
     user = db.query(User).filter(User.username == username).first()
     if not user:
@@ -58,36 +243,135 @@ def authenticate_user(db: Session, username: str, password: str) -> Optional[Use
     return user
 
 
+def _store_password_hash(db: Session, user: User, password_hash: str) -> None:
+    # Same password at the configured cost: keep the user's refresh tokens
+    db.info.setdefault(_REHASHED_USERS_KEY, set()).add(user.id)
+    user.password_hash = password_hash
+    db.commit()
+
+
+async def authenticate_user_async(db: Session, username: str, password: str) -> Optional[User]:
+    """``authenticate_user`` for async callers: bcrypt runs on ``password_verifier``
+
+    A hash stored with another cost than ``auth_bcrypt_rounds`` is replaced by
+    one with the configured cost. Raises ``PasswordHashQueueFull`` when too
+    many logins are already waiting.
+    """
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.username == username).first())
+    if not user:
+        return None
+    verified, new_hash = await password_verifier.verify_and_update(password, user.password_hash)
+    if not verified:
+        return None
+    if new_hash:
+        await run_in_threadpool(_store_password_hash, db, user, new_hash)
+    return user
+
+
 def create_access_token(subject: str, expires_delta: timedelta | None = None) -> str:
     expire = datetime.now(timezone.utc) + (expires_delta or timedelta(minutes=settings.access_token_expire_minutes))
     to_encode = {"sub": subject, "exp": int(expire.timestamp())}
     return jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
-    credentials_exception = HTTPException(
+def create_refresh_token(db: Session, user_id: int, subject: str, expires_delta: timedelta | None = None) -> str:
+    """Long-lived, single-use token that can only be exchanged for new tokens at /auth/refresh
+
+    Its jti is added to ``db`` as a ``RefreshToken`` row; the caller commits.
+    """
+    expire = datetime.now(timezone.utc) + (expires_delta or timedelta(days=settings.refresh_token_expire_days))
+    jti = uuid.uuid4().hex
+    db.add(RefreshToken(jti=jti, user_id=user_id, expires_at=expire.replace(tzinfo=None)))
+    to_encode = {"sub": subject, "exp": int(expire.timestamp()), "type": REFRESH_TOKEN_TYPE, "jti": jti}
+    return jwt.encode(to_encode, settings.secret_key, algorithm=ALGORITHM)
+
+
+def load_principal(db: Session, username: str) -> Optional[Principal]:
+    row = (
+        db.query(User.id, User.username, User.tenant_id, User.role_id, Role.name)
+        .outerjoin(Role, Role.id == User.role_id)
+        .filter(User.username == username)
+        .first()
+    )
+    if row is None:
+        return None
+    return Principal(id=row[0], username=row[1], tenant_id=row[2], role_id=row[3], role_name=row[4] or "")
+
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+
+def _decode_token(token: str, token_type: Optional[str]) -> dict:
     try:
         payload = jwt.decode(token, settings.secret_key, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except Exception:
-        raise credentials_exception
-    user = db.query(User).filter(User.username == username).first()
+        raise _credentials_exception()
+    if payload.get("sub") is None or payload.get("type") != token_type:
+        raise _credentials_exception()
+    return payload
+
+
+def _cached_principal(db: Session, username: str) -> Principal:
+    user = principal_cache.get(username)
     if user is None:
-        raise credentials_exception
+        user = load_principal(db, username)
+        if user is None:
+            raise _credentials_exception()
+        principal_cache.put(username, user)
     return user
 
 
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> Principal:
+    """Principal of the bearer (access) token, from the principal cache when possible"""
+    return _cached_principal(db, _decode_token(token, None)["sub"])
+
+
+def get_refresh_principal(refresh_token: str, db: Session) -> Principal:
+    """Principal of a refresh token, which is revoked in ``db`` as it is used; the caller commits
+
+    Raises 401 for access tokens, unknown users and tokens that are expired or
+    already revoked. Presenting a revoked token again means it was copied, so
+    every refresh token of that user is revoked (and committed) as well.
+    """
+    payload = _decode_token(refresh_token, REFRESH_TOKEN_TYPE)
+    jti = payload.get("jti")
+    if not jti:
+        raise _credentials_exception()
+    now = datetime.utcnow()
+    consumed = db.execute(
+        update(RefreshToken.__table__)
+        .where(RefreshToken.jti == jti, RefreshToken.revoked_at.is_(None), RefreshToken.expires_at > now)
+        .values(revoked_at=now)
+    )
+    if consumed.rowcount != 1:
+        reused = db.query(RefreshToken.user_id).filter(
+            RefreshToken.jti == jti, RefreshToken.revoked_at.isnot(None)
+        ).first()
+        if reused is not None:
+            revoke_user_refresh_tokens(db, reused[0])
+            db.commit()
+        raise _credentials_exception()
+    return _cached_principal(db, payload["sub"])
+
+
+def revoke_user_refresh_tokens(db: Session, user_id: int) -> None:
+    """Revoke every outstanding refresh token of ``user_id``; the caller commits"""
+    db.execute(
+        update(RefreshToken.__table__)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=datetime.utcnow())
+    )
+
+
 def require_role(required: str):
-    def dep(user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
-        role = db.query(Role).filter(Role.id == user.role_id).first()
+    def dep(user: Principal = Depends(get_current_user)) -> Principal:
         # Compare role names case-insensitively to avoid mismatches like 'admin' vs 'Admin'
-        if not role or (role.name or "").lower() != (required or "").lower():
+        if not user.role_name or user.role_name.lower() != (required or "").lower():
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
         return user
     return dep
@@ -98,12 +382,11 @@ def require_any_role(required_roles: list[str]):
 
     Example: Depends(require_any_role(["Admin", "Store"]))
     """
-    def dep(user: User = Depends(get_current_user), db: Session = Depends(get_db)) -> User:
-        role = db.query(Role).filter(Role.id == user.role_id).first()
+    required_lower = {(r or "").lower() for r in required_roles}
+
+    def dep(user: Principal = Depends(get_current_user)) -> Principal:
         # Case-insensitive comparison for role membership
-        required_lower = {(r or "").lower() for r in required_roles}
-        current_role = (role.name or "").lower() if role else ""
-        if not role or current_role not in required_lower:
+        if not user.role_name or user.role_name.lower() not in required_lower:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Forbidden")
         return user
     return dep
@@ -282,11 +282,25 @@ class Settings(BaseSettings):
     database_pool_size: int = 10
     database_max_overflow: int = 20
     database_pool_timeout: int = 30
+    # Per-tenant async engines share this connection budget; idle ones are disposed
+    tenant_engine_max_connections: int = 200
+    tenant_engine_pool_size: int = 5
+    tenant_engine_max_overflow: int = 5
+    tenant_engine_idle_timeout: int = 600  # seconds
+    # Document numbers reserved per allocator round trip (1 keeps series gap-free per worker)
+    number_block_size: int = 1
     
     # Security Settings
     secret_key: str = "your-secret-key-change-in-production"
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 1440
+    auth_principal_cache_ttl: int = 60  # seconds an authenticated user's id/role/tenant is reused
+    refresh_token_expire_days: int = 7
+    # bcrypt cost for new hashes; existing hashes with another cost are rehashed on login
+    auth_bcrypt_rounds: int = 12
+    # Password checks run on their own threads so logins cannot starve other requests
+    auth_hash_workers: int = 2
+    auth_hash_queue_size: int = 500
     
     # CORS Settings
     allowed_origins: List[str] = [
@@ -314,14 +328,48 @@ class Settings(BaseSettings):
     smtp_user: Optional[str] = None
     smtp_from: Optional[str] = None
     smtp_enabled: bool = False
+    smtp_timeout: int = 30
+    smtp_pool_size: int = 2  # long-lived sessions, one per outbox sender thread
+    smtp_idle_timeout: int = 60  # seconds before an idle session is replaced
+    
+    # Email Outbox Settings
+    email_outbox_enabled: bool = True
+    email_outbox_poll_interval: float = 5.0
+    email_outbox_batch_size: int = 20
+    email_outbox_max_attempts: int = 5
+    email_outbox_retry_base_seconds: int = 30  # doubled after each failed attempt
+    email_outbox_lock_timeout: int = 600  # reclaim messages stuck in "sending" after a crash
     
     # File Upload Settings
     upload_dir: str = "uploads"
     max_file_size: int = 10 * 1024 * 1024  # 10MB
-    
+
+    # PDF Rendering Settings (0 workers renders in the request thread)
+    pdf_render_workers: int = 2
+    pdf_render_queue_size: int = 16
+    pdf_render_timeout: int = 60
+    pdf_cache_max_entries: int = 256
+    pdf_cache_max_bytes: int = 64 * 1024 * 1024  # 64MB
+
     # Redis Settings (for caching, future use)
     redis_url: Optional[str] = None
     
+    # Security/Audit Event Settings
+    audit_queue_size: int = 10000  # events waiting to be written; more are dropped
+    audit_batch_size: int = 200
+    audit_flush_interval_ms: int = 500
+    security_event_buffer_size: int = 5000  # recent events kept in memory for metrics
+    
+    # Rate Limiting Settings (redis:// shares counters between workers; unset keeps them per process)
+    rate_limit_storage_url: Optional[str] = None
+    rate_limit_window_seconds: int = 60
+    rate_limit_policy_ttl: int = 300  # seconds a tenant's resolved limits are reused
+    
+    # Query Result Cache Settings
+    query_cache_max_entries: int = 1000
+    query_cache_max_bytes: int = 64 * 1024 * 1024  # 64MB
+    query_cache_ttl: int = 300  # seconds; writes in other processes are caught by cache_generations
+    
     # Monitoring Settings
     enable_metrics: bool = False
     metrics_port: int = 9090
@@ -0,0 +1,419 @@
+"""
+Daily rollups
+Keeps daily_rollups holding, per tenant and day, the totals dashboards and KPI
+reports need: payments received and made, expenses, invoiced and purchased
+amounts, tax and the outstanding receivables and payables.
+
+Every write to payments, purchase payments, expenses, invoices or purchases
+is turned into per-day deltas, which are collected per transaction and added
+to the matching rows with one upsert just before it commits. Concurrent
+writers never overwrite each other's totals, and the rollup rows are only
+locked from that upsert to the commit. ``rebuild_rollups`` recomputes a date
+range from the documents themselves; it backfills an empty table on startup
+and can be run as a catch-up job.
+"""
+
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import Date, case, delete, event, func, inspect, select, true
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .db import dialect_insert
+from .models import DailyRollup, Expense, Invoice, Payment, Purchase, PurchasePayment
+
+logger = logging.getLogger(__name__)
+
+rollups = DailyRollup.__table__
+
+AMOUNT_COLUMNS = (
+    "income", "purchase_payments", "expenses", "invoiced", "paid_invoiced", "tax_collected",
+    "receivables", "purchased", "paid_purchased", "tax_paid", "payables",
+)
+COUNT_COLUMNS = ("income_count", "purchase_payment_count", "expense_count", "invoice_count", "purchase_count")
+MEASURES = AMOUNT_COLUMNS + COUNT_COLUMNS
+
+# Invoices and purchases in these statuses count towards revenue and COGS
+PAID_STATUSES = ("Paid", "Partially Paid")
+
+Key = Tuple[int, date]
+
+# Rows per multi-row upsert (keeps SQLite under its bound-parameter limit)
+UPSERT_CHUNK_SIZE = 500
+
+
+def _amount(value: Any) -> Decimal:
+    if value is None:
+        return Decimal("0")
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _day(value: Any) -> Optional[date]:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+@dataclass(frozen=True)
+class _Source:
+    """How one document table contributes to the rollups
+
+    ``values`` maps a document's attributes to its contribution and
+    ``aggregates`` is the same thing as SQL aggregates over the table.
+    """
+    model: Any
+    date_attr: str
+    attrs: Tuple[str, ...]
+    values: Callable[[Mapping[str, Any]], Dict[str, Any]]
+    aggregates: Callable[[Any], Dict[str, Any]]
+
+
+# Rollup columns fed by invoices and purchases: total, paid total, tax, outstanding, count
+_DOCUMENT_COLUMNS = {
+    "invoice": ("invoiced", "paid_invoiced", "tax_collected", "receivables", "invoice_count"),
+    "purchase": ("purchased", "paid_purchased", "tax_paid", "payables", "purchase_count"),
+}
+
+
+def _document_values(kind: str) -> Callable[[Mapping[str, Any]], Dict[str, Any]]:
+    total, paid, tax, outstanding, count = _DOCUMENT_COLUMNS[kind]
+
+    def values(v: Mapping[str, Any]) -> Dict[str, Any]:
+        grand_total = _amount(v.get("grand_total"))
+        return {
+            total: grand_total,
+            paid: grand_total if v.get("status") in PAID_STATUSES else Decimal("0"),
+            tax: _amount(v.get("cgst")) + _amount(v.get("sgst")) + _amount(v.get("igst")),
+            outstanding: max(_amount(v.get("balance_amount")), Decimal("0")),
+            count: 1,
+        }
+    return values
+
+
+def _document_aggregates(kind: str) -> Callable[[Any], Dict[str, Any]]:
+    total, paid, tax, outstanding, count = _DOCUMENT_COLUMNS[kind]
+
+    def aggregates(model) -> Dict[str, Any]:
+        return {
+            total: func.sum(model.grand_total),
+            paid: func.sum(case((model.status.in_(PAID_STATUSES), model.grand_total), else_=0)),
+            tax: func.sum(model.cgst + model.sgst + model.igst),
+            outstanding: func.sum(case((model.balance_amount > 0, model.balance_amount), else_=0)),
+            count: func.count(model.id),
+        }
+    return aggregates
+
+
+_DOCUMENT_ATTRS = ("grand_total", "balance_amount", "status", "cgst", "sgst", "igst")
+
+SOURCES: Dict[Any, _Source] = {
+    source.model: source for source in (
+        _Source(
+            Payment, "payment_date", ("amount",),
+            lambda v: {"income": _amount(v.get("amount")), "income_count": 1},
+            lambda m: {"income": func.sum(m.amount), "income_count": func.count(m.id)},
+        ),
+        _Source(
+            PurchasePayment, "payment_date", ("payment_amount",),
+            lambda v: {"purchase_payments": _amount(v.get("payment_amount")), "purchase_payment_count": 1},
+            lambda m: {"purchase_payments": func.sum(m.payment_amount), "purchase_payment_count": func.count(m.id)},
+        ),
+        _Source(
+            Expense, "expense_date", ("amount",),
+            lambda v: {"expenses": _amount(v.get("amount")), "expense_count": 1},
+            lambda m: {"expenses": func.sum(m.amount), "expense_count": func.count(m.id)},
+        ),
+        _Source(Invoice, "date", _DOCUMENT_ATTRS, _document_values("invoice"), _document_aggregates("invoice")),
+        _Source(Purchase, "date", _DOCUMENT_ATTRS, _document_values("purchase"), _document_aggregates("purchase")),
+    )
+}
+
+
+class _Deltas:
+    """Per-(tenant, day) changes to the rollup columns"""
+
+    def __init__(self):
+        self.rows: Dict[Key, Dict[str, Any]] = defaultdict(lambda: defaultdict(Decimal))
+
+    def add(self, source: _Source, values: Mapping[str, Any], sign: int) -> None:
+        day = _day(values.get(source.date_attr))
+        if day is None:
+            return
+        key = (values.get("tenant_id") or 0, day)
+        for column, amount in source.values(values).items():
+            self.rows[key][column] += sign * amount
+
+    def merge(self, other: "_Deltas") -> None:
+        for key, columns in other.rows.items():
+            for column, amount in columns.items():
+                self.rows[key][column] += amount
+
+    def nonzero(self) -> Dict[Key, Dict[str, Any]]:
+        result = {}
+        for key, columns in self.rows.items():
+            columns = {column: amount for column, amount in columns.items() if amount}
+            if columns:
+                result[key] = columns
+        return result
+
+
+def apply_deltas(connection: Connection, deltas: _Deltas) -> int:
+    """Add ``deltas`` to the rollup rows, creating rows for new days; returns the rows touched"""
+    changes = deltas.nonzero()
+    rows = []
+    for (tenant_id, day), columns in sorted(changes.items()):
+        row = {"tenant_id": tenant_id, "day": day}
+        for column in MEASURES:
+            amount = columns.get(column, 0)
+            row[column] = int(amount) if column in COUNT_COLUMNS else amount
+        rows.append(row)
+    for i in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = dialect_insert(connection, rollups).values(rows[i:i + UPSERT_CHUNK_SIZE])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["tenant_id", "day"],
+            set_={column: rollups.c[column] + stmt.excluded[column] for column in MEASURES},
+        )
+        connection.execute(stmt)
+    return len(rows)
+
+
+def _day_column(source: _Source):
+    return func.date(getattr(source.model, source.date_attr))
+
+
+def day_bound(column, day: date):
+    """``day`` as a value comparable with ``column`` (Date or DateTime)"""
+    return day if isinstance(column.type, Date) else datetime.combine(day, time.min)
+
+
+def rebuild_rollups(connection: Connection, start: Optional[date] = None, end: Optional[date] = None) -> int:
+    """Recompute the rollups of ``start``..``end`` (inclusive, open-ended if None) from the documents
+
+    Returns the number of rollup rows written. Meant for backfills and
+    catch-up runs while the documents in the range are not being edited.
+    """
+    totals: Dict[Key, Dict[str, Any]] = defaultdict(lambda: defaultdict(Decimal))
+    for source in SOURCES.values():
+        model = source.model
+        date_column = getattr(model, source.date_attr)
+        day = _day_column(source)
+        aggregates = source.aggregates(model)
+        query = select(
+            func.coalesce(model.tenant_id, 0).label("tenant_id"),
+            day.label("day"),
+            *[expr.label(name) for name, expr in aggregates.items()]
+        ).where(date_column.isnot(None)).group_by(func.coalesce(model.tenant_id, 0), day)
+        if start is not None:
+            query = query.where(date_column >= day_bound(date_column, start))
+        if end is not None:
+            query = query.where(date_column < day_bound(date_column, end + timedelta(days=1)))
+        for row in connection.execute(query):
+            key = (row.tenant_id, _day(row.day))
+            for name in aggregates:
+                totals[key][name] += _amount(getattr(row, name))
+
+    clear = delete(rollups)
+    if start is not None:
+        clear = clear.where(rollups.c.day >= start)
+    if end is not None:
+        clear = clear.where(rollups.c.day <= end)
+    connection.execute(clear)
+
+    deltas = _Deltas()
+    deltas.rows = totals
+    return apply_deltas(connection, deltas)
+
+
+def ensure_rollups(connection: Connection) -> None:
+    """Backfill the rollups from existing documents the first time the table is used"""
+    if connection.execute(select(rollups.c.id).limit(1)).first() is not None:
+        return
+    written = rebuild_rollups(connection)
+    if written:
+        logger.info(f"Backfilled {written} daily rollup rows")
+
+
+def _summed(query, start: Optional[date], end: Optional[date], tenant_id: Optional[int]):
+    if start is not None:
+        query = query.where(rollups.c.day >= start)
+    if end is not None:
+        query = query.where(rollups.c.day <= end)
+    if tenant_id is not None:
+        query = query.where(rollups.c.tenant_id == tenant_id)
+    return query
+
+
+def _totals(row, offset: int = 0) -> Dict[str, Any]:
+    return {
+        column: (int(row[offset + i]) if column in COUNT_COLUMNS else _amount(row[offset + i]))
+        for i, column in enumerate(MEASURES)
+    }
+
+
+def rollup_totals(db: Session, start: Optional[date] = None, end: Optional[date] = None,
+                  tenant_id: Optional[int] = None) -> Dict[str, Any]:
+    """Sum every rollup column over ``start``..``end`` inclusive (either end may be open)"""
+    query = select(*[func.coalesce(func.sum(rollups.c[column]), 0).label(column) for column in MEASURES])
+    return _totals(db.execute(_summed(query, start, end, tenant_id)).one())
+
+
+def rollup_days(db: Session, start: Optional[date] = None, end: Optional[date] = None,
+                tenant_id: Optional[int] = None) -> Dict[date, Dict[str, Any]]:
+    """Totals of each day in ``start``..``end`` that has activity, summed over tenants unless one is given"""
+    query = select(
+        rollups.c.day,
+        *[func.coalesce(func.sum(rollups.c[column]), 0).label(column) for column in MEASURES]
+    ).group_by(rollups.c.day)
+    return {_day(row[0]): _totals(row, 1) for row in db.execute(_summed(query, start, end, tenant_id))}
+
+
+def _keep_replaced_values(target, value, oldvalue, initiator) -> None:
+    pass
+
+
+# active_history loads an expired attribute's committed value before it is
+# replaced, so history.deleted always holds the value the rollups counted
+for _source in SOURCES.values():
+    for _attr in {_source.date_attr, "tenant_id", *_source.attrs}:
+        event.listen(getattr(_source.model, _attr), "set", _keep_replaced_values, active_history=True)
+
+
+def _snapshot(obj, source: _Source, committed: bool) -> Dict[str, Any]:
+    """Attribute values of ``obj``; ``committed`` gives the values before this flush"""
+    state = inspect(obj)
+    values = {}
+    for attr in (source.date_attr, "tenant_id", *source.attrs):
+        value = getattr(obj, attr)
+        if committed:
+            history = state.attrs[attr].history
+            if history.deleted:
+                value = history.deleted[0]
+        values[attr] = value
+    return values
+
+
+_PENDING_KEY = "daily_rollup_deltas"
+
+
+def _record(session: Session, deltas: _Deltas) -> None:
+    """Hold ``deltas`` on the innermost transaction until it commits or rolls back"""
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    if transaction in pending:
+        pending[transaction].merge(deltas)
+    else:
+        pending[transaction] = deltas
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_documents(session: Session, flush_context) -> None:
+    deltas = _Deltas()
+    for obj in session.new:
+        source = SOURCES.get(type(obj))
+        if source is not None:
+            deltas.add(source, _snapshot(obj, source, committed=False), 1)
+    for obj in session.dirty:
+        source = SOURCES.get(type(obj))
+        if source is not None and session.is_modified(obj):
+            deltas.add(source, _snapshot(obj, source, committed=True), -1)
+            deltas.add(source, _snapshot(obj, source, committed=False), 1)
+    for obj in session.deleted:
+        source = SOURCES.get(type(obj))
+        if source is not None:
+            deltas.add(source, _snapshot(obj, source, committed=True), -1)
+    if deltas.rows:
+        _record(session, deltas)
+
+
+@event.listens_for(Session, "before_commit")
+def _apply_before_commit(session: Session) -> None:
+    if session.get_nested_transaction() is not None:
+        return
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    pending = session.info.pop(_PENDING_KEY, None)
+    if pending:
+        deltas = _Deltas()
+        for transaction_deltas in pending.values():
+            deltas.merge(transaction_deltas)
+        apply_deltas(session.connection(), deltas)
+
+
+@event.listens_for(Session, "after_commit")
+def _release_savepoint_deltas(session: Session) -> None:
+    """A released savepoint hands its deltas to the enclosing transaction"""
+    nested = session.get_nested_transaction()
+    pending = session.info.get(_PENDING_KEY)
+    if nested is None or not pending or nested not in pending:
+        return
+    deltas = pending.pop(nested)
+    if nested.parent in pending:
+        pending[nested.parent].merge(deltas)
+    else:
+        pending[nested.parent] = deltas
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back_deltas(session: Session) -> None:
+    pending = session.info.get(_PENDING_KEY)
+    if pending:
+        for transaction in [t for t in pending if not t.is_active]:
+            del pending[transaction]
+
+
+@event.listens_for(Session, "after_transaction_end")
+def _discard_pending(session: Session, transaction) -> None:
+    if transaction.parent is None:
+        session.info.pop(_PENDING_KEY, None)
+
+
+def _select_documents(connection: Connection, source: _Source, where) -> List[Dict[str, Any]]:
+    model = source.model
+    columns = [getattr(model, attr) for attr in ("id", source.date_attr, "tenant_id", *source.attrs)]
+    return [dict(row._mapping) for row in connection.execute(select(*columns).where(where))]
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(state: ORMExecuteState):
+    """Keep rollups current for bulk INSERT, Query.update() and Query.delete() on documents"""
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return None
+    mapper = state.bind_mapper
+    source = SOURCES.get(mapper.class_) if mapper is not None else None
+    if source is None:
+        return None
+
+    connection = state.session.connection()
+    deltas = _Deltas()
+    if state.is_insert:
+        result = state.invoke_statement()
+        params = state.parameters
+        rows = params if isinstance(params, list) else [params] if params else []
+        for row in rows:
+            row = dict(row)
+            row.setdefault(source.date_attr, datetime.utcnow())
+            deltas.add(source, row, 1)
+        _record(state.session, deltas)
+        return result
+
+    where = state.statement.whereclause
+    before = _select_documents(connection, source, where if where is not None else true())
+    result = state.invoke_statement()
+    for row in before:
+        deltas.add(source, row, -1)
+    if state.is_update and before:
+        ids = [row["id"] for row in before]
+        for i in range(0, len(ids), 500):
+            for row in _select_documents(connection, source, source.model.id.in_(ids[i:i + 500])):
+                deltas.add(source, row, 1)
+    _record(state.session, deltas)
+    return result
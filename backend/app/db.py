@@ -1,8 +1,11 @@
-from sqlalchemy import create_engine, event, text
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+from sqlalchemy import create_engine, event, Table
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import sessionmaker, DeclarativeBase, ORMExecuteState
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from .config import settings
 from .tenant_config import tenant_config_manager
+from .monitoring import MeteredQueuePool
+from typing import Optional, Set
 import logging
 import os
 
@@ -13,6 +16,28 @@ class Base(DeclarativeBase):
     pass
 
 
+def dialect_insert(connection: Connection, table: Table):
+    """INSERT with the ``on_conflict_*`` clauses of the connection's dialect"""
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(table)
+
+
+def updated_columns(state: ORMExecuteState) -> Optional[Set[str]]:
+    """Columns a bulk UPDATE sets, or None when they cannot be told"""
+    statement = state.statement
+    values = getattr(statement, "_values", None) or dict(getattr(statement, "_ordered_values", None) or ())
+    if values:
+        return {getattr(column, "key", column) for column in values}
+    params = state.parameters
+    rows = params if isinstance(params, list) else [params] if params else []
+    if rows:
+        return {key for row in rows for key in row}
+    return None
+
+
 # SQLite-specific configuration
 def configure_sqlite_engine(engine):
     """Configure SQLite-specific settings for optimal performance"""
@@ -38,6 +63,14 @@ def configure_sqlite_engine(engine):
             cursor.execute("PRAGMA page_size=4096")
             cursor.close()
 
+    @event.listens_for(engine, "savepoint")
+    def begin_before_savepoint(connection, name):
+        # pysqlite only emits BEGIN before DML, so a SAVEPOINT issued first
+        # would open the transaction itself and its RELEASE would commit it.
+        # Savepoints guard writes, so take the write lock up front as well
+        if "sqlite" in str(engine.url) and not connection.connection.dbapi_connection.in_transaction:
+            connection.exec_driver_sql("BEGIN IMMEDIATE")
+
 def configure_async_sqlite_engine(engine):
     """Configure async SQLite-specific settings for optimal performance"""
     @event.listens_for(engine.sync_engine, "connect")
@@ -67,6 +100,7 @@ if settings.database_type == "sqlite":
     # SQLite configuration with optimized connection pooling
     legacy_engine = create_engine(
         settings.database_url,
+        poolclass=MeteredQueuePool,  # Records checkout waits for /metrics
         pool_size=20,  # Increase pool size for SQLite
         max_overflow=0,  # No overflow for SQLite (file-based)
         pool_timeout=30,  # Connection timeout
@@ -83,6 +117,7 @@ else:
     # PostgreSQL configuration
     legacy_engine = create_engine(
         settings.database_url,
+        poolclass=MeteredQueuePool,  # Records checkout waits for /metrics
         pool_size=settings.database_pool_size,
         max_overflow=settings.database_max_overflow,
         pool_timeout=settings.database_pool_timeout,
@@ -103,9 +138,7 @@ def get_db():
     """Legacy dependency to get database session (single-tenant) with optimized error handling"""
     db = LegacySessionLocal()
     try:
-        # Test connection for SQLite
-        if settings.database_type == "sqlite":
-            db.execute(text("SELECT 1"))
+        # Stale connections are caught by pool_pre_ping when the session first checks one out
         yield db
     except Exception as e:
         logger.error(f"Database session error: {e}")
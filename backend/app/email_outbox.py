@@ -0,0 +1,248 @@
+"""
+Email outbox
+Endpoints queue messages in the email_outbox table and return straight away. A
+background sender claims due messages in batches, delivers them over pooled SMTP
+sessions, retries transient failures with exponential backoff and reports the
+outcome back to the originating document.
+"""
+
+import logging
+import smtplib
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+
+from sqlalchemy import and_, func, or_, update
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .db import LegacySessionLocal
+from .emailer import SMTPConnectionPool, build_email_message
+from .models import EmailOutbox, Invoice
+from .monitoring import email_outbox_queue_depth, register_metrics_refresher
+
+logger = logging.getLogger(__name__)
+
+MAX_RETRY_DELAY_SECONDS = 3600
+
+# Statuses reported by the email_outbox_queue_depth gauge
+PENDING_STATUSES = ("queued", "sending", "failed")
+
+# Invoice statuses that delivering the invoice moves to "Sent"
+UNSENT_INVOICE_STATUSES = ("Draft",)
+
+# document_type -> callable(db, document_id) returning the PDF attachment bytes
+_attachment_builders: Dict[str, Callable[[Session, int], bytes]] = {}
+
+
+class PermanentEmailError(Exception):
+    """Delivery failure that retrying will not fix"""
+
+
+def register_attachment_builder(document_type: str, builder: Callable[[Session, int], bytes]) -> None:
+    """Register how to render the PDF attached to ``document_type`` emails"""
+    _attachment_builders[document_type] = builder
+
+
+def enqueue_email(
+    db: Session,
+    to: str,
+    subject: str,
+    body: str,
+    document_type: Optional[str] = None,
+    document_id: Optional[int] = None,
+    attachment_filename: Optional[str] = None,
+    tenant_id: Optional[int] = None,
+) -> EmailOutbox:
+    """Add a message to the outbox; the caller commits
+
+    The attachment is rendered by the sender at delivery time, so the request
+    that queues the email never waits on PDF generation or SMTP.
+    """
+    entry = EmailOutbox(
+        tenant_id=tenant_id,
+        document_type=document_type,
+        document_id=document_id,
+        to_email=to,
+        subject=subject,
+        body=body,
+        attachment_filename=attachment_filename,
+        status="queued",
+        attempts=0,
+        next_attempt_at=datetime.utcnow(),
+    )
+    db.add(entry)
+    db.flush()
+    return entry
+
+
+def retry_delay(attempts: int) -> timedelta:
+    """Backoff before the next attempt: base, 2x base, 4x base ... capped at an hour"""
+    seconds = settings.email_outbox_retry_base_seconds * (2 ** max(0, attempts - 1))
+    return timedelta(seconds=min(seconds, MAX_RETRY_DELAY_SECONDS))
+
+
+def _is_permanent(error: Exception) -> bool:
+    if isinstance(error, (PermanentEmailError, smtplib.SMTPRecipientsRefused)):
+        return True
+    # 5xx replies (bad mailbox, message rejected) will not succeed on retry
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+
+class EmailOutboxSender:
+    """Background sender draining the email outbox
+
+    Each sender thread claims up to ``email_outbox_batch_size`` due messages
+    with a single conditional UPDATE, so several threads or API processes can
+    run side by side without sending a message twice. Messages left in
+    ``sending`` by a crashed process are reclaimed after
+    ``email_outbox_lock_timeout`` seconds.
+    """
+
+    def __init__(self, session_factory=LegacySessionLocal, pool: Optional[SMTPConnectionPool] = None):
+        self.session_factory = session_factory
+        self.pool = pool or SMTPConnectionPool()
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        self._stop.clear()
+        for i in range(self.pool.max_size):
+            thread = threading.Thread(target=self._run, name=f"email-outbox-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info(f"Email outbox sender started with {len(self._threads)} thread(s)")
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+        self.pool.close_all()
+
+    def wake(self) -> None:
+        """Deliver newly queued mail now instead of at the next poll"""
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            try:
+                processed = self.process_batch()
+            except Exception as e:
+                logger.error(f"Email outbox sender error: {e}")
+                processed = 0
+            if not processed:
+                self._wake.wait(settings.email_outbox_poll_interval)
+                self._wake.clear()
+
+    def process_batch(self) -> int:
+        """Claim and deliver one batch of due messages; returns how many were handled"""
+        db = self.session_factory()
+        try:
+            claimed = self._claim(db)
+            for entry in claimed:
+                self._deliver(db, entry)
+            return len(claimed)
+        finally:
+            db.close()
+
+    def _claim(self, db: Session) -> List[EmailOutbox]:
+        now = datetime.utcnow()
+        due = or_(
+            and_(EmailOutbox.status == "queued", EmailOutbox.next_attempt_at <= now),
+            and_(
+                EmailOutbox.status == "sending",
+                EmailOutbox.locked_at < now - timedelta(seconds=settings.email_outbox_lock_timeout),
+            ),
+        )
+        candidate_ids = [
+            row.id for row in db.query(EmailOutbox.id)
+            .filter(due)
+            .order_by(EmailOutbox.next_attempt_at, EmailOutbox.id)
+            .limit(settings.email_outbox_batch_size)
+        ]
+        if not candidate_ids:
+            db.rollback()
+            return []
+        # Re-check the condition in the UPDATE so a concurrent sender cannot claim the same rows
+        claimed_ids = db.execute(
+            update(EmailOutbox)
+            .where(EmailOutbox.id.in_(candidate_ids), due)
+            .values(status="sending", locked_at=now)
+            .returning(EmailOutbox.id)
+            .execution_options(synchronize_session=False)
+        ).scalars().all()
+        db.commit()
+        if not claimed_ids:
+            return []
+        return (
+            db.query(EmailOutbox)
+            .filter(EmailOutbox.id.in_(claimed_ids))
+            .order_by(EmailOutbox.id)
+            .all()
+        )
+
+    def _deliver(self, db: Session, entry: EmailOutbox) -> None:
+        attempts = entry.attempts + 1
+        try:
+            if not settings.smtp_enabled:
+                raise PermanentEmailError("SMTP is not enabled")
+            attachment = None
+            if entry.attachment_filename and entry.document_type in _attachment_builders:
+                attachment = _attachment_builders[entry.document_type](db, entry.document_id)
+            msg = build_email_message(entry.to_email, entry.subject, entry.body, attachment, entry.attachment_filename)
+            self.pool.send(msg)
+        except Exception as e:
+            db.rollback()
+            entry.attempts = attempts
+            entry.last_error = str(e)[:1000]
+            entry.locked_at = None
+            if _is_permanent(e) or attempts >= settings.email_outbox_max_attempts:
+                entry.status = "failed"
+                logger.warning(f"Email {entry.id} to {entry.to_email} failed permanently: {e}")
+            else:
+                entry.status = "queued"
+                entry.next_attempt_at = datetime.utcnow() + retry_delay(attempts)
+                logger.info(f"Email {entry.id} attempt {attempts} failed, retrying at {entry.next_attempt_at}: {e}")
+            db.commit()
+            return
+
+        entry.attempts = attempts
+        entry.status = "sent"
+        entry.sent_at = datetime.utcnow()
+        entry.locked_at = None
+        entry.last_error = None
+        if entry.document_type == "invoice" and entry.document_id:
+            # Delivery can lag the request by minutes; don't undo a payment or cancellation made since
+            db.query(Invoice).filter(
+                Invoice.id == entry.document_id,
+                Invoice.status.in_(UNSENT_INVOICE_STATUSES)
+            ).update(
+                {Invoice.status: "Sent"}, synchronize_session=False
+            )
+        db.commit()
+
+
+# Global instance
+email_outbox_sender = EmailOutboxSender()
+
+
+@register_metrics_refresher
+def refresh_outbox_metrics() -> None:
+    """Set email_outbox_queue_depth from the outbox table"""
+    db = LegacySessionLocal()
+    try:
+        counts = dict(
+            db.query(EmailOutbox.status, func.count(EmailOutbox.id))
+            .filter(EmailOutbox.status.in_(PENDING_STATUSES))
+            .group_by(EmailOutbox.status)
+            .all()
+        )
+    finally:
+        db.close()
+    for status in PENDING_STATUSES:
+        email_outbox_queue_depth.labels(status=status).set(counts.get(status, 0))
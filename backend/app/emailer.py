@@ -1,4 +1,7 @@
 import smtplib
+import threading
+import time
+from typing import List, Optional, Tuple
 from email.message import EmailMessage
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
@@ -6,6 +9,42 @@ from email.mime.application import MIMEApplication
 from .config import settings
 
 
+def build_email_message(to: str, subject: str, body: str, pdf_attachment=None, filename=None) -> MIMEMultipart:
+    """Build the MIME message sent by ``send_email`` and the outbox sender"""
+    msg = MIMEMultipart('alternative')
+    msg['From'] = settings.smtp_from
+    msg['To'] = to
+    msg['Subject'] = subject
+    
+    # Add text and HTML parts
+    text_part = MIMEText(body, 'plain')
+    html_part = MIMEText(body, 'html')
+    msg.attach(text_part)
+    msg.attach(html_part)
+    
+    # Add PDF attachment if provided
+    if pdf_attachment and filename:
+        pdf_attachment = MIMEApplication(pdf_attachment, _subtype='pdf')
+        pdf_attachment.add_header('Content-Disposition', 'attachment', filename=filename)
+        msg.attach(pdf_attachment)
+    
+    return msg
+
+
+def open_smtp_connection() -> smtplib.SMTP:
+    """Connect, STARTTLS and log in to the configured SMTP server"""
+    s = smtplib.SMTP(settings.smtp_host, settings.smtp_port, timeout=settings.smtp_timeout)
+    try:
+        if settings.smtp_use_tls:
+            s.starttls()
+        if settings.smtp_user and settings.smtp_password:
+            s.login(settings.smtp_user, settings.smtp_password)
+    except Exception:
+        s.close()
+        raise
+    return s
+
+
 def send_email(to: str, subject: str, body: str, pdf_attachment=None, filename=None):
     """
     Send email with optional PDF attachment
@@ -21,30 +60,10 @@ def send_email(to: str, subject: str, body: str, pdf_attachment=None, filename=N
         return False
     
     try:
-        # Create message
-        msg = MIMEMultipart('alternative')
-        msg['From'] = settings.smtp_from
-        msg['To'] = to
-        msg['Subject'] = subject
-        
-        # Add text and HTML parts
-        text_part = MIMEText(body, 'plain')
-        html_part = MIMEText(body, 'html')
-        msg.attach(text_part)
-        msg.attach(html_part)
-        
-        # Add PDF attachment if provided
-        if pdf_attachment and filename:
-            pdf_attachment = MIMEApplication(pdf_attachment, _subtype='pdf')
-            pdf_attachment.add_header('Content-Disposition', 'attachment', filename=filename)
-            msg.attach(pdf_attachment)
+        msg = build_email_message(to, subject, body, pdf_attachment, filename)
         
         # Send email
-        with smtplib.SMTP(settings.smtp_host, settings.smtp_port) as s:
-            if settings.smtp_use_tls:
-                s.starttls()
-            if settings.smtp_user and settings.smtp_password:
-                s.login(settings.smtp_user, settings.smtp_password)
+        with open_smtp_connection() as s:
             s.send_message(msg)
         
         return True
@@ -53,6 +72,74 @@ def send_email(to: str, subject: str, body: str, pdf_attachment=None, filename=N
         return False
 
 
+class SMTPConnectionPool:
+    """Long-lived SMTP sessions reused across messages
+
+    Opening a session costs a TCP connect, STARTTLS and login, so sessions are
+    kept open between sends. A session idle for longer than ``idle_timeout``
+    seconds is replaced before use since most servers drop quiet clients, and
+    one the server has dropped anyway is reconnected once before giving up.
+    """
+
+    def __init__(self, max_size: Optional[int] = None, idle_timeout: Optional[int] = None):
+        self.max_size = max(1, max_size if max_size is not None else settings.smtp_pool_size)
+        self.idle_timeout = idle_timeout if idle_timeout is not None else settings.smtp_idle_timeout
+        self._idle: List[Tuple[smtplib.SMTP, float]] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.max_size)
+
+    def _checkout(self) -> smtplib.SMTP:
+        with self._lock:
+            while self._idle:
+                conn, idle_since = self._idle.pop()
+                if time.monotonic() - idle_since < self.idle_timeout:
+                    return conn
+                self._discard(conn)
+        return open_smtp_connection()
+
+    def _checkin(self, conn: smtplib.SMTP) -> None:
+        with self._lock:
+            self._idle.append((conn, time.monotonic()))
+
+    @staticmethod
+    def _discard(conn: smtplib.SMTP) -> None:
+        try:
+            conn.quit()
+        except Exception:
+            conn.close()
+
+    def send(self, msg) -> None:
+        """Send ``msg`` on a pooled session; SMTP errors propagate to the caller"""
+        with self._slots:
+            conn = self._checkout()
+            try:
+                try:
+                    conn.send_message(msg)
+                except smtplib.SMTPServerDisconnected:
+                    conn.close()
+                    conn = open_smtp_connection()
+                    conn.send_message(msg)
+            except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException):
+                # The server answered, so the session itself is still usable
+                try:
+                    conn.rset()
+                except Exception:
+                    self._discard(conn)
+                else:
+                    self._checkin(conn)
+                raise
+            except Exception:
+                self._discard(conn)
+                raise
+            self._checkin(conn)
+
+    def close_all(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self._discard(conn)
+
+
 def create_invoice_email_template(invoice_no: str, customer_name: str, amount: float, due_date: str, company_name: str = "CASHFLOW"):
     """
     Create HTML email template for invoice delivery
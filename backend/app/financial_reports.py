@@ -10,9 +10,10 @@ from sqlalchemy import and_, or_, func, desc
 from enum import Enum
 
 from .models import (
-    Invoice, InvoiceItem, Purchase, PurchaseItem, Payment, PurchasePayment, 
+    Invoice, InvoiceItem, Purchase, PurchaseItem,
     Expense, Party, Product, StockLedgerEntry
 )
+from .daily_rollups import rollup_totals
 
 
 class ReportType(str, Enum):
@@ -233,32 +234,12 @@ class FinancialReports:
     
     def _calculate_revenue(self, start_date: date, end_date: date) -> Decimal:
         """Calculate total revenue for the period"""
-        result = self.db.query(
-            func.sum(Invoice.grand_total)
-        ).filter(
-            and_(
-                Invoice.date >= start_date,
-                Invoice.date <= end_date,
-                Invoice.status.in_(["Paid", "Partially Paid"])
-            )
-        ).scalar()
-        
-        return Decimal(str(result or 0))
+        return rollup_totals(self.db, start_date, end_date)["paid_invoiced"]
     
     def _calculate_cogs(self, start_date: date, end_date: date) -> Decimal:
         """Calculate Cost of Goods Sold"""
         # Simplified COGS calculation based on purchases
-        result = self.db.query(
-            func.sum(Purchase.grand_total)
-        ).filter(
-            and_(
-                Purchase.date >= start_date,
-                Purchase.date <= end_date,
-                Purchase.status.in_(["Paid", "Partially Paid"])
-            )
-        ).scalar()
-        
-        return Decimal(str(result or 0))
+        return rollup_totals(self.db, start_date, end_date)["paid_purchased"]
     
     def _calculate_operating_expenses(self, start_date: date, end_date: date) -> Decimal:
         """Calculate operating expenses"""
@@ -308,14 +289,7 @@ class FinancialReports:
         cash_balance = self._get_cash_balance_at_date(as_of_date)
         
         # Accounts receivable
-        accounts_receivable = self.db.query(
-            func.sum(Invoice.balance_amount)
-        ).filter(
-            and_(
-                Invoice.date <= as_of_date,
-                Invoice.balance_amount > 0
-            )
-        ).scalar() or 0
+        accounts_receivable = rollup_totals(self.db, end=as_of_date)["receivables"]
         
         # Inventory
         inventory_value = self.db.query(
@@ -342,14 +316,7 @@ class FinancialReports:
     def _calculate_current_liabilities(self, as_of_date: date) -> Decimal:
         """Calculate current liabilities"""
         # Accounts payable
-        accounts_payable = self.db.query(
-            func.sum(Purchase.balance_amount)
-        ).filter(
-            and_(
-                Purchase.date <= as_of_date,
-                Purchase.balance_amount > 0
-            )
-        ).scalar() or 0
+        accounts_payable = rollup_totals(self.db, end=as_of_date)["payables"]
         
         return Decimal(str(accounts_payable))
     
@@ -360,37 +327,10 @@ class FinancialReports:
     
     def _calculate_operating_cash_flow(self, start_date: date, end_date: date) -> Decimal:
         """Calculate operating cash flow"""
-        # Cash received from customers
-        cash_received = self.db.query(
-            func.sum(Payment.payment_amount)
-        ).filter(
-            and_(
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        ).scalar() or 0
-        
-        # Cash paid to suppliers
-        cash_paid = self.db.query(
-            func.sum(PurchasePayment.payment_amount)
-        ).filter(
-            and_(
-                PurchasePayment.payment_date >= start_date,
-                PurchasePayment.payment_date <= end_date
-            )
-        ).scalar() or 0
+        totals = rollup_totals(self.db, start_date, end_date)
         
-        # Operating expenses paid
-        expenses_paid = self.db.query(
-            func.sum(Expense.amount)
-        ).filter(
-            and_(
-                Expense.expense_date >= start_date,
-                Expense.expense_date <= end_date
-            )
-        ).scalar() or 0
-        
-        return Decimal(str(cash_received - cash_paid - expenses_paid))
+        # Cash received from customers, less cash paid to suppliers and operating expenses paid
+        return totals["income"] - totals["purchase_payments"] - totals["expenses"]
     
     def _calculate_investing_cash_flow(self, start_date: date, end_date: date) -> Decimal:
         """Calculate investing cash flow"""
@@ -405,19 +345,8 @@ class FinancialReports:
     def _get_cash_balance_at_date(self, as_of_date: date) -> Decimal:
         """Get cash balance as of a specific date"""
         # Calculate cash balance based on all transactions up to the date
-        cash_received = self.db.query(
-            func.sum(Payment.payment_amount)
-        ).filter(Payment.payment_date <= as_of_date).scalar() or 0
-        
-        cash_paid = self.db.query(
-            func.sum(PurchasePayment.payment_amount)
-        ).filter(PurchasePayment.payment_date <= as_of_date).scalar() or 0
-        
-        expenses_paid = self.db.query(
-            func.sum(Expense.amount)
-        ).filter(Expense.expense_date <= as_of_date).scalar() or 0
-        
-        return Decimal(str(cash_received - cash_paid - expenses_paid))
+        totals = rollup_totals(self.db, end=as_of_date)
+        return totals["income"] - totals["purchase_payments"] - totals["expenses"]
     
     # Breakdown methods for detailed reporting
     def _get_revenue_breakdown(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
@@ -530,14 +459,7 @@ class FinancialReports:
     def _get_current_assets_breakdown(self, as_of_date: date) -> List[Dict[str, Any]]:
         """Get current assets breakdown"""
         cash_balance = self._get_cash_balance_at_date(as_of_date)
-        accounts_receivable = self.db.query(
-            func.sum(Invoice.balance_amount)
-        ).filter(
-            and_(
-                Invoice.date <= as_of_date,
-                Invoice.balance_amount > 0
-            )
-        ).scalar() or 0
+        accounts_receivable = rollup_totals(self.db, end=as_of_date)["receivables"]
         
         inventory_value = self.db.query(
             func.sum(Product.stock * Product.purchase_price)
@@ -580,14 +502,7 @@ class FinancialReports:
     
     def _get_current_liabilities_breakdown(self, as_of_date: date) -> List[Dict[str, Any]]:
         """Get current liabilities breakdown"""
-        accounts_payable = self.db.query(
-            func.sum(Purchase.balance_amount)
-        ).filter(
-            and_(
-                Purchase.date <= as_of_date,
-                Purchase.balance_amount > 0
-            )
-        ).scalar() or 0
+        accounts_payable = rollup_totals(self.db, end=as_of_date)["payables"]
         
         return [
             {
@@ -611,32 +526,10 @@ class FinancialReports:
     
     def _get_operating_cash_flow_breakdown(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
         """Get operating cash flow breakdown"""
-        cash_received = self.db.query(
-            func.sum(Payment.payment_amount)
-        ).filter(
-            and_(
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        ).scalar() or 0
-        
-        cash_paid = self.db.query(
-            func.sum(PurchasePayment.payment_amount)
-        ).filter(
-            and_(
-                PurchasePayment.payment_date >= start_date,
-                PurchasePayment.payment_date <= end_date
-            )
-        ).scalar() or 0
-        
-        expenses_paid = self.db.query(
-            func.sum(Expense.amount)
-        ).filter(
-            and_(
-                Expense.expense_date >= start_date,
-                Expense.expense_date <= end_date
-            )
-        ).scalar() or 0
+        totals = rollup_totals(self.db, start_date, end_date)
+        cash_received = totals["income"]
+        cash_paid = totals["purchase_payments"]
+        expenses_paid = totals["expenses"]
         
         return [
             {
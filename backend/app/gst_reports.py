@@ -6,13 +6,154 @@ in the exact format required by the GST portal.
 """
 
 import csv
-from datetime import datetime, date
+from datetime import datetime, date, time, timedelta
 from decimal import Decimal
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Iterator, Optional
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, func
+from sqlalchemy import and_, distinct, func, or_, select
 from .models import Invoice, InvoiceItem, Purchase, PurchaseItem, Party, Product, CompanySettings
 from .gst import money
+from .report_streaming import iter_csv, stream_rows
+
+
+TAX_TOTAL_COLUMNS = ("taxable_value", "cgst", "sgst", "igst", "cess", "grand_total")
+
+
+def day_range(column, start_date: date, end_date: date):
+    """Predicate for a DateTime ``column`` falling on any day from start_date to end_date inclusive
+
+    Compares the raw column against [start 00:00, day after end 00:00) rather
+    than casting it to Date, so an index on the column can be used.
+    """
+    return and_(
+        column >= datetime.combine(start_date, time.min),
+        column < datetime.combine(end_date + timedelta(days=1), time.min)
+    )
+
+
+def document_tax_totals(db: Session, model, start_date: date, end_date: date) -> Dict[str, float]:
+    """Count and sum the tax columns of ``model`` (Invoice or Purchase) in one aggregate query"""
+    row = db.query(
+        func.count(model.id).label("count"),
+        *[func.coalesce(func.sum(getattr(model, name)), 0).label(name) for name in TAX_TOTAL_COLUMNS]
+    ).filter(day_range(model.date, start_date, end_date)).one()
+    totals = {name: float(getattr(row, name)) for name in TAX_TOTAL_COLUMNS}
+    totals["count"] = int(row.count)
+    return totals
+
+
+def gstr1_line_query(start_date: date, end_date: date, b2b: Optional[bool] = None, with_items: bool = True, outer_items: bool = True):
+    """One joined select of invoices with their customer, lines and product HSN
+
+    Replaces loading each invoice's party, items and products separately.
+    Rows are ordered by invoice so consecutive rows of one invoice can be
+    grouped while streaming. ``b2b`` restricts to customers with (True) or
+    without (False) a 15 character GSTIN; ``outer_items`` keeps invoices that
+    have no lines.
+    """
+    columns = [
+        Invoice.id.label("invoice_id"),
+        Invoice.invoice_no,
+        Invoice.date.label("invoice_date"),
+        Invoice.invoice_type,
+        Invoice.place_of_supply,
+        Invoice.place_of_supply_state_code,
+        Invoice.reverse_charge,
+        Invoice.taxable_value.label("invoice_taxable_value"),
+        Invoice.cgst.label("invoice_cgst"),
+        Invoice.sgst.label("invoice_sgst"),
+        Invoice.igst.label("invoice_igst"),
+        Invoice.grand_total,
+        Party.name.label("customer_name"),
+        Party.gstin.label("customer_gstin"),
+        Party.gst_enabled.label("customer_gst_enabled"),
+    ]
+    if with_items:
+        columns += [
+            InvoiceItem.id.label("item_id"),
+            InvoiceItem.description,
+            InvoiceItem.hsn_code,
+            InvoiceItem.qty,
+            InvoiceItem.rate,
+            InvoiceItem.discount,
+            InvoiceItem.taxable_value,
+            InvoiceItem.gst_rate,
+            InvoiceItem.cgst,
+            InvoiceItem.sgst,
+            InvoiceItem.igst,
+            InvoiceItem.cess,
+            InvoiceItem.amount,
+            Product.hsn.label("product_hsn"),
+        ]
+    query = select(*columns).select_from(Invoice).outerjoin(Party, Party.id == Invoice.customer_id)
+    order_by = [Invoice.date, Invoice.id]
+    if with_items:
+        if outer_items:
+            query = query.outerjoin(InvoiceItem, InvoiceItem.invoice_id == Invoice.id)
+        else:
+            query = query.join(InvoiceItem, InvoiceItem.invoice_id == Invoice.id)
+        query = query.outerjoin(Product, Product.id == InvoiceItem.product_id)
+        order_by.append(InvoiceItem.id)
+    query = query.where(day_range(Invoice.date, start_date, end_date))
+    if b2b is not None:
+        has_gstin = and_(Party.gstin.isnot(None), func.length(Party.gstin) == 15)
+        query = query.where(has_gstin if b2b else or_(Party.gstin.is_(None), func.length(Party.gstin) != 15))
+    return query.order_by(*order_by)
+
+
+def _num(value) -> float:
+    return float(value) if value else 0
+
+
+GSTR1_COLUMNS = (
+    "GSTIN/UIN of Recipient", "Receiver Name", "Invoice Number", "Invoice Date", "Invoice Value",
+    "Place Of Supply", "Reverse Charge", "Applicable % of Tax Rate", "Invoice Type", "E-Commerce GSTIN",
+    "Rate", "Taxable Value", "Cess Amount", "Eligibility for ITC", "Availed ITC Integrated Tax",
+    "Availed ITC Central Tax", "Availed ITC State/UT Tax", "Availed ITC Cess", "HSN/SAC", "Description",
+    "Quantity", "Unit", "Total Value", "Discount", "CGST Amount", "SGST Amount", "IGST Amount", "CESS Amount",
+)
+
+
+def gstr1_portal_row(line) -> Dict[str, Any]:
+    """GSTR-1 portal row for one ``gstr1_line_query`` row"""
+    has_customer = line.customer_name is not None
+    supply_type = "B2B" if has_customer and line.customer_gst_enabled else "B2C"
+    values = (
+        line.customer_gstin if has_customer and line.customer_gst_enabled else "",
+        line.customer_name if has_customer else "",
+        line.invoice_no,
+        line.invoice_date.strftime("%d-%m-%Y"),
+        float(line.grand_total),
+        line.place_of_supply_state_code,
+        "Y" if line.reverse_charge else "N",
+        _num(line.gst_rate),
+        "Regular" if line.invoice_type == "Invoice" else line.invoice_type,
+        "",
+        float(line.rate),
+        float(line.taxable_value),
+        _num(line.cess),
+        "Ineligible" if supply_type == "B2C" else "Eligible",
+        _num(line.igst),
+        _num(line.cgst),
+        _num(line.sgst),
+        _num(line.cess),
+        line.hsn_code or line.product_hsn or "",
+        line.description,
+        float(line.qty),
+        "PCS",  # Default unit
+        float(line.amount),
+        _num(line.discount),
+        _num(line.cgst),
+        _num(line.sgst),
+        _num(line.igst),
+        _num(line.cess),
+    )
+    return dict(zip(GSTR1_COLUMNS, values))
+
+
+def iter_gstr1_csv(rows: Iterable[Dict[str, Any]]) -> Iterator[str]:
+    """CSV text chunks for GSTR-1 portal rows, header first"""
+    return iter_csv((row.values() for row in rows), header=GSTR1_COLUMNS)
 
 
 class GSTReportGenerator:
@@ -27,29 +168,23 @@ class GSTReportGenerator:
         errors = []
         
         # Check for invoices without HSN codes
-        invoices_without_hsn = self.db.query(Invoice).join(InvoiceItem).filter(
-            and_(
-                Invoice.date >= start_date,
-                Invoice.date <= end_date,
-                InvoiceItem.hsn_code.is_(None)
-            )
-        ).distinct().all()
+        invoices_without_hsn = self.db.query(func.count(distinct(Invoice.id))).join(InvoiceItem).filter(
+            day_range(Invoice.date, start_date, end_date),
+            InvoiceItem.hsn_code.is_(None)
+        ).scalar()
         
         if invoices_without_hsn:
-            errors.append(f"Found {len(invoices_without_hsn)} invoices without HSN codes")
+            errors.append(f"Found {invoices_without_hsn} invoices without HSN codes")
         
         # Check for invoices without GSTIN for B2B transactions
-        b2b_invoices_without_gstin = self.db.query(Invoice).join(Party, Invoice.customer_id == Party.id).filter(
-            and_(
-                Invoice.date >= start_date,
-                Invoice.date <= end_date,
-                Party.gstin.is_(None),
-                Party.gst_enabled == True
-            )
-        ).all()
+        b2b_invoices_without_gstin = self.db.query(func.count(Invoice.id)).join(Party, Invoice.customer_id == Party.id).filter(
+            day_range(Invoice.date, start_date, end_date),
+            Party.gstin.is_(None),
+            Party.gst_enabled == True
+        ).scalar()
         
         if b2b_invoices_without_gstin:
-            errors.append(f"Found {len(b2b_invoices_without_gstin)} B2B invoices without customer GSTIN")
+            errors.append(f"Found {b2b_invoices_without_gstin} B2B invoices without customer GSTIN")
         
         return errors
     
@@ -58,107 +193,48 @@ class GSTReportGenerator:
         errors = []
         
         # Check for purchases without HSN codes
-        purchases_without_hsn = self.db.query(Purchase).join(PurchaseItem).filter(
-            and_(
-                Purchase.date >= start_date,
-                Purchase.date <= end_date,
-                PurchaseItem.hsn_code.is_(None)
-            )
-        ).distinct().all()
+        purchases_without_hsn = self.db.query(func.count(distinct(Purchase.id))).join(PurchaseItem).filter(
+            day_range(Purchase.date, start_date, end_date),
+            PurchaseItem.hsn_code.is_(None)
+        ).scalar()
         
         if purchases_without_hsn:
-            errors.append(f"Found {len(purchases_without_hsn)} purchases without HSN codes")
+            errors.append(f"Found {purchases_without_hsn} purchases without HSN codes")
         
         return errors
     
+    def iter_gstr1_rows(self, start_date: date, end_date: date) -> Iterator[Dict[str, Any]]:
+        """Yield GSTR-1 rows in GST portal format, one per invoice line, from a single streamed query"""
+        for line in stream_rows(self.db, gstr1_line_query(start_date, end_date, with_items=True, outer_items=False)):
+            yield gstr1_portal_row(line)
+    
+    def count_gstr1_rows(self, start_date: date, end_date: date) -> int:
+        """Number of rows ``iter_gstr1_rows`` yields for the period"""
+        return self.db.query(func.count(InvoiceItem.id)).join(Invoice, Invoice.id == InvoiceItem.invoice_id).filter(
+            day_range(Invoice.date, start_date, end_date)
+        ).scalar()
+    
     def generate_gstr1_data(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
         """Generate GSTR-1 data in GST portal format"""
-        gstr1_data = []
-        
-        # Get all invoices in the date range
-        invoices = self.db.query(Invoice).filter(
-            and_(
-                Invoice.date >= start_date,
-                Invoice.date <= end_date
-            )
-        ).all()
-        
-        for invoice in invoices:
-            customer = self.db.query(Party).filter(Party.id == invoice.customer_id).first()
-            items = self.db.query(InvoiceItem).filter(InvoiceItem.invoice_id == invoice.id).all()
-            
-            for item in items:
-                product = self.db.query(Product).filter(Product.id == item.product_id).first()
-                
-                # Determine supply type
-                supply_type = "B2B" if customer and customer.gst_enabled else "B2C"
-                
-                # GSTR-1 format fields
-                row = {
-                    "GSTIN/UIN of Recipient": customer.gstin if customer and customer.gst_enabled else "",
-                    "Receiver Name": customer.name if customer else "",
-                    "Invoice Number": invoice.invoice_no,
-                    "Invoice Date": invoice.date.strftime("%d-%m-%Y"),
-                    "Invoice Value": float(invoice.grand_total),
-                    "Place Of Supply": invoice.place_of_supply_state_code,
-                    "Reverse Charge": "Y" if invoice.reverse_charge else "N",
-                    "Applicable % of Tax Rate": float(item.gst_rate) if item.gst_rate else 0,
-                    "Invoice Type": "Regular" if invoice.invoice_type == "Invoice" else invoice.invoice_type,
-                    "E-Commerce GSTIN": "",
-                    "Rate": float(item.rate),
-                    "Taxable Value": float(item.taxable_value),
-                    "Cess Amount": float(item.cess) if item.cess else 0,
-                    "Eligibility for ITC": "Ineligible" if supply_type == "B2C" else "Eligible",
-                    "Availed ITC Integrated Tax": float(item.igst) if item.igst else 0,
-                    "Availed ITC Central Tax": float(item.cgst) if item.cgst else 0,
-                    "Availed ITC State/UT Tax": float(item.sgst) if item.sgst else 0,
-                    "Availed ITC Cess": float(item.cess) if item.cess else 0,
-                    "HSN/SAC": item.hsn_code if item.hsn_code else product.hsn if product else "",
-                    "Description": item.description,
-                    "Quantity": float(item.qty),
-                    "Unit": "PCS",  # Default unit
-                    "Total Value": float(item.amount),
-                    "Discount": float(item.discount) if item.discount else 0,
-                    "CGST Amount": float(item.cgst) if item.cgst else 0,
-                    "SGST Amount": float(item.sgst) if item.sgst else 0,
-                    "IGST Amount": float(item.igst) if item.igst else 0,
-                    "CESS Amount": float(item.cess) if item.cess else 0
-                }
-                
-                gstr1_data.append(row)
-        
-        return gstr1_data
+        return list(self.iter_gstr1_rows(start_date, end_date))
     
     def generate_gstr3b_data(self, start_date: date, end_date: date) -> Dict[str, Any]:
         """Generate GSTR-3B summary data"""
         
-        # Get all invoices and purchases in the date range
-        invoices = self.db.query(Invoice).filter(
-            and_(
-                Invoice.date >= start_date,
-                Invoice.date <= end_date
-            )
-        ).all()
+        # Outward totals from invoices, input tax credit from purchases
+        outward = document_tax_totals(self.db, Invoice, start_date, end_date)
+        inward = document_tax_totals(self.db, Purchase, start_date, end_date)
         
-        purchases = self.db.query(Purchase).filter(
-            and_(
-                Purchase.date >= start_date,
-                Purchase.date <= end_date
-            )
-        ).all()
+        total_taxable_value = outward["taxable_value"]
+        total_cgst = outward["cgst"]
+        total_sgst = outward["sgst"]
+        total_igst = outward["igst"]
+        total_cess = outward["cess"]
         
-        # Calculate totals
-        total_taxable_value = sum(float(inv.taxable_value) for inv in invoices)
-        total_cgst = sum(float(inv.cgst) for inv in invoices)
-        total_sgst = sum(float(inv.sgst) for inv in invoices)
-        total_igst = sum(float(inv.igst) for inv in invoices)
-        total_cess = sum(float(inv.cess) for inv in invoices)
-        
-        # Calculate input tax credit from purchases
-        total_itc_cgst = sum(float(pur.cgst) for pur in purchases)
-        total_itc_sgst = sum(float(pur.sgst) for pur in purchases)
-        total_itc_igst = sum(float(pur.igst) for pur in purchases)
-        total_itc_cess = sum(float(pur.cess) for pur in purchases if hasattr(pur, 'cess'))
+        total_itc_cgst = inward["cgst"]
+        total_itc_sgst = inward["sgst"]
+        total_itc_igst = inward["igst"]
+        total_itc_cess = inward["cess"]
         
         gstr3b_data = {
             "summary": {
@@ -177,33 +253,28 @@ class GSTReportGenerator:
                 "net_cess": total_cess - total_itc_cess
             },
             "details": {
-                "invoices": len(invoices),
-                "purchases": len(purchases),
+                "invoices": outward["count"],
+                "purchases": inward["count"],
                 "period": f"{start_date.strftime('%d-%m-%Y')} to {end_date.strftime('%d-%m-%Y')}"
             }
         }
         
         return gstr3b_data
     
-    def export_gstr1_csv(self, start_date: date, end_date: date) -> str:
+    def export_gstr1_csv(self, start_date: date, end_date: date, data: Optional[List[Dict[str, Any]]] = None) -> str:
         """Export GSTR-1 data to CSV format"""
-        data = self.generate_gstr1_data(start_date, end_date)
+        if data is None:
+            data = self.generate_gstr1_data(start_date, end_date)
         
         if not data:
             return ""
         
-        # Create CSV content using StringIO
-        import io
-        output = io.StringIO()
-        writer = csv.DictWriter(output, fieldnames=data[0].keys())
-        writer.writeheader()
-        writer.writerows(data)
-        
-        return output.getvalue()
+        return "".join(iter_gstr1_csv(data))
     
-    def export_gstr3b_csv(self, start_date: date, end_date: date) -> str:
+    def export_gstr3b_csv(self, start_date: date, end_date: date, data: Optional[Dict[str, Any]] = None) -> str:
         """Export GSTR-3B data to CSV format"""
-        data = self.generate_gstr3b_data(start_date, end_date)
+        if data is None:
+            data = self.generate_gstr3b_data(start_date, end_date)
         
         # Create CSV content for GSTR-3B summary
         import io
@@ -258,7 +329,7 @@ def generate_gstr1_report(db: Session, start_date: str, end_date: str) -> Dict[s
         
         # Generate data
         data = generator.generate_gstr1_data(start_dt, end_dt)
-        csv_content = generator.export_gstr1_csv(start_dt, end_dt)
+        csv_content = generator.export_gstr1_csv(start_dt, end_dt, data)
         
         return {
             "success": True,
@@ -296,7 +367,7 @@ def generate_gstr3b_report(db: Session, start_date: str, end_date: str) -> Dict[
         
         # Generate data
         data = generator.generate_gstr3b_data(start_dt, end_dt)
-        csv_content = generator.export_gstr3b_csv(start_dt, end_dt)
+        csv_content = generator.export_gstr3b_csv(start_dt, end_dt, data)
         
         return {
             "success": True,
@@ -99,7 +99,17 @@ class HTMLToPDFConverter:
         }
 
 
+_converter: Optional[HTMLToPDFConverter] = None
+
+
+def get_converter() -> HTMLToPDFConverter:
+    """Return the process-wide converter, created on first use"""
+    global _converter
+    if _converter is None:
+        _converter = HTMLToPDFConverter()
+    return _converter
+
+
 def convert_html_to_pdf(html_content: str, paper_size: str = "A4") -> bytes:
     """Simple function to convert HTML to PDF"""
-    converter = HTMLToPDFConverter()
-    return converter.convert_html_to_pdf(html_content, paper_size)
+    return get_converter().convert_html_to_pdf(html_content, paper_size)
@@ -9,7 +9,9 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func, desc
 from enum import Enum
 
-from .models import Product, StockLedgerEntry, Invoice, InvoiceItem, Purchase, PurchaseItem
+from .models import Product, StockAlert, StockLedgerEntry, Invoice, InvoiceItem, Purchase, PurchaseItem
+from .inventory_valuation import get_stock_valuation
+from .stock_alerts import DEFAULT_REORDER_QUANTITY, low_stock_query
 
 
 class StockValuationMethod(str, Enum):
@@ -77,29 +79,31 @@ class InventoryManager:
         Returns:
             List of low stock products
         """
-        query = self.db.query(Product).filter(Product.is_active == True)
-        
-        if threshold is not None:
-            query = query.filter(Product.stock <= threshold)
+        if threshold is None:
+            # Precomputed for the default reorder level
+            alerts_query = self.db.query(
+                Product, StockAlert.reorder_level, StockAlert.urgency, StockAlert.last_purchase_at
+            ).join(StockAlert, StockAlert.product_id == Product.id)
         else:
-            query = query.filter(Product.stock <= 10)  # Default reorder level
-        
-        low_stock_products = query.all()
+            low_stock = low_stock_query(threshold).subquery()
+            alerts_query = self.db.query(
+                Product, low_stock.c.reorder_level, low_stock.c.urgency, low_stock.c.last_purchase_at
+            ).join(low_stock, low_stock.c.product_id == Product.id)
         
         alerts = []
-        for product in low_stock_products:
+        for product, reorder_level, urgency, last_purchase_at in alerts_query.order_by(Product.id):
             alerts.append({
                 "id": product.id,
                 "name": product.name,
                 "sku": product.sku,
                 "current_stock": product.stock,
-                "reorder_level": 10,  # Default reorder level
-                "reorder_quantity": 20,  # Default reorder quantity
+                "reorder_level": reorder_level,
+                "reorder_quantity": DEFAULT_REORDER_QUANTITY,
                 "unit": product.unit,
                 "purchase_price": float(product.purchase_price or 0),
                 "stock_value": float(product.stock * (product.purchase_price or 0)),
-                "days_since_last_purchase": self._get_days_since_last_purchase(product.id),
-                "urgency": self._calculate_urgency(product.stock, 10)  # Default reorder level
+                "days_since_last_purchase": (date.today() - last_purchase_at.date()).days if last_purchase_at else 999,  # No purchase history
+                "urgency": urgency
             })
         
         return alerts
@@ -244,32 +248,31 @@ class InventoryManager:
             Dictionary with stock value calculations
         """
         products = self.db.query(Product).filter(Product.is_active == True).all()
+        stock_values = get_stock_valuation(self.db).by_product(valuation_method.value)
         
-        total_value = Decimal('0')
+        total_value = 0.0
         product_values = []
         
         for product in products:
-            if valuation_method == StockValuationMethod.FIFO:
-                value = self._calculate_fifo_value(product.id)
-            elif valuation_method == StockValuationMethod.LIFO:
-                value = self._calculate_lifo_value(product.id)
-            else:  # AVERAGE
-                value = self._calculate_average_value(product.id)
+            # Quantity on hand and its value both come from the ledger layers;
+            # products with no stock are priced at their purchase price
+            stock_qty, value = stock_values.get(product.id, (0.0, 0.0))
+            unit_value = value / stock_qty if stock_qty > 0 else float(product.purchase_price or 0)
             
             product_values.append({
                 "id": product.id,
                 "name": product.name,
                 "sku": product.sku,
-                "stock_qty": product.stock,
-                "unit_value": float(value or 0),
-                "total_value": float(product.stock * (value or 0))
+                "stock_qty": stock_qty,
+                "unit_value": unit_value,
+                "total_value": value
             })
             
-            total_value += product.stock * (value or 0)
+            total_value += value
         
         return {
             "valuation_method": valuation_method,
-            "total_stock_value": float(total_value),
+            "total_stock_value": total_value,
             "products": product_values
         }
     
@@ -280,12 +283,24 @@ class InventoryManager:
         Returns:
             List of products with aging information
         """
-        products = self.db.query(Product).filter(Product.is_active == True).all()
+        # Latest ledger row per product in one pass over (product_id, created_at)
+        last_movement = self.db.query(
+            StockLedgerEntry.product_id,
+            StockLedgerEntry.entry_type,
+            StockLedgerEntry.created_at,
+            func.row_number().over(
+                partition_by=StockLedgerEntry.product_id,
+                order_by=(desc(StockLedgerEntry.created_at), desc(StockLedgerEntry.id))
+            ).label("rn")
+        ).subquery()
+        rows = self.db.query(Product, last_movement.c.entry_type, last_movement.c.created_at)\
+            .outerjoin(last_movement, and_(last_movement.c.product_id == Product.id, last_movement.c.rn == 1))\
+            .filter(Product.is_active == True)\
+            .order_by(Product.id)
         
         aging_report = []
-        for product in products:
-            last_movement = self._get_last_stock_movement(product.id)
-            days_since_last_movement = (date.today() - last_movement.created_at.date()).days if last_movement else 0
+        for product, last_movement_type, last_movement_date in rows:
+            days_since_last_movement = (date.today() - last_movement_date.date()).days if last_movement_date else 0
             
             aging_report.append({
                 "id": product.id,
@@ -296,46 +311,12 @@ class InventoryManager:
                 "total_value": float(product.stock * (product.purchase_price or 0)),
                 "days_since_last_movement": days_since_last_movement,
                 "aging_category": self._categorize_aging(days_since_last_movement),
-                "last_movement_type": last_movement.entry_type if last_movement else None,
-                "last_movement_date": last_movement.created_at if last_movement else None
+                "last_movement_type": last_movement_type,
+                "last_movement_date": last_movement_date
             })
         
         return aging_report
     
-    def _get_days_since_last_purchase(self, product_id: int) -> int:
-        """Get days since last purchase for a product"""
-        last_purchase = self.db.query(StockLedgerEntry)\
-            .filter(
-                and_(
-                    StockLedgerEntry.product_id == product_id,
-                    StockLedgerEntry.entry_type == "in"
-                )
-            )\
-            .order_by(desc(StockLedgerEntry.created_at))\
-            .first()
-        
-        if last_purchase:
-            return (date.today() - last_purchase.created_at.date()).days
-        return 999  # No purchase history
-    
-    def _calculate_urgency(self, current_stock: int, reorder_level: int) -> str:
-        """Calculate urgency level for low stock"""
-        if current_stock == 0:
-            return "critical"
-        elif current_stock <= reorder_level * 0.5:
-            return "high"
-        elif current_stock <= reorder_level:
-            return "medium"
-        else:
-            return "low"
-    
-    def _get_last_stock_movement(self, product_id: int) -> Optional[StockLedgerEntry]:
-        """Get last stock movement for a product"""
-        return self.db.query(StockLedgerEntry)\
-            .filter(StockLedgerEntry.product_id == product_id)\
-            .order_by(desc(StockLedgerEntry.created_at))\
-            .first()
-    
     def _calculate_stock_turnover(self, start_date: date, end_date: date) -> Dict[str, Any]:
         """Calculate stock turnover ratio"""
         # Get total sales quantity
@@ -364,24 +345,6 @@ class InventoryManager:
             "days_to_turnover": 365 / turnover_ratio if turnover_ratio > 0 else 0
         }
     
-    def _calculate_fifo_value(self, product_id: int) -> Decimal:
-        """Calculate FIFO value for a product"""
-        # For simplicity, using purchase price as FIFO value
-        product = self.db.query(Product).filter(Product.id == product_id).first()
-        return product.purchase_price if product and product.purchase_price else Decimal('0')
-    
-    def _calculate_lifo_value(self, product_id: int) -> Decimal:
-        """Calculate LIFO value for a product"""
-        # For simplicity, using purchase price as LIFO value
-        product = self.db.query(Product).filter(Product.id == product_id).first()
-        return product.purchase_price if product and product.purchase_price else Decimal('0')
-    
-    def _calculate_average_value(self, product_id: int) -> Decimal:
-        """Calculate weighted average value for a product"""
-        # For simplicity, using purchase price as average value
-        product = self.db.query(Product).filter(Product.id == product_id).first()
-        return product.purchase_price if product and product.purchase_price else Decimal('0')
-    
     def _categorize_aging(self, days: int) -> str:
         """Categorize inventory aging"""
         if days <= 30:
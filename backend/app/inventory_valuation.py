@@ -0,0 +1,261 @@
+"""
+Inventory valuation
+Values stock on hand by FIFO, LIFO and weighted average cost from the stock
+ledger's cost layers. Every ledger row is read in one ordered query and the
+layers of all products are costed together with NumPy, so valuing the whole
+catalogue costs one query plus a handful of array operations.
+
+The methods are periodic: closing quantity comes from the ledger, FIFO prices
+it from the most recent receipts, LIFO from the earliest and WAC at the average
+cost of all receipts. Results are cached per database until the ledger, purchase
+items or product prices change.
+"""
+
+import threading
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import Float, case, cast, event, func, inspect as sa_inspect, select
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .db import updated_columns
+from .models import Product, PurchaseItem, StockLedgerEntry
+from .services.query_optimizer import bump_shared_generations, shared_generations
+from .stock_snapshots import signed_stock_qty, unit_cost
+
+VALUATION_METHODS = ("fifo", "lifo", "average")
+
+# Any change to these invalidates cached valuations
+_COST_MODELS = (StockLedgerEntry, PurchaseItem)
+# Product columns valuations read (as the fallback unit cost); stock counter
+# updates made by every invoice leave cached valuations alone
+_PRODUCT_COST_COLUMNS = frozenset(("purchase_price", "sales_price"))
+
+_PENDING_KEY = "inventory_valuation_pending"
+# cache_generations row bumped by every commit that changes a valuation
+GENERATION_TAG = "stock_valuation"
+
+
+@dataclass
+class StockValuation:
+    """Closing quantity and value of every product with ledger history
+
+    Arrays are aligned with ``product_ids``, which is sorted.
+    """
+    product_ids: np.ndarray
+    closing_qty: np.ndarray
+    fallback_cost: np.ndarray
+    values: Dict[str, np.ndarray]
+
+    def by_product(self, method: str) -> Dict[int, Tuple[float, float]]:
+        """{product_id: (closing_qty, value)} for one valuation method"""
+        values = self.values[method]
+        return {
+            int(product_id): (float(qty), float(value))
+            for product_id, qty, value in zip(self.product_ids, self.closing_qty, values)
+        }
+
+    def unit_values(self, method: str) -> Dict[int, float]:
+        """{product_id: value per unit on hand}; products with no stock use their list cost"""
+        qty = self.closing_qty
+        per_unit = np.where(qty > 0, self.values[method] / np.where(qty > 0, qty, 1), self.fallback_cost)
+        return dict(zip(self.product_ids.tolist(), per_unit.tolist()))
+
+
+def _purchase_costs():
+    """Taxable cost per unit of each product on each purchase"""
+    gross = PurchaseItem.qty * PurchaseItem.expected_rate
+    taxable = gross - case(
+        (PurchaseItem.discount_type == "Fixed", PurchaseItem.discount),
+        else_=gross * PurchaseItem.discount / 100
+    )
+    return (
+        select(
+            PurchaseItem.purchase_id,
+            PurchaseItem.product_id,
+            (func.sum(taxable) / func.nullif(func.sum(PurchaseItem.qty), 0)).label("unit_cost"),
+        )
+        .group_by(PurchaseItem.purchase_id, PurchaseItem.product_id)
+        .subquery()
+    )
+
+
+def _purchase_layer(costs):
+    """Join condition from an incoming ledger row to the purchase line it received"""
+    return (
+        (StockLedgerEntry.ref_type == "purchase")
+        & (costs.c.purchase_id == StockLedgerEntry.ref_id)
+        & (costs.c.product_id == StockLedgerEntry.product_id)
+    )
+
+
+def _layer_query():
+    costs = _purchase_costs()
+    signed = signed_stock_qty()
+    fallback = unit_cost()
+    return (
+        select(
+            StockLedgerEntry.product_id,
+            cast(signed, Float),
+            cast(func.coalesce(costs.c.unit_cost, fallback), Float),
+            cast(fallback, Float),
+        )
+        .join(Product, Product.id == StockLedgerEntry.product_id)
+        .outerjoin(costs, _purchase_layer(costs))
+        .order_by(StockLedgerEntry.product_id, StockLedgerEntry.created_at, StockLedgerEntry.id)
+    )
+
+
+def value_layers(product_ids: np.ndarray, qty: np.ndarray, cost: np.ndarray, fallback: np.ndarray) -> StockValuation:
+    """Value ledger rows grouped by product and ordered by time within each product
+
+    ``qty`` is the signed stock effect of each row and ``cost`` the unit cost of
+    the layer it creates (ignored for outgoing rows). Quantity on hand beyond
+    what the recorded receipts cover (stock that predates the ledger) is valued
+    at the product's ``fallback`` cost under every method.
+    """
+    if not len(product_ids):
+        empty = np.zeros(0)
+        return StockValuation(np.zeros(0, dtype=np.int64), empty, empty, {m: empty for m in VALUATION_METHODS})
+
+    ids, group = np.unique(product_ids, return_inverse=True)
+    n = len(ids)
+    closing = np.maximum(np.bincount(group, weights=qty, minlength=n), 0)
+    product_fallback = np.zeros(n)
+    product_fallback[group] = fallback
+
+    receipts = qty > 0
+    layer_group = group[receipts]
+    layer_qty = qty[receipts]
+    layer_cost = cost[receipts]
+    received = np.bincount(layer_group, weights=layer_qty, minlength=n)
+
+    # Quantity received before and after each layer within its own product
+    running = np.cumsum(layer_qty)
+    before_group = np.concatenate(([0.0], running))[np.searchsorted(layer_group, np.arange(n))]
+    earlier = running - layer_qty - before_group[layer_group]
+    later = received[layer_group] - earlier - layer_qty
+    on_hand = closing[layer_group]
+
+    uncovered = np.maximum(closing - received, 0) * product_fallback
+    fifo_take = np.clip(on_hand - later, 0, layer_qty)
+    lifo_take = np.clip(on_hand - earlier, 0, layer_qty)
+    fifo = np.bincount(layer_group, weights=fifo_take * layer_cost, minlength=n) + uncovered
+    lifo = np.bincount(layer_group, weights=lifo_take * layer_cost, minlength=n) + uncovered
+
+    received_cost = np.bincount(layer_group, weights=layer_qty * layer_cost, minlength=n)
+    average_cost = received_cost / np.where(received > 0, received, 1)
+    average = np.minimum(closing, received) * average_cost + uncovered
+
+    return StockValuation(ids, closing, product_fallback, {"fifo": fifo, "lifo": lifo, "average": average})
+
+
+def compute_stock_valuation(db: Session) -> StockValuation:
+    """Read every ledger row once and value all products"""
+    rows = db.execute(_layer_query()).all()
+    data = np.array(rows, dtype=float).reshape(len(rows), 4)
+    data = np.nan_to_num(data)
+    return value_layers(data[:, 0].astype(np.int64), data[:, 1], data[:, 2], data[:, 3])
+
+
+class StockValuationCache:
+    """Per-process cache of the latest valuation of each database
+
+    Entries are dropped when a session that wrote ledger rows, purchase items,
+    product prices or deleted products commits. The same commit bumps the
+    shared ``stock_valuation`` generation, so an entry is also dropped when
+    another process made such a change; checking it is one primary-key read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version = 0
+        self._entries: Dict[str, Tuple[tuple, StockValuation]] = {}
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+
+    def get(self, db: Session) -> StockValuation:
+        if db.info.get(_PENDING_KEY):
+            # Uncommitted cost changes are visible only to this session
+            return compute_stock_valuation(db)
+        bind_key = str(db.get_bind().url)
+        generation = shared_generations(db, (GENERATION_TAG,))
+        with self._lock:
+            key = (self._version, generation)
+            cached = self._entries.get(bind_key)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        valuation = compute_stock_valuation(db)
+        with self._lock:
+            if key[0] == self._version:
+                self._entries[bind_key] = (key, valuation)
+        return valuation
+
+
+stock_valuation_cache = StockValuationCache()
+
+
+def get_stock_valuation(db: Session) -> StockValuation:
+    """Valuation of all stock, from cache when the ledger has not changed"""
+    return stock_valuation_cache.get(db)
+
+
+def _changes_product_cost(product: Product) -> bool:
+    attrs = sa_inspect(product).attrs
+    return any(attrs[column].history.has_changes() for column in _PRODUCT_COST_COLUMNS)
+
+
+def _is_cost_change(session: Session, obj) -> bool:
+    if isinstance(obj, _COST_MODELS):
+        return True
+    if isinstance(obj, Product):
+        # A new product has no ledger rows yet, so only deletes and price edits matter
+        return obj in session.deleted or (obj in session.dirty and _changes_product_cost(obj))
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_cost_changes(session: Session, flush_context) -> None:
+    if any(_is_cost_change(session, obj) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_cost_changes(state: ORMExecuteState) -> Optional[object]:
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return None
+    mapper = state.bind_mapper
+    if mapper is None:
+        return None
+    if mapper.class_ in _COST_MODELS:
+        state.session.info[_PENDING_KEY] = True
+    elif mapper.class_ is Product:
+        columns = updated_columns(state) if state.is_update else set()
+        if state.is_delete or columns is None or columns & _PRODUCT_COST_COLUMNS:
+            state.session.info[_PENDING_KEY] = True
+    return None
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_generation_before_commit(session: Session) -> None:
+    if session.get_nested_transaction() is not None:
+        return
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    if session.info.get(_PENDING_KEY):
+        bump_shared_generations(session.connection(), [GENERATION_TAG])
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_on_commit(session: Session) -> None:
+    if session.info.pop(_PENDING_KEY, False):
+        stock_valuation_cache.invalidate()
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
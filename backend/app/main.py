@@ -14,6 +14,10 @@ from app.db import Base, legacy_engine, init_db, init_tenant_db
 # Seed data removed from main application - use separate scripts for development and testing
 from app import main_routers
 from app.config import settings
+from app.pagination import NEXT_CURSOR_HEADER
+from app.pdf_renderer import pdf_render_pool
+from app.email_outbox import email_outbox_sender
+from app.auth import password_verifier
 from app.middleware.tenant_routing import (
     tenant_routing_middleware, 
     tenant_feature_access_middleware
@@ -32,6 +36,9 @@ from app.logging_config import setup_logging, get_logger
 import logging
 from datetime import datetime
 from app.seed import run_seed
+from app.stock_alerts import refresh_stock_alerts
+from app.daily_rollups import ensure_rollups
+from app.stock_snapshots import backfill_snapshots
 
 # Configure structured logging
 setup_logging(
@@ -65,6 +72,7 @@ def create_app(database_engine=None) -> FastAPI:
         allow_credentials=True,
         allow_methods=["*"],
         allow_headers=["*"],
+        expose_headers=[NEXT_CURSOR_HEADER],
     )
 
     # Add security middleware if enabled
@@ -84,6 +92,15 @@ def create_app(database_engine=None) -> FastAPI:
     else:
         logger.info("Multi-tenant middleware disabled - running in single-tenant mode")
 
+    # Prometheus metrics; added last so it wraps every other middleware
+    if settings.enable_metrics:
+        app.add_middleware(MonitoringMiddleware)
+
+        @app.get("/metrics", include_in_schema=False)
+        def metrics():
+            """Prometheus metrics (sync so scrape-time refreshers run off the event loop)"""
+            return get_metrics_response()
+
     @app.get("/health")
     async def health_check():
         return {
@@ -285,12 +302,33 @@ def create_app(database_engine=None) -> FastAPI:
                 logger.info("Running database seed...")
                 run_seed()
 
+                # Rebuild low-stock alerts in case stock changed outside the app,
+                # backfill the daily rollups on first run and seed this year's
+                # stock snapshots
+                with (database_engine or legacy_engine).begin() as connection:
+                    refresh_stock_alerts(connection)
+                    ensure_rollups(connection)
+                    backfill_snapshots(connection)
+
+                if settings.email_outbox_enabled:
+                    email_outbox_sender.start()
+
                 logger.info("Application initialization completed successfully")
                 
             except Exception as e:
                 logger.error(f"Application initialization failed: {e}")
                 raise
 
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        """Stop background workers"""
+        email_outbox_sender.stop()
+        pdf_render_pool.shutdown()
+        password_verifier.shutdown()
+        if SECURITY_ENABLED:
+            await security_manager.audit_writer.stop()
+        await tenant_config_manager.engine_registry.dispose_all()
+
     return app
 
 # Create the application instance
@@ -1,34 +1,58 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Response, Request, UploadFile, File
-from pydantic import BaseModel, validator
+from pydantic import AliasChoices, BaseModel, Field, ValidationError, validator
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_, or_, case
+from sqlalchemy import func, and_, or_, case, insert, select, update, true, false
+from sqlalchemy.exc import IntegrityError, SQLAlchemyError
 import re
+import csv
+import io
 import logging
 from datetime import datetime, timedelta, date
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
-from .auth import authenticate_user, create_access_token, get_current_user, require_role, require_any_role
-from .db import get_db
-from .models import Product, User, Party, CompanySettings, Invoice, InvoiceItem, StockLedgerEntry, Purchase, PurchaseItem, Payment, PurchasePayment, Expense, AuditTrail, RecurringInvoiceTemplate, RecurringInvoiceTemplateItem, RecurringInvoice, PurchaseOrder, PurchaseOrderItem, GSTInvoiceTemplate
+from .auth import (
+    PasswordHashQueueFull, authenticate_user_async, create_access_token, create_refresh_token,
+    get_current_user, get_refresh_principal, require_role, require_any_role
+)
+from .db import LegacySessionLocal, get_db
+from .models import Product, User, Party, CompanySettings, Invoice, InvoiceItem, StockLedgerEntry, Purchase, PurchaseItem, Payment, PurchasePayment, Expense, AuditTrail, RecurringInvoiceTemplate, RecurringInvoiceTemplateItem, RecurringInvoice, PurchaseOrder, PurchaseOrderItem, GSTInvoiceTemplate, EmailOutbox, StockAlert
 from .audit import AuditService
 from .gst import money, split_gst
-from .gst_reports import generate_gstr1_report, generate_gstr3b_report
+from .gst_reports import (
+    GSTR1_COLUMNS, GSTReportGenerator, day_range, document_tax_totals, generate_gstr3b_report,
+    gstr1_line_query, iter_gstr1_csv
+)
 from .currency import get_exchange_rate, get_supported_currencies, format_currency, format_currency_for_pdf
 from .recurring_invoices import RecurringInvoiceService, generate_recurring_invoices
 from .purchase_orders import PurchaseOrderService, convert_po_to_purchase
 from .profitpath_service import ProfitPathService
 from .payment_scheduler import PaymentScheduler, PaymentStatus, PaymentReminderType
 from .inventory_manager import InventoryManager, StockValuationMethod
+from .inventory_valuation import get_stock_valuation
 from .financial_reports import FinancialReports, ReportType
+from .pagination import NEXT_CURSOR_HEADER, apply_keyset, clamp_page_size, fetch_page
+from .number_allocator import number_allocator, financial_year_prefix, same_tenant_scope
+from .stock_alerts import DEFAULT_REORDER_LEVEL
+from .stock_snapshots import fy_bounds, get_snapshots, signed_qty, signed_stock_qty, unit_cost as stock_unit_cost
+from .services.query_optimizer import INVENTORY_TAGS, LEDGER_TAGS, cached_query
+from .report_streaming import OPENPYXL_AVAILABLE, StreamedText, iter_csv, iter_json, iter_jsonl, stream_rows, write_xlsx
+from .pdf_renderer import (
+    PYPDF_AVAILABLE, PDFRenderQueueFull, invoice_pdf_cache_key, invoice_pdf_inputs_stamp, iter_zip,
+    merge_pdfs, pdf_render_pool, rendered_pdf_cache
+)
 from .routers.branding import router as branding_router
 from .config import settings
+from .tenant_config import tenant_config_manager
 # from .dental import router as dental_router
 # from .manufacturing import router as manufacturing_router
 from decimal import Decimal
-from .emailer import send_email, create_invoice_email_template, create_purchase_email_template
+from .emailer import create_invoice_email_template, create_purchase_email_template
+from .email_outbox import PermanentEmailError, email_outbox_sender, enqueue_email, register_attachment_builder
 from fastapi import Query
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
 import json
 import calendar
 from io import BytesIO
@@ -149,17 +173,56 @@ class LoginRequest(BaseModel):
     password: str
 
 
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+
+def _token_response(db: Session, user_id: int, username: str) -> dict:
+    refresh = create_refresh_token(db, user_id, username)
+    db.commit()
+    return {
+        "access_token": create_access_token(username),
+        "refresh_token": refresh,
+        "token_type": "bearer"
+    }
+
+
 @api.post("/auth/login")
-def login(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
-    user = authenticate_user(db, payload.username, payload.password)
+async def login(payload: LoginRequest, request: Request, db: Session = Depends(get_db)):
+    # async so a burst of logins waits on the password workers, not on request threads
+    try:
+        user = await authenticate_user_async(db, payload.username, payload.password)
+    except PasswordHashQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many logins in progress, please retry",
+            headers={"Retry-After": "2"}
+        )
     if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
     
     # Log successful login
-    AuditService.log_login(db, user, request)
+    await run_in_threadpool(AuditService.log_login, db, user, request)
     
-    token = create_access_token(user.username)
-    return {"access_token": token, "token_type": "bearer"}
+    return await run_in_threadpool(_token_response, db, user.id, user.username)
+
+
+@api.post("/auth/refresh")
+def refresh_token(payload: RefreshRequest, db: Session = Depends(get_db)):
+    """Exchange a refresh token for a new access/refresh token pair without re-entering the password
+
+    The presented refresh token is revoked, so each one can be used once.
+    """
+    principal = get_refresh_principal(payload.refresh_token, db)
+    return _token_response(db, principal.id, principal.username)
+
+
+@api.post("/auth/logout", status_code=status.HTTP_204_NO_CONTENT)
+def logout(payload: RefreshRequest, request: Request, db: Session = Depends(get_db)):
+    """Revoke the refresh token; the short-lived access token simply expires"""
+    principal = get_refresh_principal(payload.refresh_token, db)
+    db.commit()
+    AuditService.log_logout(db, principal, request)
 
 
 class ProductOut(BaseModel):
@@ -587,74 +650,107 @@ class InvoiceCreate(BaseModel):
     notes: str | None = None
 
 
-def _next_invoice_no(db: Session) -> str:
-    """Generate next invoice number with FY prefix and auto-generated sequence"""
-    from datetime import datetime
-    
-    # Get current financial year (April to March)
-    current_date = datetime.now()
-    if current_date.month >= 4:
-        fy_year = current_date.year
-    else:
-        fy_year = current_date.year - 1
-    
-    fy_prefix = f"FY{fy_year}"
-    
-    # Find the last invoice number for this financial year
+def _last_invoice_seq(db: Session, fy_prefix: str, tenant_id: int | None = None) -> int:
+    """Highest sequence already used in the tenant's invoice series for this financial year"""
     last_invoice = db.query(Invoice).filter(
+        same_tenant_scope(Invoice.tenant_id, tenant_id),
         Invoice.invoice_no.like(f"{fy_prefix}/INV-%")
     ).order_by(Invoice.invoice_no.desc()).first()
     
     if last_invoice:
-        # Extract sequence number from last invoice
         try:
-            last_seq = int(last_invoice.invoice_no.split('-')[-1])
-            seq = last_seq + 1
+            return int(last_invoice.invoice_no.split('-')[-1])
         except (ValueError, IndexError):
-            seq = 1
-    else:
-        seq = 1
-    
-    # Format as FY<year>/INV-<4 digit sequence>
-    invoice_no = f"{fy_prefix}/INV-{seq:04d}"
-    
-    # Ensure total length doesn't exceed 16 characters
-    if len(invoice_no) > 16:
-        # Truncate if necessary
-        invoice_no = invoice_no[:16]
-    
-    return invoice_no
-    
-    # Ensure final length doesn't exceed 16
-    result = f"{prefix}{seq_str}"
-    if len(result) > 16:
-        result = result[:16]
-    
-    return result
+            return 0
+    return 0
+
+
+def _format_invoice_no(fy_prefix: str, seq: int) -> str:
+    # Format as FY<year>/INV-<4 digit sequence>, max 16 characters as per GST law
+    return f"{fy_prefix}/INV-{seq:04d}"[:16]
+
+
+def _next_invoice_no(db: Session, tenant_id: int | None = None, peek: bool = False) -> str:
+    """Generate next invoice number with FY prefix and auto-generated sequence
+
+    The sequence comes from the atomic per-tenant, per-FY number allocator;
+    the invoice_no scan only seeds a series the first time it is used.
+    """
+    fy_prefix = financial_year_prefix()
+    allocate = number_allocator.peek if peek else number_allocator.allocate
+    seq = allocate(
+        db, f"{fy_prefix}/INV", tenant_id=tenant_id,
+        seed=lambda: _last_invoice_seq(db, fy_prefix, tenant_id)
+    )
+    return _format_invoice_no(fy_prefix, seq)
 
 
 @api.get('/invoices/next-number')
 def get_next_invoice_number(_: User = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get the next invoice number for preview"""
     try:
-        next_number = _next_invoice_no(db)
+        company = db.query(CompanySettings).first()
+        next_number = _next_invoice_no(db, company.tenant_id if company else None, peek=True)
         return {"invoice_number": next_number}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate invoice number: {str(e)}")
 
+class InvoiceLookupCache:
+    """Company settings, parties and products reused across invoice creations
+
+    A single create uses a fresh cache; bulk imports share one across the whole
+    batch and prefetch each chunk's parties and products with IN queries.
+    """
+
+    def __init__(self):
+        self._company_loaded = False
+        self.company: CompanySettings | None = None
+        self.parties: dict[int, Party] = {}
+        self.products: dict[int, Product] = {}
+
+    def get_company(self, db: Session) -> CompanySettings | None:
+        if not self._company_loaded:
+            self.company = db.query(CompanySettings).first()
+            self._company_loaded = True
+        return self.company
+
+    def get_parties(self, db: Session, ids) -> dict[int, Party]:
+        missing = {i for i in ids if i not in self.parties}
+        if missing:
+            for party in db.query(Party).filter(Party.id.in_(missing)).all():
+                self.parties[party.id] = party
+        return {i: self.parties[i] for i in ids if i in self.parties}
+
+    def get_products(self, db: Session, ids) -> dict[int, Product]:
+        missing = {i for i in ids if i not in self.products}
+        if missing:
+            for prod in db.query(Product).filter(Product.id.in_(missing)).all():
+                self.products[prod.id] = prod
+        return {i: self.products[i] for i in ids if i in self.products}
+
+
 @api.post('/invoices', response_model=InvoiceOut, status_code=status.HTTP_201_CREATED)
 def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    inv = _create_invoice_record(db, payload)
+    db.commit()
+    db.refresh(inv)
+    return inv
+
+
+def _create_invoice_record(db: Session, payload: InvoiceCreate, cache: InvoiceLookupCache | None = None) -> Invoice:
+    """Validate ``payload`` and write the invoice, its items and stock movements
+
+    Raises HTTPException on validation errors. Does not commit, so callers
+    decide the transaction boundary.
+    """
+    cache = cache or InvoiceLookupCache()
+    
     # Validation
     if payload.invoice_no and len(payload.invoice_no) > 16:
         raise HTTPException(status_code=400, detail="Invoice number must be 16 characters or less as per GST law")
     if payload.invoice_no and not re.match(r'^[a-zA-Z0-9\s\-/]+$', payload.invoice_no):
         raise HTTPException(status_code=400, detail="Invoice number must be alphanumeric with spaces, hyphens, and forward slashes only")
-    
-    # Check for duplicate invoice number (AC1)
-    if payload.invoice_no:
-        existing_invoice = db.query(Invoice).filter(Invoice.invoice_no == payload.invoice_no).first()
-        if existing_invoice:
-            raise HTTPException(status_code=400, detail="Invoice number already exists")
+
     if len(payload.bill_to_address) > 200:
         raise HTTPException(status_code=400, detail="Bill to address must be 200 characters or less")
     if len(payload.ship_to_address) > 200:
@@ -686,9 +782,10 @@ def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user),
     except ValueError:
         raise HTTPException(status_code=400, detail="Invalid invoice date format")
     
-    company = db.query(CompanySettings).first()
-    customer = db.query(Party).filter(Party.id == payload.customer_id).first()
-    supplier = db.query(Party).filter(Party.id == payload.supplier_id).first()
+    company = cache.get_company(db)
+    parties = cache.get_parties(db, {payload.customer_id, payload.supplier_id})
+    customer = parties.get(payload.customer_id)
+    supplier = parties.get(payload.supplier_id)
     
     if not customer:
         raise HTTPException(status_code=400, detail='Customer not found')
@@ -699,6 +796,15 @@ def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user),
     if not company:
         raise HTTPException(status_code=400, detail='Company profile not configured')
     
+    # Check for duplicate invoice number (AC1); numbers are unique per tenant
+    if payload.invoice_no:
+        existing_invoice = db.query(Invoice).filter(
+            same_tenant_scope(Invoice.tenant_id, company.tenant_id),
+            Invoice.invoice_no == payload.invoice_no
+        ).first()
+        if existing_invoice:
+            raise HTTPException(status_code=400, detail="Invoice number already exists")
+    
     # Validate GSTIN format if provided (AC9)
     if hasattr(customer, 'gstin') and customer.gstin:
         if not re.match(r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}$', customer.gstin):
@@ -708,8 +814,14 @@ def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user),
         if not re.match(r'^[0-9]{2}[A-Z]{5}[0-9]{4}[A-Z]{1}[1-9A-Z]{1}Z[0-9A-Z]{1}$', company.gstin):
             raise HTTPException(status_code=400, detail='Invalid company GSTIN format')
     
+    # Load every referenced product in one IN query
+    product_ids = {it.product_id for it in payload.items}
+    products = cache.get_products(db, product_ids)
+    if len(products) != len(product_ids):
+        raise HTTPException(status_code=400, detail='Invalid product')
+    
     # Generate invoice number if not provided
-    invoice_no = payload.invoice_no if payload.invoice_no else _next_invoice_no(db)
+    invoice_no = payload.invoice_no if payload.invoice_no else _next_invoice_no(db, company.tenant_id)
     
     # Calculate due date
     if payload.due_date:
@@ -731,6 +843,7 @@ def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user),
     cess_total = money(0)
 
     inv = Invoice(
+        tenant_id=company.tenant_id,
         customer_id=customer.id,
         supplier_id=supplier.id,
         invoice_no=invoice_no,
@@ -760,10 +873,11 @@ def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user),
     db.add(inv)
     db.flush()
 
+    item_rows = []
+    ledger_rows = []
+    stock_deltas: dict[int, float] = {}
     for it in payload.items:
-        prod = db.query(Product).filter(Product.id == it.product_id).first()
-        if not prod:
-            raise HTTPException(status_code=400, detail='Invalid product')
+        prod = products[it.product_id]
         
         # Calculate line item amounts
         line_total = money(Decimal(it.qty) * Decimal(it.rate))
@@ -787,7 +901,7 @@ def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user),
         description = it.description if it.description else prod.name
         hsn_code = it.hsn_code if it.hsn_code else prod.hsn
         
-        item = InvoiceItem(
+        item_rows.append(dict(
             invoice_id=inv.id,
             product_id=prod.id,
             description=description,
@@ -801,15 +915,27 @@ def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user),
             cgst=cgst, sgst=sgst, igst=igst,
             utgst=money(0), cess=money(0),  # These can be calculated based on specific requirements
             amount=line_total + cgst + sgst + igst
-        )
-        db.add(item)
+        ))
         # stock out for sale
-        db.add(StockLedgerEntry(product_id=prod.id, qty=it.qty, entry_type='out', ref_type='invoice', ref_id=inv.id))
+        ledger_rows.append(dict(product_id=prod.id, qty=it.qty, entry_type='out', ref_type='invoice', ref_id=inv.id))
+        stock_deltas[prod.id] = stock_deltas.get(prod.id, 0) + it.qty
         taxable_total += line_total
         cgst_total += cgst
         sgst_total += sgst
         igst_total += igst
 
+    # Bulk-insert items and ledger rows (executemany) and apply all stock
+    # deltas in one grouped UPDATE, inside the same transaction as the invoice
+    if item_rows:
+        db.execute(insert(InvoiceItem), item_rows)
+        db.execute(insert(StockLedgerEntry), ledger_rows)
+        db.execute(
+            update(Product)
+            .where(Product.id.in_(stock_deltas.keys()))
+            .values(stock=Product.stock - case(stock_deltas, value=Product.id, else_=0))
+            .execution_options(synchronize_session=False)
+        )
+
     # Calculate round off
     subtotal = taxable_total + cgst_total + sgst_total + igst_total + utgst_total + cess_total
     round_off = money(round(subtotal) - subtotal)
@@ -824,24 +950,137 @@ def create_invoice(payload: InvoiceCreate, _: User = Depends(get_current_user),
     inv.round_off = round_off
     inv.grand_total = money(subtotal + round_off)
     inv.balance_amount = money(subtotal + round_off)
-    db.commit()
-    db.refresh(inv)
+    db.flush()
     return inv
 
 
-@api.get('/invoices/{invoice_id}/pdf')
-def invoice_pdf(
-    invoice_id: int,
-    template_id: int | None = None,
-    paper_size: str | None = None,
+INVOICE_IMPORT_ITEM_FIELDS = ('product_id', 'qty', 'rate', 'discount', 'discount_type', 'description', 'hsn_code')
+INVOICE_IMPORT_MAX_CHUNK = 5000
+
+
+def _iter_invoice_import_rows(stream, fmt: str):
+    """Yield ``(row_number, data, error)`` for each invoice in an upload
+
+    JSONL carries one InvoiceCreate object per line. CSV carries one line item
+    per row; consecutive rows sharing ``invoice_ref`` (or ``invoice_no``) form
+    one invoice and header columns are read from the group's first row.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if fmt == 'jsonl':
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield row_number, json.loads(line), None
+            except json.JSONDecodeError as e:
+                yield row_number, None, f"Invalid JSON: {e.msg}"
+        return
+
+    reader = csv.DictReader(text)
+    group_key = None
+    group_row = None
+    group = None
+    for row_number, row in enumerate(reader, start=2):
+        row = {k: v.strip() for k, v in row.items() if k and v is not None and v.strip() != ''}
+        key = row.get('invoice_ref') or row.get('invoice_no') or f"__row{row_number}"
+        if key != group_key:
+            if group is not None:
+                yield group_row, group, None
+            group_key, group_row = key, row_number
+            group = {k: v for k, v in row.items() if k not in INVOICE_IMPORT_ITEM_FIELDS and k != 'invoice_ref'}
+            group['items'] = []
+        group['items'].append({k: row[k] for k in INVOICE_IMPORT_ITEM_FIELDS if k in row})
+    if group is not None:
+        yield group_row, group, None
+
+
+def _import_invoice_chunk(db: Session, chunk: list, cache: InvoiceLookupCache, results: list) -> int:
+    """Create one chunk of parsed invoices and commit it; returns rows created"""
+    cache.get_parties(db, {i for _, p in chunk for i in (p.customer_id, p.supplier_id)})
+    cache.get_products(db, {it.product_id for _, p in chunk for it in p.items})
+
+    created = 0
+    for row_number, payload in chunk:
+        try:
+            # Savepoint per row so one bad invoice does not discard the chunk
+            with db.begin_nested():
+                inv = _create_invoice_record(db, payload, cache)
+            results.append({"row": row_number, "status": "created", "invoice_id": inv.id, "invoice_no": inv.invoice_no})
+            created += 1
+        except HTTPException as e:
+            results.append({"row": row_number, "status": "error", "error": e.detail})
+        except IntegrityError:
+            results.append({"row": row_number, "status": "error", "error": "Invoice number already exists"})
+        except ValueError as e:
+            results.append({"row": row_number, "status": "error", "error": str(e)})
+        except (KeyError, TypeError, ArithmeticError) as e:
+            logger.warning(f"Invoice import row {row_number} failed: {e!r}")
+            results.append({"row": row_number, "status": "error", "error": f"Invalid invoice data: {type(e).__name__}: {e}"})
+        except SQLAlchemyError as e:
+            logger.error(f"Invoice import row {row_number} failed: {e}")
+            results.append({"row": row_number, "status": "error", "error": "Could not save invoice"})
+    db.commit()
+    return created
+
+
+@api.post('/invoices/import')
+def import_invoices(
+    file: UploadFile = File(...),
+    format: str | None = None,
+    chunk_size: int = 500,
     _: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
-    if not inv:
-        raise HTTPException(status_code=404, detail='Invoice not found')
-    
-    # Get template
+    """Bulk-create invoices from a streamed CSV or JSONL upload
+
+    Every row goes through the same validation and GST math as
+    POST /invoices. Company settings, parties and products are cached for
+    the whole batch, and work is committed every ``chunk_size`` invoices.
+    """
+    fmt = (format or os.path.splitext(file.filename or '')[1].lstrip('.')).lower()
+    if fmt == 'ndjson':
+        fmt = 'jsonl'
+    if fmt not in ('csv', 'jsonl'):
+        raise HTTPException(status_code=400, detail="Unsupported import format. Use csv or jsonl")
+    chunk_size = max(1, min(chunk_size, INVOICE_IMPORT_MAX_CHUNK))
+
+    cache = InvoiceLookupCache()
+    if not cache.get_company(db):
+        raise HTTPException(status_code=400, detail='Company profile not configured')
+
+    results = []
+    total = 0
+    created = 0
+    chunk = []
+    for row_number, data, error in _iter_invoice_import_rows(file.file, fmt):
+        total += 1
+        if error is None:
+            try:
+                chunk.append((row_number, InvoiceCreate(**data)))
+            except ValidationError as e:
+                error = "; ".join(
+                    f"{'.'.join(str(part) for part in err['loc'])}: {err['msg']}" for err in e.errors()
+                )
+            except TypeError:
+                error = "Row must be a JSON object"
+        if error is not None:
+            results.append({"row": row_number, "status": "error", "error": error})
+        if len(chunk) >= chunk_size:
+            created += _import_invoice_chunk(db, chunk, cache, results)
+            chunk = []
+    if chunk:
+        created += _import_invoice_chunk(db, chunk, cache, results)
+
+    results.sort(key=lambda r: r["row"])
+    return {
+        "total": total,
+        "created": created,
+        "failed": total - created,
+        "results": results
+    }
+
+
+def _resolve_invoice_template(db: Session, template_id: int | None) -> GSTInvoiceTemplate:
     if template_id:
         template = db.query(GSTInvoiceTemplate).filter(GSTInvoiceTemplate.id == template_id).first()
         if not template:
@@ -854,12 +1093,41 @@ def invoice_pdf(
         ).first()
         if not template:
             raise HTTPException(status_code=404, detail='No default invoice template found')
-    
-    # Get related data
-    company = db.query(CompanySettings).first()
-    customer = db.query(Party).filter(Party.id == inv.customer_id).first()
-    supplier = db.query(Party).filter(Party.id == inv.supplier_id).first()
-    items = db.query(InvoiceItem).filter(InvoiceItem.invoice_id == inv.id).all()
+    return template
+
+
+def _resolve_paper_size(template: GSTInvoiceTemplate, paper_size: str | None) -> str:
+    """Prefer an explicit paper size, else the template default"""
+    allowed_paper_sizes = {"A4", "A5"}
+    if paper_size:
+        if paper_size.upper() not in allowed_paper_sizes:
+            raise HTTPException(status_code=400, detail="Invalid paper_size. Allowed values: A4, A5")
+        return paper_size.upper()
+    paper_sizes = (template.paper_sizes or "A4").split(',')
+    resolved_paper_size = paper_sizes[0].strip().upper() if paper_sizes else "A4"
+    if resolved_paper_size not in allowed_paper_sizes:
+        resolved_paper_size = "A4"
+    return resolved_paper_size
+
+
+def _build_invoice_pdf_data(
+    db: Session,
+    inv: Invoice,
+    cache: InvoiceLookupCache | None = None,
+    items: list[InvoiceItem] | None = None
+) -> dict:
+    """Collect the invoice, parties, items and branding into PDFGenerator's input
+
+    Batch exports pass a shared ``cache`` and prefetched ``items``.
+    """
+    cache = cache or InvoiceLookupCache()
+    company = cache.get_company(db)
+    parties = cache.get_parties(db, {inv.customer_id, inv.supplier_id})
+    customer = parties.get(inv.customer_id)
+    supplier = parties.get(inv.supplier_id)
+    if items is None:
+        items = db.query(InvoiceItem).filter(InvoiceItem.invoice_id == inv.id).all()
+    products = cache.get_products(db, {item.product_id for item in items})
     
     # Prepare invoice data for PDF generator
     invoice_data = {
@@ -949,7 +1217,7 @@ def invoice_pdf(
     
     # Add items
     for item in items:
-        product = db.query(Product).filter(Product.id == item.product_id).first()
+        product = products.get(item.product_id)
         invoice_data["items"].append({
             "sl": len(invoice_data["items"]) + 1,
             "description": item.description or (product.name if product else "N/A"),
@@ -981,8 +1249,8 @@ def invoice_pdf(
     
     # In single-tenant mode, attempt to use the uploaded branding logo if available
     try:
-        if not settings.multi_tenant_enabled:
-            logo_path = os.path.join(settings.upload_dir, "branding", "logo.png")
+        logo_path = _invoice_logo_path()
+        if logo_path:
             if os.path.exists(logo_path):
                 with open(logo_path, 'rb') as _lf:
                     _b64 = base64.b64encode(_lf.read()).decode('utf-8')
@@ -992,58 +1260,276 @@ def invoice_pdf(
         # Non-fatal: proceed without logo if anything goes wrong
         logger.warning(f"Failed to load single-tenant logo: {_e}")
     
-    # Generate PDF using new HTML-based generator
+    return invoice_data
+
+
+def _invoice_logo_path() -> str | None:
+    """Uploaded branding logo invoice PDFs embed (single-tenant mode only)"""
+    if settings.multi_tenant_enabled:
+        return None
+    return os.path.join(settings.upload_dir, "branding", "logo.png")
+
+
+def _invoice_pdf_cache_key(db: Session, inv: Invoice, template: GSTInvoiceTemplate, paper_size: str) -> tuple:
+    return invoice_pdf_cache_key(inv, template, paper_size, invoice_pdf_inputs_stamp(db, _invoice_logo_path()))
+
+
+def _render_invoice_html(
+    db: Session,
+    inv: Invoice,
+    template: GSTInvoiceTemplate,
+    paper_size: str,
+    cache: InvoiceLookupCache | None = None,
+    items: list[InvoiceItem] | None = None
+) -> str:
     from .pdf_generator import PDFGenerator
-    from .html_to_pdf import convert_html_to_pdf
-    
-    pdf_generator = PDFGenerator()
+
+    invoice_data = _build_invoice_pdf_data(db, inv, cache, items)
+    return PDFGenerator().generate_invoice_pdf(invoice_data, template.template_id, paper_size)
+
+
+@api.get('/invoices/{invoice_id}/pdf')
+def invoice_pdf(
+    invoice_id: int,
+    template_id: int | None = None,
+    paper_size: str | None = None,
+    _: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    if not inv:
+        raise HTTPException(status_code=404, detail='Invoice not found')
     
-    # Determine paper size: prefer explicit query param, else template default
-    allowed_paper_sizes = {"A4", "A5"}
-    if paper_size:
-        if paper_size.upper() not in allowed_paper_sizes:
-            raise HTTPException(status_code=400, detail="Invalid paper_size. Allowed values: A4, A5")
-        resolved_paper_size = paper_size.upper()
-    else:
-        paper_sizes = (template.paper_sizes or "A4").split(',')
-        resolved_paper_size = paper_sizes[0].strip().upper() if paper_sizes else "A4"
-        if resolved_paper_size not in allowed_paper_sizes:
-            resolved_paper_size = "A4"
+    template = _resolve_invoice_template(db, template_id)
+    resolved_paper_size = _resolve_paper_size(template, paper_size)
+    no_cache_headers = {
+        'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
+        'Pragma': 'no-cache',
+        'Expires': '0'
+    }
     
-    # Generate HTML
-    html_content = pdf_generator.generate_invoice_pdf(invoice_data, template.template_id, resolved_paper_size)
+    cache_key = _invoice_pdf_cache_key(db, inv, template, resolved_paper_size)
+    pdf_bytes = rendered_pdf_cache.get(cache_key)
+    if pdf_bytes is not None:
+        return Response(content=pdf_bytes, media_type='application/pdf', headers=no_cache_headers)
     
+    html_content = _render_invoice_html(db, inv, template, resolved_paper_size)
     try:
-        # Convert HTML to PDF
-        pdf_bytes = convert_html_to_pdf(html_content, resolved_paper_size)
-        return Response(
-            content=pdf_bytes,
-            media_type='application/pdf',
-            headers={
-                'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+        # Convert HTML to PDF in the render pool
+        pdf_bytes = pdf_render_pool.render(html_content, resolved_paper_size)
+    except PDFRenderQueueFull:
+        raise HTTPException(
+            status_code=503,
+            detail='PDF renderer is busy, please retry shortly',
+            headers={'Retry-After': '5'}
         )
     except Exception as e:
         # Fallback to HTML if PDF conversion fails
-        return Response(
-            content=html_content,
-            media_type='text/html',
-            headers={
-                'Cache-Control': 'no-store, no-cache, must-revalidate, max-age=0',
-                'Pragma': 'no-cache',
-                'Expires': '0'
-            }
+        logger.warning(f"PDF conversion failed for invoice {invoice_id}: {e}")
+        return Response(content=html_content, media_type='text/html', headers=no_cache_headers)
+    rendered_pdf_cache.put(cache_key, pdf_bytes)
+    return Response(content=pdf_bytes, media_type='application/pdf', headers=no_cache_headers)
+
+
+PDF_EXPORT_MAX_INVOICES = 5000
+# pypdf holds every page of a merged PDF in memory until it is written, so
+# merged exports stay small; larger exports use the streamed ZIP
+PDF_MERGE_MAX_INVOICES = 100
+PDF_EXPORT_BATCH_SIZE = 100
+
+
+def _export_pdf_filename(invoice_no: str) -> str:
+    # Invoice numbers contain "/", which would become folders inside the ZIP
+    return re.sub(r'[^A-Za-z0-9._-]+', '-', invoice_no) + '.pdf'
+
+
+def _iter_export_pdfs(invoice_ids: list[int], template: GSTInvoiceTemplate, paper_size: str):
+    """Yield ``(invoice_no, pdf_bytes | Exception)`` for ``invoice_ids`` in order
+
+    Uses its own session because a streamed body outlives the request's
+    dependencies. Invoices are loaded in batches with parties, items and
+    products prefetched, and each batch is expunged once its HTML is built so
+    the identity map stays small however many invoices are exported.
+    """
+    def jobs():
+        db = LegacySessionLocal()
+        try:
+            cache = InvoiceLookupCache()
+            inputs_stamp = invoice_pdf_inputs_stamp(db, _invoice_logo_path())
+            for start in range(0, len(invoice_ids), PDF_EXPORT_BATCH_SIZE):
+                batch_ids = invoice_ids[start:start + PDF_EXPORT_BATCH_SIZE]
+                invoices = {inv.id: inv for inv in db.query(Invoice).filter(Invoice.id.in_(batch_ids)).all()}
+                items_by_invoice: dict[int, list[InvoiceItem]] = {invoice_id: [] for invoice_id in batch_ids}
+                for item in db.query(InvoiceItem).filter(InvoiceItem.invoice_id.in_(batch_ids)).order_by(InvoiceItem.id):
+                    items_by_invoice[item.invoice_id].append(item)
+                cache.get_parties(db, {i.customer_id for i in invoices.values()} | {i.supplier_id for i in invoices.values()})
+                cache.get_products(db, {item.product_id for items in items_by_invoice.values() for item in items})
+
+                for invoice_id in batch_ids:
+                    inv = invoices.get(invoice_id)
+                    if inv is None:
+                        # Deleted after the export started
+                        continue
+                    cached = rendered_pdf_cache.get(invoice_pdf_cache_key(inv, template, paper_size, inputs_stamp))
+                    if cached is not None:
+                        yield inv.invoice_no, cached, paper_size
+                    else:
+                        html_content = _render_invoice_html(
+                            db, inv, template, paper_size, cache, items_by_invoice[invoice_id]
+                        )
+                        yield inv.invoice_no, html_content, paper_size
+
+                db.expunge_all()
+                cache.parties.clear()
+                cache.products.clear()
+        finally:
+            db.close()
+
+    return pdf_render_pool.render_many(jobs())
+
+
+def _iter_export_zip_entries(results):
+    failed = []
+    for invoice_no, result in results:
+        if isinstance(result, Exception):
+            logger.warning(f"PDF export skipped invoice {invoice_no}: {result}")
+            failed.append(f"{invoice_no}: {result}")
+            continue
+        yield _export_pdf_filename(invoice_no), result
+    if failed:
+        yield 'export_errors.txt', ('\n'.join(failed) + '\n').encode('utf-8')
+
+
+def _iter_file_chunks(file, chunk_size: int = 64 * 1024):
+    try:
+        while chunk := file.read(chunk_size):
+            yield chunk
+    finally:
+        file.close()
+
+
+@api.get('/invoices/pdf-export')
+def export_invoice_pdfs(
+    format: str = 'zip',
+    date_from: str | None = None,
+    date_to: str | None = None,
+    customer_id: int | None = None,
+    status: str | None = None,
+    template_id: int | None = None,
+    paper_size: str | None = None,
+    _: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Export every invoice matching the filter as one ZIP or one merged PDF
+
+    Invoices render in parallel across the PDF worker pool. A ZIP streams each
+    invoice as soon as it is rendered, and failed renders are listed in
+    export_errors.txt. A merged PDF can only be sent once complete and is
+    built in memory, so it is limited to PDF_MERGE_MAX_INVOICES (413 above it).
+    """
+    from .html_to_pdf import get_converter
+
+    format = format.lower()
+    if format not in ('zip', 'pdf'):
+        raise HTTPException(status_code=400, detail="Invalid format. Allowed values: zip, pdf")
+    if format == 'pdf' and not PYPDF_AVAILABLE:
+        raise HTTPException(status_code=501, detail="Merged PDF export is not available; use format=zip")
+    if get_converter().backend == "none":
+        raise HTTPException(status_code=503, detail="No PDF conversion backend available")
+
+    query = db.query(Invoice.id)
+    if customer_id:
+        query = query.filter(Invoice.customer_id == customer_id)
+    if status:
+        query = query.filter(Invoice.status == status)
+    if date_from:
+        try:
+            query = query.filter(Invoice.date >= datetime.fromisoformat(date_from))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Invalid date_from format. Use ISO format (YYYY-MM-DD)")
+    if date_to:
+        try:
+            query = query.filter(Invoice.date <= datetime.fromisoformat(date_to))
+        except ValueError:
+            raise HTTPException(status_code=422, detail="Invalid date_to format. Use ISO format (YYYY-MM-DD)")
+
+    max_invoices = PDF_MERGE_MAX_INVOICES if format == 'pdf' else PDF_EXPORT_MAX_INVOICES
+    invoice_ids = [row.id for row in query.order_by(Invoice.date, Invoice.id).limit(max_invoices + 1)]
+    if not invoice_ids:
+        raise HTTPException(status_code=404, detail="No invoices match the filter")
+    if len(invoice_ids) > max_invoices:
+        if format == 'pdf':
+            raise HTTPException(
+                status_code=413,
+                detail=f"Merged PDF export is limited to {max_invoices} invoices; narrow the filter or use format=zip"
+            )
+        raise HTTPException(
+            status_code=400,
+            detail=f"Export is limited to {max_invoices} invoices for format={format}; narrow the filter"
         )
 
+    template = _resolve_invoice_template(db, template_id)
+    resolved_paper_size = _resolve_paper_size(template, paper_size)
+    results = _iter_export_pdfs(invoice_ids, template, resolved_paper_size)
+    stamp = datetime.now().strftime('%Y%m%d%H%M%S')
+
+    if format == 'zip':
+        return StreamingResponse(
+            iter_zip(_iter_export_zip_entries(results)),
+            media_type='application/zip',
+            headers={'Content-Disposition': f'attachment; filename="invoices_{stamp}.zip"'}
+        )
+
+    failed = []
+
+    def rendered_parts():
+        for invoice_no, result in results:
+            if isinstance(result, Exception):
+                logger.warning(f"PDF export skipped invoice {invoice_no}: {result}")
+                failed.append(invoice_no)
+            else:
+                yield result
+
+    merged = merge_pdfs(rendered_parts())
+    if len(failed) == len(invoice_ids):
+        merged.close()
+        raise HTTPException(status_code=500, detail="PDF conversion failed for every invoice")
+    headers = {'Content-Disposition': f'attachment; filename="invoices_{stamp}.pdf"'}
+    if failed:
+        headers['X-Export-Failed'] = ','.join(failed)
+    return StreamingResponse(_iter_file_chunks(merged), media_type='application/pdf', headers=headers)
+
 
 class EmailRequest(BaseModel):
-    to_email: str
+    # The frontend posts {"to": ...}; keep accepting to_email as well
+    to_email: str = Field(validation_alias=AliasChoices('to_email', 'to'))
     subject: str | None = None
     message: str | None = None
 
 
+def _list_document_emails(db: Session, document_type: str, document_id: int) -> list[dict]:
+    entries = (
+        db.query(EmailOutbox)
+        .filter(EmailOutbox.document_type == document_type, EmailOutbox.document_id == document_id)
+        .order_by(EmailOutbox.id.desc())
+        .all()
+    )
+    return [
+        {
+            "id": e.id,
+            "to": e.to_email,
+            "subject": e.subject,
+            "status": e.status,
+            "attempts": e.attempts,
+            "last_error": e.last_error,
+            "next_attempt_at": e.next_attempt_at,
+            "sent_at": e.sent_at,
+            "created_at": e.created_at
+        }
+        for e in entries
+    ]
+
+
 @api.patch('/invoices/{invoice_id}/status')
 def update_invoice_status(invoice_id: int, status: str, _: User = Depends(get_current_user), db: Session = Depends(get_db)):
     inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
@@ -1061,16 +1547,41 @@ def update_invoice_status(invoice_id: int, status: str, _: User = Depends(get_cu
     return {"message": f"Invoice status updated to {status}"}
 
 
+def _invoice_email_pdf(db: Session, invoice_id: int) -> bytes:
+    """Render the PDF attached to invoice emails (run by the email outbox sender)
+
+    Uses the default template through the render pool and shares the rendered
+    PDF cache with the download endpoint, so emailing an invoice that was just
+    viewed costs no render at all.
+    """
+    inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
+    if not inv:
+        raise PermanentEmailError(f"Invoice {invoice_id} no longer exists")
+    try:
+        template = _resolve_invoice_template(db, None)
+    except HTTPException as e:
+        raise PermanentEmailError(e.detail) from e
+    paper_size = _resolve_paper_size(template, None)
+
+    cache_key = _invoice_pdf_cache_key(db, inv, template, paper_size)
+    pdf_bytes = rendered_pdf_cache.get(cache_key)
+    if pdf_bytes is None:
+        # A full render queue raises PDFRenderQueueFull, which the sender retries
+        pdf_bytes = pdf_render_pool.render(_render_invoice_html(db, inv, template, paper_size), paper_size)
+        rendered_pdf_cache.put(cache_key, pdf_bytes)
+    return pdf_bytes
+
+
+register_attachment_builder('invoice', _invoice_email_pdf)
+
+
 @api.post('/invoices/{invoice_id}/email', status_code=202)
 def email_invoice(invoice_id: int, payload: EmailRequest, _: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Queue the invoice email; delivery and the status change to Sent happen in the background"""
     inv = db.query(Invoice).filter(Invoice.id == invoice_id).first()
     if not inv:
         raise HTTPException(status_code=404, detail='Invoice not found')
     
-    # Update status to Sent when emailing
-    inv.status = "Sent"
-    db.commit()
-    
     # Get customer details
     customer = db.query(Party).filter(Party.id == inv.customer_id).first()
     customer_name = customer.name if customer else "Valued Customer"
@@ -1079,220 +1590,35 @@ def email_invoice(invoice_id: int, payload: EmailRequest, _: User = Depends(get_
     company = db.query(CompanySettings).first()
     company_name = company.name if company else "ProfitPath"
     
-    # Generate PDF
-    try:
-        # Create PDF buffer
-        buf = BytesIO()
-        doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=1*cm, leftMargin=1*cm, topMargin=1*cm, bottomMargin=1*cm)
-        
-        # Define styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=darkblue,
-            alignment=TA_CENTER,
-            spaceAfter=20
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=12,
-            textColor=darkblue,
-            spaceAfter=6
-        )
-        
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=10,
-            spaceAfter=3
-        )
-        
-        # Build PDF content (same as invoice_pdf function)
-        story = []
-        
-        # Header - Company Details
-        if company:
-            story.append(Paragraph(f"<b>{company.name}</b>", title_style))
-            story.append(Paragraph(f"GSTIN: {company.gstin}", normal_style))
-            story.append(Paragraph(f"State: {company.state} - {company.state_code}", normal_style))
-        else:
-            story.append(Paragraph("<b>CASHFLOW</b>", title_style))
-            story.append(Paragraph("Financial Management System", normal_style))
-        
-        story.append(Spacer(1, 20))
-        
-        # Invoice Header
-        story.append(Paragraph(f"<b>TAX INVOICE</b>", heading_style))
-        
-        # Invoice Details Table
-        invoice_data = [
-            ['Invoice No:', inv.invoice_no, 'Date:', inv.date.strftime('%d/%m/%Y')],
-            ['Due Date:', inv.due_date.strftime('%d/%m/%Y'), 'Terms:', inv.terms],
-            ['Place of Supply:', inv.place_of_supply, 'State Code:', inv.place_of_supply_state_code]
-        ]
-        
-        if inv.eway_bill_number:
-            invoice_data.append(['E-way Bill No:', inv.eway_bill_number, '', ''])
-        
-        invoice_table = Table(invoice_data, colWidths=[2*cm, 6*cm, 2*cm, 6*cm])
-        invoice_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        story.append(invoice_table)
-        story.append(Spacer(1, 15))
-        
-        # Customer and Supplier Details
-        details_data = []
-        
-        if customer:
-            details_data.append(['Bill To:', customer.name])
-            details_data.append(['', f"GSTIN: {customer.gstin}" if customer.gstin else "GSTIN: Not Available"])
-            customer_address = f"{customer.billing_address_line1}"
-            if customer.billing_address_line2:
-                customer_address += f", {customer.billing_address_line2}"
-            customer_address += f", {customer.billing_city}, {customer.billing_state} - {customer.billing_pincode or ''}"
-            details_data.append(['', customer_address])
-            if customer.email:
-                details_data.append(['', f"Email: {customer.email}"])
-            if customer.contact_number:
-                details_data.append(['', f"Phone: {customer.contact_number}"])
-        
-        supplier = db.query(Party).filter(Party.id == inv.supplier_id).first()
-        if supplier:
-            details_data.append(['Ship From:', supplier.name])
-            details_data.append(['', f"GSTIN: {supplier.gstin}" if supplier.gstin else "GSTIN: Not Available"])
-            supplier_address = f"{supplier.billing_address_line1}"
-            if supplier.billing_address_line2:
-                supplier_address += f", {supplier.billing_address_line2}"
-            supplier_address += f", {supplier.billing_city}, {supplier.billing_state} - {supplier.billing_pincode or ''}"
-            details_data.append(['', supplier_address])
-        
-        if details_data:
-            details_table = Table(details_data, colWidths=[2*cm, 14*cm])
-            details_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-                ('TOPPADDING', (0, 0), (-1, -1), 2),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ]))
-            story.append(details_table)
-            story.append(Spacer(1, 15))
-        
-        # Items Table
-        story.append(Paragraph("<b>Item Details</b>", heading_style))
-        
-        # Table headers
-        headers = ['S.No', 'Description', 'HSN', 'Qty', 'Rate', 'Amount', 'GST %', 'CGST', 'SGST', 'Total']
-        table_data = [headers]
-        
-        # Add items
-        items = db.query(InvoiceItem).filter(InvoiceItem.invoice_id == inv.id).all()
-        for i, item in enumerate(items, 1):
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            description = product.name if product else item.description
-            
-            row = [
-                str(i),
-                description,
-                item.hsn_code or '',
-                str(item.qty),
-                f"₹{float(item.rate):.2f}",
-                f"₹{float(item.taxable_value):.2f}",
-                f"{item.gst_rate}%",
-                f"₹{float(item.cgst):.2f}",
-                f"₹{float(item.sgst):.2f}",
-                f"₹{float(item.amount):.2f}"
-            ]
-            table_data.append(row)
-        
-        # Create items table
-        items_table = Table(table_data, colWidths=[0.8*cm, 4*cm, 1.5*cm, 1*cm, 1.5*cm, 1.5*cm, 1*cm, 1.2*cm, 1.2*cm, 1.5*cm])
-        items_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),  # Description left-aligned
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),  # Header row
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-        ]))
-        story.append(items_table)
-        story.append(Spacer(1, 15))
-        
-        # Totals Table
-        totals_data = [
-            ['Subtotal:', f"₹{float(inv.taxable_value):.2f}"],
-            ['CGST:', f"₹{float(inv.cgst):.2f}"],
-            ['SGST:', f"₹{float(inv.sgst):.2f}"],
-            ['IGST:', f"₹{float(inv.igst):.2f}"],
-            ['Total:', f"₹{float(inv.grand_total):.2f}"]
-        ]
-        
-        totals_table = Table(totals_data, colWidths=[4*cm, 2*cm])
-        totals_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),  # Total row bold
-            ('FONTSIZE', (0, -1), (-1, -1), 12),  # Total row larger
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        story.append(totals_table)
-        story.append(Spacer(1, 20))
-        
-        # Notes
-        if inv.notes:
-            story.append(Paragraph("<b>Notes:</b>", heading_style))
-            story.append(Paragraph(inv.notes, normal_style))
-            story.append(Spacer(1, 15))
-        
-        # Footer
-        story.append(Paragraph("Thank you for your business!", normal_style))
-        story.append(Paragraph("This is a computer generated invoice", normal_style))
-        
-        # Build PDF
-        doc.build(story)
-        pdf_content = buf.getvalue()
-        buf.close()
-        
-        # Create email template
-        text_body, html_body = create_invoice_email_template(
-            invoice_no=inv.invoice_no,
-            customer_name=customer_name,
-            amount=float(inv.grand_total),
-            due_date=inv.due_date.strftime('%d/%m/%Y'),
-            company_name=company_name
-        )
-        
-        # Send email with PDF attachment
-        subject = f"Invoice {inv.invoice_no} - {company_name}"
-        filename = f"Invoice_{inv.invoice_no}.pdf"
-        
-        success = send_email(
-            to=payload.to,
-            subject=subject,
-            body=html_body,  # Use HTML version
-            pdf_attachment=pdf_content,
-            filename=filename
-        )
-        
-        return {"status": "sent" if success else "failed"}
-        
-    except Exception as e:
-        return {"status": "failed", "error": str(e)}
+    # Create email template
+    text_body, html_body = create_invoice_email_template(
+        invoice_no=inv.invoice_no,
+        customer_name=customer_name,
+        amount=float(inv.grand_total),
+        due_date=inv.due_date.strftime('%d/%m/%Y'),
+        company_name=company_name
+    )
+    
+    entry = enqueue_email(
+        db,
+        to=payload.to_email,
+        subject=payload.subject or f"Invoice {inv.invoice_no} - {company_name}",
+        body=html_body,  # Use HTML version
+        document_type='invoice',
+        document_id=inv.id,
+        attachment_filename=f"Invoice_{inv.invoice_no}.pdf",
+        tenant_id=inv.tenant_id
+    )
+    db.commit()
+    email_outbox_sender.wake()
+    
+    return {"status": entry.status, "email_id": entry.id}
+
+
+@api.get('/invoices/{invoice_id}/emails')
+def list_invoice_emails(invoice_id: int, _: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Delivery status of emails queued for an invoice, newest first"""
+    return _list_document_emails(db, 'invoice', invoice_id)
 
 
 # Audit Trail Endpoints
@@ -1312,6 +1638,31 @@ class AuditTrailOut(BaseModel):
         from_attributes = True
 
 
+AUDIT_TRAIL_EXPORT_COLUMNS = ['ID', 'User ID', 'Action', 'Table', 'Record ID', 'Old Values', 'New Values', 'IP Address', 'User Agent', 'Created At']
+
+
+def _audit_trail_filters(
+    table_name: str | None,
+    user_id: int | None,
+    action: str | None,
+    from_date: str | None,
+    to_date: str | None
+) -> list:
+    """WHERE conditions shared by the audit trail listing and export"""
+    conditions = []
+    if table_name:
+        conditions.append(AuditTrail.table_name == table_name)
+    if user_id:
+        conditions.append(AuditTrail.user_id == user_id)
+    if action:
+        conditions.append(AuditTrail.action == action)
+    if from_date:
+        conditions.append(AuditTrail.created_at >= datetime.fromisoformat(from_date))
+    if to_date:
+        conditions.append(AuditTrail.created_at <= datetime.fromisoformat(to_date))
+    return conditions
+
+
 @api.get('/audit-trail', response_model=list[AuditTrailOut])
 def get_audit_trail(
     table_name: str | None = None,
@@ -1325,26 +1676,15 @@ def get_audit_trail(
     db: Session = Depends(get_db)
 ):
     """Get audit trail entries with filtering and pagination"""
-    query = db.query(AuditTrail)
-    
-    # Apply filters
-    if table_name:
-        query = query.filter(AuditTrail.table_name == table_name)
-    if user_id:
-        query = query.filter(AuditTrail.user_id == user_id)
-    if action:
-        query = query.filter(AuditTrail.action == action)
-    if from_date:
-        query = query.filter(AuditTrail.created_at >= datetime.fromisoformat(from_date))
-    if to_date:
-        query = query.filter(AuditTrail.created_at <= datetime.fromisoformat(to_date))
-    
-    # Apply pagination
     offset = (page - 1) * limit
-    total = query.count()
-    entries = query.order_by(AuditTrail.created_at.desc()).offset(offset).limit(limit).all()
-    
-    return entries
+    return (
+        db.query(AuditTrail)
+        .filter(*_audit_trail_filters(table_name, user_id, action, from_date, to_date))
+        .order_by(AuditTrail.created_at.desc(), AuditTrail.id.desc())
+        .offset(offset)
+        .limit(limit)
+        .all()
+    )
 
 
 @api.get('/audit-trail/export')
@@ -1354,56 +1694,64 @@ def export_audit_trail(
     action: str | None = None,
     from_date: str | None = None,
     to_date: str | None = None,
+    format: str = Query("csv", description="Export format: csv or jsonl"),
     _: User = Depends(require_role("Admin")),
     db: Session = Depends(get_db)
 ):
-    """Export audit trail to CSV"""
-    import csv
-    from io import StringIO
-    
-    query = db.query(AuditTrail)
-    
-    # Apply filters
-    if table_name:
-        query = query.filter(AuditTrail.table_name == table_name)
-    if user_id:
-        query = query.filter(AuditTrail.user_id == user_id)
-    if action:
-        query = query.filter(AuditTrail.action == action)
-    if from_date:
-        query = query.filter(AuditTrail.created_at >= datetime.fromisoformat(from_date))
-    if to_date:
-        query = query.filter(AuditTrail.created_at <= datetime.fromisoformat(to_date))
-    
-    entries = query.order_by(AuditTrail.created_at.desc()).all()
-    
-    # Create CSV
-    output = StringIO()
-    writer = csv.writer(output)
-    writer.writerow(['ID', 'User ID', 'Action', 'Table', 'Record ID', 'Old Values', 'New Values', 'IP Address', 'User Agent', 'Created At'])
-    
-    for entry in entries:
-        writer.writerow([
-            entry.id,
-            entry.user_id,
-            entry.action,
-            entry.table_name,
-            entry.record_id,
-            entry.old_values,
-            entry.new_values,
-            entry.ip_address,
-            entry.user_agent,
-            entry.created_at.isoformat()
-        ])
-    
-    output.seek(0)
-    return Response(
-        content=output.getvalue(),
+    """Export audit trail to CSV or JSON Lines, streamed as it is read"""
+    if format not in ("csv", "jsonl"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use csv or jsonl")
+
+    statement = (
+        select(
+            AuditTrail.id,
+            AuditTrail.user_id,
+            AuditTrail.action,
+            AuditTrail.table_name,
+            AuditTrail.record_id,
+            AuditTrail.old_values,
+            AuditTrail.new_values,
+            AuditTrail.ip_address,
+            AuditTrail.user_agent,
+            AuditTrail.created_at,
+        )
+        .where(*_audit_trail_filters(table_name, user_id, action, from_date, to_date))
+        .order_by(AuditTrail.created_at.desc(), AuditTrail.id.desc())
+    )
+
+    if format == "jsonl":
+        def build(stream_db):
+            return iter_jsonl(
+                {**row._asdict(), "created_at": row.created_at.isoformat()}
+                for row in stream_rows(stream_db, statement)
+            )
+        return StreamingResponse(
+            _stream_in_own_session(build),
+            media_type='application/x-ndjson',
+            headers={'Content-Disposition': 'attachment; filename=audit_trail.jsonl'}
+        )
+
+    def build(stream_db):
+        return iter_csv(
+            ([*row[:-1], row.created_at.isoformat()] for row in stream_rows(stream_db, statement)),
+            header=AUDIT_TRAIL_EXPORT_COLUMNS
+        )
+    return StreamingResponse(
+        _stream_in_own_session(build),
         media_type='text/csv',
         headers={'Content-Disposition': 'attachment; filename=audit_trail.csv'}
     )
 
 
+@api.get('/performance/tenant-engines')
+def get_tenant_engine_statistics(_: User = Depends(require_role("Admin"))):
+    """Per-tenant database engine pools and the shared connection budget"""
+    return {
+        'tenant_engines': tenant_config_manager.engine_registry.get_stats(),
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
+
 class InvoiceListOut(BaseModel):
     id: int
     invoice_no: str
@@ -1420,6 +1768,10 @@ class InvoiceListOut(BaseModel):
         from_attributes = True
 
 
+# Cursor-mode sorts; each has an ix_invoices_<column>_id index
+INVOICE_KEYSET_SORT_FIELDS = ('date', 'invoice_no', 'due_date', 'grand_total', 'status')
+
+
 @api.get('/invoices', response_model=dict)
 def list_invoices(
     search: str | None = None,
@@ -1435,6 +1787,8 @@ def list_invoices(
     limit: int = 10,
     sort_field: str = 'date',
     sort_direction: str = 'desc',
+    pagination_mode: str = 'page',
+    cursor: str | None = None,
     _: User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
@@ -1443,8 +1797,25 @@ def list_invoices(
         page = 1
     if limit < 1 or limit > 100:
         limit = 10
-    
-    query = db.query(Invoice).join(Party, Invoice.customer_id == Party.id)
+    use_cursor = pagination_mode == 'cursor' or cursor is not None
+    
+    # Project only the columns InvoiceListOut needs straight from the join so the
+    # page is a single SELECT instead of one Party lookup per row
+    query = (
+        db.query(
+            Invoice.id,
+            Invoice.invoice_no,
+            Invoice.customer_id,
+            Party.name.label('customer_name'),
+            Invoice.date,
+            Invoice.due_date,
+            Invoice.grand_total,
+            Invoice.paid_amount,
+            Invoice.balance_amount,
+            Invoice.status,
+        )
+        .join(Party, Invoice.customer_id == Party.id)
+    )
     
     if search:
         search_filter = (
@@ -1501,60 +1872,69 @@ def list_invoices(
                 Invoice.paid_amount < Invoice.grand_total
             )
     
-    # Get total count for pagination
-    total_count = query.count()
-    
-    # Compute INR-only totals (exclude non-standard invoice types) before pagination
+    # Total count and every meta.totals figure come from one conditional-aggregate
+    # query over the filtered set; totals are INR-only and exclude non-standard
+    # invoice types
+    total_count = 0
     totals_meta = None
     try:
-        # Base filtered query for totals and counts
-        base_q = query.filter(Invoice.currency == 'INR', Invoice.invoice_type == 'Invoice')
+        is_base = and_(Invoice.currency == 'INR', Invoice.invoice_type == 'Invoice')
+        is_overdue = and_(
+            is_base,
+            Invoice.due_date < func.date(func.now()),
+            Invoice.balance_amount > 0,
+        )
+
+        def _sum_if(condition, value):
+            return func.coalesce(func.sum(case((condition, value), else_=0)), 0)
 
-        # Monetary aggregates
         totals_row = (
-            base_q
+            query
             .with_entities(
                 func.count(Invoice.id),
-                func.coalesce(func.sum(Invoice.taxable_value), 0),
-                func.coalesce(func.sum(Invoice.total_discount), 0),
-                func.coalesce(func.sum(Invoice.cgst + Invoice.sgst + Invoice.igst + Invoice.utgst + Invoice.cess), 0),
-                func.coalesce(func.sum(Invoice.grand_total), 0),
-                func.coalesce(func.sum(Invoice.paid_amount), 0),
-                func.coalesce(func.sum(Invoice.balance_amount), 0),
+                _sum_if(is_base, 1),
+                _sum_if(is_base, Invoice.taxable_value),
+                _sum_if(is_base, Invoice.total_discount),
+                _sum_if(is_base, Invoice.cgst + Invoice.sgst + Invoice.igst + Invoice.utgst + Invoice.cess),
+                _sum_if(is_base, Invoice.grand_total),
+                _sum_if(is_base, Invoice.paid_amount),
+                _sum_if(is_base, Invoice.balance_amount),
+                _sum_if(and_(is_base, Invoice.paid_amount >= Invoice.grand_total), 1),
+                _sum_if(and_(is_base, Invoice.balance_amount > 0), 1),
+                _sum_if(is_overdue, 1),
+                func.coalesce(func.avg(case(
+                    (is_overdue, func.date(func.now()) - func.date(Invoice.due_date)),
+                    else_=None,
+                )), 0),
             )
             .first()
         )
 
-        # Counts
-        paid_count = base_q.filter(Invoice.paid_amount >= Invoice.grand_total).count()
-        outstanding_count = base_q.filter(Invoice.balance_amount > 0).count()
-        overdue_q = base_q.filter(
-            Invoice.due_date < func.date(func.now()),
-            Invoice.balance_amount > 0,
-        )
-        overdue_count = overdue_q.count()
-        overdue_avg_days_val = overdue_q.with_entities(
-            func.coalesce(func.avg(func.date(func.now()) - func.date(Invoice.due_date)), 0)
-        ).scalar()
-
-        if totals_row is not None and totals_row[0] and int(totals_row[0]) > 0:
-            count, subtotal, discount, tax, total, amount_paid, outstanding = totals_row
-            totals_meta = {
-                "count": int(count),
-                "subtotal": float(subtotal or 0),
-                "discount": float(discount or 0),
-                "tax": float(tax or 0),
-                "total": float(total or 0),
-                "amount_paid": float(amount_paid or 0),
-                "outstanding": float(outstanding or 0),
-                "paid_count": int(paid_count or 0),
-                "outstanding_count": int(outstanding_count or 0),
-                "overdue_count": int(overdue_count or 0),
-                "overdue_avg_days": int(overdue_avg_days_val or 0),
-                "currency": "INR",
-            }
+        if totals_row is not None:
+            total_count = int(totals_row[0] or 0)
+            (
+                count, subtotal, discount, tax, total, amount_paid, outstanding,
+                paid_count, outstanding_count, overdue_count, overdue_avg_days_val,
+            ) = totals_row[1:]
+            if count and int(count) > 0:
+                totals_meta = {
+                    "count": int(count),
+                    "subtotal": float(subtotal or 0),
+                    "discount": float(discount or 0),
+                    "tax": float(tax or 0),
+                    "total": float(total or 0),
+                    "amount_paid": float(amount_paid or 0),
+                    "outstanding": float(outstanding or 0),
+                    "paid_count": int(paid_count or 0),
+                    "outstanding_count": int(outstanding_count or 0),
+                    "overdue_count": int(overdue_count or 0),
+                    "overdue_avg_days": int(overdue_avg_days_val or 0),
+                    "currency": "INR",
+                }
     except Exception:
         # Fail-safe: do not break listing if aggregation fails
+        db.rollback()
+        total_count = query.count()
         totals_meta = None
     
     # Apply sorting
@@ -1568,47 +1948,71 @@ def list_invoices(
     }
     
     sort_column = sort_column_map.get(sort_field, Invoice.date)
-    if sort_direction.lower() == 'asc':
-        query = query.order_by(sort_column.asc())
+    next_cursor = None
+    if use_cursor:
+        # Keyset mode: seek past the last (sort column, id) seen instead of
+        # scanning and discarding every earlier row. customer_name lives on
+        # the joined party, so no index can serve it and it falls back to date
+        if sort_field not in INVOICE_KEYSET_SORT_FIELDS:
+            sort_field = 'date'
+            sort_column = Invoice.date
+        query = apply_keyset(query, sort_column, Invoice.id, sort_field, sort_direction, cursor)
+        invoices, next_cursor = fetch_page(
+            query, limit, sort_field, sort_direction,
+            sort_key=lambda row: getattr(row, sort_field),
+            id_key=lambda row: row.id,
+        )
     else:
-        query = query.order_by(sort_column.desc())
-    
-    # Apply pagination
-    offset = (page - 1) * limit
-    invoices = query.offset(offset).limit(limit).all()
-    
-    # Convert to response format with customer name
-    result = []
-    for inv in invoices:
-        customer = db.query(Party).filter(Party.id == inv.customer_id).first()
-        result.append(InvoiceListOut(
-            id=inv.id,
-            invoice_no=inv.invoice_no,
-            customer_id=inv.customer_id,
-            customer_name=customer.name if customer else "Unknown",
-            date=inv.date,
-            due_date=inv.due_date,
-            grand_total=float(inv.grand_total),
-            paid_amount=float(inv.paid_amount),
-            balance_amount=float(inv.balance_amount),
-            status=inv.status
-        ))
+        if sort_direction.lower() == 'asc':
+            query = query.order_by(sort_column.asc())
+        else:
+            query = query.order_by(sort_column.desc())
+        
+        # Apply pagination
+        offset = (page - 1) * limit
+        invoices = query.offset(offset).limit(limit).all()
+    
+    # Rows already carry the customer name from the join
+    result = [
+        InvoiceListOut(
+            id=row.id,
+            invoice_no=row.invoice_no,
+            customer_id=row.customer_id,
+            customer_name=row.customer_name or "Unknown",
+            date=row.date,
+            due_date=row.due_date,
+            grand_total=float(row.grand_total),
+            paid_amount=float(row.paid_amount),
+            balance_amount=float(row.balance_amount),
+            status=row.status
+        )
+        for row in invoices
+    ]
     
     # Calculate pagination info
     total_pages = (total_count + limit - 1) // limit
-    has_next = page < total_pages
-    has_prev = page > 1
-    
-    response_payload = {
-        "invoices": result,
-        "pagination": {
+    if use_cursor:
+        pagination = {
+            "mode": "cursor",
+            "limit": limit,
+            "total_count": total_count,
+            "next_cursor": next_cursor,
+            "has_next": next_cursor is not None,
+            "has_prev": cursor is not None
+        }
+    else:
+        pagination = {
             "page": page,
             "limit": limit,
             "total_count": total_count,
             "total_pages": total_pages,
-            "has_next": has_next,
-            "has_prev": has_prev
+            "has_next": page < total_pages,
+            "has_prev": page > 1
         }
+    
+    response_payload = {
+        "invoices": result,
+        "pagination": pagination
     }
     if totals_meta is not None:
         response_payload["meta"] = {"totals": totals_meta}
@@ -1616,45 +2020,31 @@ def list_invoices(
 
 
 @api.get('/reports/gst-summary')
+@cached_query('invoices', 'products')
 def gst_summary(from_: str = Query(alias='from'), to: str = Query(alias='to'), _: User = Depends(get_current_user), db: Session = Depends(get_db)):
-    # naive impl: aggregate all invoices between dates
-    from sqlalchemy import func, cast, Date
-    from datetime import datetime
+    from sqlalchemy import select
+    from .models import InvoiceItem, Product
     
     # Convert string dates to proper date objects
     from_date = datetime.strptime(from_, '%Y-%m-%d').date()
     to_date = datetime.strptime(to, '%Y-%m-%d').date()
     
-    q = db.query(Invoice).filter(
-        cast(Invoice.date, Date) >= from_date,
-        cast(Invoice.date, Date) <= to_date
-    )
-    invoices = q.all()
-    taxable = sum([float(i.taxable_value) for i in invoices], 0.0)
-    cgst = sum([float(i.cgst) for i in invoices], 0.0)
-    sgst = sum([float(i.sgst) for i in invoices], 0.0)
-    igst = sum([float(i.igst) for i in invoices], 0.0)
-    grand = sum([float(i.grand_total) for i in invoices], 0.0)
+    totals = document_tax_totals(db, Invoice, from_date, to_date)
     # rate-wise breakup using items
-    from sqlalchemy import select
-    from .models import InvoiceItem, Product
     rows = db.execute(
         select(Product.gst_rate, func.sum(InvoiceItem.taxable_value))
         .join(Product, Product.id == InvoiceItem.product_id)
         .join(Invoice, Invoice.id == InvoiceItem.invoice_id)
-        .filter(
-            cast(Invoice.date, Date) >= from_date,
-            cast(Invoice.date, Date) <= to_date
-        )
+        .filter(day_range(Invoice.date, from_date, to_date))
         .group_by(Product.gst_rate)
     ).all()
     rate_breakup = [{"rate": float(r[0]), "taxable_value": float(r[1])} for r in rows]
     return {
-        "taxable_value": taxable,
-        "cgst": cgst,
-        "sgst": sgst,
-        "igst": igst,
-        "grand_total": grand,
+        "taxable_value": totals["taxable_value"],
+        "cgst": totals["cgst"],
+        "sgst": totals["sgst"],
+        "igst": totals["igst"],
+        "grand_total": totals["grand_total"],
         "rate_breakup": rate_breakup,
     }
 
@@ -1703,24 +2093,60 @@ def gst_filing_report(
 def generate_gstr1_report_api(
     start_date: str = Query(..., description="Start date in YYYY-MM-DD format"),
     end_date: str = Query(..., description="End date in YYYY-MM-DD format"),
-    format: str = Query("json", description="json/csv"),
+    format: str = Query("json", description="json/csv/excel"),
     _: User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
-    """Generate GSTR-1 report in GST portal format"""
-    result = generate_gstr1_report(db, start_date, end_date)
+    """Generate GSTR-1 report in GST portal format
+
+    Rows are streamed from a single joined query straight into the response,
+    so a full year of invoices is exported in constant memory.
+    """
+    try:
+        start_dt = datetime.strptime(start_date, "%Y-%m-%d").date()
+        end_dt = datetime.strptime(end_date, "%Y-%m-%d").date()
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
     
-    if not result["success"]:
-        raise HTTPException(status_code=400, detail=result["message"])
+    generator = GSTReportGenerator(db)
+    if generator.validate_data_for_gstr1(start_dt, end_dt):
+        raise HTTPException(status_code=400, detail="Data validation failed")
+    
+    filename = f"gstr1_{start_date}_to_{end_date}"
+    
+    if format == "excel":
+        if not OPENPYXL_AVAILABLE:
+            raise HTTPException(status_code=500, detail="Excel export requires openpyxl package")
+        workbook = write_xlsx(
+            "GSTR-1",
+            (row.values() for row in generator.iter_gstr1_rows(start_dt, end_dt)),
+            header=GSTR1_COLUMNS
+        )
+        return StreamingResponse(
+            _iter_file_chunks(workbook),
+            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={"Content-Disposition": f"attachment; filename={filename}.xlsx"}
+        )
     
     if format == "csv":
-        return Response(
-            content=result["csv_content"],
+        return StreamingResponse(
+            _stream_in_own_session(lambda stream_db: iter_gstr1_csv(GSTReportGenerator(stream_db).iter_gstr1_rows(start_dt, end_dt))),
             media_type="text/csv",
-            headers={"Content-Disposition": f"attachment; filename=gstr1_{start_date}_to_{end_date}.csv"}
+            headers={"Content-Disposition": f"attachment; filename={filename}.csv"}
         )
     
-    return result
+    total_records = generator.count_gstr1_rows(start_dt, end_dt)
+    
+    def build(stream_db):
+        stream_generator = GSTReportGenerator(stream_db)
+        return iter_json({
+            "success": True,
+            "data": stream_generator.iter_gstr1_rows(start_dt, end_dt),
+            "csv_content": StreamedText(iter_gstr1_csv(stream_generator.iter_gstr1_rows(start_dt, end_dt))) if total_records else "",
+            "total_records": total_records,
+            "period": f"{start_date} to {end_date}"
+        })
+    return StreamingResponse(_stream_in_own_session(build), media_type="application/json")
 
 
 @api.get('/reports/gstr3b')
@@ -1755,7 +2181,6 @@ def validate_gst_data(
     db: Session = Depends(get_db)
 ):
     """Validate GST data for report generation"""
-    from .gst_reports import GSTReportGenerator
     from datetime import datetime
     
     try:
@@ -1892,6 +2317,7 @@ class CashflowReport(BaseModel):
     trends: dict
     generated_at: str
     filters_applied: dict | None
+    total_count: int | None = None
 
 class IncomeReportItem(BaseModel):
     invoice_id: int
@@ -1987,7 +2413,22 @@ class FinancialReport(BaseModel):
     filters_applied: dict | None
 
 
+def _ledger_stock_totals():
+    """Subquery of each product's ledger stock, movement count and last movement"""
+    return (
+        select(
+            StockLedgerEntry.product_id,
+            func.sum(signed_stock_qty()).label("stock"),
+            func.count(StockLedgerEntry.id).label("movement_count"),
+            func.max(StockLedgerEntry.created_at).label("last_movement_at"),
+        )
+        .group_by(StockLedgerEntry.product_id)
+        .subquery()
+    )
+
+
 @api.get('/reports/inventory-summary', response_model=InventorySummaryReport)
+@cached_query(*INVENTORY_TAGS)
 def get_inventory_summary_report(
     category: str | None = Query(None, description="Filter by product category"),
     low_stock_only: bool = Query(False, description="Show only low stock items"),
@@ -1995,53 +2436,38 @@ def get_inventory_summary_report(
     _: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Generate comprehensive inventory summary report"""
-    
-    # Build base query
-    query = db.query(Product).filter(Product.is_active == True)
+    """Generate comprehensive inventory summary report
+
+    Stock and last movement come from one grouped ledger query; low and out
+    of stock flags come from the precomputed stock_alerts table.
+    """
+    totals = _ledger_stock_totals()
+    current_stock = case((totals.c.stock > 0, totals.c.stock), else_=0)
+    query = (
+        db.query(Product, current_stock, totals.c.last_movement_at, StockAlert.current_stock)
+        .outerjoin(totals, totals.c.product_id == Product.id)
+        .outerjoin(StockAlert, StockAlert.product_id == Product.id)
+        .filter(Product.is_active == True)
+    )
     
     # Apply filters
     if category:
         query = query.filter(Product.category == category)
     
-    products = query.all()
-    
-    # Calculate current stock levels and values
     summary_items = []
     total_stock_value = 0
     low_stock_count = 0
     out_of_stock_count = 0
     
-    for product in products:
-        # Calculate current stock from ledger entries
-        stock_entries = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product.id
-        ).all()
-        
-        current_stock = sum(
-            entry.qty for entry in stock_entries 
-            if entry.entry_type in ['in', 'adjust']
-        ) - sum(
-            entry.qty for entry in stock_entries 
-            if entry.entry_type == 'out'
-        )
-        current_stock = max(0, current_stock)
+    for product, stock, last_movement_at, alert_stock in query.order_by(Product.id):
+        stock = stock or 0
         
         # Calculate stock value
         unit_price = product.purchase_price or product.sales_price or 0
-        stock_value = current_stock * float(unit_price) if unit_price else 0
-        
-        # Get last movement date
-        last_movement = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product.id
-        ).order_by(StockLedgerEntry.created_at.desc()).first()
+        stock_value = stock * float(unit_price) if unit_price else 0
         
-        last_movement_date = last_movement.created_at.isoformat() if last_movement else None
-        
-        # Check stock status (using default minimum stock of 10 since field doesn't exist)
-        default_minimum_stock = 10
-        is_low_stock = current_stock <= default_minimum_stock
-        is_out_of_stock = current_stock == 0
+        is_low_stock = alert_stock is not None
+        is_out_of_stock = is_low_stock and alert_stock <= 0
         
         if is_low_stock:
             low_stock_count += 1
@@ -2060,12 +2486,12 @@ def get_inventory_summary_report(
             sku=product.sku,
             category=product.category,
             unit=product.unit,
-            current_stock=current_stock,
+            current_stock=stock,
             purchase_price=float(product.purchase_price) if product.purchase_price else None,
             sales_price=float(product.sales_price) if product.sales_price else None,
             stock_value=stock_value,
-            last_movement_date=last_movement_date,
-            minimum_stock=default_minimum_stock
+            last_movement_date=last_movement_at.isoformat() if last_movement_at else None,
+            minimum_stock=DEFAULT_REORDER_LEVEL
         ))
         
         total_stock_value += stock_value
@@ -2090,138 +2516,191 @@ def get_inventory_summary_report(
     )
 
 
-@api.get('/reports/stock-ledger', response_model=StockLedgerReport)
+def _stock_ledger_query(product_ids, from_dt: datetime | None, to_dt: datetime | None, entry_type: str | None):
+    """Ledger rows with running balances and reference numbers in one select
+
+    The running balance is a window sum over each product's whole history up
+    to ``to_dt``; the period and entry type filters are applied outside the
+    window so every returned row carries its true balance, on any page.
+    """
+    from sqlalchemy import select
+
+    running_balance = func.sum(signed_stock_qty()).over(
+        partition_by=StockLedgerEntry.product_id,
+        order_by=(StockLedgerEntry.created_at, StockLedgerEntry.id)
+    )
+    ledger = select(
+        StockLedgerEntry.id,
+        StockLedgerEntry.product_id,
+        StockLedgerEntry.qty,
+        StockLedgerEntry.entry_type,
+        StockLedgerEntry.ref_type,
+        StockLedgerEntry.ref_id,
+        StockLedgerEntry.created_at,
+        running_balance.label('running_balance')
+    )
+    if product_ids is not None:
+        ledger = ledger.where(StockLedgerEntry.product_id.in_(product_ids))
+    if to_dt:
+        ledger = ledger.where(StockLedgerEntry.created_at < to_dt)
+    ledger = ledger.subquery()
+
+    query = (
+        select(ledger, Product.name, Product.sku, Product.purchase_price, Invoice.invoice_no, Purchase.purchase_no)
+        .join(Product, Product.id == ledger.c.product_id)
+        .outerjoin(Invoice, and_(ledger.c.ref_type == 'invoice', Invoice.id == ledger.c.ref_id))
+        .outerjoin(Purchase, and_(ledger.c.ref_type == 'purchase', Purchase.id == ledger.c.ref_id))
+    )
+    if from_dt:
+        query = query.where(ledger.c.created_at >= from_dt)
+    if entry_type:
+        query = query.where(ledger.c.entry_type == entry_type)
+    return query.order_by(ledger.c.product_id, ledger.c.created_at, ledger.c.id)
+
+
+def _stock_ledger_item(row) -> dict:
+    if row.ref_type == 'invoice' and row.ref_id:
+        reference_number = row.invoice_no
+    elif row.ref_type == 'purchase' and row.ref_id:
+        reference_number = row.purchase_no
+    else:
+        reference_number = f"ADJ-{row.id}"
+    unit_price = float(row.purchase_price) if row.purchase_price else None
+    return {
+        "transaction_id": row.id,
+        "transaction_date": row.created_at.isoformat(),
+        "product_id": row.product_id,
+        "product_name": row.name,
+        "sku": row.sku,
+        "entry_type": row.entry_type,
+        "quantity": row.qty,
+        "unit_price": unit_price,
+        "total_value": row.qty * (unit_price or 0),
+        "running_balance": float(row.running_balance or 0),
+        "reference_type": row.ref_type if row.ref_type else 'adjustment',
+        "reference_id": row.ref_id if row.ref_id else row.id,
+        "reference_number": reference_number,
+        "notes": None  # StockLedgerEntry doesn't have notes field
+    }
+
+
+@api.get(
+    '/reports/stock-ledger',
+    response_class=StreamingResponse,
+    responses={200: {"model": StockLedgerReport, "description": "Stock ledger report, streamed as JSON"}}
+)
 def get_stock_ledger_report(
     product_id: int | None = Query(None, description="Filter by product ID"),
     from_date: str | None = Query(None, description="Filter from date (YYYY-MM-DD)"),
     to_date: str | None = Query(None, description="Filter to date (YYYY-MM-DD)"),
     entry_type: str | None = Query(None, description="Filter by entry type (in/out/adjust)"),
+    limit: int | None = Query(None, description="Products per page; pages through products in id order"),
+    cursor: str | None = Query(None, description="Cursor from the previous page's X-Next-Cursor header"),
     _: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Generate detailed stock ledger report with running balances"""
+    """Generate detailed stock ledger report with running balances
+
+    Transactions come from a single joined query with window-function running
+    balances and are streamed as they are read, grouped by product. With
+    ``limit`` the report is paged by product: each page holds the complete
+    ledger of up to ``limit`` products and the totals cover those products.
+    """
     try:
-        # Build query for stock ledger entries
-        query = db.query(StockLedgerEntry).join(Product)
-        
-        # Apply filters
-        if product_id:
-            query = query.filter(StockLedgerEntry.product_id == product_id)
-        
-        if from_date:
-            query = query.filter(StockLedgerEntry.created_at >= from_date)
-        
-        if to_date:
-            query = query.filter(StockLedgerEntry.created_at <= to_date + " 23:59:59")
-        
-        if entry_type:
-            query = query.filter(StockLedgerEntry.entry_type == entry_type)
-        
-        # Order by date and product
-        entries = query.order_by(StockLedgerEntry.created_at, StockLedgerEntry.product_id).all()
-        
-        # Group entries by product and calculate running balances
-        ledger_items = []
-        total_incoming = 0
-        total_outgoing = 0
-        total_adjustments = 0
-        
-        # Group by product for running balance calculation
-        product_entries = {}
-        for entry in entries:
-            if entry.product_id not in product_entries:
-                product_entries[entry.product_id] = []
-            product_entries[entry.product_id].append(entry)
-        
-        # Calculate running balances for each product
-        for product_id, product_entry_list in product_entries.items():
-            running_balance = 0
-            
-            for entry in product_entry_list:
-                # Calculate running balance
-                if entry.entry_type == 'in':
-                    running_balance += entry.qty
-                    total_incoming += entry.qty
-                elif entry.entry_type == 'out':
-                    running_balance -= entry.qty
-                    total_outgoing += entry.qty
-                elif entry.entry_type == 'adjust':
-                    running_balance += entry.qty
-                    total_adjustments += abs(entry.qty)
-                
-                # Get product details
-                product = db.query(Product).filter(Product.id == entry.product_id).first()
-                
-                # Determine reference information
-                reference_type = entry.ref_type if entry.ref_type else 'adjustment'
-                reference_id = entry.ref_id if entry.ref_id else entry.id
-                reference_number = None
-                
-                if entry.ref_type == 'invoice' and entry.ref_id:
-                    invoice = db.query(Invoice).filter(Invoice.id == entry.ref_id).first()
-                    reference_number = invoice.invoice_no if invoice else None
-                elif entry.ref_type == 'purchase' and entry.ref_id:
-                    purchase = db.query(Purchase).filter(Purchase.id == entry.ref_id).first()
-                    reference_number = purchase.purchase_no if purchase else None
-                else:
-                    reference_number = f"ADJ-{entry.id}"
-                
-                # Get unit price from product if available
-                unit_price = None
-                if product and product.purchase_price:
-                    unit_price = float(product.purchase_price)
-                
-                ledger_items.append(StockLedgerItem(
-                    transaction_id=entry.id,
-                    transaction_date=entry.created_at.isoformat(),
-                    product_id=entry.product_id,
-                    product_name=product.name if product else "Unknown Product",
-                    sku=product.sku if product else None,
-                    entry_type=entry.entry_type,
-                    quantity=entry.qty,
-                    unit_price=unit_price,
-                    total_value=entry.qty * (unit_price or 0),
-                    running_balance=running_balance,
-                    reference_type=reference_type,
-                    reference_id=reference_id,
-                    reference_number=reference_number,
-                    notes=None  # StockLedgerEntry doesn't have notes field
-                ))
-        
-        # Calculate opening and closing balances
-        opening_balance = 0
-        closing_balance = running_balance if ledger_items else 0
+        from_dt = datetime.strptime(from_date, '%Y-%m-%d') if from_date else None
+        to_dt = datetime.strptime(to_date, '%Y-%m-%d') + timedelta(days=1) if to_date else None
+    except ValueError:
+        raise HTTPException(status_code=422, detail="Invalid date format. Use YYYY-MM-DD")
+    
+    try:
+        product_ids = [product_id] if product_id else None
+        next_cursor = None
+        if cursor is not None or limit is not None:
+            # Keyset over the products that have movements in the period
+            products_query = db.query(StockLedgerEntry.product_id).distinct()
+            if product_ids is not None:
+                products_query = products_query.filter(StockLedgerEntry.product_id.in_(product_ids))
+            if from_dt:
+                products_query = products_query.filter(StockLedgerEntry.created_at >= from_dt)
+            if to_dt:
+                products_query = products_query.filter(StockLedgerEntry.created_at < to_dt)
+            if entry_type:
+                products_query = products_query.filter(StockLedgerEntry.entry_type == entry_type)
+            products_query = apply_keyset(
+                products_query, StockLedgerEntry.product_id, StockLedgerEntry.product_id, 'product_id', 'asc', cursor
+            )
+            page, next_cursor = fetch_page(
+                products_query, clamp_page_size(limit), 'product_id', 'asc',
+                sort_key=lambda row: row.product_id,
+                id_key=lambda row: row.product_id,
+            )
+            product_ids = [row.product_id for row in page]
         
-        return StockLedgerReport(
-            total_transactions=len(ledger_items),
-            total_incoming=total_incoming,
-            total_outgoing=total_outgoing,
-            total_adjustments=total_adjustments,
-            opening_balance=opening_balance,
-            closing_balance=closing_balance,
-            transactions=ledger_items,
-            generated_at=datetime.now().isoformat(),
-            filters_applied={
+        # Totals and opening/closing balances in one conditional aggregate
+        signed_qty = signed_stock_qty()
+        in_period = and_(
+            StockLedgerEntry.created_at >= from_dt if from_dt else true(),
+            StockLedgerEntry.entry_type == entry_type if entry_type else true()
+        )
+        before_period = StockLedgerEntry.created_at < from_dt if from_dt else false()
+        totals_query = db.query(
+            func.count(case((in_period, 1))),
+            func.coalesce(func.sum(case((and_(in_period, StockLedgerEntry.entry_type == 'in'), StockLedgerEntry.qty), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(in_period, StockLedgerEntry.entry_type == 'out'), StockLedgerEntry.qty), else_=0)), 0),
+            func.coalesce(func.sum(case((and_(in_period, StockLedgerEntry.entry_type == 'adjust'), func.abs(StockLedgerEntry.qty)), else_=0)), 0),
+            func.coalesce(func.sum(case((before_period, signed_qty), else_=0)), 0),
+            func.coalesce(func.sum(signed_qty), 0)
+        ).join(Product, Product.id == StockLedgerEntry.product_id)
+        if product_ids is not None:
+            totals_query = totals_query.filter(StockLedgerEntry.product_id.in_(product_ids))
+        if to_dt:
+            totals_query = totals_query.filter(StockLedgerEntry.created_at < to_dt)
+        total_transactions, total_incoming, total_outgoing, total_adjustments, opening_balance, closing_balance = totals_query.one()
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error generating stock ledger report: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to generate stock ledger report")
+    
+    ledger_query = _stock_ledger_query(product_ids, from_dt, to_dt, entry_type)
+    
+    def build(stream_db):
+        return iter_json({
+            "total_transactions": int(total_transactions),
+            "total_incoming": float(total_incoming),
+            "total_outgoing": float(total_outgoing),
+            "total_adjustments": float(total_adjustments),
+            "opening_balance": float(opening_balance),
+            "closing_balance": float(closing_balance),
+            "transactions": (_stock_ledger_item(row) for row in stream_rows(stream_db, ledger_query)),
+            "generated_at": datetime.now().isoformat(),
+            "filters_applied": {
                 "product_id": product_id,
                 "from_date": from_date,
                 "to_date": to_date,
                 "entry_type": entry_type
             } if any([product_id, from_date, to_date, entry_type]) else None
-        )
-        
-    except Exception as e:
-        logger.error(f"Error generating stock ledger report: {str(e)}")
-        raise HTTPException(status_code=500, detail="Failed to generate stock ledger report")
+        })
+    
+    headers = {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
+    return StreamingResponse(_stream_in_own_session(build), media_type='application/json', headers=headers)
 
 
 @api.get('/reports/inventory-valuation', response_model=InventoryValuationReport)
+@cached_query(*INVENTORY_TAGS)
 def get_inventory_valuation_report(
     category: str | None = Query(None, description="Filter by product category"),
     include_zero_stock: bool = Query(True, description="Include products with zero stock"),
+    valuation_method: str = Query("fifo", description="Valuation method: fifo, lifo, average"),
     _: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """Generate inventory valuation report with cost and market value calculations"""
+    try:
+        method = StockValuationMethod(valuation_method)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid valuation method")
+
     try:
         # Build base query
         query = db.query(Product).filter(Product.is_active == True)
@@ -2231,6 +2710,12 @@ def get_inventory_valuation_report(
             query = query.filter(Product.category == category)
         
         products = query.all()
+        stock_values = get_stock_valuation(db).by_product(method.value)
+        last_movements = dict(
+            db.query(StockLedgerEntry.product_id, func.max(StockLedgerEntry.created_at))
+            .group_by(StockLedgerEntry.product_id)
+            .all()
+        )
         
         # Calculate valuations
         valuation_items = []
@@ -2239,38 +2724,23 @@ def get_inventory_valuation_report(
         total_valuation_difference = 0
         
         for product in products:
-            # Calculate current stock from ledger entries
-            stock_entries = db.query(StockLedgerEntry).filter(
-                StockLedgerEntry.product_id == product.id
-            ).all()
-            
-            current_stock = sum(
-                entry.qty for entry in stock_entries 
-                if entry.entry_type in ['in', 'adjust']
-            ) - sum(
-                entry.qty for entry in stock_entries 
-                if entry.entry_type == 'out'
-            )
-            current_stock = max(0, current_stock)
+            # Current stock and its layered cost from the ledger
+            current_stock, total_cost_value_product = stock_values.get(product.id, (0.0, 0.0))
             
             # Skip zero stock items if not included
             if not include_zero_stock and current_stock == 0:
                 continue
             
             # Calculate unit costs and values
-            unit_cost = float(product.purchase_price) if product.purchase_price else 0
-            unit_market_price = float(product.sales_price) if product.sales_price else unit_cost
+            list_cost = float(product.purchase_price) if product.purchase_price else 0
+            unit_cost = total_cost_value_product / current_stock if current_stock > 0 else list_cost
+            unit_market_price = float(product.sales_price) if product.sales_price else list_cost
             
-            total_cost_value_product = current_stock * unit_cost
             total_market_value_product = current_stock * unit_market_price
             valuation_difference = total_market_value_product - total_cost_value_product
             
-            # Get last updated date
-            last_movement = db.query(StockLedgerEntry).filter(
-                StockLedgerEntry.product_id == product.id
-            ).order_by(StockLedgerEntry.created_at.desc()).first()
-            
-            last_updated = last_movement.created_at.isoformat() if last_movement else None
+            last_movement = last_movements.get(product.id)
+            last_updated = last_movement.isoformat() if last_movement else None
             
             valuation_items.append(InventoryValuationItem(
                 product_id=product.id,
@@ -2296,6 +2766,7 @@ def get_inventory_valuation_report(
             filters_applied["category"] = category
         if not include_zero_stock:
             filters_applied["include_zero_stock"] = False
+        filters_applied["valuation_method"] = method.value
         
         return InventoryValuationReport(
             total_products=len(valuation_items),
@@ -2313,84 +2784,77 @@ def get_inventory_valuation_report(
 
 
 @api.get('/reports/inventory-dashboard', response_model=InventoryDashboardMetrics)
+@cached_query(*INVENTORY_TAGS)
 def get_inventory_dashboard_metrics(
     _: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Generate real-time inventory dashboard metrics"""
+    """Generate real-time inventory dashboard metrics
+
+    Totals and top movers come from grouped ledger queries and low stock from
+    the stock_alerts table, so the query count does not grow with the catalogue.
+    """
     try:
-        # Get all active products
-        products = db.query(Product).filter(Product.is_active == True).all()
-        
-        total_products = len(products)
-        total_stock_value = 0
-        low_stock_items = 0
-        out_of_stock_items = 0
-        recent_movements = 0
-        total_stock_quantity = 0
+        from datetime import timedelta
         
-        # Calculate metrics for each product
-        low_stock_alerts = []
-        top_moving_products = []
+        totals = _ledger_stock_totals()
+        current_stock = case((totals.c.stock > 0, totals.c.stock), else_=0)
+        active_products = (
+            select(Product.id, Product.name, Product.category, current_stock.label("current_stock"),
+                   totals.c.movement_count, stock_unit_cost().label("unit_cost"))
+            .outerjoin(totals, totals.c.product_id == Product.id)
+            .where(Product.is_active == True)
+            .subquery()
+        )
+        total_products, total_stock_quantity, total_stock_value = db.execute(
+            select(
+                func.count(active_products.c.id),
+                func.coalesce(func.sum(active_products.c.current_stock), 0),
+                func.coalesce(func.sum(active_products.c.current_stock * active_products.c.unit_cost), 0),
+            )
+        ).one()
+        total_stock_quantity = float(total_stock_quantity)
+        total_stock_value = float(total_stock_value)
         
         # Get recent movements (last 7 days)
-        from datetime import timedelta
         recent_date = datetime.now() - timedelta(days=7)
-        recent_entries = db.query(StockLedgerEntry).filter(
+        recent_movements = db.query(func.count(StockLedgerEntry.id)).filter(
             StockLedgerEntry.created_at >= recent_date
-        ).all()
-        recent_movements = len(recent_entries)
-        
-        for product in products:
-            # Calculate current stock
-            stock_entries = db.query(StockLedgerEntry).filter(
-                StockLedgerEntry.product_id == product.id
-            ).all()
-            
-            current_stock = sum(
-                entry.qty for entry in stock_entries 
-                if entry.entry_type in ['in', 'adjust']
-            ) - sum(
-                entry.qty for entry in stock_entries 
-                if entry.entry_type == 'out'
+        ).scalar() or 0
+        
+        top_moving_products = [
+            {
+                "product_id": row.id,
+                "product_name": row.name,
+                "movement_count": row.movement_count,
+                "current_stock": row.current_stock,
+                "category": row.category
+            }
+            for row in db.execute(
+                select(active_products)
+                .where(active_products.c.movement_count > 0)
+                .order_by(active_products.c.movement_count.desc(), active_products.c.id)
+                .limit(10)
             )
-            current_stock = max(0, current_stock)
-            
-            total_stock_quantity += current_stock
-            
-            # Calculate stock value
-            unit_price = product.purchase_price or product.sales_price or 0
-            stock_value = current_stock * float(unit_price) if unit_price else 0
-            total_stock_value += stock_value
-            
-            # Check stock status
-            default_minimum_stock = 10
-            if current_stock == 0:
+        ]
+        
+        out_of_stock_items = 0
+        low_stock_alerts = []
+        alerts = db.query(Product, StockAlert.current_stock, StockAlert.reorder_level).join(
+            StockAlert, StockAlert.product_id == Product.id
+        ).order_by(Product.id)
+        for product, stock, reorder_level in alerts:
+            if stock <= 0:
                 out_of_stock_items += 1
-            elif current_stock <= default_minimum_stock:
-                low_stock_items += 1
+            else:
                 low_stock_alerts.append({
                     "product_id": product.id,
                     "product_name": product.name,
-                    "current_stock": current_stock,
-                    "minimum_stock": default_minimum_stock,
-                    "category": product.category
-                })
-            
-            # Calculate movement frequency for top moving products
-            movement_count = len(stock_entries)
-            if movement_count > 0:
-                top_moving_products.append({
-                    "product_id": product.id,
-                    "product_name": product.name,
-                    "movement_count": movement_count,
-                    "current_stock": current_stock,
+                    "current_stock": stock,
+                    "minimum_stock": reorder_level,
                     "category": product.category
                 })
-        
-        # Sort top moving products by movement count
-        top_moving_products.sort(key=lambda x: x["movement_count"], reverse=True)
-        top_moving_products = top_moving_products[:10]  # Top 10
+        low_stock_items = len(low_stock_alerts)
         
         # Calculate average stock level
         average_stock_level = total_stock_quantity / total_products if total_products > 0 else 0
@@ -2414,12 +2878,15 @@ def get_inventory_dashboard_metrics(
 
 # Cashflow Reports API Endpoints
 @api.get('/reports/cashflow', response_model=CashflowReport)
+@cached_query(*LEDGER_TAGS, 'parties')
 def get_cashflow_report(
     start_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str | None = Query(None, description="End date (YYYY-MM-DD)"),
     transaction_type: str | None = Query(None, description="Filter by transaction type: income, expense, purchase_payment"),
     payment_method: str | None = Query(None, description="Filter by payment method"),
     category: str | None = Query(None, description="Filter by category"),
+    page: int = Query(1, ge=1, description="Page of transactions (with limit)"),
+    limit: int | None = Query(None, ge=1, le=1000, description="Transactions per page; all when omitted"),
     _: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -2438,127 +2905,65 @@ def get_cashflow_report(
         start_dt = datetime.strptime(start_date, '%Y-%m-%d').date()
         end_dt = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # Initialize cashflow service
-        from .profitpath_service import ProfitPathService
         profitpath_service = ProfitPathService(db)
         
-        # Get cashflow summary
-        summary = profitpath_service.get_profitpath_summary(start_dt, end_dt)
+        # Summary and the 6-month trend come from one read of the daily rollups
+        summary, monthly_breakdown = profitpath_service.get_summary_with_trend(start_dt, end_dt)
+        
+        # Transactions: one UNION ALL over payments, purchase payments and expenses
+        feed = profitpath_service.cashflow_feed(
+            transaction_type=transaction_type,
+            payment_method=payment_method,
+            start_date=start_dt,
+            end_date=end_dt,
+            category=category,
+            exact_payment_method=True
+        )
         
-        # Get detailed transactions
         transactions = []
-        
-        # Income transactions (Invoice Payments)
-        income_filter = []
-        if start_date:
-            income_filter.append(Payment.payment_date >= start_dt)
-        if end_date:
-            income_filter.append(Payment.payment_date <= end_dt)
-        if payment_method:
-            income_filter.append(Payment.payment_method == payment_method)
-        
-        income_payments = db.query(Payment).filter(and_(*income_filter)).all()
-        for payment in income_payments:
-            invoice = db.query(Invoice).filter(Invoice.id == payment.invoice_id).first()
-            customer = db.query(Party).filter(Party.id == invoice.customer_id).first() if invoice else None
+        total_count = 0
+        if feed is not None:
+            query = select(feed, func.count().over().label('total_count')).order_by(*ProfitPathService.feed_order(feed))
+            if limit is not None:
+                query = query.limit(limit).offset((page - 1) * limit)
+            rows = db.execute(query).all()
+            total_count = rows[0].total_count if rows else 0
             
-            transactions.append(CashflowReportItem(
-                transaction_id=payment.id,
-                transaction_type='income',
-                transaction_date=payment.payment_date.isoformat(),
-                amount=float(payment.amount or 0),
-                description=f"Payment for Invoice {invoice.invoice_no}" if invoice else "Payment",
-                category="Sales",
-                payment_method=payment.payment_method,
-                reference_type='invoice',
-                reference_id=payment.invoice_id,
-                reference_number=invoice.invoice_no if invoice else None,
-                party_name=customer.name if customer else None
-            ))
+            for row in rows:
+                if row.source_type == 'invoice_payment':
+                    transaction_type_name = 'income'
+                    description = f"Payment for Invoice {row.reference_document}" if row.reference_document else "Payment"
+                elif row.source_type == 'purchase_payment':
+                    transaction_type_name = 'purchase_payment'
+                    description = f"Payment for Purchase {row.reference_document}" if row.reference_document else "Purchase Payment"
+                else:
+                    transaction_type_name = 'expense'
+                    description = row.description
+                
+                transaction_date = row.transaction_date
+                if row.source_type == 'invoice_payment' and transaction_date is not None:
+                    # Payment dates carry no time of day
+                    transaction_date = transaction_date.date()
+                
+                transactions.append(CashflowReportItem(
+                    transaction_id=row.source_id,
+                    transaction_type=transaction_type_name,
+                    transaction_date=transaction_date.isoformat() if transaction_date else '',
+                    amount=float(row.amount or 0),
+                    description=description,
+                    category=row.category,
+                    payment_method=row.payment_method,
+                    reference_type=row.reference_type,
+                    reference_id=row.reference_id,
+                    reference_number=row.reference_number if row.source_type == 'expense' else row.reference_document,
+                    party_name=row.party_name
+                ))
         
-        # Expense transactions (Purchase Payments + Direct Expenses)
-        purchase_payment_filter = []
-        expense_filter = []
-        if start_date:
-            purchase_payment_filter.append(PurchasePayment.payment_date >= start_dt)
-            expense_filter.append(Expense.expense_date >= start_dt)
-        if end_date:
-            purchase_payment_filter.append(PurchasePayment.payment_date <= end_dt)
-            expense_filter.append(Expense.expense_date <= end_dt)
-        if payment_method:
-            purchase_payment_filter.append(PurchasePayment.payment_method == payment_method)
-        
-        # Purchase payments
-        purchase_payments = db.query(PurchasePayment).filter(and_(*purchase_payment_filter)).all()
-        for payment in purchase_payments:
-            purchase = db.query(Purchase).filter(Purchase.id == payment.purchase_id).first()
-            vendor = db.query(Party).filter(Party.id == purchase.vendor_id).first() if purchase else None
-            
-            transactions.append(CashflowReportItem(
-                transaction_id=payment.id,
-                transaction_type='purchase_payment',
-                transaction_date=payment.payment_date.isoformat(),
-                amount=float(payment.payment_amount),
-                description=f"Payment for Purchase {purchase.purchase_no}" if purchase else "Purchase Payment",
-                category="Purchases",
-                payment_method=payment.payment_method,
-                reference_type='purchase',
-                reference_id=payment.purchase_id,
-                reference_number=purchase.purchase_no if purchase else None,
-                party_name=vendor.name if vendor else None
-            ))
-        
-        # Direct expenses
-        expenses = db.query(Expense).filter(and_(*expense_filter)).all()
-        for expense in expenses:
-            # Get vendor name through relationship
-            vendor = db.query(Party).filter(Party.id == expense.vendor_id).first() if expense.vendor_id else None
-            
-            transactions.append(CashflowReportItem(
-                transaction_id=expense.id,
-                transaction_type='expense',
-                transaction_date=expense.expense_date.isoformat(),
-                amount=float(expense.total_amount),
-                description=expense.description,
-                category=expense.category,
-                payment_method=expense.payment_method,
-                reference_type='expense',
-                reference_id=expense.id,
-                reference_number=expense.reference_number,
-                party_name=vendor.name if vendor else None
-            ))
-        
-        # Apply transaction type filter if specified
-        if transaction_type:
-            transactions = [t for t in transactions if t.transaction_type == transaction_type]
-        
-        # Apply category filter if specified
-        if category:
-            transactions = [t for t in transactions if t.category == category]
-        
-        # Sort transactions by date
-        transactions.sort(key=lambda x: x.transaction_date, reverse=True)
-        
-        # Calculate trends (monthly breakdown)
-        trends = {
-            "monthly_breakdown": [],
-            "cashflow_trend": "positive" if summary["net_cashflow"] > 0 else "negative"
-        }
-        
-        # Generate monthly breakdown for the last 6 months
-        for i in range(6):
-            month_start = (datetime.now() - timedelta(days=30*i)).replace(day=1)
-            month_end = (month_start + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            month_summary = profitpath_service.get_profitpath_summary(month_start.date(), month_end.date())
-            trends["monthly_breakdown"].append({
-                "month": month_start.strftime('%Y-%m'),
-                "income": month_summary["total_income"],
-                "expenses": month_summary["total_outflow"],
-                "net_cashflow": month_summary["net_cashflow"]
-            })
-        
-        trends["monthly_breakdown"].reverse()
+        # Calculate trends (monthly breakdown)
+        trends = {
+            "monthly_breakdown": monthly_breakdown,
+            "cashflow_trend": "positive" if summary["net_cashflow"] > 0 else "negative"
+        }
         
         return CashflowReport(
             period={
@@ -2573,7 +2978,8 @@ def get_cashflow_report(
                 "transaction_type": transaction_type,
                 "payment_method": payment_method,
                 "category": category
-            }
+            },
+            total_count=total_count
         )
         
     except Exception as e:
@@ -2583,6 +2989,7 @@ def get_cashflow_report(
 
 # Income Reports API Endpoints
 @api.get('/reports/income', response_model=IncomeReport)
+@cached_query('invoices', 'payments', 'parties', 'products')
 def get_income_report(
     start_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str | None = Query(None, description="End date (YYYY-MM-DD)"),
@@ -2798,6 +3205,7 @@ def get_income_report(
 
 # Expense Reports API Endpoints
 @api.get('/reports/expenses', response_model=ExpenseReport)
+@cached_query('expenses', 'parties')
 def get_expense_report(
     start_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str | None = Query(None, description="End date (YYYY-MM-DD)"),
@@ -2955,6 +3363,7 @@ def get_expense_report(
 
 # Purchase Reports API Endpoints
 @api.get('/reports/purchases', response_model=PurchaseReport)
+@cached_query('purchases', 'purchase_payments', 'parties', 'products')
 def get_purchase_report(
     start_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str | None = Query(None, description="End date (YYYY-MM-DD)"),
@@ -3163,6 +3572,7 @@ def get_purchase_report(
 
 # Payment Reports API Endpoints
 @api.get('/reports/payments', response_model=PaymentReport)
+@cached_query('payments', 'purchase_payments', 'parties')
 def get_payment_report(
     start_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str | None = Query(None, description="End date (YYYY-MM-DD)"),
@@ -3352,6 +3762,7 @@ def get_payment_report(
 
 # Financial Reports API Endpoints
 @api.get('/reports/financial', response_model=FinancialReport)
+@cached_query(*LEDGER_TAGS, *INVENTORY_TAGS)
 def get_financial_report(
     report_type: str = Query(..., description="Report type: profit_loss, balance_sheet, cash_flow"),
     start_date: str | None = Query(None, description="Start date (YYYY-MM-DD)"),
@@ -3453,108 +3864,170 @@ def _calculate_period_dates(period_type: str, period_value: str) -> tuple[str, s
     return start_date, end_date
 
 
+GSTR1_B2B_COLUMNS = ["Invoice No", "Date", "Customer", "GSTIN", "Taxable Value", "CGST", "SGST", "IGST", "Total"]
+
+
+def _stream_in_own_session(build):
+    """Yield the chunks of ``build(db)`` run on a session of its own
+
+    A streamed body outlives the request's dependencies, so it cannot use the
+    request session.
+    """
+    db = LegacySessionLocal()
+    try:
+        yield from build(db)
+    finally:
+        db.close()
+
+
+def _iter_gstr1_invoices(db: Session, start_date: date, end_date: date, b2b: bool):
+    """Yield GSTR-1 filing invoices with their items, grouped from one streamed joined query"""
+    from itertools import groupby
+    from operator import attrgetter
+
+    lines = stream_rows(db, gstr1_line_query(start_date, end_date, b2b=b2b))
+    for _, invoice_lines in groupby(lines, key=attrgetter("invoice_id")):
+        invoice_data = None
+        for line in invoice_lines:
+            if invoice_data is None:
+                has_customer = line.customer_name is not None
+                invoice_data = {
+                    "invoice_no": line.invoice_no,
+                    "invoice_date": line.invoice_date.isoformat(),
+                    "customer_name": line.customer_name if has_customer else "Unknown",
+                    "customer_gstin": line.customer_gstin if has_customer else "",
+                    "place_of_supply": line.place_of_supply,
+                    "reverse_charge": line.reverse_charge,
+                    "items": [],
+                    "total_taxable_value": float(line.invoice_taxable_value),
+                    "total_cgst": float(line.invoice_cgst),
+                    "total_sgst": float(line.invoice_sgst),
+                    "total_igst": float(line.invoice_igst),
+                    "grand_total": float(line.grand_total)
+                }
+            if line.item_id is not None:
+                invoice_data["items"].append({
+                    "description": line.description,
+                    "hsn_code": line.product_hsn or "",
+                    "qty": float(line.qty),
+                    "rate": float(line.rate),
+                    "taxable_value": float(line.taxable_value),
+                    "gst_rate": float(line.gst_rate),
+                    "cgst": float(line.cgst),
+                    "sgst": float(line.sgst),
+                    "igst": float(line.igst),
+                    "amount": float(line.amount)
+                })
+        yield invoice_data
+
+
+def _gstr1_b2b_row(invoice: dict) -> list:
+    return [
+        invoice["invoice_no"],
+        invoice["invoice_date"],
+        invoice["customer_name"],
+        invoice["customer_gstin"],
+        invoice["total_taxable_value"],
+        invoice["total_cgst"],
+        invoice["total_sgst"],
+        invoice["total_igst"],
+        invoice["grand_total"]
+    ]
+
+
 def _generate_gstr1_report(start_date: str, end_date: str, format: str, db: Session):
-    """Generate GSTR-1 (Outward Supplies) report"""
-    from sqlalchemy import func, select, cast, Date
-    from .models import Invoice, InvoiceItem, Product, Party
+    """Generate GSTR-1 (Outward Supplies) report
+
+    Invoices are read through one joined query on a server-side cursor and
+    written to the response as they arrive, so the report streams in
+    constant memory however many invoices the period holds.
+    """
+    from sqlalchemy import func, select
+    from .models import Invoice, InvoiceItem, Product
     from datetime import datetime
     
+    if format not in ("json", "csv", "excel"):
+        raise HTTPException(status_code=400, detail="Invalid format. Use json, csv, or excel")
+    
     # Convert string dates to proper date objects
     start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
     end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
     
-    # Get all invoices in the period
-    invoices = db.query(Invoice).filter(
-        cast(Invoice.date, Date) >= start_date_obj,
-        cast(Invoice.date, Date) <= end_date_obj
-    ).all()
-    
-    gstr1_data = {
-        "period": f"{start_date} to {end_date}",
-        "report_type": "GSTR-1",
-        "generated_on": datetime.now().isoformat(),
-        "sections": {
-            "b2b": [],
-            "b2c": [],
-            "nil_rated": [],
-            "exempted": [],
-            "rate_wise_summary": []
-        }
-    }
-    
-    # Process each invoice
-    for invoice in invoices:
-        customer = db.query(Party).filter(Party.id == invoice.customer_id).first()
-        
-        # Determine if B2B or B2C based on customer GSTIN
-        is_b2b = customer and customer.gstin and len(customer.gstin) == 15
-        
-        invoice_data = {
-            "invoice_no": invoice.invoice_no,
-            "invoice_date": invoice.date.isoformat(),
-            "customer_name": customer.name if customer else "Unknown",
-            "customer_gstin": customer.gstin if customer else "",
-            "place_of_supply": invoice.place_of_supply,
-            "reverse_charge": invoice.reverse_charge,
-            "items": [],
-            "total_taxable_value": float(invoice.taxable_value),
-            "total_cgst": float(invoice.cgst),
-            "total_sgst": float(invoice.sgst),
-            "total_igst": float(invoice.igst),
-            "grand_total": float(invoice.grand_total)
-        }
-        
-        # Get invoice items
-        items = db.query(InvoiceItem).filter(InvoiceItem.invoice_id == invoice.id).all()
-        for item in items:
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            item_data = {
-                "description": item.description,
-                "hsn_code": product.hsn if product else "",
-                "qty": float(item.qty),
-                "rate": float(item.rate),
-                "taxable_value": float(item.taxable_value),
-                "gst_rate": float(item.gst_rate),
-                "cgst": float(item.cgst),
-                "sgst": float(item.sgst),
-                "igst": float(item.igst),
-                "amount": float(item.amount)
-            }
-            invoice_data["items"].append(item_data)
-        
-        # Categorize invoice
-        if is_b2b:
-            gstr1_data["sections"]["b2b"].append(invoice_data)
-        else:
-            gstr1_data["sections"]["b2c"].append(invoice_data)
-    
     # Generate rate-wise summary
     rate_summary = db.execute(
         select(Product.gst_rate, func.sum(InvoiceItem.taxable_value), func.sum(InvoiceItem.cgst), func.sum(InvoiceItem.sgst), func.sum(InvoiceItem.igst))
         .join(Product, Product.id == InvoiceItem.product_id)
         .join(Invoice, Invoice.id == InvoiceItem.invoice_id)
-        .filter(
-            cast(Invoice.date, Date) >= start_date_obj,
-            cast(Invoice.date, Date) <= end_date_obj
-        )
+        .filter(day_range(Invoice.date, start_date_obj, end_date_obj))
         .group_by(Product.gst_rate)
     ).all()
-    
-    for rate, taxable, cgst, sgst, igst in rate_summary:
-        gstr1_data["sections"]["rate_wise_summary"].append({
+    rate_wise_summary = [
+        {
             "gst_rate": float(rate),
             "taxable_value": float(taxable),
             "cgst": float(cgst),
             "sgst": float(sgst),
             "igst": float(igst)
-        })
+        }
+        for rate, taxable, cgst, sgst, igst in rate_summary
+    ]
     
-    return _format_report(gstr1_data, format, "gstr1")
+    period = f"{start_date} to {end_date}"
+    generated_on = datetime.now().isoformat()
+    
+    if format == "excel":
+        if not OPENPYXL_AVAILABLE:
+            raise HTTPException(status_code=500, detail="Excel export requires openpyxl package")
+        workbook = write_xlsx(
+            "GST GSTR1",
+            (_gstr1_b2b_row(invoice) for invoice in _iter_gstr1_invoices(db, start_date_obj, end_date_obj, b2b=True)),
+            header=GSTR1_B2B_COLUMNS,
+            preamble=["GST GSTR1 Report", f"Period: {period}", f"Generated On: {generated_on}", "", "B2B Invoices"]
+        )
+        return StreamingResponse(
+            _iter_file_chunks(workbook),
+            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+            headers={'Content-Disposition': f'attachment; filename="gst_gstr1_{period.replace(" ", "_")}.xlsx"'}
+        )
+    
+    if format == "csv":
+        def build(stream_db):
+            def rows():
+                yield ["GST GSTR1 Report"]
+                yield [f"Period: {period}"]
+                yield [f"Generated On: {generated_on}"]
+                yield []
+                yield ["B2B Invoices"]
+                yield GSTR1_B2B_COLUMNS
+                for invoice in _iter_gstr1_invoices(stream_db, start_date_obj, end_date_obj, b2b=True):
+                    yield _gstr1_b2b_row(invoice)
+                yield []
+                yield ["Rate-wise Summary"]
+                yield ["GST Rate", "Taxable Value", "CGST", "SGST", "IGST"]
+                for rate in rate_wise_summary:
+                    yield [rate["gst_rate"], rate["taxable_value"], rate["cgst"], rate["sgst"], rate["igst"]]
+            return iter_csv(rows())
+        return StreamingResponse(_stream_in_own_session(build), media_type='text/csv')
+    
+    def build(stream_db):
+        return iter_json({
+            "period": period,
+            "report_type": "GSTR-1",
+            "generated_on": generated_on,
+            "sections": {
+                "b2b": _iter_gstr1_invoices(stream_db, start_date_obj, end_date_obj, b2b=True),
+                "b2c": _iter_gstr1_invoices(stream_db, start_date_obj, end_date_obj, b2b=False),
+                "nil_rated": [],
+                "exempted": [],
+                "rate_wise_summary": rate_wise_summary
+            }
+        })
+    return StreamingResponse(_stream_in_own_session(build), media_type='application/json')
 
 
 def _generate_gstr2_report(start_date: str, end_date: str, format: str, db: Session):
     """Generate GSTR-2 (Inward Supplies) report"""
-    from sqlalchemy import func, select, cast, Date
+    from sqlalchemy import func, select
     from .models import Purchase, PurchaseItem, Product, Party
     from datetime import datetime
     
@@ -3563,10 +4036,7 @@ def _generate_gstr2_report(start_date: str, end_date: str, format: str, db: Sess
     end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
     
     # Get all purchases in the period
-    purchases = db.query(Purchase).filter(
-        cast(Purchase.date, Date) >= start_date_obj,
-        cast(Purchase.date, Date) <= end_date_obj
-    ).all()
+    purchases = db.query(Purchase).filter(day_range(Purchase.date, start_date_obj, end_date_obj)).all()
     
     gstr2_data = {
         "period": f"{start_date} to {end_date}",
@@ -3623,7 +4093,7 @@ def _generate_gstr2_report(start_date: str, end_date: str, format: str, db: Sess
         select(Product.gst_rate, func.sum(PurchaseItem.taxable_value), func.sum(PurchaseItem.cgst), func.sum(PurchaseItem.sgst), func.sum(PurchaseItem.igst))
         .join(Product, Product.id == PurchaseItem.product_id)
         .join(Purchase, Purchase.id == PurchaseItem.purchase_id)
-        .filter(func.date(Purchase.date) >= func.date(start_date), func.date(Purchase.date) <= func.date(end_date))
+        .filter(day_range(Purchase.date, start_date_obj, end_date_obj))
         .group_by(Product.gst_rate)
     ).all()
     
@@ -3641,7 +4111,7 @@ def _generate_gstr2_report(start_date: str, end_date: str, format: str, db: Sess
 
 def _generate_gstr3b_report(start_date: str, end_date: str, format: str, db: Session):
     """Generate GSTR-3B (Summary) report"""
-    from sqlalchemy import func, select, cast, Date
+    from sqlalchemy import func, select
     from .models import Invoice, Purchase, InvoiceItem, PurchaseItem, Product
     from datetime import datetime
     
@@ -3660,16 +4130,14 @@ def _generate_gstr3b_report(start_date: str, end_date: str, format: str, db: Ses
         }
     }
     
-    # Outward supplies (GSTR-1 data)
-    invoices = db.query(Invoice).filter(
-        cast(Invoice.date, Date) >= start_date_obj,
-        cast(Invoice.date, Date) <= end_date_obj
-    ).all()
+    # Outward supplies (GSTR-1 data) and inward supplies (GSTR-2 data), each one aggregate query
+    outward = document_tax_totals(db, Invoice, start_date_obj, end_date_obj)
+    inward = document_tax_totals(db, Purchase, start_date_obj, end_date_obj)
     
-    outward_taxable = sum([float(i.taxable_value) for i in invoices], 0.0)
-    outward_cgst = sum([float(i.cgst) for i in invoices], 0.0)
-    outward_sgst = sum([float(i.sgst) for i in invoices], 0.0)
-    outward_igst = sum([float(i.igst) for i in invoices], 0.0)
+    outward_taxable = outward["taxable_value"]
+    outward_cgst = outward["cgst"]
+    outward_sgst = outward["sgst"]
+    outward_igst = outward["igst"]
     
     gstr3b_data["sections"]["outward_supplies"] = {
         "total_taxable_value": outward_taxable,
@@ -3679,16 +4147,10 @@ def _generate_gstr3b_report(start_date: str, end_date: str, format: str, db: Ses
         "total_tax": outward_cgst + outward_sgst + outward_igst
     }
     
-    # Inward supplies (GSTR-2 data)
-    purchases = db.query(Purchase).filter(
-        cast(Purchase.date, Date) >= start_date_obj,
-        cast(Purchase.date, Date) <= end_date_obj
-    ).all()
-    
-    inward_taxable = sum([float(p.taxable_value) for p in purchases], 0.0)
-    inward_cgst = sum([float(p.cgst) for p in purchases], 0.0)
-    inward_sgst = sum([float(p.sgst) for p in purchases], 0.0)
-    inward_igst = sum([float(p.igst) for p in purchases], 0.0)
+    inward_taxable = inward["taxable_value"]
+    inward_cgst = inward["cgst"]
+    inward_sgst = inward["sgst"]
+    inward_igst = inward["igst"]
     
     gstr3b_data["sections"]["inward_supplies"] = {
         "total_taxable_value": inward_taxable,
@@ -3741,36 +4203,7 @@ def _convert_to_csv(data: dict, report_type: str):
     w.writerow([f"Generated On: {data['generated_on']}"])
     w.writerow([])
     
-    if report_type == "gstr1":
-        # B2B Section
-        w.writerow(["B2B Invoices"])
-        w.writerow(["Invoice No", "Date", "Customer", "GSTIN", "Taxable Value", "CGST", "SGST", "IGST", "Total"])
-        for invoice in data["sections"]["b2b"]:
-            w.writerow([
-                invoice["invoice_no"],
-                invoice["invoice_date"],
-                invoice["customer_name"],
-                invoice["customer_gstin"],
-                invoice["total_taxable_value"],
-                invoice["total_cgst"],
-                invoice["total_sgst"],
-                invoice["total_igst"],
-                invoice["grand_total"]
-            ])
-        
-        w.writerow([])
-        w.writerow(["Rate-wise Summary"])
-        w.writerow(["GST Rate", "Taxable Value", "CGST", "SGST", "IGST"])
-        for rate in data["sections"]["rate_wise_summary"]:
-            w.writerow([
-                rate["gst_rate"],
-                rate["taxable_value"],
-                rate["cgst"],
-                rate["sgst"],
-                rate["igst"]
-            ])
-    
-    elif report_type == "gstr2":
+    if report_type == "gstr2":
         # B2B Section
         w.writerow(["B2B Purchases"])
         w.writerow(["Purchase No", "Date", "Vendor", "GSTIN", "Taxable Value", "CGST", "SGST", "IGST", "Total"])
@@ -3807,7 +4240,7 @@ def _convert_to_excel(data: dict, report_type: str):
     """Convert report data to Excel format"""
     try:
         import openpyxl
-        from openpyxl.styles import Font, Alignment, PatternFill
+        from openpyxl.styles import Font, Alignment
     except ImportError:
         raise HTTPException(status_code=500, detail="Excel export requires openpyxl package")
     
@@ -3815,42 +4248,12 @@ def _convert_to_excel(data: dict, report_type: str):
     ws = wb.active
     ws.title = f"GST {report_type.upper()}"
     
-    # Header styling
-    header_font = Font(bold=True)
-    header_fill = PatternFill(start_color="CCCCCC", end_color="CCCCCC", fill_type="solid")
-    
     # Write header
     ws['A1'] = f"GST {report_type.upper()} Report"
     ws['A1'].font = Font(bold=True, size=14)
     ws['A2'] = f"Period: {data['period']}"
     ws['A3'] = f"Generated On: {data['generated_on']}"
     
-    if report_type == "gstr1":
-        # B2B Section
-        row = 5
-        ws[f'A{row}'] = "B2B Invoices"
-        ws[f'A{row}'].font = header_font
-        
-        row += 1
-        headers = ["Invoice No", "Date", "Customer", "GSTIN", "Taxable Value", "CGST", "SGST", "IGST", "Total"]
-        for col, header in enumerate(headers, 1):
-            cell = ws.cell(row=row, column=col, value=header)
-            cell.font = header_font
-            cell.fill = header_fill
-        
-        row += 1
-        for invoice in data["sections"]["b2b"]:
-            ws.cell(row=row, column=1, value=invoice["invoice_no"])
-            ws.cell(row=row, column=2, value=invoice["invoice_date"])
-            ws.cell(row=row, column=3, value=invoice["customer_name"])
-            ws.cell(row=row, column=4, value=invoice["customer_gstin"])
-            ws.cell(row=row, column=5, value=invoice["total_taxable_value"])
-            ws.cell(row=row, column=6, value=invoice["total_cgst"])
-            ws.cell(row=row, column=7, value=invoice["total_sgst"])
-            ws.cell(row=row, column=8, value=invoice["total_igst"])
-            ws.cell(row=row, column=9, value=invoice["grand_total"])
-            row += 1
-    
     # Save to bytes
     from io import BytesIO
     output = BytesIO()
@@ -3956,21 +4359,23 @@ class PurchaseItemOut(BaseModel):
     created_at: str
 
 
-def _next_purchase_no(db: Session) -> str:
-    """Generate next purchase number"""
-    settings = db.query(CompanySettings).first()
-    if not settings:
-        raise HTTPException(status_code=500, detail="Company settings not found")
-    
+def _next_purchase_no(db: Session, settings: CompanySettings) -> str:
+    """Generate next purchase number in the company's tenant series"""
     prefix = settings.invoice_series.replace("INV", "PUR")  # Use similar series for purchases
-    last_purchase = db.query(Purchase).filter(Purchase.purchase_no.like(f"{prefix}%")).order_by(Purchase.purchase_no.desc()).first()
     
-    if last_purchase:
-        # Extract sequence number from last purchase number
-        last_seq = int(last_purchase.purchase_no.replace(prefix, ""))
-        seq = last_seq + 1
-    else:
-        seq = 1
+    def last_purchase_seq() -> int:
+        last_purchase = db.query(Purchase).filter(
+            same_tenant_scope(Purchase.tenant_id, settings.tenant_id),
+            Purchase.purchase_no.like(f"{prefix}%")
+        ).order_by(Purchase.purchase_no.desc()).first()
+        if not last_purchase:
+            return 0
+        try:
+            return int(last_purchase.purchase_no.replace(prefix, ""))
+        except ValueError:
+            return 0
+    
+    seq = number_allocator.allocate(db, prefix, tenant_id=settings.tenant_id, seed=last_purchase_seq)
     
     # Ensure the total length doesn't exceed 16 characters
     max_seq_length = 16 - len(prefix)
@@ -4004,8 +4409,12 @@ def create_purchase(payload: PurchaseCreate, _: User = Depends(get_current_user)
     if not vendor:
         raise HTTPException(status_code=400, detail='Invalid vendor')
     
+    company = db.query(CompanySettings).first()
+    if not company:
+        raise HTTPException(status_code=500, detail="Company settings not found")
+    
     # Generate purchase number
-    purchase_no = _next_purchase_no(db)
+    purchase_no = _next_purchase_no(db, company)
     
     # Calculate GST and totals
     taxable_value = Decimal('0.00')
@@ -4015,6 +4424,7 @@ def create_purchase(payload: PurchaseCreate, _: User = Depends(get_current_user)
     
     # Create purchase
     pur = Purchase(
+        tenant_id=company.tenant_id,
         vendor_id=vendor.id,
         purchase_no=purchase_no,
         date=datetime.fromisoformat(payload.date),
@@ -4103,6 +4513,7 @@ def create_purchase(payload: PurchaseCreate, _: User = Depends(get_current_user)
 
 @api.get('/purchases', response_model=list[PurchaseOut])
 def list_purchases(
+    response: Response,
     search: str | None = None,
     status: str | None = None,
     vendor_id: int | None = None,
@@ -4112,10 +4523,16 @@ def list_purchases(
     place_of_supply: str | None = None,
     date_from: str | None = None,
     date_to: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
     _: User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
-    query = db.query(Purchase).join(Party).filter(Party.is_vendor == True)
+    query = (
+        db.query(Purchase, Party.name.label('vendor_name'))
+        .join(Party, Purchase.vendor_id == Party.id)
+        .filter(Party.is_vendor == True)
+    )
     
     if search:
         search_filter = or_(
@@ -4161,16 +4578,27 @@ def list_purchases(
     if date_to:
         query = query.filter(Purchase.date <= datetime.fromisoformat(date_to))
     
-    purchases = query.order_by(Purchase.date.desc()).all()
+    if cursor is not None or limit is not None:
+        # Keyset mode: bounded page ordered by (date, id); the next cursor is
+        # returned in a response header so the list body stays unchanged
+        query = apply_keyset(query, Purchase.date, Purchase.id, 'date', 'desc', cursor)
+        purchases, next_cursor = fetch_page(
+            query, clamp_page_size(limit), 'date', 'desc',
+            sort_key=lambda row: row.Purchase.date,
+            id_key=lambda row: row.Purchase.id,
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        purchases = query.order_by(Purchase.date.desc(), Purchase.id.desc()).all()
     
     result = []
-    for pur in purchases:
-        vendor = db.query(Party).filter(Party.id == pur.vendor_id).first()
+    for pur, vendor_name in purchases:
         result.append(PurchaseOut(
             id=pur.id,
             purchase_no=pur.purchase_no,
             vendor_id=pur.vendor_id,
-            vendor_name=vendor.name if vendor else "Unknown",
+            vendor_name=vendor_name or "Unknown",
             date=pur.date.isoformat(),
             due_date=pur.due_date.isoformat(),
             terms=pur.terms,
@@ -4358,6 +4786,7 @@ def create_expense(payload: ExpenseIn, _: User = Depends(get_current_user), db:
 
 @api.get('/expenses', response_model=list[ExpenseOut])
 def list_expenses(
+    response: Response,
     search: str | None = None,
     category: str | None = None,
     expense_type: str | None = None,
@@ -4366,10 +4795,15 @@ def list_expenses(
     amount_max: float | None = None,
     start_date: str | None = None,
     end_date: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
     _: User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
-    query = db.query(Expense)
+    query = (
+        db.query(Expense, Party.name.label('vendor_name'))
+        .outerjoin(Party, Expense.vendor_id == Party.id)
+    )
     
     if search:
         search_filter = or_(
@@ -4399,14 +4833,23 @@ def list_expenses(
     if end_date:
         query = query.filter(Expense.expense_date <= datetime.fromisoformat(end_date))
     
-    expenses = query.order_by(Expense.expense_date.desc()).all()
+    if cursor is not None or limit is not None:
+        # Keyset mode: bounded page ordered by (expense_date, id)
+        query = apply_keyset(query, Expense.expense_date, Expense.id, 'expense_date', 'desc', cursor)
+        expenses, next_cursor = fetch_page(
+            query, clamp_page_size(limit), 'expense_date', 'desc',
+            sort_key=lambda row: row.Expense.expense_date,
+            id_key=lambda row: row.Expense.id,
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        expenses = query.order_by(Expense.expense_date.desc(), Expense.id.desc()).all()
     
     result = []
-    for exp in expenses:
-        vendor_name = None
-        if exp.vendor_id:
-            vendor = db.query(Party).filter(Party.id == exp.vendor_id).first()
-            vendor_name = vendor.name if vendor else "Unknown"
+    for exp, vendor_name in expenses:
+        if exp.vendor_id and not vendor_name:
+            vendor_name = "Unknown"
         
         result.append(ExpenseOut(
             id=exp.id,
@@ -4598,6 +5041,9 @@ def add_payment(invoice_id: int, payload: PaymentIn, _: User = Depends(get_curre
 @api.get('/invoices/payments')
 @api.get('/invoice-payments')
 def list_all_invoice_payments(
+    response: Response,
+    cursor: str | None = None,
+    limit: int | None = None,
     _: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -4613,8 +5059,22 @@ def list_all_invoice_payments(
       "reference_number": str | None,
       "notes": str | None
     }
+
+    Passing ``limit`` or ``cursor`` switches to keyset pagination (newest
+    first); the next page's cursor is returned in the X-Next-Cursor header.
     """
-    pays = db.query(Payment).all()
+    query = db.query(Payment)
+    if cursor is not None or limit is not None:
+        query = apply_keyset(query, Payment.id, Payment.id, 'id', 'desc', cursor)
+        pays, next_cursor = fetch_page(
+            query, clamp_page_size(limit), 'id', 'desc',
+            sort_key=lambda p: p.id,
+            id_key=lambda p: p.id,
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        pays = query.all()
     return [
         {
             "id": p.id,
@@ -4630,6 +5090,7 @@ def list_all_invoice_payments(
 
 
 @api.get('/invoice-payments/summary', response_model=dict)
+@cached_query('invoices', 'payments', 'parties')
 def invoice_payments_summary(
     search: str | None = None,
     payment_method: str | None = None,
@@ -4763,6 +5224,7 @@ def add_purchase_payment(purchase_id: int, payload: PurchasePaymentIn, _: User =
 
 @api.get('/purchase-payments', response_model=list[PurchasePaymentOut])
 def list_all_purchase_payments(
+    response: Response,
     search: str | None = None,
     payment_status: str | None = None,
     payment_method: str | None = None,
@@ -4771,11 +5233,17 @@ def list_all_purchase_payments(
     amount_max: float | None = None,
     date_from: str | None = None,
     date_to: str | None = None,
+    cursor: str | None = None,
+    limit: int | None = None,
     _: User = Depends(get_current_user), 
     db: Session = Depends(get_db)
 ):
     """Get all purchase payments with filtering"""
-    query = db.query(PurchasePayment).join(Purchase, PurchasePayment.purchase_id == Purchase.id).join(Party, Purchase.vendor_id == Party.id)
+    query = (
+        db.query(PurchasePayment, Purchase.purchase_no, Party.name.label('vendor_name'))
+        .join(Purchase, PurchasePayment.purchase_id == Purchase.id)
+        .join(Party, Purchase.vendor_id == Party.id)
+    )
     
     if search:
         search_filter = (
@@ -4809,13 +5277,21 @@ def list_all_purchase_payments(
     if date_to:
         query = query.filter(PurchasePayment.payment_date <= datetime.fromisoformat(date_to))
     
-    payments = query.order_by(PurchasePayment.payment_date.desc()).all()
+    if cursor is not None or limit is not None:
+        # Keyset mode: bounded page ordered by (payment_date, id)
+        query = apply_keyset(query, PurchasePayment.payment_date, PurchasePayment.id, 'payment_date', 'desc', cursor)
+        payments, next_cursor = fetch_page(
+            query, clamp_page_size(limit), 'payment_date', 'desc',
+            sort_key=lambda row: row.PurchasePayment.payment_date,
+            id_key=lambda row: row.PurchasePayment.id,
+        )
+        if next_cursor:
+            response.headers[NEXT_CURSOR_HEADER] = next_cursor
+    else:
+        payments = query.order_by(PurchasePayment.payment_date.desc(), PurchasePayment.id.desc()).all()
     
     result = []
-    for payment in payments:
-        purchase = db.query(Purchase).filter(Purchase.id == payment.purchase_id).first()
-        vendor = db.query(Party).filter(Party.id == purchase.vendor_id).first() if purchase else None
-        
+    for payment, purchase_no, vendor_name in payments:
         result.append(PurchasePaymentOut(
             id=payment.id,
             purchase_id=payment.purchase_id,
@@ -4825,8 +5301,8 @@ def list_all_purchase_payments(
             reference_number=payment.reference_number,
             payment_date=payment.payment_date.isoformat(),
             notes=payment.notes,
-            vendor_name=vendor.name if vendor else "Unknown",
-            purchase_number=purchase.purchase_no if purchase else "Unknown"
+            vendor_name=vendor_name or "Unknown",
+            purchase_number=purchase_no or "Unknown"
         ))
     
     return result
@@ -5220,6 +5696,7 @@ def toggle_party(party_id: int, _: User = Depends(get_current_user), db: Session
 
 # Cashflow Management - Using consolidated service
 @api.get('/cashflow/summary')
+@cached_query(*LEDGER_TAGS)
 def get_cashflow_summary(
     start_date: str | None = None,
     end_date: str | None = None,
@@ -5490,222 +5967,238 @@ def purchase_pdf(purchase_id: int, _: User = Depends(get_current_user), db: Sess
     return Response(content=pdf, media_type='application/pdf')
 
 
-@api.post('/purchases/{purchase_id}/email', status_code=202)
-def email_purchase(purchase_id: int, payload: EmailRequest, _: User = Depends(get_current_user), db: Session = Depends(get_db)):
+def _purchase_email_pdf(db: Session, purchase_id: int) -> bytes:
+    """Render the PDF attached to purchase emails (run by the email outbox sender)"""
     purchase = db.query(Purchase).filter(Purchase.id == purchase_id).first()
     if not purchase:
-        raise HTTPException(status_code=404, detail='Purchase not found')
-    
-    # Get vendor details
+        raise PermanentEmailError(f"Purchase {purchase_id} no longer exists")
     vendor = db.query(Party).filter(Party.id == purchase.vendor_id).first()
-    vendor_name = vendor.name if vendor else "Valued Vendor"
-    
-    # Get company details
     company = db.query(CompanySettings).first()
-    company_name = company.name if company else "ProfitPath"
     
-    # Generate PDF
-    try:
-        # Create PDF buffer
-        buf = BytesIO()
-        doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=1*cm, leftMargin=1*cm, topMargin=1*cm, bottomMargin=1*cm)
-        
-        # Define styles
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=18,
-            textColor=darkblue,
-            alignment=TA_CENTER,
-            spaceAfter=20
-        )
-        
-        heading_style = ParagraphStyle(
-            'CustomHeading',
-            parent=styles['Heading2'],
-            fontSize=12,
-            textColor=darkblue,
-            spaceAfter=6
-        )
-        
-        normal_style = ParagraphStyle(
-            'CustomNormal',
-            parent=styles['Normal'],
-            fontSize=10,
-            spaceAfter=3
-        )
-        
-        # Build PDF content (same as purchase_pdf function)
-        story = []
-        
-        # Header - Company Details
-        if company:
-            story.append(Paragraph(f"<b>{company.name}</b>", title_style))
-            story.append(Paragraph(f"GSTIN: {company.gstin}", normal_style))
-            story.append(Paragraph(f"State: {company.state} - {company.state_code}", normal_style))
-        else:
-            story.append(Paragraph("<b>CASHFLOW</b>", title_style))
-            story.append(Paragraph("Financial Management System", normal_style))
-        
-        story.append(Spacer(1, 20))
-        
-        # Purchase Header
-        story.append(Paragraph(f"<b>PURCHASE ORDER</b>", heading_style))
-        
-        # Purchase Details Table
-        purchase_data = [
-            ['Purchase No:', purchase.purchase_no, 'Date:', purchase.date.strftime('%d/%m/%Y')],
-            ['Due Date:', purchase.due_date.strftime('%d/%m/%Y'), 'Terms:', purchase.terms],
-            ['Place of Supply:', purchase.place_of_supply, 'State Code:', purchase.place_of_supply_state_code]
+    # Create PDF buffer
+    buf = BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=1*cm, leftMargin=1*cm, topMargin=1*cm, bottomMargin=1*cm)
+
+    # Define styles
+    styles = getSampleStyleSheet()
+    title_style = ParagraphStyle(
+        'CustomTitle',
+        parent=styles['Heading1'],
+        fontSize=18,
+        textColor=darkblue,
+        alignment=TA_CENTER,
+        spaceAfter=20
+    )
+
+    heading_style = ParagraphStyle(
+        'CustomHeading',
+        parent=styles['Heading2'],
+        fontSize=12,
+        textColor=darkblue,
+        spaceAfter=6
+    )
+
+    normal_style = ParagraphStyle(
+        'CustomNormal',
+        parent=styles['Normal'],
+        fontSize=10,
+        spaceAfter=3
+    )
+
+    # Build PDF content (same as purchase_pdf function)
+    story = []
+
+    # Header - Company Details
+    if company:
+        story.append(Paragraph(f"<b>{company.name}</b>", title_style))
+        story.append(Paragraph(f"GSTIN: {company.gstin}", normal_style))
+        story.append(Paragraph(f"State: {company.state} - {company.state_code}", normal_style))
+    else:
+        story.append(Paragraph("<b>CASHFLOW</b>", title_style))
+        story.append(Paragraph("Financial Management System", normal_style))
+
+    story.append(Spacer(1, 20))
+
+    # Purchase Header
+    story.append(Paragraph(f"<b>PURCHASE ORDER</b>", heading_style))
+
+    # Purchase Details Table
+    purchase_data = [
+        ['Purchase No:', purchase.purchase_no, 'Date:', purchase.date.strftime('%d/%m/%Y')],
+        ['Due Date:', purchase.due_date.strftime('%d/%m/%Y'), 'Terms:', purchase.terms],
+        ['Place of Supply:', purchase.place_of_supply, 'State Code:', purchase.place_of_supply_state_code]
+    ]
+
+    if purchase.eway_bill_number:
+        purchase_data.append(['E-way Bill No:', purchase.eway_bill_number, '', ''])
+
+    purchase_table = Table(purchase_data, colWidths=[2*cm, 6*cm, 2*cm, 6*cm])
+    purchase_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 9),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+    ]))
+    story.append(purchase_table)
+    story.append(Spacer(1, 15))
+
+    # Vendor Details
+    if vendor:
+        vendor_address = f"{vendor.billing_address_line1}"
+        if vendor.billing_address_line2:
+            vendor_address += f", {vendor.billing_address_line2}"
+        vendor_address += f", {vendor.billing_city}, {vendor.billing_state} - {vendor.billing_pincode or ''}"
+
+        vendor_data = [
+            ['Vendor:', vendor.name],
+            ['', f"GSTIN: {vendor.gstin}" if vendor.gstin else "GSTIN: Not Available"],
+            ['', vendor_address],
+            ['', f"Email: {vendor.email}" if vendor.email else ""],
+            ['', f"Phone: {vendor.contact_number}" if vendor.contact_number else ""]
         ]
-        
-        if purchase.eway_bill_number:
-            purchase_data.append(['E-way Bill No:', purchase.eway_bill_number, '', ''])
-        
-        purchase_table = Table(purchase_data, colWidths=[2*cm, 6*cm, 2*cm, 6*cm])
-        purchase_table.setStyle(TableStyle([
+
+        vendor_table = Table(vendor_data, colWidths=[2*cm, 14*cm])
+        vendor_table.setStyle(TableStyle([
             ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
             ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
             ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-        ]))
-        story.append(purchase_table)
-        story.append(Spacer(1, 15))
-        
-        # Vendor Details
-        if vendor:
-            vendor_address = f"{vendor.billing_address_line1}"
-            if vendor.billing_address_line2:
-                vendor_address += f", {vendor.billing_address_line2}"
-            vendor_address += f", {vendor.billing_city}, {vendor.billing_state} - {vendor.billing_pincode or ''}"
-            
-            vendor_data = [
-                ['Vendor:', vendor.name],
-                ['', f"GSTIN: {vendor.gstin}" if vendor.gstin else "GSTIN: Not Available"],
-                ['', vendor_address],
-                ['', f"Email: {vendor.email}" if vendor.email else ""],
-                ['', f"Phone: {vendor.contact_number}" if vendor.contact_number else ""]
-            ]
-            
-            vendor_table = Table(vendor_data, colWidths=[2*cm, 14*cm])
-            vendor_table.setStyle(TableStyle([
-                ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 0), (-1, -1), 9),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
-                ('TOPPADDING', (0, 0), (-1, -1), 2),
-                ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ]))
-            story.append(vendor_table)
-            story.append(Spacer(1, 15))
-        
-        # Items Table
-        story.append(Paragraph("<b>Item Details</b>", heading_style))
-        
-        # Table headers
-        headers = ['S.No', 'Description', 'HSN', 'Qty', 'Rate', 'Amount', 'GST %', 'CGST', 'SGST', 'Total']
-        table_data = [headers]
-        
-        # Add items
-        items = db.query(PurchaseItem).filter(PurchaseItem.purchase_id == purchase.id).all()
-        for i, item in enumerate(items, 1):
-            product = db.query(Product).filter(Product.id == item.product_id).first()
-            description = product.name if product else item.description
-            
-            row = [
-                str(i),
-                description,
-                item.hsn_code or '',
-                str(item.qty),
-                f"₹{float(item.rate):.2f}",
-                f"₹{float(item.taxable_value):.2f}",
-                f"{item.gst_rate}%",
-                f"₹{float(item.cgst):.2f}",
-                f"₹{float(item.sgst):.2f}",
-                f"₹{float(item.amount):.2f}"
-            ]
-            table_data.append(row)
-        
-        # Create items table
-        items_table = Table(table_data, colWidths=[0.8*cm, 4*cm, 1.5*cm, 1*cm, 1.5*cm, 1.5*cm, 1*cm, 1.2*cm, 1.2*cm, 1.5*cm])
-        items_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('ALIGN', (1, 0), (1, -1), 'LEFT'),  # Description left-aligned
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),  # Header row
-            ('FONTSIZE', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
-            ('TOPPADDING', (0, 0), (-1, -1), 3),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black),
-            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 2),
+            ('TOPPADDING', (0, 0), (-1, -1), 2),
+            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
         ]))
-        story.append(items_table)
+        story.append(vendor_table)
         story.append(Spacer(1, 15))
-        
-        # Totals Table
-        totals_data = [
-            ['Subtotal:', f"₹{float(purchase.taxable_value):.2f}"],
-            ['CGST:', f"₹{float(purchase.cgst):.2f}"],
-            ['SGST:', f"₹{float(purchase.sgst):.2f}"],
-            ['IGST:', f"₹{float(purchase.igst):.2f}"],
-            ['Total:', f"₹{float(purchase.grand_total):.2f}"]
-        ]
-        
-        totals_table = Table(totals_data, colWidths=[4*cm, 2*cm])
-        totals_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),  # Total row bold
-            ('FONTSIZE', (0, -1), (-1, -1), 12),  # Total row larger
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
-            ('TOPPADDING', (0, 0), (-1, -1), 5),
-        ]))
-        story.append(totals_table)
-        story.append(Spacer(1, 20))
-        
-        # Notes
-        if purchase.notes:
-            story.append(Paragraph("<b>Notes:</b>", heading_style))
-            story.append(Paragraph(purchase.notes, normal_style))
-            story.append(Spacer(1, 15))
-        
-        # Footer
-        story.append(Paragraph("Thank you for your service!", normal_style))
-        story.append(Paragraph("This is a computer generated purchase order", normal_style))
-        
-        # Build PDF
-        doc.build(story)
-        pdf_content = buf.getvalue()
-        buf.close()
-        
-        # Create email template
-        text_body, html_body = create_purchase_email_template(
-            purchase_no=purchase.purchase_no,
-            vendor_name=vendor_name,
-            amount=float(purchase.grand_total),
-            due_date=purchase.due_date.strftime('%d/%m/%Y'),
-            company_name=company_name
-        )
-        
-        # Send email with PDF attachment
-        subject = f"Purchase Order {purchase.purchase_no} - {company_name}"
-        filename = f"PurchaseOrder_{purchase.purchase_no}.pdf"
-        
-        success = send_email(
-            to=payload.to,
-            subject=subject,
-            body=html_body,  # Use HTML version
-            pdf_attachment=pdf_content,
-            filename=filename
-        )
-        
-        return {"status": "sent" if success else "failed"}
-        
-    except Exception as e:
-        return {"status": "failed", "error": str(e)}
+
+    # Items Table
+    story.append(Paragraph("<b>Item Details</b>", heading_style))
+
+    # Table headers
+    headers = ['S.No', 'Description', 'HSN', 'Qty', 'Rate', 'Amount', 'GST %', 'CGST', 'SGST', 'Total']
+    table_data = [headers]
+
+    # Add items
+    items = db.query(PurchaseItem).filter(PurchaseItem.purchase_id == purchase.id).all()
+    for i, item in enumerate(items, 1):
+        product = db.query(Product).filter(Product.id == item.product_id).first()
+        description = product.name if product else item.description
+
+        row = [
+            str(i),
+            description,
+            item.hsn_code or '',
+            str(item.qty),
+            f"₹{float(item.rate):.2f}",
+            f"₹{float(item.taxable_value):.2f}",
+            f"{item.gst_rate}%",
+            f"₹{float(item.cgst):.2f}",
+            f"₹{float(item.sgst):.2f}",
+            f"₹{float(item.amount):.2f}"
+        ]
+        table_data.append(row)
+
+    # Create items table
+    items_table = Table(table_data, colWidths=[0.8*cm, 4*cm, 1.5*cm, 1*cm, 1.5*cm, 1.5*cm, 1*cm, 1.2*cm, 1.2*cm, 1.5*cm])
+    items_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('ALIGN', (1, 0), (1, -1), 'LEFT'),  # Description left-aligned
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),  # Header row
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
+        ('TOPPADDING', (0, 0), (-1, -1), 3),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+        ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+    ]))
+    story.append(items_table)
+    story.append(Spacer(1, 15))
+
+    # Totals Table
+    totals_data = [
+        ['Subtotal:', f"₹{float(purchase.taxable_value):.2f}"],
+        ['CGST:', f"₹{float(purchase.cgst):.2f}"],
+        ['SGST:', f"₹{float(purchase.sgst):.2f}"],
+        ['IGST:', f"₹{float(purchase.igst):.2f}"],
+        ['Total:', f"₹{float(purchase.grand_total):.2f}"]
+    ]
+
+    totals_table = Table(totals_data, colWidths=[4*cm, 2*cm])
+    totals_table.setStyle(TableStyle([
+        ('ALIGN', (0, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('FONTNAME', (0, -1), (-1, -1), 'Helvetica-Bold'),  # Total row bold
+        ('FONTSIZE', (0, -1), (-1, -1), 12),  # Total row larger
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 5),
+        ('TOPPADDING', (0, 0), (-1, -1), 5),
+    ]))
+    story.append(totals_table)
+    story.append(Spacer(1, 20))
+
+    # Notes
+    if purchase.notes:
+        story.append(Paragraph("<b>Notes:</b>", heading_style))
+        story.append(Paragraph(purchase.notes, normal_style))
+        story.append(Spacer(1, 15))
+
+    # Footer
+    story.append(Paragraph("Thank you for your service!", normal_style))
+    story.append(Paragraph("This is a computer generated purchase order", normal_style))
+
+    # Build PDF
+    doc.build(story)
+    pdf_content = buf.getvalue()
+    buf.close()
+    return pdf_content
+
+
+register_attachment_builder('purchase', _purchase_email_pdf)
+
+
+@api.post('/purchases/{purchase_id}/email', status_code=202)
+def email_purchase(purchase_id: int, payload: EmailRequest, _: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Queue the purchase order email for background delivery"""
+    purchase = db.query(Purchase).filter(Purchase.id == purchase_id).first()
+    if not purchase:
+        raise HTTPException(status_code=404, detail='Purchase not found')
+    
+    # Get vendor details
+    vendor = db.query(Party).filter(Party.id == purchase.vendor_id).first()
+    vendor_name = vendor.name if vendor else "Valued Vendor"
+    
+    # Get company details
+    company = db.query(CompanySettings).first()
+    company_name = company.name if company else "ProfitPath"
+    
+    # Create email template
+    text_body, html_body = create_purchase_email_template(
+        purchase_no=purchase.purchase_no,
+        vendor_name=vendor_name,
+        amount=float(purchase.grand_total),
+        due_date=purchase.due_date.strftime('%d/%m/%Y'),
+        company_name=company_name
+    )
+    
+    entry = enqueue_email(
+        db,
+        to=payload.to_email,
+        subject=payload.subject or f"Purchase Order {purchase.purchase_no} - {company_name}",
+        body=html_body,  # Use HTML version
+        document_type='purchase',
+        document_id=purchase.id,
+        attachment_filename=f"PurchaseOrder_{purchase.purchase_no}.pdf",
+        tenant_id=purchase.tenant_id
+    )
+    db.commit()
+    email_outbox_sender.wake()
+    
+    return {"status": entry.status, "email_id": entry.id}
+
+
+@api.get('/purchases/{purchase_id}/emails')
+def list_purchase_emails(purchase_id: int, _: User = Depends(get_current_user), db: Session = Depends(get_db)):
+    """Delivery status of emails queued for a purchase, newest first"""
+    return _list_document_emails(db, 'purchase', purchase_id)
 
 
 # Company Settings
@@ -6090,15 +6583,8 @@ def get_stock_history(
     
     return result
 
-@api.get('/stock/movement-history', response_model=list[StockMovementSummaryOut])
-def get_stock_movement_history(
-    financial_year: str | None = None,
-    product_id: int | None = None,
-    _: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
-):
-    """Get stock movement history with individual transactions for all products or specific product by financial year"""
-    
+def _parse_financial_year(financial_year: str | None) -> tuple[str, int]:
+    """Return ``(financial_year, start_year)`` for a "YYYY-YYYY" year, defaulting to the current one"""
     # If no financial year specified, use current year
     if not financial_year:
         current_year = datetime.now().year
@@ -6107,11 +6593,73 @@ def get_stock_movement_history(
     # Parse financial year (format: "2024-2025")
     try:
         start_year = int(financial_year.split('-')[0])
-        end_year = int(financial_year.split('-')[1])
-        fy_start_date = datetime(start_year, 4, 1)  # April 1st
-        fy_end_date = datetime(end_year, 3, 31)     # March 31st
+        int(financial_year.split('-')[1])
     except (ValueError, IndexError):
         raise HTTPException(status_code=400, detail="Invalid financial year format. Use YYYY-YYYY")
+    return financial_year, start_year
+
+
+def _load_stock_movements(db: Session, product_ids: list[int] | None, start_year: int) -> dict[int, list]:
+    """A financial year's ledger rows with reference numbers and supplier, grouped by product
+
+    One query for every product instead of one per product and per row;
+    ``product_ids`` None loads all products.
+    """
+    from sqlalchemy import select
+
+    fy_start, fy_end = fy_bounds(start_year)
+    query = (
+        select(
+            StockLedgerEntry.id,
+            StockLedgerEntry.product_id,
+            StockLedgerEntry.entry_type,
+            StockLedgerEntry.qty,
+            StockLedgerEntry.ref_type,
+            StockLedgerEntry.ref_id,
+            StockLedgerEntry.created_at,
+            Invoice.invoice_no,
+            Purchase.purchase_no,
+            Party.name.label('supplier_name')
+        )
+        .outerjoin(Invoice, and_(StockLedgerEntry.ref_type == 'invoice', Invoice.id == StockLedgerEntry.ref_id))
+        .outerjoin(Purchase, and_(StockLedgerEntry.ref_type == 'purchase', Purchase.id == StockLedgerEntry.ref_id))
+        .outerjoin(Party, Party.id == Purchase.vendor_id)
+        .where(StockLedgerEntry.created_at >= fy_start, StockLedgerEntry.created_at < fy_end)
+        .order_by(StockLedgerEntry.product_id, StockLedgerEntry.created_at, StockLedgerEntry.id)
+    )
+    if product_ids is not None:
+        query = query.where(StockLedgerEntry.product_id.in_(product_ids))
+    movements: dict[int, list] = {}
+    for row in db.execute(query):
+        movements.setdefault(row.product_id, []).append(row)
+    return movements
+
+
+def _movement_reference(row) -> str | None:
+    if not (row.ref_type and row.ref_id):
+        return None
+    if row.ref_type == 'invoice':
+        return row.invoice_no
+    if row.ref_type == 'purchase':
+        return row.purchase_no
+    if row.ref_type == 'adjustment':
+        return f"ADJ-{row.ref_id}"
+    return None
+
+
+@api.get('/stock/movement-history', response_model=list[StockMovementSummaryOut])
+def get_stock_movement_history(
+    financial_year: str | None = None,
+    product_id: int | None = None,
+    _: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Get stock movement history with individual transactions for all products or specific product by financial year
+
+    Opening and closing stock come from the per-year stock snapshots, so only
+    the year's own ledger rows are read, in one query for all products.
+    """
+    financial_year, start_year = _parse_financial_year(financial_year)
     
     # Get products (all or specific)
     if product_id:
@@ -6121,151 +6669,93 @@ def get_stock_movement_history(
     else:
         products = db.query(Product).all()
     
+    snapshots = get_snapshots(db, [product.id for product in products], start_year)
+    movements_by_product = _load_stock_movements(db, [product_id] if product_id else None, start_year)
+    
     movements = []
     
     for product in products:
-        # Get all stock transactions for this product in the financial year
-        stock_transactions = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product.id,
-            StockLedgerEntry.created_at >= fy_start_date,
-            StockLedgerEntry.created_at <= fy_end_date
-        ).order_by(StockLedgerEntry.created_at).all()
-        
-        # Calculate opening stock (stock at the beginning of FY)
-        # Get all transactions before the financial year
-        pre_fy_transactions = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product.id,
-            StockLedgerEntry.created_at < fy_start_date
-        ).all()
-        
-        opening_stock = sum(
-            adj.qty for adj in pre_fy_transactions 
-            if adj.entry_type == 'in'
-        ) - sum(
-            adj.qty for adj in pre_fy_transactions 
-            if adj.entry_type == 'out'
-        )
-        opening_stock = max(0, opening_stock)
-        
-        # Calculate opening value (using average cost method)
+        snapshot = snapshots[product.id]
         unit_price = product.purchase_price or product.sales_price or 0
+        # Convert Decimal to float for calculation
         unit_price_float = float(unit_price) if unit_price else 0.0
-        opening_value = opening_stock * unit_price_float
+        opening_stock = snapshot.opening_qty
         
         # Process individual transactions
         transactions = []
         running_balance = opening_stock
-        
-        for transaction in stock_transactions:
-            # Calculate unit price and total value
-            unit_price = product.purchase_price or product.sales_price or 0
-            # Convert Decimal to float for calculation
-            unit_price_float = float(unit_price) if unit_price else 0.0
-            total_value = transaction.qty * unit_price_float
-            
-            # Determine reference information
-            ref_type = None
-            ref_id = None
-            reference_number = None
-            supplier_name = None
-            notes = None
+        total_incoming = total_incoming_value = 0.0
+        total_outgoing = total_outgoing_value = 0.0
+        
+        for row in movements_by_product.get(product.id, ()):
+            total_value = row.qty * unit_price_float
+            has_reference = bool(row.ref_type and row.ref_id)
+            delta = signed_qty(row.entry_type, row.qty)
+            running_balance += delta
             
-            if transaction.ref_type and transaction.ref_id:
-                ref_type = transaction.ref_type
-                ref_id = transaction.ref_id
-                # Try to get reference number based on ref_type
-                if ref_type == 'invoice':
-                    invoice = db.query(Invoice).filter(Invoice.id == ref_id).first()
-                    reference_number = invoice.invoice_no if invoice else None
-                elif ref_type == 'purchase':
-                    purchase = db.query(Purchase).filter(Purchase.id == ref_id).first()
-                    if purchase:
-                        reference_number = purchase.purchase_no
-                        vendor = db.query(Party).filter(Party.id == purchase.vendor_id).first()
-                        supplier_name = vendor.name if vendor else None
-                elif ref_type == 'adjustment':
-                    reference_number = f"ADJ-{ref_id}"
-            
-            # Update running balance
-            # Qty convention: 'in' is positive, 'out' is negative, 'adjust' signed
-            # Running balance should add the signed quantity uniformly
-            if transaction.entry_type in ('in', 'out', 'adjust'):
-                running_balance += transaction.qty
+            # Summary totals as magnitudes (positive numbers)
+            if delta > 0:
+                total_incoming += delta
+                total_incoming_value += delta * unit_price_float
+            elif delta < 0:
+                total_outgoing += -delta
+                total_outgoing_value += -delta * unit_price_float
             
             transactions.append(StockTransactionOut(
-                id=transaction.id,
+                id=row.id,
                 product_id=product.id,
                 product_name=product.name,
                 sku=product.sku,
                 category=product.category,
-                transaction_date=transaction.created_at,
-                entry_type=transaction.entry_type,
-                quantity=transaction.qty,
+                transaction_date=row.created_at,
+                entry_type=row.entry_type,
+                quantity=row.qty,
                 unit_price=unit_price,
                 total_value=total_value,
-                ref_type=ref_type,
-                ref_id=ref_id,
-                reference_number=reference_number,
-                supplier_name=supplier_name,
-                notes=notes,
+                ref_type=row.ref_type if has_reference else None,
+                ref_id=row.ref_id if has_reference else None,
+                reference_number=_movement_reference(row),
+                supplier_name=row.supplier_name if has_reference and row.ref_type == 'purchase' else None,
+                notes=None,
                 financial_year=financial_year,
                 running_balance=running_balance
             ))
         
-        # Calculate summary totals as magnitudes (positive numbers)
-        # Treat any negative quantity as outgoing, positive as incoming
-        total_incoming = sum(t.quantity for t in transactions if t.quantity > 0)
-        total_incoming_value = sum((t.total_value or 0) for t in transactions if t.quantity > 0)
-        total_outgoing = sum(abs(t.quantity) for t in transactions if t.quantity < 0)
-        total_outgoing_value = sum(abs(t.total_value or 0) for t in transactions if t.quantity < 0)
-        closing_stock = running_balance
-        closing_value = closing_stock * unit_price_float
-        
         movements.append(StockMovementSummaryOut(
             product_id=product.id,
             product_name=product.name,
             financial_year=financial_year,
             opening_stock=opening_stock,
-            opening_value=opening_value,
+            opening_value=float(snapshot.opening_value),
             total_incoming=total_incoming,
             total_incoming_value=total_incoming_value,
             total_outgoing=total_outgoing,
             total_outgoing_value=total_outgoing_value,
-            closing_stock=closing_stock,
-            closing_value=closing_value,
+            closing_stock=snapshot.closing_qty,
+            closing_value=float(snapshot.closing_value),
             transactions=transactions
         ))
     
     return movements
 
 
-@api.get('/stock/movement-history/pdf')
-def get_stock_movement_history_pdf(
-    financial_year: str | None = None,
-    product_id: int | None = None,
-    product_filter: str | None = None,
-    entry_type_filter: str | None = None,
-    reference_type_filter: str | None = None,
-    reference_search: str | None = None,
-    stock_level_filter: str | None = None,
-    _: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+def _stock_movement_history_pdf(
+    db: Session,
+    financial_year: str | None,
+    product_id: int | None,
+    product_filter: str | None,
+    entry_type_filter: str | None,
+    reference_type_filter: str | None,
+    reference_search: str | None,
+    stock_level_filter: str | None,
+    preview: bool = False
 ):
-    """Generate PDF report for stock movement history with filters applied"""
-    
-    # If no financial year specified, use current year
-    if not financial_year:
-        current_year = datetime.now().year
-        financial_year = f"{current_year}-{current_year + 1}"
-    
-    # Parse financial year (format: "2024-2025")
-    try:
-        start_year = int(financial_year.split('-')[0])
-        end_year = int(financial_year.split('-')[1])
-        fy_start_date = datetime(start_year, 4, 1)  # April 1st
-        fy_end_date = datetime(end_year, 3, 31)     # March 31st
-    except (ValueError, IndexError):
-        raise HTTPException(status_code=400, detail="Invalid financial year format. Use YYYY-YYYY")
+    """Build the stock movement history PDF shared by the download and preview endpoints
+
+    Returns ``(pdf_bytes, products)``. Opening stock comes from the per-year
+    stock snapshots and the year's ledger rows are loaded in one query.
+    """
+    financial_year, start_year = _parse_financial_year(financial_year)
     
     # Get products (all or specific)
     if product_id:
@@ -6278,6 +6768,10 @@ def get_stock_movement_history_pdf(
     else:
         products = db.query(Product).all()
     
+    snapshots = get_snapshots(db, [product.id for product in products], start_year)
+    filtered_ids = [product.id for product in products] if (product_id or (product_filter and product_filter != 'all')) else None
+    movements_by_product = _load_stock_movements(db, filtered_ids, start_year)
+    
     # Create PDF buffer
     buf = BytesIO()
     doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=1*cm, leftMargin=1*cm, topMargin=1*cm, bottomMargin=1*cm)
@@ -6321,6 +6815,25 @@ def get_stock_movement_history_pdf(
     else:
         story.append(Paragraph(f"All Products ({len(products)} items)", normal_style))
     story.append(Paragraph(f"Generated on: {datetime.now().strftime('%d/%m/%Y %H:%M')}", normal_style))
+    
+    if preview:
+        # Add filter information
+        active_filters = []
+        if product_filter and product_filter != 'all':
+            active_filters.append(f"Product: {product_filter}")
+        if entry_type_filter and entry_type_filter != 'all':
+            active_filters.append(f"Entry Type: {entry_type_filter}")
+        if reference_type_filter and reference_type_filter != 'all':
+            active_filters.append(f"Reference Type: {reference_type_filter}")
+        if reference_search:
+            active_filters.append(f"Reference Search: {reference_search}")
+        if stock_level_filter and stock_level_filter != 'all':
+            active_filters.append(f"Stock Level: {stock_level_filter}")
+        
+        if active_filters:
+            story.append(Paragraph("Active Filters:", normal_style))
+            for filter_info in active_filters:
+                story.append(Paragraph(f"• {filter_info}", normal_style))
     story.append(Spacer(1, 20))
     
     # Process each product with enhanced sections
@@ -6357,12 +6870,8 @@ def get_stock_movement_history_pdf(
         story.append(product_table)
         story.append(Spacer(1, 15))
         
-        # Get all stock transactions for this product in the financial year
-        stock_transactions = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product.id,
-            StockLedgerEntry.created_at >= fy_start_date,
-            StockLedgerEntry.created_at <= fy_end_date
-        ).order_by(StockLedgerEntry.created_at).all()
+        # This product's stock transactions in the financial year
+        stock_transactions = movements_by_product.get(product.id, [])
         
         # Apply filters to transactions
         filtered_transactions = []
@@ -6383,44 +6892,18 @@ def get_stock_movement_history_pdf(
             
             # Reference search filter
             if reference_search:
-                ref_type = transaction.ref_type
-                ref_id = transaction.ref_id
-                reference_number = None
-                
-                if ref_type and ref_id:
-                    if ref_type == 'invoice':
-                        invoice = db.query(Invoice).filter(Invoice.id == ref_id).first()
-                        reference_number = invoice.invoice_no if invoice else None
-                    elif ref_type == 'purchase':
-                        purchase = db.query(Purchase).filter(Purchase.id == ref_id).first()
-                        reference_number = purchase.purchase_no if purchase else None
-                    elif ref_type == 'adjustment':
-                        reference_number = f"ADJ-{ref_id}"
-                
+                reference_number = _movement_reference(transaction)
                 if not reference_number or reference_search.lower() not in reference_number.lower():
                     continue
             
             filtered_transactions.append(transaction)
         
-        # Calculate opening stock
-        pre_fy_transactions = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product.id,
-            StockLedgerEntry.created_at < fy_start_date
-        ).all()
-        
-        opening_stock = sum(
-            adj.qty for adj in pre_fy_transactions 
-            if adj.entry_type == 'in'
-        ) - sum(
-            adj.qty for adj in pre_fy_transactions 
-            if adj.entry_type == 'out'
-        )
-        opening_stock = max(0, opening_stock)
-        
-        # Calculate opening value
+        # Opening stock from the year's snapshot
+        snapshot = snapshots[product.id]
+        opening_stock = snapshot.opening_qty
+        opening_value = float(snapshot.opening_value)
         unit_price = product.purchase_price or product.sales_price or 0
         unit_price_float = float(unit_price) if unit_price else 0.0
-        opening_value = opening_stock * unit_price_float
         
         # Process filtered transactions
         transactions = []
@@ -6432,30 +6915,10 @@ def get_stock_movement_history_pdf(
             unit_price_float = float(unit_price) if unit_price else 0.0
             total_value = transaction.qty * unit_price_float
             
-            # Determine reference information
-            ref_type = None
-            ref_id = None
-            reference_number = None
-            
-            if transaction.ref_type and transaction.ref_id:
-                ref_type = transaction.ref_type
-                ref_id = transaction.ref_id
-                if ref_type == 'invoice':
-                    invoice = db.query(Invoice).filter(Invoice.id == ref_id).first()
-                    reference_number = invoice.invoice_no if invoice else None
-                elif ref_type == 'purchase':
-                    purchase = db.query(Purchase).filter(Purchase.id == ref_id).first()
-                    reference_number = purchase.purchase_no if purchase else None
-                elif ref_type == 'adjustment':
-                    reference_number = f"ADJ-{ref_id}"
+            reference_number = _movement_reference(transaction)
             
             # Update running balance
-            if transaction.entry_type == 'in':
-                running_balance += transaction.qty
-            elif transaction.entry_type == 'out':
-                running_balance -= transaction.qty
-            elif transaction.entry_type == 'adjust':
-                running_balance += transaction.qty
+            running_balance += signed_qty(transaction.entry_type, transaction.qty)
             
             transactions.append({
                 'date': transaction.created_at.strftime('%d/%m/%Y'),
@@ -6472,9 +6935,9 @@ def get_stock_movement_history_pdf(
                         sum(t.qty for t in filtered_transactions if t.entry_type == 'adjust' and t.qty > 0)
         total_incoming_value = sum(t.qty * unit_price_float for t in filtered_transactions if t.entry_type == 'in') + \
                               sum(t.qty * unit_price_float for t in filtered_transactions if t.entry_type == 'adjust' and t.qty > 0)
-        total_outgoing = sum(t.qty for t in filtered_transactions if t.entry_type == 'out') + \
+        total_outgoing = sum(abs(t.qty) for t in filtered_transactions if t.entry_type == 'out') + \
                         sum(abs(t.qty) for t in filtered_transactions if t.entry_type == 'adjust' and t.qty < 0)
-        total_outgoing_value = sum(t.qty * unit_price_float for t in filtered_transactions if t.entry_type == 'out') + \
+        total_outgoing_value = sum(abs(t.qty) * unit_price_float for t in filtered_transactions if t.entry_type == 'out') + \
                               sum(abs(t.qty) * unit_price_float for t in filtered_transactions if t.entry_type == 'adjust' and t.qty < 0)
         closing_stock = running_balance
         closing_value = closing_stock * unit_price_float
@@ -6561,8 +7024,29 @@ def get_stock_movement_history_pdf(
     doc.build(story)
     pdf = buf.getvalue()
     buf.close()
+    return pdf, products
+
+
+@api.get('/stock/movement-history/pdf')
+def get_stock_movement_history_pdf(
+    financial_year: str | None = None,
+    product_id: int | None = None,
+    product_filter: str | None = None,
+    entry_type_filter: str | None = None,
+    reference_type_filter: str | None = None,
+    reference_search: str | None = None,
+    stock_level_filter: str | None = None,
+    _: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Generate PDF report for stock movement history with filters applied"""
+    pdf, products = _stock_movement_history_pdf(
+        db, financial_year, product_id, product_filter, entry_type_filter,
+        reference_type_filter, reference_search, stock_level_filter
+    )
     
     # Generate filename
+    financial_year, _start_year = _parse_financial_year(financial_year)
     filename = f"stock_movement_history_{financial_year}"
     if product_id:
         product = products[0] if products else None
@@ -6590,335 +7074,11 @@ def get_stock_movement_history_pdf_preview(
     db: Session = Depends(get_db)
 ):
     """Generate PDF preview for stock movement history (inline display)"""
-    
-    # If no financial year specified, use current year
-    if not financial_year:
-        current_year = datetime.now().year
-        financial_year = f"{current_year}-{current_year + 1}"
-    
-    # Parse financial year (format: "2024-2025")
-    try:
-        start_year = int(financial_year.split('-')[0])
-        end_year = int(financial_year.split('-')[1])
-        fy_start_date = datetime(start_year, 4, 1)  # April 1st
-        fy_end_date = datetime(end_year, 3, 31)     # March 31st
-    except (ValueError, IndexError):
-        raise HTTPException(status_code=400, detail="Invalid financial year format. Use YYYY-YYYY")
-    
-    # Get products (all or specific)
-    if product_id:
-        products = db.query(Product).filter(Product.id == product_id).all()
-        if not products:
-            raise HTTPException(status_code=404, detail="Product not found")
-    elif product_filter and product_filter != 'all':
-        # Filter by product name
-        products = db.query(Product).filter(Product.name.ilike(f"%{product_filter}%")).all()
-    else:
-        products = db.query(Product).all()
-    
-    # Create PDF buffer
-    buf = BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4, rightMargin=1*cm, leftMargin=1*cm, topMargin=1*cm, bottomMargin=1*cm)
-    
-    # Define styles
-    styles = getSampleStyleSheet()
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=styles['Heading1'],
-        fontSize=18,
-        textColor=darkblue,
-        alignment=TA_CENTER,
-        spaceAfter=20
+    pdf, _products = _stock_movement_history_pdf(
+        db, financial_year, product_id, product_filter, entry_type_filter,
+        reference_type_filter, reference_search, stock_level_filter, preview=True
     )
     
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=styles['Heading2'],
-        fontSize=14,
-        textColor=darkblue,
-        spaceAfter=10
-    )
-    
-    normal_style = ParagraphStyle(
-        'CustomNormal',
-        parent=styles['Normal'],
-        fontSize=10,
-        spaceAfter=3
-    )
-    
-    # Build PDF content
-    story = []
-    
-    # Header
-    story.append(Paragraph("Stock Movement History Report", title_style))
-    story.append(Paragraph(f"Financial Year: {financial_year}", normal_style))
-    if product_id:
-        product = products[0] if products else None
-        if product:
-            story.append(Paragraph(f"Product: {product.name}", normal_style))
-    else:
-        story.append(Paragraph(f"All Products ({len(products)} items)", normal_style))
-    story.append(Paragraph(f"Generated on: {datetime.now().strftime('%d/%m/%Y %H:%M')}", normal_style))
-    
-    # Add filter information
-    active_filters = []
-    if product_filter and product_filter != 'all':
-        active_filters.append(f"Product: {product_filter}")
-    if entry_type_filter and entry_type_filter != 'all':
-        active_filters.append(f"Entry Type: {entry_type_filter}")
-    if reference_type_filter and reference_type_filter != 'all':
-        active_filters.append(f"Reference Type: {reference_type_filter}")
-    if reference_search:
-        active_filters.append(f"Reference Search: {reference_search}")
-    if stock_level_filter and stock_level_filter != 'all':
-        active_filters.append(f"Stock Level: {stock_level_filter}")
-    
-    if active_filters:
-        story.append(Paragraph("Active Filters:", normal_style))
-        for filter_info in active_filters:
-            story.append(Paragraph(f"• {filter_info}", normal_style))
-    
-    story.append(Spacer(1, 20))
-    
-    # Process each product with enhanced sections (same logic as download endpoint)
-    for i, product in enumerate(products, 1):
-        # Add page break for each product (except the first one)
-        if i > 1:
-            story.append(PageBreak())
-        
-        # Enhanced Product Section Header
-        story.append(Paragraph(f"PRODUCT {i}: {product.name.upper()}", heading_style))
-        story.append(Spacer(1, 5))
-        
-        # Product Details Box
-        product_details = [
-            ['Product Name:', product.name],
-            ['SKU:', product.sku or 'N/A'],
-            ['Category:', product.category or 'N/A'],
-            ['Unit:', product.unit or 'N/A'],
-            ['Purchase Price:', format_currency_for_pdf(float(product.purchase_price or 0), 'INR')],
-            ['Sales Price:', format_currency_for_pdf(float(product.sales_price or 0), 'INR')]
-        ]
-        
-        product_table = Table(product_details, colWidths=[3*cm, 8*cm])
-        product_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, -1), colors.lightblue),
-            ('TEXTCOLOR', (0, 0), (0, -1), colors.black),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (0, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 6),
-            ('BACKGROUND', (1, 0), (1, -1), colors.white),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(product_table)
-        story.append(Spacer(1, 15))
-        
-        # Get all stock transactions for this product in the financial year
-        stock_transactions = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product.id,
-            StockLedgerEntry.created_at >= fy_start_date,
-            StockLedgerEntry.created_at <= fy_end_date
-        ).order_by(StockLedgerEntry.created_at).all()
-        
-        # Apply filters to transactions (same logic as download endpoint)
-        filtered_transactions = []
-        for transaction in stock_transactions:
-            # Entry type filter
-            if entry_type_filter and entry_type_filter != 'all':
-                if entry_type_filter == 'incoming' and transaction.entry_type not in ['in', 'adjust']:
-                    continue
-                elif entry_type_filter == 'outgoing' and transaction.entry_type not in ['out', 'adjust']:
-                    continue
-                elif entry_type_filter == 'adjustment' and transaction.entry_type != 'adjust':
-                    continue
-            
-            # Reference type filter
-            if reference_type_filter and reference_type_filter != 'all':
-                if reference_type_filter != transaction.ref_type:
-                    continue
-            
-            # Reference search filter
-            if reference_search:
-                ref_type = transaction.ref_type
-                ref_id = transaction.ref_id
-                reference_number = None
-                
-                if ref_type and ref_id:
-                    if ref_type == 'invoice':
-                        invoice = db.query(Invoice).filter(Invoice.id == ref_id).first()
-                        reference_number = invoice.invoice_no if invoice else None
-                    elif ref_type == 'purchase':
-                        purchase = db.query(Purchase).filter(Purchase.id == ref_id).first()
-                        reference_number = purchase.purchase_no if purchase else None
-                    elif ref_type == 'adjustment':
-                        reference_number = f"ADJ-{ref_id}"
-                
-                if not reference_number or reference_search.lower() not in reference_number.lower():
-                    continue
-            
-            filtered_transactions.append(transaction)
-        
-        # Calculate opening stock
-        pre_fy_transactions = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product.id,
-            StockLedgerEntry.created_at < fy_start_date
-        ).all()
-        
-        opening_stock = sum(
-            adj.qty for adj in pre_fy_transactions 
-            if adj.entry_type == 'in'
-        ) - sum(
-            adj.qty for adj in pre_fy_transactions 
-            if adj.entry_type == 'out'
-        )
-        opening_stock = max(0, opening_stock)
-        
-        # Calculate opening value
-        unit_price = product.purchase_price or product.sales_price or 0
-        unit_price_float = float(unit_price) if unit_price else 0.0
-        opening_value = opening_stock * unit_price_float
-        
-        # Process filtered transactions
-        transactions = []
-        running_balance = opening_stock
-        
-        for transaction in filtered_transactions:
-            # Calculate unit price and total value
-            unit_price = product.purchase_price or product.sales_price or 0
-            unit_price_float = float(unit_price) if unit_price else 0.0
-            total_value = transaction.qty * unit_price_float
-            
-            # Determine reference information
-            ref_type = None
-            ref_id = None
-            reference_number = None
-            
-            if transaction.ref_type and transaction.ref_id:
-                ref_type = transaction.ref_type
-                ref_id = transaction.ref_id
-                if ref_type == 'invoice':
-                    invoice = db.query(Invoice).filter(Invoice.id == ref_id).first()
-                    reference_number = invoice.invoice_no if invoice else None
-                elif ref_type == 'purchase':
-                    purchase = db.query(Purchase).filter(Purchase.id == ref_id).first()
-                    reference_number = purchase.purchase_no if purchase else None
-                elif ref_type == 'adjustment':
-                    reference_number = f"ADJ-{ref_id}"
-            
-            # Update running balance
-            if transaction.entry_type == 'in':
-                running_balance += transaction.qty
-            elif transaction.entry_type == 'out':
-                running_balance -= transaction.qty
-            elif transaction.entry_type == 'adjust':
-                running_balance += transaction.qty
-            
-            transactions.append({
-                'date': transaction.created_at.strftime('%d/%m/%Y'),
-                'type': transaction.entry_type.upper(),
-                'quantity': f"{transaction.qty:.2f}",
-                'unit_price': f"₹{unit_price_float:.2f}" if unit_price_float > 0 else '-',
-                'total_value': f"₹{total_value:.2f}" if total_value > 0 else '-',
-                'running_balance': f"{running_balance:.2f}",
-                'reference': reference_number or '-'
-            })
-        
-        # Calculate summary totals from filtered transactions
-        total_incoming = sum(t.qty for t in filtered_transactions if t.entry_type == 'in') + \
-                        sum(t.qty for t in filtered_transactions if t.entry_type == 'adjust' and t.qty > 0)
-        total_incoming_value = sum(t.qty * unit_price_float for t in filtered_transactions if t.entry_type == 'in') + \
-                              sum(t.qty * unit_price_float for t in filtered_transactions if t.entry_type == 'adjust' and t.qty > 0)
-        total_outgoing = sum(t.qty for t in filtered_transactions if t.entry_type == 'out') + \
-                        sum(abs(t.qty) for t in filtered_transactions if t.entry_type == 'adjust' and t.qty < 0)
-        total_outgoing_value = sum(t.qty * unit_price_float for t in filtered_transactions if t.entry_type == 'out') + \
-                              sum(abs(t.qty) * unit_price_float for t in filtered_transactions if t.entry_type == 'adjust' and t.qty < 0)
-        closing_stock = running_balance
-        closing_value = closing_stock * unit_price_float
-        
-        # Apply stock level filter
-        if stock_level_filter and stock_level_filter != 'all':
-            if stock_level_filter == 'out_of_stock' and closing_stock > 0:
-                continue
-            elif stock_level_filter == 'in_stock' and closing_stock <= 0:
-                continue
-            elif stock_level_filter == 'low_stock' and (closing_stock <= 0 or closing_stock >= 10):
-                continue
-        
-        # Enhanced Summary Section
-        story.append(Paragraph("STOCK SUMMARY", heading_style))
-        story.append(Spacer(1, 5))
-        
-        summary_data = [
-            ['Opening Stock', f"{opening_stock:.2f}", f"₹{opening_value:.2f}"],
-            ['Total Incoming', f"{total_incoming:.2f}", f"₹{total_incoming_value:.2f}"],
-            ['Total Outgoing', f"{total_outgoing:.2f}", f"₹{total_outgoing_value:.2f}"],
-            ['Closing Stock', f"{closing_stock:.2f}", f"₹{closing_value:.2f}"]
-        ]
-        
-        summary_table = Table(summary_data, colWidths=[4*cm, 3*cm, 4*cm])
-        summary_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgrey),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        story.append(summary_table)
-        story.append(Spacer(1, 15))
-        
-        # Enhanced Transactions Section
-        if transactions:
-            story.append(Paragraph("TRANSACTION DETAILS", heading_style))
-            story.append(Spacer(1, 5))
-            
-            # Add opening balance row
-            transactions.insert(0, {
-                'date': f"{start_year}-04-01",
-                'type': 'OPENING',
-                'quantity': f"{opening_stock:.2f}",
-                'unit_price': f"₹{unit_price_float:.2f}" if unit_price_float > 0 else '-',
-                'total_value': f"₹{opening_value:.2f}" if opening_value > 0 else '-',
-                'running_balance': f"{opening_stock:.2f}",
-                'reference': '-'
-            })
-            
-            # Create table data
-            table_data = [['Date', 'Type', 'Quantity', 'Unit Price', 'Total Value', 'Running Balance', 'Reference']]
-            for t in transactions:
-                table_data.append([
-                    t['date'], t['type'], t['quantity'], t['unit_price'], 
-                    t['total_value'], t['running_balance'], t['reference']
-                ])
-            
-            # Create table with enhanced styling
-            transaction_table = Table(table_data, colWidths=[2*cm, 1.5*cm, 1.5*cm, 2*cm, 2*cm, 2*cm, 2*cm])
-            transaction_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.darkblue),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.white),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, colors.lightgrey])
-            ]))
-            story.append(transaction_table)
-        else:
-            story.append(Paragraph("No transactions found for this period.", normal_style))
-        
-        story.append(Spacer(1, 20))
-    
-    # Build PDF
-    doc.build(story)
-    pdf = buf.getvalue()
-    buf.close()
-    
     return Response(
         content=pdf, 
         media_type='application/pdf',
@@ -6947,43 +7107,41 @@ def get_product_stock_movement_history(
     if not to_year:
         to_year = datetime.now().year
     
+    # Incoming and outgoing stock for every year in one grouped query
+    from sqlalchemy import extract
+    first_start = fy_bounds(from_year)[0]
+    last_end = fy_bounds(to_year)[1]
+    month = extract('month', StockLedgerEntry.created_at)
+    year_of_entry = extract('year', StockLedgerEntry.created_at)
+    fy_year = case((month >= 4, year_of_entry), else_=year_of_entry - 1)
+    flows = {
+        int(row.fy_year): row for row in db.query(
+            fy_year.label('fy_year'),
+            func.sum(case((StockLedgerEntry.entry_type == 'in', StockLedgerEntry.qty), else_=0)).label('incoming'),
+            func.sum(case((StockLedgerEntry.entry_type == 'out', func.abs(StockLedgerEntry.qty)), else_=0)).label('outgoing')
+        ).filter(
+            StockLedgerEntry.product_id == product_id,
+            StockLedgerEntry.created_at >= first_start,
+            StockLedgerEntry.created_at < last_end
+        ).group_by(fy_year)
+    }
+    
     movements = []
     
     for year in range(from_year, to_year + 1):
         financial_year = f"{year}-{year + 1}"
-        fy_start_date = datetime(year, 4, 1)  # April 1st
-        fy_end_date = datetime(year + 1, 3, 31)  # March 31st
-        
-        # Get stock adjustments for this product in the financial year
-        stock_adjustments = db.query(StockLedgerEntry).filter(
-            StockLedgerEntry.product_id == product_id,
-            StockLedgerEntry.created_at >= fy_start_date,
-            StockLedgerEntry.created_at <= fy_end_date
-        ).all()
-        
-        # Calculate incoming and outgoing stock
-        incoming_stock = sum(
-            adj.qty for adj in stock_adjustments 
-            if adj.entry_type == 'in'
-        )
-        outgoing_stock = sum(
-            adj.qty for adj in stock_adjustments 
-            if adj.entry_type == 'out'
-        )
-        
-        # For historical years, we need to calculate opening stock differently
-        # This is a simplified calculation - in a real system, you'd need to track opening balances
-        opening_stock = 0  # Placeholder - would need historical opening balance tracking
-        closing_stock = opening_stock + incoming_stock - outgoing_stock
+        # Opening and closing stock from the year's snapshot
+        snapshot = get_snapshots(db, [product_id], year)[product_id]
+        flow = flows.get(year)
         
         movements.append(StockMovementOut(
             product_id=product.id,
             product_name=product.name,
             financial_year=financial_year,
-            opening_stock=opening_stock,
-            incoming_stock=incoming_stock,
-            outgoing_stock=outgoing_stock,
-            closing_stock=closing_stock
+            opening_stock=snapshot.opening_qty,
+            incoming_stock=float(flow.incoming or 0) if flow else 0,
+            outgoing_stock=float(flow.outgoing or 0) if flow else 0,
+            closing_stock=snapshot.closing_qty
         ))
     
     return movements
@@ -7424,6 +7582,7 @@ def get_payment_analytics(
 
 # Inventory Management API Endpoints
 @api.get('/inventory/summary')
+@cached_query(*INVENTORY_TAGS)
 def get_inventory_summary(
     _: User = Depends(get_current_user),
     db: Session = Depends(get_db)
@@ -7473,6 +7632,7 @@ def get_stock_movements(
 
 
 @api.get('/inventory/analytics')
+@cached_query(*INVENTORY_TAGS)
 def get_inventory_analytics(
     start_date: str = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str = Query(None, description="End date (YYYY-MM-DD)"),
@@ -7494,6 +7654,7 @@ def get_inventory_analytics(
 
 
 @api.get('/inventory/stock-value')
+@cached_query(*INVENTORY_TAGS)
 def get_stock_value(
     valuation_method: str = Query("fifo", description="Valuation method: fifo, lifo, average"),
     _: User = Depends(get_current_user),
@@ -7522,6 +7683,7 @@ def get_stock_aging_report(
 
 # Financial Reports API Endpoints
 @api.get('/financial-reports/profit-loss')
+@cached_query(*LEDGER_TAGS, *INVENTORY_TAGS)
 def get_profit_loss_statement(
     start_date: str = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str = Query(None, description="End date (YYYY-MM-DD)"),
@@ -7543,6 +7705,7 @@ def get_profit_loss_statement(
 
 
 @api.get('/financial-reports/balance-sheet')
+@cached_query(*LEDGER_TAGS, *INVENTORY_TAGS)
 def get_balance_sheet(
     as_of_date: str = Query(None, description="As of date (YYYY-MM-DD)"),
     _: User = Depends(get_current_user),
@@ -7560,6 +7723,7 @@ def get_balance_sheet(
 
 
 @api.get('/financial-reports/cash-flow')
+@cached_query(*LEDGER_TAGS, *INVENTORY_TAGS)
 def get_cash_flow_statement(
     start_date: str = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str = Query(None, description="End date (YYYY-MM-DD)"),
@@ -7581,6 +7745,7 @@ def get_cash_flow_statement(
 
 
 @api.get('/financial-reports/summary')
+@cached_query(*LEDGER_TAGS, *INVENTORY_TAGS)
 def get_financial_summary(
     start_date: str = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: str = Query(None, description="End date (YYYY-MM-DD)"),
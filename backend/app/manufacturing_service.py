@@ -7,6 +7,7 @@ import json
 from . import models
 from .models import User, Product
 from .db import get_db
+from .number_allocator import number_allocator
 
 logger = logging.getLogger(__name__)
 
@@ -417,40 +418,39 @@ class ManufacturingService:
         """Generate unique BOM ID"""
         prefix = "BOM"
         
-        # Get last BOM number
-        last_bom = db.query(models.BillOfMaterials).filter(
-            models.BillOfMaterials.tenant_id == tenant_id
-        ).order_by(desc(models.BillOfMaterials.id)).first()
-        
-        if last_bom:
+        def last_bom_number() -> int:
+            # Only consulted the first time this tenant's series is allocated
+            last_bom = db.query(models.BillOfMaterials).filter(
+                models.BillOfMaterials.tenant_id == tenant_id
+            ).order_by(desc(models.BillOfMaterials.id)).first()
+            if not last_bom:
+                return 0
             try:
-                last_number = int(last_bom.bom_id.split('-')[-1])
-                new_number = last_number + 1
+                return int(last_bom.bom_id.split('-')[-1])
             except (ValueError, IndexError):
-                new_number = 1
-        else:
-            new_number = 1
+                return 0
         
+        new_number = number_allocator.allocate(db, prefix, tenant_id=tenant_id, seed=last_bom_number)
         return f"{prefix}-{new_number:06d}"
     
     def _generate_production_order_id(self, db: Session, tenant_id: int) -> str:
         """Generate unique production order ID"""
         prefix = "PO"
         
-        # Get last production order number
-        last_order = db.query(models.ProductionOrder).filter(
-            models.ProductionOrder.tenant_id == tenant_id
-        ).order_by(desc(models.ProductionOrder.id)).first()
-        
-        if last_order:
+        def last_order_number() -> int:
+            # Only consulted the first time this tenant's series is allocated
+            last_order = db.query(models.ProductionOrder).filter(
+                models.ProductionOrder.tenant_id == tenant_id
+            ).order_by(desc(models.ProductionOrder.id)).first()
+            if not last_order:
+                return 0
             try:
-                last_number = int(last_order.production_order_id.split('-')[-1])
-                new_number = last_number + 1
+                return int(last_order.production_order_id.split('-')[-1])
             except (ValueError, IndexError):
-                new_number = 1
-        else:
-            new_number = 1
+                return 0
         
+        # Separate series key from purchase orders, which share the "PO" prefix
+        new_number = number_allocator.allocate(db, "PROD-ORDER", tenant_id=tenant_id, seed=last_order_number)
         return f"{prefix}-{new_number:06d}"
 
 
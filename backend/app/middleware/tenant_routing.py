@@ -5,13 +5,23 @@ Handles tenant routing, authentication, and data isolation
 
 import re
 import logging
-from typing import Optional, Dict, Any
-from fastapi import Request, HTTPException, Response, Depends
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session
-from ..db import get_db
+from typing import List, Optional
+from fastapi import Request, HTTPException
+from starlette.concurrency import run_in_threadpool
+from ..db import LegacySessionLocal
 from ..tenant_service import tenant_service
-from ..models import Tenant, TenantUser, User
+from ..tenant_cache import (
+    BY_DOMAIN,
+    BY_ID,
+    BY_SLUG,
+    LookupKey,
+    TenantSnapshot,
+    feature_enabled,
+    remember_tenant,
+    resolve_tenant,
+    tenant_has_feature
+)
+from ..models import Tenant
 from ..config import is_public_endpoint, get_required_feature
 from ..utils.error_handling import (
     create_unauthorized_response,
@@ -37,16 +47,13 @@ async def tenant_routing_middleware(request: Request, call_next):
         if is_public_endpoint(request.url.path):
             return await call_next(request)
         
-        # Get database session
-        db = next(get_db())
-        
-        # Determine tenant context
-        tenant = await get_tenant_context(request, db)
+        # Determine tenant context (cached; misses are loaded off the event loop)
+        tenant = await get_tenant_context(request)
         
         if not tenant:
             # If no tenant found and multi-tenant is disabled, create/use default tenant
             if not MULTI_TENANT_ENABLED:
-                tenant = await ensure_default_tenant(db)
+                tenant = await ensure_default_tenant()
             else:
                 return create_unauthorized_response("Tenant ID required")
         
@@ -92,12 +99,7 @@ async def tenant_feature_access_middleware(request: Request, call_next):
         required_feature = get_required_feature(request.url.path)
         if required_feature:
             # Check tenant settings for feature access
-            db = next(get_db())
-            feature_enabled = tenant_service.get_tenant_setting(
-                db, tenant.id, "features", required_feature
-            )
-            
-            if not feature_enabled or feature_enabled.lower() != "true":
+            if not await tenant_has_feature(tenant.id, required_feature):
                 return create_forbidden_response(
                     f"Feature '{required_feature}' is not available for this tenant",
                     required_feature
@@ -139,77 +141,66 @@ async def tenant_data_isolation_middleware(request: Request, call_next):
 
 
 # Helper functions for middleware
-async def get_tenant_context(request: Request, db: Session) -> Optional[Tenant]:
+async def get_tenant_context(request: Request) -> Optional[TenantSnapshot]:
     """Get tenant context from request"""
-    # Method 1: Extract from subdomain
-    tenant = await extract_tenant_from_subdomain(request, db)
-    if tenant:
-        return tenant
-    
-    # Method 2: Extract from headers
-    tenant = await extract_tenant_from_headers(request, db)
-    if tenant:
-        return tenant
-    
-    # Method 3: Extract from query parameter (for development/testing)
-    tenant = await extract_tenant_from_query(request, db)
-    if tenant:
-        return tenant
-    
-    # Method 4: Extract from path parameter (for API routes with tenant prefix)
-    tenant = await extract_tenant_from_path(request, db)
-    if tenant:
-        return tenant
-    
-    return None
+    return await resolve_tenant(get_tenant_lookup_keys(request))
+
+def get_tenant_lookup_keys(request: Request) -> List[LookupKey]:
+    """Tenant lookups implied by the request, in order of precedence"""
+    return (
+        extract_tenant_from_subdomain(request)
+        + extract_tenant_from_headers(request)
+        + extract_tenant_from_query(request)
+        + extract_tenant_from_path(request)
+    )
 
-async def extract_tenant_from_subdomain(request: Request, db: Session) -> Optional[Tenant]:
-    """Extract tenant from subdomain"""
+def extract_tenant_from_subdomain(request: Request) -> List[LookupKey]:
+    """Extract tenant from subdomain, or from the whole host as a custom domain"""
     subdomain_pattern = re.compile(r'^([^.]+)\.')
-    host = request.headers.get("host", "")
+    host = request.headers.get("host", "").split(":")[0].lower()
+    keys: List[LookupKey] = []
     
     if "." in host:
         subdomain_match = subdomain_pattern.match(host)
         if subdomain_match:
             tenant_slug = subdomain_match.group(1)
             if tenant_slug not in ["www", "api", "localhost", "127", "0"]:
-                return tenant_service.get_tenant_by_slug(db, tenant_slug)
+                keys.append((BY_SLUG, tenant_slug))
+                keys.append((BY_DOMAIN, host))
     
-    return None
+    return keys
 
-async def extract_tenant_from_headers(request: Request, db: Session) -> Optional[Tenant]:
+def extract_tenant_from_headers(request: Request) -> List[LookupKey]:
     """Extract tenant from headers"""
+    keys: List[LookupKey] = []
+    
     # Check X-Tenant-ID header
     tenant_id = request.headers.get("X-Tenant-ID")
-    if tenant_id:
-        try:
-            return db.query(Tenant).filter(Tenant.id == int(tenant_id)).first()
-        except (ValueError, TypeError):
-            pass
+    if tenant_id and tenant_id.strip().isdigit():
+        keys.append((BY_ID, tenant_id.strip()))
     
     # Check X-Tenant-Slug header
     tenant_slug = request.headers.get("X-Tenant-Slug")
     if tenant_slug:
-        return tenant_service.get_tenant_by_slug(db, tenant_slug)
+        keys.append((BY_SLUG, tenant_slug))
     
-    return None
+    return keys
 
-async def extract_tenant_from_query(request: Request, db: Session) -> Optional[Tenant]:
+def extract_tenant_from_query(request: Request) -> List[LookupKey]:
     """Extract tenant from query parameters"""
+    keys: List[LookupKey] = []
+    
     tenant_id = request.query_params.get("tenant_id")
-    if tenant_id:
-        try:
-            return db.query(Tenant).filter(Tenant.id == int(tenant_id)).first()
-        except (ValueError, TypeError):
-            pass
+    if tenant_id and tenant_id.strip().isdigit():
+        keys.append((BY_ID, tenant_id.strip()))
     
     tenant_slug = request.query_params.get("tenant_slug")
     if tenant_slug:
-        return tenant_service.get_tenant_by_slug(db, tenant_slug)
+        keys.append((BY_SLUG, tenant_slug))
     
-    return None
+    return keys
 
-async def extract_tenant_from_path(request: Request, db: Session) -> Optional[Tenant]:
+def extract_tenant_from_path(request: Request) -> List[LookupKey]:
     """Extract tenant from path parameters (only for explicit tenant routes)"""
     path_parts = request.url.path.split('/')
     
@@ -217,36 +208,46 @@ async def extract_tenant_from_path(request: Request, db: Session) -> Optional[Te
     if len(path_parts) > 3 and path_parts[1] == 'api' and path_parts[2] == 'tenant':
         tenant_slug = path_parts[3]
         if re.match(r'^[a-z0-9-]+$', tenant_slug):
-            return tenant_service.get_tenant_by_slug(db, tenant_slug)
+            return [(BY_SLUG, tenant_slug)]
     
-    return None
+    return []
 
-async def ensure_default_tenant(db: Session) -> Tenant:
+def _ensure_default_tenant() -> TenantSnapshot:
+    db = LegacySessionLocal()
+    try:
+        # Try to find existing default tenant
+        default_tenant = tenant_service.get_tenant_by_slug(db, DEFAULT_TENANT_SLUG)
+        
+        if not default_tenant:
+            # Create default tenant if it doesn't exist
+            logger.info(f"Creating default tenant with slug: {DEFAULT_TENANT_SLUG}")
+            default_tenant = Tenant(
+                name="Default Organization",
+                slug=DEFAULT_TENANT_SLUG,
+                is_active=True,
+                is_trial=False,
+                trial_end_date=None
+            )
+            db.add(default_tenant)
+            db.commit()
+            db.refresh(default_tenant)
+            logger.info(f"Created default tenant with ID: {default_tenant.id}")
+        
+        return remember_tenant(default_tenant)
+    finally:
+        db.close()
+
+async def ensure_default_tenant() -> TenantSnapshot:
     """Ensure default tenant exists and return it"""
-    # Try to find existing default tenant
-    default_tenant = tenant_service.get_tenant_by_slug(db, DEFAULT_TENANT_SLUG)
-    
-    if not default_tenant:
-        # Create default tenant if it doesn't exist
-        logger.info(f"Creating default tenant with slug: {DEFAULT_TENANT_SLUG}")
-        default_tenant = Tenant(
-            name="Default Organization",
-            slug=DEFAULT_TENANT_SLUG,
-            is_active=True,
-            is_trial=False,
-            trial_end_date=None
-        )
-        db.add(default_tenant)
-        db.commit()
-        db.refresh(default_tenant)
-        logger.info(f"Created default tenant with ID: {default_tenant.id}")
-    
-    return default_tenant
+    cached = await resolve_tenant([(BY_SLUG, DEFAULT_TENANT_SLUG)])
+    if cached:
+        return cached
+    return await run_in_threadpool(_ensure_default_tenant)
 
 
 # Dependency functions for use in FastAPI routes
-def get_current_tenant(request: Request) -> Tenant:
-    """Get current tenant from request state"""
+def get_current_tenant(request: Request) -> TenantSnapshot:
+    """Get current tenant (a read-only snapshot) from request state"""
     tenant = getattr(request.state, 'tenant', None)
     if not tenant:
         raise HTTPException(status_code=400, detail="Tenant context not found")
@@ -261,13 +262,10 @@ def get_current_tenant_id(request: Request) -> int:
 
 def require_tenant_feature(feature: str):
     """Dependency to require specific tenant feature"""
-    def dependency(request: Request, db: Session = Depends(get_db)):
+    def dependency(request: Request):
         tenant = get_current_tenant(request)
-        feature_enabled = tenant_service.get_tenant_setting(
-            db, tenant.id, "features", feature
-        )
         
-        if not feature_enabled or feature_enabled.lower() != "true":
+        if not feature_enabled(tenant.id, feature):
             raise HTTPException(
                 status_code=403,
                 detail=f"Feature '{feature}' is not available for this tenant"
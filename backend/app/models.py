@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Numeric, Text, Date
+from sqlalchemy import Column, Integer, String, Boolean, Float, ForeignKey, DateTime, Numeric, Text, Date, Index, UniqueConstraint, text
 from sqlalchemy.orm import relationship, Mapped, mapped_column
 from datetime import datetime, date
 from .db import Base
@@ -22,6 +22,20 @@ class User(Base):
     tenant: Mapped[Tenant | None] = relationship("Tenant")
 
 
+class RefreshToken(Base):
+    """Issued refresh token, by its jti; single use, revoked on rotation, logout or password change"""
+    __tablename__ = "refresh_tokens"
+    __table_args__ = (
+        Index("ix_refresh_tokens_user_id", "user_id"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    jti: Mapped[str] = mapped_column(String(64), unique=True, nullable=False)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    expires_at: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    revoked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class CompanySettings(Base):
     __tablename__ = "company_settings"
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
@@ -107,6 +121,9 @@ class Product(Base):
 
 class StockLedgerEntry(Base):
     __tablename__ = "stock_ledger"
+    __table_args__ = (
+        Index("ix_stock_ledger_product_created_at", "product_id", "created_at"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
     product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), nullable=False)
@@ -118,13 +135,56 @@ class StockLedgerEntry(Base):
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
 
 
+class StockSnapshot(Base):
+    """Opening and closing stock of a product for one financial year (April to March)
+
+    Maintained by app.stock_snapshots as ledger rows are written.
+    """
+    __tablename__ = "stock_snapshots"
+    __table_args__ = (UniqueConstraint('product_id', 'fy_start_year', name='uq_stock_snapshot_product_fy'),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), nullable=False)
+    fy_start_year: Mapped[int] = mapped_column(Integer, nullable=False)  # 2024 for FY 2024-2025
+    opening_qty: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    opening_value: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    closing_qty: Mapped[float] = mapped_column(Float, nullable=False, default=0)
+    closing_value: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class StockAlert(Base):
+    """Active product at or below its reorder level
+
+    Maintained by app.stock_alerts as stock changes, so alert lists are a
+    single read instead of a scan of products and the ledger.
+    """
+    __tablename__ = "stock_alerts"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    product_id: Mapped[int] = mapped_column(ForeignKey("products.id"), unique=True, nullable=False)
+    current_stock: Mapped[int] = mapped_column(Integer, nullable=False)
+    reorder_level: Mapped[int] = mapped_column(Integer, nullable=False)
+    urgency: Mapped[str] = mapped_column(String(10), nullable=False)  # critical|high|medium
+    last_purchase_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+
+
 class Invoice(Base):
     __tablename__ = "invoices"
+    __table_args__ = (
+        # Keyset pagination on (sort column, id)
+        Index("ix_invoices_date_id", "date", "id"),
+        Index("ix_invoices_invoice_no_id", "invoice_no", "id"),
+        Index("ix_invoices_due_date_id", "due_date", "id"),
+        Index("ix_invoices_grand_total_id", "grand_total", "id"),
+        Index("ix_invoices_status_id", "status", "id"),
+        # Numbers are unique per tenant; documents without a tenant share scope 0
+        Index("uq_invoices_tenant_invoice_no", text("coalesce(tenant_id, 0)"), "invoice_no", unique=True),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
     customer_id: Mapped[int] = mapped_column(ForeignKey("parties.id"), nullable=False)
     supplier_id: Mapped[int] = mapped_column(ForeignKey("parties.id"), nullable=False)  # New field for supplier
-    invoice_no: Mapped[str] = mapped_column(String(16), unique=True, nullable=False)  # max length 16 as per GST law
+    invoice_no: Mapped[str] = mapped_column(String(16), nullable=False)  # max length 16 as per GST law
     date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     due_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     terms: Mapped[str] = mapped_column(String(20), nullable=False, default="Due on Receipt")
@@ -196,6 +256,9 @@ class InvoiceItem(Base):
 
 class Payment(Base):
     __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_payment_date_id", "payment_date", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
     invoice_id: Mapped[int | None] = mapped_column(ForeignKey("invoices.id"), nullable=True)
@@ -209,10 +272,14 @@ class Payment(Base):
 
 class Purchase(Base):
     __tablename__ = "purchases"
+    __table_args__ = (
+        Index("ix_purchases_date_id", "date", "id"),
+        Index("uq_purchases_tenant_purchase_no", text("coalesce(tenant_id, 0)"), "purchase_no", unique=True),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
     vendor_id: Mapped[int] = mapped_column(ForeignKey("parties.id"), nullable=False)
-    purchase_no: Mapped[str] = mapped_column(String(16), unique=True, nullable=False)  # max length 16 as per GST law
+    purchase_no: Mapped[str] = mapped_column(String(16), nullable=False)  # max length 16 as per GST law
     reference_bill_number: Mapped[str | None] = mapped_column(String(50), nullable=True)  # Vendor's bill/invoice number
     date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     due_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
@@ -272,6 +339,9 @@ class PurchaseItem(Base):
 
 class PurchasePayment(Base):
     __tablename__ = "purchase_payments"
+    __table_args__ = (
+        Index("ix_purchase_payments_payment_date_id", "payment_date", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
     purchase_id: Mapped[int] = mapped_column(ForeignKey("purchases.id"), nullable=False)
@@ -286,8 +356,43 @@ class PurchasePayment(Base):
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
 
 
+class DailyRollup(Base):
+    """Per-tenant, per-day totals of payments, expenses, invoices and purchases
+
+    Maintained by app.daily_rollups as those documents are written, so
+    dashboards sum a few rows per day instead of the fact tables.
+    Documents are bucketed by their own date (payment, expense, invoice or
+    purchase date); receivables and payables are the current balances of the
+    invoices and purchases dated that day.
+    """
+    __tablename__ = "daily_rollups"
+    __table_args__ = (UniqueConstraint('tenant_id', 'day', name='uq_daily_rollup_tenant_day'),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # 0 for documents without a tenant
+    day: Mapped[date] = mapped_column(Date, nullable=False)
+    income: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)  # invoice payments received
+    income_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    purchase_payments: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    purchase_payment_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    expenses: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    expense_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    invoiced: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    paid_invoiced: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)  # Paid / Partially Paid invoices
+    tax_collected: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    receivables: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    invoice_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    purchased: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    paid_purchased: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)  # Paid / Partially Paid purchases
+    tax_paid: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    payables: Mapped[Numeric] = mapped_column(Numeric(14, 2), nullable=False, default=0)
+    purchase_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
 class Expense(Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_expense_date_id", "expense_date", "id"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
     expense_date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
@@ -312,8 +417,59 @@ class Expense(Base):
 # CashflowTransaction model removed - using source tables directly via CashflowService
 
 
+class NumberSequence(Base):
+    """Per-tenant, per-series counter backing document number allocation"""
+    __tablename__ = "number_sequences"
+    __table_args__ = (UniqueConstraint('tenant_scope', 'series_key', name='uq_number_sequence_series'),)
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_scope: Mapped[int] = mapped_column(Integer, nullable=False, default=0)  # tenant id, 0 for single-tenant
+    series_key: Mapped[str] = mapped_column(String(64), nullable=False)  # e.g. FY2025/INV, PO, BOM
+    next_value: Mapped[int] = mapped_column(Integer, nullable=False, default=1)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
+class CacheGeneration(Base):
+    """Per-tag write counter shared by all workers; bumped by every commit that changes a cached table"""
+    __tablename__ = "cache_generations"
+    tag: Mapped[str] = mapped_column(String(50), primary_key=True)
+    generation: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+
+class EmailOutbox(Base):
+    """Queued outgoing email, delivered by the background outbox sender"""
+    __tablename__ = "email_outbox"
+    __table_args__ = (
+        # Sender polls for due messages
+        Index("ix_email_outbox_status_next_attempt", "status", "next_attempt_at"),
+        Index("ix_email_outbox_document", "document_type", "document_id"),
+    )
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
+    tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
+    document_type: Mapped[str | None] = mapped_column(String(20), nullable=True)  # invoice, purchase
+    document_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    to_email: Mapped[str] = mapped_column(String(255), nullable=False)
+    subject: Mapped[str] = mapped_column(String(255), nullable=False)
+    body: Mapped[str] = mapped_column(Text, nullable=False)  # HTML
+    attachment_filename: Mapped[str | None] = mapped_column(String(255), nullable=True)  # PDF rendered at send time
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default="queued")  # queued, sending, sent, failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    locked_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    sent_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+
 class AuditTrail(Base):
     __tablename__ = "audit_trail"
+    __table_args__ = (
+        # Audit listing/export filters, each newest first
+        Index("ix_audit_trail_created_at_id", "created_at", "id"),
+        Index("ix_audit_trail_table_created_at", "table_name", "created_at"),
+        Index("ix_audit_trail_user_created_at", "user_id", "created_at"),
+        Index("ix_audit_trail_action_created_at", "action", "created_at"),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
@@ -392,10 +548,13 @@ class RecurringInvoice(Base):
 
 class PurchaseOrder(Base):
     __tablename__ = "purchase_orders"
+    __table_args__ = (
+        Index("uq_purchase_orders_tenant_po_number", text("coalesce(tenant_id, 0)"), "po_number", unique=True),
+    )
     id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=True)
     tenant_id: Mapped[int | None] = mapped_column(ForeignKey("tenants.id"), nullable=True)
     vendor_id: Mapped[int] = mapped_column(ForeignKey("parties.id"), nullable=False)
-    po_number: Mapped[str] = mapped_column(String(16), unique=True, nullable=False)
+    po_number: Mapped[str] = mapped_column(String(16), nullable=False)
     date: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, nullable=False)
     expected_delivery_date: Mapped[datetime] = mapped_column(DateTime, nullable=False)
     
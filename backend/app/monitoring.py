@@ -5,16 +5,20 @@ Provides metrics collection, health checks, and observability features
 
 import time
 import logging
+from contextvars import ContextVar
 from datetime import datetime
-from typing import Dict, Any, Optional
-from sqlalchemy import text
+from typing import Callable, Dict, Any, List, Optional
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
 from prometheus_client import (
     Counter, Histogram, Gauge, Summary, 
     generate_latest, CONTENT_TYPE_LATEST,
     CollectorRegistry, multiprocess
 )
-from fastapi import Request, Response
+from fastapi import Response
 from fastapi.responses import PlainTextResponse
+from starlette.routing import Mount
 import psutil
 import os
 
@@ -133,9 +137,114 @@ cache_hit_ratio = Gauge(
     registry=registry
 )
 
+http_request_db_duration_seconds = Histogram(
+    'http_request_db_duration_seconds',
+    'Time spent in database queries per HTTP request',
+    ['method', 'endpoint'],
+    buckets=(.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10),
+    registry=registry
+)
+
+http_request_db_queries = Histogram(
+    'http_request_db_queries',
+    'Database queries executed per HTTP request',
+    ['method', 'endpoint'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 250, 1000),
+    registry=registry
+)
+
+db_pool_checkout_seconds = Histogram(
+    'db_pool_checkout_seconds',
+    'Time spent waiting for a connection from the database pool',
+    buckets=(.0005, .001, .005, .01, .05, .1, .5, 1, 5, 30),
+    registry=registry
+)
+
+pdf_render_duration_seconds = Histogram(
+    'pdf_render_duration_seconds',
+    'Time to render a PDF, including time queued for a render worker',
+    buckets=(.1, .25, .5, 1, 2.5, 5, 10, 30, 60),
+    registry=registry
+)
+
+email_outbox_queue_depth = Gauge(
+    'email_outbox_queue_depth',
+    'Emails in the outbox by status',
+    ['status'],
+    registry=registry
+)
+
+# Label for requests that matched no route, so unknown paths share one series
+UNMATCHED_ENDPOINT = '<unmatched>'
+KNOWN_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'})
+
+
+class _RequestDBStats:
+    """Database time and query count of the request being handled"""
+    __slots__ = ('seconds', 'queries')
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.queries = 0
+
+
+# Set by MonitoringMiddleware; copied into threadpool workers with the request context
+_request_db_stats: ContextVar[Optional[_RequestDBStats]] = ContextVar('request_db_stats', default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    if _request_db_stats.get() is not None:
+        conn.info.setdefault('query_start_time', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    stats = _request_db_stats.get()
+    if stats is not None:
+        started = conn.info.get('query_start_time')
+        if started:
+            stats.seconds += time.perf_counter() - started.pop()
+            stats.queries += 1
+
+
+class MeteredQueuePool(QueuePool):
+    """QueuePool that records how long each checkout took, including waits for a free connection"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        finally:
+            db_pool_checkout_seconds.observe(time.perf_counter() - start)
+
+
+def endpoint_label(scope) -> str:
+    """Route template that handled the request, e.g. ``/api/invoices/{invoice_id}``"""
+    route = scope.get("route")
+    if route is None:
+        return UNMATCHED_ENDPOINT
+    template = getattr(route, "path", None) or ""
+    if isinstance(route, Mount):
+        return template + "/{path}"
+    if ":path}" in template:
+        return template
+    # Routes of an included router may report their template without the
+    # router's prefix; the prefix is static, so take it from the request path
+    depth = template.count("/")
+    segments = scope["path"].split("/")
+    prefix = "/".join(segments[:len(segments) - depth]) if len(segments) > depth else ""
+    return (prefix + template) or "/"
+
 
 class MonitoringMiddleware:
-    """Middleware for collecting HTTP metrics"""
+    """ASGI middleware collecting HTTP metrics
+
+    Requests are labelled by the template of the route that handled them (e.g.
+    ``/api/invoices/{invoice_id}``), never the raw path, so the number of series
+    stays bounded. Status and response size are taken from the messages sent
+    downstream, and the database time of each request from SQLAlchemy events.
+    """
     
     def __init__(self, app):
         self.app = app
@@ -145,41 +254,48 @@ class MonitoringMiddleware:
             await self.app(scope, receive, send)
             return
         
-        start_time = time.time()
-        request = Request(scope, receive)
-        
-        # Get request size
-        request_size = 0
-        if hasattr(request, 'body'):
-            request_size = len(request.body) if request.body else 0
-        
-        # Process request
-        response = await self.app(scope, receive, send)
+        start_time = time.perf_counter()
+        db_stats = _RequestDBStats()
+        token = _request_db_stats.set(db_stats)
+        status = 500
+        response_size = 0
         
-        # Calculate duration
-        duration = time.time() - start_time
+        async def send_with_metrics(message):
+            nonlocal status, response_size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                response_size += len(message.get("body", b""))
+            await send(message)
         
-        # Get response size
-        response_size = 0
-        if hasattr(response, 'body'):
-            response_size = len(response.body) if response.body else 0
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        finally:
+            _request_db_stats.reset(token)
+            self._record(scope, status, response_size, time.perf_counter() - start_time, db_stats)
+    
+    @staticmethod
+    def _record(scope, status: int, response_size: int, duration: float, db_stats: _RequestDBStats):
+        endpoint = endpoint_label(scope)
+        method = scope["method"] if scope["method"] in KNOWN_METHODS else "OTHER"
         
-        # Record metrics
-        method = request.method
-        endpoint = request.url.path
-        status = response.status_code if hasattr(response, 'status_code') else 200
+        request_size = 0
+        for name, value in scope.get("headers", ()):
+            if name == b"content-length":
+                request_size = int(value) if value.isdigit() else 0
+                break
         
         http_requests_total.labels(method=method, endpoint=endpoint, status=status).inc()
         http_request_duration_seconds.labels(method=method, endpoint=endpoint).observe(duration)
         http_request_size_bytes.labels(method=method, endpoint=endpoint).observe(request_size)
         http_response_size_bytes.labels(method=method, endpoint=endpoint).observe(response_size)
+        http_request_db_duration_seconds.labels(method=method, endpoint=endpoint).observe(db_stats.seconds)
+        http_request_db_queries.labels(method=method, endpoint=endpoint).observe(db_stats.queries)
         
         # Record errors
         if status >= 400:
             error_type = 'client_error' if status < 500 else 'server_error'
             api_errors_total.labels(error_type=error_type, endpoint=endpoint).inc()
-        
-        return response
 
 
 class SystemMonitor:
@@ -291,8 +407,23 @@ class HealthChecker:
         }
 
 
+# Called before each scrape to refresh gauges that are read on demand
+_metrics_refreshers: List[Callable[[], None]] = []
+
+
+def register_metrics_refresher(refresher: Callable[[], None]) -> Callable[[], None]:
+    """Run ``refresher`` before metrics are exported; usable as a decorator"""
+    _metrics_refreshers.append(refresher)
+    return refresher
+
+
 def get_metrics_response() -> Response:
     """Get Prometheus metrics response"""
+    for refresher in _metrics_refreshers:
+        try:
+            refresher()
+        except Exception as e:
+            logger.error(f"Error refreshing metrics with {refresher.__name__}: {e}")
     return PlainTextResponse(
         generate_latest(registry),
         media_type=CONTENT_TYPE_LATEST
@@ -328,6 +459,10 @@ def update_cache_hit_ratio(ratio: float):
     """Update cache hit ratio"""
     cache_hit_ratio.set(ratio)
 
+def record_pdf_render_duration(duration: float):
+    """Record PDF render time"""
+    pdf_render_duration_seconds.observe(duration)
+
 def update_database_connections(count: int):
     """Update database connections count"""
     database_connections.set(count)
@@ -0,0 +1,170 @@
+"""
+Document number allocation
+Hands out invoice, purchase, PO and manufacturing sequence numbers from the
+number_sequences table with a single atomic UPDATE ... RETURNING per allocation,
+optionally reserving a block of numbers per worker process.
+"""
+
+import logging
+import threading
+from datetime import datetime
+from typing import Callable, Dict, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from .config import settings
+from .models import NumberSequence
+
+logger = logging.getLogger(__name__)
+
+SeriesKey = Tuple[int, str]
+
+
+def financial_year_prefix(on_date=None) -> str:
+    """Return the FY<year> prefix for the Indian financial year (April to March)"""
+    current_date = on_date or datetime.now()
+    fy_year = current_date.year if current_date.month >= 4 else current_date.year - 1
+    return f"FY{fy_year}"
+
+
+def same_tenant_scope(tenant_column, tenant_id: Optional[int]):
+    """Filter on documents sharing ``tenant_id``'s numbering scope
+
+    Document numbers are unique per ``coalesce(tenant_id, 0)``, the same scope
+    the allocator keys its series on, so documents without a tenant share one.
+    """
+    return func.coalesce(tenant_column, 0) == (tenant_id or 0)
+
+
+class NumberAllocator:
+    """Atomic per-series number allocator with optional block pre-allocation
+
+    Numbers are reserved in their own short transaction so the sequence row is
+    never locked for the lifetime of the caller's transaction. A number whose
+    document later fails to commit is not reused, like a database sequence.
+
+    SQLite allows a single writer, so there the reservation runs inside the
+    caller's transaction instead (a second connection would wait on the
+    caller's own write lock) and block pre-allocation is disabled.
+    """
+
+    def __init__(self, block_size: Optional[int] = None):
+        self._block_size = block_size
+        self._blocks: Dict[SeriesKey, list] = {}
+        self._locks: Dict[SeriesKey, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    @property
+    def block_size(self) -> int:
+        return max(1, self._block_size or settings.number_block_size)
+
+    def _lock_for(self, key: SeriesKey) -> threading.Lock:
+        lock = self._locks.get(key)
+        if lock is None:
+            with self._locks_guard:
+                lock = self._locks.setdefault(key, threading.Lock())
+        return lock
+
+    def allocate(
+        self,
+        db: Session,
+        series: str,
+        tenant_id: Optional[int] = None,
+        seed: Optional[Callable[[], int]] = None,
+    ) -> int:
+        """Return the next number in ``series``
+
+        ``seed`` returns the last number already used by existing documents and
+        is only called the first time a series is seen, so legacy data keeps
+        its numbering.
+        """
+        key = (tenant_id or 0, series)
+        if self._uses_caller_transaction(db):
+            return self._reserve(db, key, 1, seed, commit=False)
+
+        with self._lock_for(key):
+            block = self._blocks.get(key)
+            if block and block[0] < block[1]:
+                value = block[0]
+                block[0] += 1
+                return value
+
+            size = self.block_size
+            with Session(bind=db.get_bind()) as session:
+                start = self._reserve(session, key, size, seed, commit=True)
+            self._blocks[key] = [start + 1, start + size]
+            return start
+
+    def peek(
+        self,
+        db: Session,
+        series: str,
+        tenant_id: Optional[int] = None,
+        seed: Optional[Callable[[], int]] = None,
+    ) -> int:
+        """Return the number the next ``allocate`` call would hand out, without consuming it"""
+        key = (tenant_id or 0, series)
+        block = self._blocks.get(key)
+        if block and block[0] < block[1]:
+            return block[0]
+        next_value = db.execute(
+            select(NumberSequence.next_value).where(
+                NumberSequence.tenant_scope == key[0],
+                NumberSequence.series_key == key[1],
+            )
+        ).scalar()
+        if next_value is not None:
+            return next_value
+        return (seed() if seed else 0) + 1
+
+    def reset(self) -> None:
+        """Drop locally reserved blocks (unused numbers in them are skipped)"""
+        self._blocks.clear()
+
+    @staticmethod
+    def _uses_caller_transaction(db: Session) -> bool:
+        return db.get_bind().dialect.name == "sqlite"
+
+    def _reserve(
+        self,
+        session: Session,
+        key: SeriesKey,
+        count: int,
+        seed: Optional[Callable[[], int]],
+        commit: bool,
+    ) -> int:
+        """Advance the series by ``count`` and return the first reserved number"""
+        tenant_scope, series = key
+        stmt = (
+            update(NumberSequence)
+            .where(NumberSequence.tenant_scope == tenant_scope, NumberSequence.series_key == series)
+            .values(next_value=NumberSequence.next_value + count)
+            .returning(NumberSequence.next_value)
+            .execution_options(synchronize_session=False)
+        )
+        for _ in range(3):
+            new_next = session.execute(stmt).scalar()
+            if new_next is not None:
+                if commit:
+                    session.commit()
+                return new_next - count
+
+            # First use of this series: start after the highest existing number
+            start = (seed() if seed else 0) + 1
+            session.add(NumberSequence(tenant_scope=tenant_scope, series_key=series, next_value=start + count))
+            if not commit:
+                session.flush()
+                return start
+            try:
+                session.commit()
+                return start
+            except IntegrityError:
+                # Another worker created the row first; retry the UPDATE
+                session.rollback()
+        raise RuntimeError(f"Could not allocate a number for series {series!r}")
+
+
+# Global instance
+number_allocator = NumberAllocator()
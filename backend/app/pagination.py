@@ -0,0 +1,118 @@
+"""
+Keyset (cursor) pagination helpers
+Encodes opaque cursors from the last row of a page and turns them back into
+sargable ``(sort_column, id)`` predicates so deep pages cost the same as the first
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Optional
+
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _dump_value(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def _load_value(column, value: Any) -> Any:
+    if value is None:
+        return None
+    try:
+        python_type = column.type.python_type
+    except (AttributeError, NotImplementedError):
+        return value
+    if python_type is datetime:
+        return datetime.fromisoformat(value)
+    if python_type is date:
+        return date.fromisoformat(value)
+    if python_type is Decimal:
+        return Decimal(value)
+    return python_type(value)
+
+
+def encode_cursor(sort_field: str, direction: str, value: Any, row_id: int) -> str:
+    """Build an opaque cursor pointing just past the given row"""
+    payload = {"f": sort_field, "d": direction, "v": _dump_value(value), "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort_field: str, direction: str) -> dict:
+    """Decode a cursor, rejecting it if it was issued for a different ordering"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["f"] != sort_field or payload["d"] != direction:
+            raise ValueError("cursor ordering mismatch")
+        int(payload["id"])
+    except (ValueError, KeyError, TypeError):
+        raise HTTPException(status_code=422, detail="Invalid cursor")
+    return payload
+
+
+def clamp_page_size(limit: Optional[int]) -> int:
+    if limit is None or limit < 1:
+        return DEFAULT_PAGE_SIZE
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def apply_keyset(query, sort_column, id_column, sort_field: str, direction: str, cursor: Optional[str]):
+    """Order ``query`` by ``(sort_column, id_column)`` and seek past ``cursor``
+
+    ``sort_column`` may be the id column itself when the list has no natural
+    sort key. The caller applies ``limit`` and reads one extra row to decide
+    whether another page exists.
+    """
+    descending = direction.lower() != "asc"
+    direction = "desc" if descending else "asc"
+    same_key = sort_column is id_column
+
+    if cursor:
+        payload = decode_cursor(cursor, sort_field, direction)
+        last_id = int(payload["id"])
+        if same_key:
+            query = query.filter(id_column < last_id if descending else id_column > last_id)
+        else:
+            last_value = _load_value(sort_column, payload["v"])
+            if descending:
+                query = query.filter(or_(
+                    sort_column < last_value,
+                    and_(sort_column == last_value, id_column < last_id),
+                ))
+            else:
+                query = query.filter(or_(
+                    sort_column > last_value,
+                    and_(sort_column == last_value, id_column > last_id),
+                ))
+
+    if same_key:
+        return query.order_by(id_column.desc() if descending else id_column.asc())
+    if descending:
+        return query.order_by(sort_column.desc(), id_column.desc())
+    return query.order_by(sort_column.asc(), id_column.asc())
+
+
+def fetch_page(query, limit: int, sort_field: str, direction: str, sort_key, id_key):
+    """Run a keyset-ordered query and return ``(rows, next_cursor)``
+
+    ``sort_key`` and ``id_key`` pull the cursor values out of a result row.
+    """
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    last = rows[-1]
+    direction = "asc" if direction.lower() == "asc" else "desc"
+    return rows, encode_cursor(sort_field, direction, sort_key(last), id_key(last))
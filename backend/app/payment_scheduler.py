@@ -9,7 +9,8 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_, func
 from enum import Enum
 
-from .models import Payment, PurchasePayment, Invoice, Purchase, Party
+from .models import Invoice, Purchase, Party
+from .daily_rollups import rollup_totals
 
 
 class PaymentStatus(str, Enum):
@@ -313,29 +314,8 @@ class PaymentScheduler:
         if not end_date:
             end_date = date.today()
         
-        # Payment collection analytics
-        invoice_payments = self.db.query(
-            func.sum(Payment.payment_amount).label('total_collected'),
-            func.count(Payment.id).label('payment_count'),
-            func.avg(Payment.payment_amount).label('avg_payment')
-        ).filter(
-            and_(
-                Payment.payment_date >= start_date,
-                Payment.payment_date <= end_date
-            )
-        ).first()
-        
-        # Payment made analytics
-        purchase_payments = self.db.query(
-            func.sum(PurchasePayment.payment_amount).label('total_paid'),
-            func.count(PurchasePayment.id).label('payment_count'),
-            func.avg(PurchasePayment.payment_amount).label('avg_payment')
-        ).filter(
-            and_(
-                PurchasePayment.payment_date >= start_date,
-                PurchasePayment.payment_date <= end_date
-            )
-        ).first()
+        # Payment collection and payment made analytics from the daily rollups
+        totals = rollup_totals(self.db, start_date, end_date)
         
         # Overdue amounts
         overdue_invoices = self.db.query(
@@ -362,14 +342,14 @@ class PaymentScheduler:
                 "end_date": end_date.isoformat()
             },
             "collections": {
-                "total_collected": float(invoice_payments.total_collected or 0),
-                "payment_count": invoice_payments.payment_count or 0,
-                "avg_payment": float(invoice_payments.avg_payment or 0)
+                "total_collected": float(totals["income"]),
+                "payment_count": totals["income_count"],
+                "avg_payment": float(totals["income"] / totals["income_count"]) if totals["income_count"] else 0
             },
             "payments": {
-                "total_paid": float(purchase_payments.total_paid or 0),
-                "payment_count": purchase_payments.payment_count or 0,
-                "avg_payment": float(purchase_payments.avg_payment or 0)
+                "total_paid": float(totals["purchase_payments"]),
+                "payment_count": totals["purchase_payment_count"],
+                "avg_payment": float(totals["purchase_payments"] / totals["purchase_payment_count"]) if totals["purchase_payment_count"] else 0
             },
             "overdue": {
                 "total_overdue_receivables": float(overdue_invoices.total_overdue or 0),
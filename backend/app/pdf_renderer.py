@@ -0,0 +1,356 @@
+"""
+Invoice PDF rendering
+Runs HTML-to-PDF conversion in a bounded process pool so WeasyPrint never holds
+an API worker, and keeps recently rendered PDFs in an LRU cache bounded by both
+entry count and total size. Also packs batches of rendered PDFs into a streamed
+ZIP or a single merged PDF.
+
+Cached PDFs are keyed on everything they show: the invoice's and template's
+updated_at, and a shared generation that commits changing parties, company
+settings, templates or product names bump.
+"""
+
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from typing import Any, Hashable, Iterable, Iterator, Optional, Tuple, Union
+
+from sqlalchemy import event, inspect as sa_inspect
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .config import settings
+from .db import updated_columns
+from .html_to_pdf import convert_html_to_pdf
+from .models import CompanySettings, GSTInvoiceTemplate, Party, Product
+from .monitoring import record_pdf_render_duration
+from .services.query_optimizer import bump_shared_generations, shared_generations
+
+try:
+    from pypdf import PdfReader, PdfWriter
+    PYPDF_AVAILABLE = True
+except ImportError:
+    PYPDF_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+# Merged exports spill to disk past this size
+MERGED_PDF_SPOOL_BYTES = 16 * 1024 * 1024
+
+# cache_generations row bumped when data an invoice PDF shows, other than the
+# invoice and template themselves, changes
+PDF_INPUTS_TAG = "invoice_pdf_inputs"
+_PDF_INPUT_MODELS = (Party, CompanySettings, GSTInvoiceTemplate)
+# Product columns invoice items fall back to; stock updates leave PDFs alone
+_PRODUCT_PDF_COLUMNS = frozenset(("name", "hsn", "unit"))
+
+_PENDING_KEY = "invoice_pdf_inputs_pending"
+
+
+class PDFRenderQueueFull(RuntimeError):
+    """Raised when every render slot is busy and the queue is full"""
+
+
+def invoice_pdf_inputs_stamp(db: Session, logo_path: Optional[str] = None) -> tuple:
+    """Version of the parties, company settings, products and logo invoice PDFs show"""
+    logo_mtime = os.path.getmtime(logo_path) if logo_path and os.path.exists(logo_path) else None
+    return shared_generations(db, (PDF_INPUTS_TAG,)), logo_mtime
+
+
+def invoice_pdf_cache_key(invoice, template, paper_size: str, inputs_stamp: tuple) -> tuple:
+    """Cache key for a rendered invoice
+
+    Edits to the invoice or template bump their updated_at; ``inputs_stamp``
+    (from ``invoice_pdf_inputs_stamp``) covers everything else.
+    """
+    return (invoice.id, invoice.updated_at, template.id, template.updated_at, paper_size, inputs_stamp)
+
+
+def _is_pdf_input_change(session: Session, obj) -> bool:
+    if isinstance(obj, _PDF_INPUT_MODELS):
+        return True
+    if isinstance(obj, Product) and obj in session.dirty:
+        attrs = sa_inspect(obj).attrs
+        return any(attrs[column].history.has_changes() for column in _PRODUCT_PDF_COLUMNS)
+    return False
+
+
+@event.listens_for(Session, "after_flush")
+def _mark_pdf_input_changes(session: Session, flush_context) -> None:
+    if any(_is_pdf_input_change(session, obj) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info[_PENDING_KEY] = True
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _mark_bulk_pdf_input_changes(state: ORMExecuteState) -> Optional[object]:
+    if not (state.is_update or state.is_delete):
+        return None
+    mapper = state.bind_mapper
+    if mapper is None:
+        return None
+    if mapper.class_ in _PDF_INPUT_MODELS:
+        state.session.info[_PENDING_KEY] = True
+    elif mapper.class_ is Product and state.is_update:
+        columns = updated_columns(state)
+        if columns is None or columns & _PRODUCT_PDF_COLUMNS:
+            state.session.info[_PENDING_KEY] = True
+    return None
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_pdf_inputs_before_commit(session: Session) -> None:
+    if session.get_nested_transaction() is not None:
+        return
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    if session.info.pop(_PENDING_KEY, False):
+        bump_shared_generations(session.connection(), [PDF_INPUTS_TAG])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pdf_input_changes(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
+
+
+class RenderedPDFCache:
+    """Thread-safe LRU cache of rendered PDF bytes
+
+    Entries are evicted least-recently-used first once either ``max_entries``
+    or ``max_bytes`` is exceeded. A single PDF larger than ``max_bytes`` is
+    never stored. The cache is per process, so each API worker keeps its own.
+    """
+
+    def __init__(self, max_entries: Optional[int] = None, max_bytes: Optional[int] = None):
+        self.max_entries = max_entries if max_entries is not None else settings.pdf_cache_max_entries
+        self.max_bytes = max_bytes if max_bytes is not None else settings.pdf_cache_max_bytes
+        self._entries: "OrderedDict[Hashable, bytes]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[bytes]:
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key: Hashable, data: bytes) -> None:
+        if self.max_entries <= 0 or len(data) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= len(previous)
+            self._entries[key] = data
+            self._size += len(data)
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+
+class PDFRenderPool:
+    """Process pool for HTML-to-PDF conversion with a bounded backlog
+
+    At most ``workers + queue_size`` renders are in flight; further requests
+    fail fast with ``PDFRenderQueueFull`` instead of piling up behind a slow
+    conversion. With ``workers`` set to 0 conversion runs in the calling thread.
+    """
+
+    def __init__(self, workers: Optional[int] = None, queue_size: Optional[int] = None):
+        self.workers = workers if workers is not None else settings.pdf_render_workers
+        self.queue_size = queue_size if queue_size is not None else settings.pdf_render_queue_size
+        self._slots = threading.BoundedSemaphore(max(1, self.workers + self.queue_size))
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                # spawn avoids forking a process that already runs server threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._executor
+
+    def render(self, html_content: str, paper_size: str = "A4") -> bytes:
+        """Convert HTML to PDF bytes, blocking only the calling thread"""
+        start = time.perf_counter()
+        try:
+            return self._render(html_content, paper_size)
+        finally:
+            record_pdf_render_duration(time.perf_counter() - start)
+
+    def _render(self, html_content: str, paper_size: str) -> bytes:
+        if self.workers <= 0:
+            return convert_html_to_pdf(html_content, paper_size)
+
+        if not self._slots.acquire(blocking=False):
+            raise PDFRenderQueueFull("PDF render queue is full")
+        try:
+            future = self._get_executor().submit(convert_html_to_pdf, html_content, paper_size)
+            return future.result(timeout=settings.pdf_render_timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed on memory); start a fresh pool next time
+            logger.error("PDF render pool broke; restarting it on next render")
+            with self._executor_lock:
+                self._executor = None
+            raise
+        finally:
+            self._slots.release()
+
+    def _submit(self, content: Union[str, bytes], paper_size: str) -> Future:
+        """Queue one render, holding a render slot until it completes
+
+        Waits up to ``pdf_render_timeout`` for a slot, so batch renders share
+        the same bound as single ones instead of queueing past it.
+        """
+        future: Future
+        if isinstance(content, bytes) or self.workers <= 0:
+            future = Future()
+            try:
+                future.set_result(content if isinstance(content, bytes) else convert_html_to_pdf(content, paper_size))
+            except Exception as e:
+                future.set_exception(e)
+            return future
+        if not self._slots.acquire(timeout=settings.pdf_render_timeout):
+            future = Future()
+            future.set_exception(PDFRenderQueueFull("PDF render queue is full"))
+            return future
+        try:
+            future = self._get_executor().submit(convert_html_to_pdf, content, paper_size)
+        except BrokenProcessPool as e:
+            self._slots.release()
+            future = Future()
+            future.set_exception(e)
+            return future
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def render_many(
+        self,
+        jobs: Iterable[Tuple[Any, Union[str, bytes], str]],
+        window: Optional[int] = None,
+    ) -> Iterator[Tuple[Any, Union[bytes, Exception]]]:
+        """Render ``(tag, html, paper_size)`` jobs across the pool in input order
+
+        Yields ``(tag, pdf_bytes)``, or ``(tag, exception)`` for a failed render.
+        At most ``window`` renders are in flight, so ``jobs`` is consumed lazily
+        and memory stays flat however many documents are exported. Each render
+        also takes one of the pool's slots, so concurrent batches and single
+        renders together never exceed ``workers + queue_size``. Jobs whose
+        content is already ``bytes`` (e.g. cache hits) pass straight through.
+        """
+        window = window or max(1, self.workers * 2)
+        pending: deque = deque()
+
+        def resolve(tag, future: Future, submitted: Optional[float]):
+            try:
+                return tag, future.result(timeout=settings.pdf_render_timeout)
+            except BrokenProcessPool as e:
+                logger.error("PDF render pool broke; restarting it on next render")
+                with self._executor_lock:
+                    self._executor = None
+                return tag, e
+            except Exception as e:
+                return tag, e
+            finally:
+                if submitted is not None:
+                    record_pdf_render_duration(time.perf_counter() - submitted)
+
+        for tag, content, paper_size in jobs:
+            # Already-rendered content is not timed
+            submitted = None if isinstance(content, bytes) else time.perf_counter()
+            pending.append((tag, self._submit(content, paper_size), submitted))
+            if len(pending) >= window:
+                yield resolve(*pending.popleft())
+        while pending:
+            yield resolve(*pending.popleft())
+
+    def shutdown(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+
+class _ZipStreamBuffer:
+    """Write-only sink so zipfile can write straight into a streamed response"""
+
+    def __init__(self):
+        self._chunks: list = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(entries: Iterable[Tuple[str, bytes]]) -> Iterator[bytes]:
+    """Stream a ZIP archive of ``(name, data)`` entries, one chunk per entry
+
+    PDFs are already compressed, so entries are stored rather than deflated.
+    """
+    sink = _ZipStreamBuffer()
+    with zipfile.ZipFile(sink, "w", compression=zipfile.ZIP_STORED) as archive:
+        for name, data in entries:
+            archive.writestr(name, data)
+            yield sink.drain()
+    yield sink.drain()
+
+
+def merge_pdfs(parts: Iterable[bytes]):
+    """Concatenate PDFs into a spooled temporary file positioned at the start
+
+    pypdf keeps every appended page in memory until the merged file is
+    written, so callers must bound how many PDFs they pass. The caller owns
+    (and must close) the returned file.
+    """
+    if not PYPDF_AVAILABLE:
+        raise RuntimeError("Merging PDFs requires pypdf")
+    writer = PdfWriter()
+    for part in parts:
+        writer.append(PdfReader(BytesIO(part)))
+    merged = tempfile.SpooledTemporaryFile(max_size=MERGED_PDF_SPOOL_BYTES)
+    writer.write(merged)
+    writer.close()
+    merged.seek(0)
+    return merged
+
+
+# Global instances
+pdf_render_pool = PDFRenderPool()
+rendered_pdf_cache = RenderedPDFCache()
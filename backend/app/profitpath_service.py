@@ -1,12 +1,22 @@
 """
 ProfitPath Service - Consolidates profitpath data from source tables
 """
-from datetime import datetime, date
+from collections import defaultdict
+from datetime import datetime, date, timedelta
 from decimal import Decimal
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_, func, case, text, String, DateTime, cast
+from sqlalchemy import and_, or_, func, select, literal, type_coerce, union_all, String, DateTime
 from .models import Payment, PurchasePayment, Expense, Invoice, Purchase, Party
+from .daily_rollups import day_bound, rollup_days, rollup_totals
+
+# Values of ``transaction_type`` that name a source type differently
+SOURCE_TYPE_ALIASES = {"income": "invoice_payment"}
+
+
+def _month_start(day: date, months_back: int = 0) -> date:
+    month = day.year * 12 + day.month - 1 - months_back
+    return date(month // 12, month % 12 + 1, 1)
 
 
 class ProfitPathService:
@@ -16,80 +26,22 @@ class ProfitPathService:
     def get_profitpath_summary(self, start_date: Optional[date] = None, end_date: Optional[date] = None) -> Dict[str, Any]:
         """Get profitpath summary for dashboard widgets"""
         
-        # Base query filters
-        date_filter = []
-        if start_date:
-            date_filter.append(Payment.payment_date >= start_date)
-        if end_date:
-            date_filter.append(Payment.payment_date <= end_date)
-        
+        # All totals come from the pre-summed daily rollups
+        return self._summary(rollup_totals(self.db, start_date, end_date), start_date, end_date)
+    
+    def _summary(self, totals: Dict[str, Any], start_date: Optional[date], end_date: Optional[date]) -> Dict[str, Any]:
         # Income (Invoice Payments)
-        income_query = self.db.query(
-            func.sum(Payment.amount).label('total_income'),
-            func.count(Payment.id).label('income_count')
-        ).filter(and_(*date_filter)) if date_filter else self.db.query(
-            func.sum(Payment.amount).label('total_income'),
-            func.count(Payment.id).label('income_count')
-        )
-        
-        income_result = income_query.first()
-        total_income = float(income_result.total_income or 0)
-        income_count = income_result.income_count or 0
+        total_income = float(totals["income"])
         
         # Expenses (Purchase Payments + Expenses)
-        purchase_payment_filter = []
-        expense_filter = []
-        if start_date:
-            purchase_payment_filter.append(PurchasePayment.payment_date >= start_date)
-            expense_filter.append(Expense.expense_date >= start_date)
-        if end_date:
-            purchase_payment_filter.append(PurchasePayment.payment_date <= end_date)
-            expense_filter.append(Expense.expense_date <= end_date)
-        
-        # Purchase payments
-        purchase_payments_query = self.db.query(
-            func.sum(PurchasePayment.payment_amount).label('total_purchase_payments'),
-            func.count(PurchasePayment.id).label('purchase_payment_count')
-        ).filter(and_(*purchase_payment_filter)) if purchase_payment_filter else self.db.query(
-            func.sum(PurchasePayment.payment_amount).label('total_purchase_payments'),
-            func.count(PurchasePayment.id).label('purchase_payment_count')
-        )
-        
-        purchase_result = purchase_payments_query.first()
-        total_purchase_payments = float(purchase_result.total_purchase_payments or 0)
-        purchase_payment_count = purchase_result.purchase_payment_count or 0
-        
-        # Direct expenses
-        expenses_query = self.db.query(
-            func.sum(Expense.amount).label('total_expenses'),
-            func.count(Expense.id).label('expense_count')
-        ).filter(and_(*expense_filter)) if expense_filter else self.db.query(
-            func.sum(Expense.amount).label('total_expenses'),
-            func.count(Expense.id).label('expense_count')
-        )
-        
-        expense_result = expenses_query.first()
-        total_expenses = float(expense_result.total_expenses or 0)
-        expense_count = expense_result.expense_count or 0
+        total_purchase_payments = float(totals["purchase_payments"])
+        total_expenses = float(totals["expenses"])
         
         total_outflow = total_purchase_payments + total_expenses
         net_cashflow = total_income - total_outflow
         
-        # Get invoice amounts for the period (not just payments)
-        invoice_filter = []
-        if start_date:
-            invoice_filter.append(Invoice.date >= start_date)
-        if end_date:
-            invoice_filter.append(Invoice.date <= end_date)
-        
-        invoice_query = self.db.query(
-            func.sum(Invoice.grand_total).label('total_invoice_amount')
-        ).filter(and_(*invoice_filter)) if invoice_filter else self.db.query(
-            func.sum(Invoice.grand_total).label('total_invoice_amount')
-        )
-        
-        invoice_result = invoice_query.first()
-        total_invoice_amount = float(invoice_result.total_invoice_amount or 0)
+        # Invoice amounts for the period (not just payments)
+        total_invoice_amount = float(totals["invoiced"])
         
         # Format dates for response
         start_date_str = start_date.isoformat() if start_date else datetime.now().replace(day=1).isoformat()
@@ -119,8 +71,49 @@ class ProfitPathService:
             }
         }
     
-    def get_cashflow_transactions(
-        self, 
+    def get_summary_with_trend(
+        self,
+        start_date: date,
+        end_date: date,
+        months: int = 6,
+        today: Optional[date] = None
+    ) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+        """Period summary plus income/outflow for each of the last ``months`` calendar months
+        
+        Both come from a single read of the daily rollups spanning the period
+        and the trend window.
+        """
+        today = today or date.today()
+        trend_start = _month_start(today, months - 1)
+        days = rollup_days(self.db, min(start_date, trend_start), max(end_date, today))
+        
+        period: Dict[str, Any] = defaultdict(Decimal)
+        monthly: Dict[date, Dict[str, Any]] = defaultdict(lambda: defaultdict(Decimal))
+        for day, totals in days.items():
+            if start_date <= day <= end_date:
+                for column, amount in totals.items():
+                    period[column] += amount
+            if trend_start <= day <= today:
+                month = monthly[day.replace(day=1)]
+                for column in ("income", "purchase_payments", "expenses"):
+                    month[column] += totals[column]
+        
+        trend = []
+        for i in reversed(range(months)):
+            month_start = _month_start(today, i)
+            totals = monthly.get(month_start, {})
+            income = float(totals.get("income", 0))
+            outflow = float(totals.get("purchase_payments", 0)) + float(totals.get("expenses", 0))
+            trend.append({
+                "month": month_start.strftime('%Y-%m'),
+                "income": income,
+                "expenses": outflow,
+                "net_cashflow": income - outflow
+            })
+        return self._summary(period, start_date, end_date), trend
+    
+    def cashflow_feed(
+        self,
         search: Optional[str] = None,
         type_filter: Optional[str] = None,
         transaction_type: Optional[str] = None,
@@ -130,139 +123,170 @@ class ProfitPathService:
         amount_max: Optional[float] = None,
         start_date: Optional[date] = None,
         end_date: Optional[date] = None,
-        page: int = 1,
-        limit: int = 25
-    ) -> Dict[str, Any]:
-        """Get consolidated cashflow transactions from all source tables"""
+        category: Optional[str] = None,
+        exact_payment_method: bool = False
+    ):
+        """Invoice payments, purchase payments and expenses as one UNION ALL subquery
         
-        # Build queries for each transaction type
-        transactions = []
+        Each branch joins its document and party and is filtered on its own
+        columns before the union, so the database sorts and pages the combined
+        feed. Returns None when the filters rule out every source.
+        """
+        now = datetime.utcnow()
+        source_type = SOURCE_TYPE_ALIASES.get(transaction_type, transaction_type)
         
-        # Invoice Payments (Income)
-        if not type_filter or type_filter == 'inflow':
-            payment_query = self.db.query(
-                cast(Payment.payment_date, DateTime).label('transaction_date'),
-                Payment.amount.label('amount'),
-                Payment.payment_method,
-                func.cast('', String).label('account_head'),
-                Payment.reference_number,
-                Payment.notes.label('description'),
-                func.cast('inflow', String).label('type'),
-                func.cast('invoice_payment', String).label('source_type'),
-                Payment.id.label('source_id'),
-                func.cast(datetime.utcnow(), DateTime).label('created_at'),
-                Invoice.invoice_no.label('reference_document'),
-                Party.name.label('party_name')
-            ).join(Invoice, Payment.invoice_id == Invoice.id).join(Party, Invoice.customer_id == Party.id)
-            
-            # Apply filters
-            if search:
-                payment_query = payment_query.filter(
-                    or_(
-                        Party.name.ilike(f"%{search}%"),
-                        Invoice.invoice_no.ilike(f"%{search}%"),
-                        Payment.reference_number.ilike(f"%{search}%"),
-                        Payment.payment_method.ilike(f"%{search}%")
-                    )
-                )
-            
-            if start_date:
-                payment_query = payment_query.filter(Payment.payment_date >= datetime.combine(start_date, datetime.min.time()))
-            if end_date:
-                payment_query = payment_query.filter(Payment.payment_date <= datetime.combine(end_date, datetime.max.time()))
-            
-            if payment_method:
-                payment_query = payment_query.filter(Payment.payment_method.ilike(f"%{payment_method}%"))
-            
-            payment_transactions = payment_query.all()
-            transactions.extend(payment_transactions)
-        
-        # Purchase Payments (Outflow)
-        if not type_filter or type_filter == 'outflow':
-            purchase_payment_query = self.db.query(
-                PurchasePayment.payment_date.label('transaction_date'),
-                PurchasePayment.payment_amount.label('amount'),
-                PurchasePayment.payment_method,
+        sources = [
+            (
+                'inflow', 'invoice_payment',
+                select(
+                    # Payment dates are plain dates; PostgreSQL widens them to timestamps in the union
+                    type_coerce(Payment.payment_date, DateTime).label('transaction_date'),
+                    Payment.amount.label('amount'),
+                    Payment.payment_method.label('payment_method'),
+                    literal('', String).label('account_head'),
+                    Payment.reference_number.label('reference_number'),
+                    Payment.notes.label('description'),
+                    literal('inflow', String).label('type'),
+                    literal('invoice_payment', String).label('source_type'),
+                    Payment.id.label('source_id'),
+                    literal(now, DateTime).label('created_at'),
+                    literal('Sales', String).label('category'),
+                    literal('invoice', String).label('reference_type'),
+                    Payment.invoice_id.label('reference_id'),
+                    Invoice.invoice_no.label('reference_document'),
+                    Party.name.label('party_name')
+                ).select_from(Payment)
+                .outerjoin(Invoice, Payment.invoice_id == Invoice.id)
+                .outerjoin(Party, Invoice.customer_id == Party.id),
+                Payment.payment_date, Payment.amount, Payment.payment_method, None,
+                [Party.name, Invoice.invoice_no, Payment.reference_number, Payment.payment_method]
+            ),
+            (
+                'outflow', 'purchase_payment',
+                select(
+                    PurchasePayment.payment_date.label('transaction_date'),
+                    PurchasePayment.payment_amount.label('amount'),
+                    PurchasePayment.payment_method.label('payment_method'),
+                    PurchasePayment.account_head.label('account_head'),
+                    PurchasePayment.reference_number.label('reference_number'),
+                    PurchasePayment.notes.label('description'),
+                    literal('outflow', String).label('type'),
+                    literal('purchase_payment', String).label('source_type'),
+                    PurchasePayment.id.label('source_id'),
+                    PurchasePayment.created_at.label('created_at'),
+                    literal('Purchases', String).label('category'),
+                    literal('purchase', String).label('reference_type'),
+                    PurchasePayment.purchase_id.label('reference_id'),
+                    Purchase.purchase_no.label('reference_document'),
+                    Party.name.label('party_name')
+                ).select_from(PurchasePayment)
+                .outerjoin(Purchase, PurchasePayment.purchase_id == Purchase.id)
+                .outerjoin(Party, Purchase.vendor_id == Party.id),
+                PurchasePayment.payment_date, PurchasePayment.payment_amount, PurchasePayment.payment_method,
                 PurchasePayment.account_head,
-                PurchasePayment.reference_number,
-                PurchasePayment.notes.label('description'),
-                func.cast('outflow', String).label('type'),
-                func.cast('purchase_payment', String).label('source_type'),
-                PurchasePayment.id.label('source_id'),
-                PurchasePayment.created_at,
-                Purchase.purchase_no.label('reference_document'),
-                Party.name.label('party_name')
-            ).join(Purchase, PurchasePayment.purchase_id == Purchase.id).join(Party, Purchase.vendor_id == Party.id)
-            
-            # Apply filters
-            if search:
-                purchase_payment_query = purchase_payment_query.filter(
-                    or_(
-                        Party.name.ilike(f"%{search}%"),
-                        Purchase.purchase_no.ilike(f"%{search}%"),
-                        PurchasePayment.reference_number.ilike(f"%{search}%"),
-                        PurchasePayment.payment_method.ilike(f"%{search}%")
-                    )
-                )
-            
-            if start_date:
-                purchase_payment_query = purchase_payment_query.filter(PurchasePayment.payment_date >= datetime.combine(start_date, datetime.min.time()))
-            if end_date:
-                purchase_payment_query = purchase_payment_query.filter(PurchasePayment.payment_date <= datetime.combine(end_date, datetime.max.time()))
-            
-            if payment_method:
-                purchase_payment_query = purchase_payment_query.filter(PurchasePayment.payment_method.ilike(f"%{payment_method}%"))
-            
-            purchase_transactions = purchase_payment_query.all()
-            transactions.extend(purchase_transactions)
+                [Party.name, Purchase.purchase_no, PurchasePayment.reference_number, PurchasePayment.payment_method]
+            ),
+            (
+                'outflow', 'expense',
+                select(
+                    Expense.expense_date.label('transaction_date'),
+                    Expense.total_amount.label('amount'),
+                    Expense.payment_method.label('payment_method'),
+                    Expense.account_head.label('account_head'),
+                    Expense.reference_number.label('reference_number'),
+                    Expense.description.label('description'),
+                    literal('outflow', String).label('type'),
+                    literal('expense', String).label('source_type'),
+                    Expense.id.label('source_id'),
+                    Expense.created_at.label('created_at'),
+                    Expense.category.label('category'),
+                    literal('expense', String).label('reference_type'),
+                    Expense.id.label('reference_id'),
+                    literal('', String).label('reference_document'),
+                    Party.name.label('party_name')
+                ).select_from(Expense)
+                .outerjoin(Party, Expense.vendor_id == Party.id),
+                Expense.expense_date, Expense.total_amount, Expense.payment_method, Expense.account_head,
+                [Expense.description, Expense.expense_type, Expense.reference_number, Expense.payment_method]
+            ),
+        ]
         
-        # Direct Expenses (Outflow)
-        if not type_filter or type_filter == 'outflow':
-            expense_query = self.db.query(
-                Expense.expense_date.label('transaction_date'),
-                Expense.total_amount.label('amount'),
-                Expense.payment_method,
-                Expense.account_head,
-                Expense.reference_number,
-                Expense.description,
-                func.cast('outflow', String).label('type'),
-                func.cast('expense', String).label('source_type'),
-                Expense.id.label('source_id'),
-                Expense.created_at,
-                func.cast('', String).label('reference_document'),
-                func.cast('', String).label('party_name')
-            )
+        branches = []
+        for flow, source, query, date_column, amount, method, head, search_columns in sources:
+            if type_filter and flow != type_filter:
+                continue
+            if source_type and source != source_type:
+                continue
+            if account_head and head is None:
+                continue
             
             # Apply filters
             if search:
-                expense_query = expense_query.filter(
-                    or_(
-                        Expense.description.ilike(f"%{search}%"),
-                        Expense.expense_type.ilike(f"%{search}%"),
-                        Expense.reference_number.ilike(f"%{search}%"),
-                        Expense.payment_method.ilike(f"%{search}%")
-                    )
-                )
-            
+                query = query.where(or_(*[column.ilike(f"%{search}%") for column in search_columns]))
             if start_date:
-                expense_query = expense_query.filter(Expense.expense_date >= datetime.combine(start_date, datetime.min.time()))
+                query = query.where(date_column >= day_bound(date_column, start_date))
             if end_date:
-                expense_query = expense_query.filter(Expense.expense_date <= datetime.combine(end_date, datetime.max.time()))
-            
+                query = query.where(date_column < day_bound(date_column, end_date + timedelta(days=1)))
             if payment_method:
-                expense_query = expense_query.filter(Expense.payment_method.ilike(f"%{payment_method}%"))
-            
-            expense_transactions = expense_query.all()
-            transactions.extend(expense_transactions)
+                query = query.where(method == payment_method if exact_payment_method else method.ilike(f"%{payment_method}%"))
+            if account_head:
+                query = query.where(head == account_head)
+            if amount_min is not None:
+                query = query.where(amount >= amount_min)
+            if amount_max is not None:
+                query = query.where(amount <= amount_max)
+            if category:
+                query = query.where(query.selected_columns.category == category)
+            branches.append(query)
+        
+        if not branches:
+            return None
+        return union_all(*branches).subquery('cashflow_feed')
+    
+    def get_cashflow_transactions(
+        self, 
+        search: Optional[str] = None,
+        type_filter: Optional[str] = None,
+        transaction_type: Optional[str] = None,
+        payment_method: Optional[str] = None,
+        account_head: Optional[str] = None,
+        amount_min: Optional[float] = None,
+        amount_max: Optional[float] = None,
+        start_date: Optional[date] = None,
+        end_date: Optional[date] = None,
+        page: int = 1,
+        limit: int = 25
+    ) -> Dict[str, Any]:
+        """Get consolidated cashflow transactions from all source tables"""
         
-        # Sort by transaction date (newest first), handle None values
-        transactions.sort(key=lambda x: x.transaction_date or datetime.min, reverse=True)
+        feed = self.cashflow_feed(
+            search=search,
+            type_filter=type_filter,
+            transaction_type=transaction_type,
+            payment_method=payment_method,
+            account_head=account_head,
+            amount_min=amount_min,
+            amount_max=amount_max,
+            start_date=start_date,
+            end_date=end_date
+        )
+        page = max(page, 1)
+        limit = max(limit, 1)
         
-        # Apply pagination
-        total_count = len(transactions)
-        start_idx = (page - 1) * limit
-        end_idx = start_idx + limit
-        paginated_transactions = transactions[start_idx:end_idx]
+        rows = []
+        total_count = 0
+        if feed is not None:
+            # Newest first; the window count gives the total without a second pass
+            rows = self.db.execute(
+                select(feed, func.count().over().label('total_count'))
+                .order_by(*self.feed_order(feed))
+                .limit(limit)
+                .offset((page - 1) * limit)
+            ).all()
+            if rows:
+                total_count = rows[0].total_count
+            elif page > 1:
+                total_count = self.db.execute(select(func.count()).select_from(feed)).scalar_one()
         
         return {
             "transactions": [
@@ -281,7 +305,7 @@ class ProfitPathService:
                     "party_name": t.party_name,
                     "created_at": t.created_at.isoformat() if t.created_at else None
                 }
-                for t in paginated_transactions
+                for t in rows
             ],
             "total_count": total_count,
             "page": page,
@@ -289,6 +313,11 @@ class ProfitPathService:
             "total_pages": (total_count + limit - 1) // limit
         }
     
+    @staticmethod
+    def feed_order(feed):
+        """Newest first, ties broken deterministically so pages never overlap"""
+        return [feed.c.transaction_date.desc(), feed.c.source_type, feed.c.source_id.desc()]
+    
     def get_pending_payments(self) -> Dict[str, Any]:
         """Get pending payments for invoices and purchases"""
         
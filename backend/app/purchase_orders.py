@@ -17,6 +17,7 @@ from .models import (
     User
 )
 from .gst import money, split_gst
+from .number_allocator import number_allocator, financial_year_prefix, same_tenant_scope
 
 
 class PurchaseOrderService:
@@ -29,7 +30,7 @@ class PurchaseOrderService:
         """Create a new purchase order"""
         # Generate PO number if not provided
         if 'po_number' not in po_data or not po_data['po_number']:
-            po_data['po_number'] = self._generate_po_number()
+            po_data['po_number'] = self._generate_po_number(po_data.get('tenant_id'))
         
         po = PurchaseOrder(**po_data)
         self.db.add(po)
@@ -117,8 +118,9 @@ class PurchaseOrderService:
         
         # Create purchase
         purchase_data = {
+            'tenant_id': po.tenant_id,
             'vendor_id': po.vendor_id,
-            'purchase_no': self._generate_purchase_number(),
+            'purchase_no': self._generate_purchase_number(po.tenant_id),
             'date': datetime.utcnow(),
             'due_date': self._calculate_due_date(po.terms, datetime.utcnow()),
             'terms': po.terms,
@@ -204,79 +206,49 @@ class PurchaseOrderService:
         self.db.refresh(purchase)
         return purchase
     
-    def _generate_po_number(self) -> str:
-        """Generate next PO number"""
-        from datetime import datetime
-        
-        # Get current financial year (April to March)
-        current_date = datetime.now()
-        if current_date.month >= 4:
-            fy_year = current_date.year
-        else:
-            fy_year = current_date.year - 1
-        
-        fy_prefix = f"FY{fy_year}"
-        
-        # Find the last PO number for this financial year
-        last_po = self.db.query(PurchaseOrder).filter(
-            PurchaseOrder.po_number.like(f"{fy_prefix}/PO-%")
-        ).order_by(PurchaseOrder.po_number.desc()).first()
-        
-        if last_po:
-            # Extract sequence number from last PO
+    def _generate_po_number(self, tenant_id: Optional[int] = None) -> str:
+        """Generate next PO number in the tenant's series"""
+        fy_prefix = financial_year_prefix()
+        
+        def last_po_seq() -> int:
+            # Only consulted the first time this FY series is allocated
+            last_po = self.db.query(PurchaseOrder).filter(
+                same_tenant_scope(PurchaseOrder.tenant_id, tenant_id),
+                PurchaseOrder.po_number.like(f"{fy_prefix}/PO-%")
+            ).order_by(PurchaseOrder.po_number.desc()).first()
+            if not last_po:
+                return 0
             try:
-                last_seq = int(last_po.po_number.split('-')[-1])
-                seq = last_seq + 1
+                return int(last_po.po_number.split('-')[-1])
             except (ValueError, IndexError):
-                seq = 1
-        else:
-            seq = 1
-        
-        # Format as FY<year>/PO-<4 digit sequence>
-        po_number = f"{fy_prefix}/PO-{seq:04d}"
+                return 0
         
-        # Ensure total length doesn't exceed 16 characters
-        if len(po_number) > 16:
-            po_number = po_number[:16]
+        seq = number_allocator.allocate(self.db, f"{fy_prefix}/PO", tenant_id=tenant_id, seed=last_po_seq)
         
-        return po_number
+        # Format as FY<year>/PO-<4 digit sequence>, max 16 characters
+        return f"{fy_prefix}/PO-{seq:04d}"[:16]
     
-    def _generate_purchase_number(self) -> str:
-        """Generate next purchase number"""
-        from datetime import datetime
-        
-        # Get current financial year (April to March)
-        current_date = datetime.now()
-        if current_date.month >= 4:
-            fy_year = current_date.year
-        else:
-            fy_year = current_date.year - 1
-        
-        fy_prefix = f"FY{fy_year}"
-        
-        # Find the last purchase number for this financial year
-        last_purchase = self.db.query(Purchase).filter(
-            Purchase.purchase_no.like(f"{fy_prefix}/PUR-%")
-        ).order_by(Purchase.purchase_no.desc()).first()
-        
-        if last_purchase:
-            # Extract sequence number from last purchase
+    def _generate_purchase_number(self, tenant_id: Optional[int] = None) -> str:
+        """Generate next purchase number in the tenant's series"""
+        fy_prefix = financial_year_prefix()
+        
+        def last_purchase_seq() -> int:
+            # Only consulted the first time this FY series is allocated
+            last_purchase = self.db.query(Purchase).filter(
+                same_tenant_scope(Purchase.tenant_id, tenant_id),
+                Purchase.purchase_no.like(f"{fy_prefix}/PUR-%")
+            ).order_by(Purchase.purchase_no.desc()).first()
+            if not last_purchase:
+                return 0
             try:
-                last_seq = int(last_purchase.purchase_no.split('-')[-1])
-                seq = last_seq + 1
+                return int(last_purchase.purchase_no.split('-')[-1])
             except (ValueError, IndexError):
-                seq = 1
-        else:
-            seq = 1
-        
-        # Format as FY<year>/PUR-<4 digit sequence>
-        purchase_no = f"{fy_prefix}/PUR-{seq:04d}"
+                return 0
         
-        # Ensure total length doesn't exceed 16 characters
-        if len(purchase_no) > 16:
-            purchase_no = purchase_no[:16]
+        seq = number_allocator.allocate(self.db, f"{fy_prefix}/PUR", tenant_id=tenant_id, seed=last_purchase_seq)
         
-        return purchase_no
+        # Format as FY<year>/PUR-<4 digit sequence>, max 16 characters
+        return f"{fy_prefix}/PUR-{seq:04d}"[:16]
     
     def _calculate_due_date(self, terms: str, purchase_date: datetime) -> datetime:
         """Calculate due date based on payment terms"""
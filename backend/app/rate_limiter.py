@@ -0,0 +1,192 @@
+"""
+Rate limiter
+Sliding-window rate limiting with fixed memory per key. Each key keeps only
+the request counts of the current and previous window; the previous count is
+weighted by how much of it still overlaps the sliding window, which
+approximates a true sliding log without storing a timestamp per request.
+
+Counters live in a pluggable backend: ``MemoryRateLimitBackend`` keeps them in
+the process (the default, and the stand-in used in tests) and
+``RedisRateLimitBackend`` shares them between every worker pointed at the same
+Redis, so limits hold across gunicorn/uvicorn processes.
+"""
+
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    import redis.asyncio as redis_asyncio
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+# Keys tracked by the in-process backend before the least recently used are dropped
+MEMORY_BACKEND_MAX_KEYS = 100_000
+
+
+@dataclass(frozen=True)
+class RateLimitResult:
+    """Outcome of one request against a limit"""
+    allowed: bool
+    limit: int
+    remaining: int
+    retry_after: float  # seconds until the current window rolls over
+
+
+def _window(now: float, window_seconds: int) -> Tuple[int, float]:
+    """Index of the fixed window containing ``now`` and the weight of the previous one"""
+    index = int(now // window_seconds)
+    elapsed = now - index * window_seconds
+    return index, 1.0 - elapsed / window_seconds
+
+
+def _result(allowed: bool, estimate: float, limit: int, index: int, window_seconds: int, now: float) -> RateLimitResult:
+    return RateLimitResult(
+        allowed=allowed,
+        limit=limit,
+        remaining=max(int(limit - math.ceil(estimate)), 0),
+        retry_after=max((index + 1) * window_seconds - now, 0.0),
+    )
+
+
+class MemoryRateLimitBackend:
+    """Counters in a bounded LRU dict; limits apply per process"""
+
+    name = "memory"
+
+    def __init__(self, max_keys: int = MEMORY_BACKEND_MAX_KEYS, clock: Callable[[], float] = time.time):
+        self.max_keys = max_keys
+        self._clock = clock
+        self._lock = threading.Lock()
+        # key -> [window index, current count, previous count]
+        self._counters: "OrderedDict[str, list]" = OrderedDict()
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> RateLimitResult:
+        now = self._clock()
+        index, weight = _window(now, window_seconds)
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = [index, 0, 0]
+                if len(self._counters) > self.max_keys:
+                    self._counters.popitem(last=False)
+            else:
+                self._counters.move_to_end(key)
+                if counter[0] != index:
+                    counter[2] = counter[1] if counter[0] == index - 1 else 0
+                    counter[1] = 0
+                    counter[0] = index
+            estimate = counter[2] * weight + counter[1]
+            allowed = estimate + 1 <= limit
+            if allowed:
+                counter[1] += 1
+                estimate += 1
+        return _result(allowed, estimate, limit, index, window_seconds, now)
+
+    async def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+
+    def status(self) -> Dict[str, Any]:
+        return {"backend": self.name, "tracked_keys": len(self._counters), "max_keys": self.max_keys}
+
+
+# KEYS: current window, previous window. ARGV: limit, previous weight, ttl.
+# Checks and increments atomically so concurrent workers never overshoot.
+_REDIS_HIT_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+local previous = tonumber(redis.call('GET', KEYS[2]) or '0')
+local estimate = previous * tonumber(ARGV[2]) + current
+if estimate + 1 > tonumber(ARGV[1]) then
+    return {0, tostring(estimate)}
+end
+if redis.call('INCR', KEYS[1]) == 1 then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+return {1, tostring(estimate + 1)}
+"""
+
+
+class RedisRateLimitBackend:
+    """Counters in Redis, shared by every process using the same server
+
+    ``client`` replaces the connection made from ``url``; any ``redis.asyncio``
+    compatible client with Lua support works (tests pass a fakeredis one).
+    """
+
+    name = "redis"
+
+    def __init__(
+        self,
+        url: str,
+        prefix: str = "ratelimit:",
+        clock: Callable[[], float] = time.time,
+        client: Any = None
+    ):
+        if client is None and not REDIS_AVAILABLE:
+            raise RuntimeError("Redis rate limiting requires the redis package")
+        self.url = url
+        self.prefix = prefix
+        self._clock = clock
+        self._client = client if client is not None else redis_asyncio.from_url(url)
+        self._script = self._client.register_script(_REDIS_HIT_SCRIPT)
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> RateLimitResult:
+        now = self._clock()
+        index, weight = _window(now, window_seconds)
+        # The hash tag keeps both windows of a key in one cluster slot
+        base = f"{self.prefix}{{{key}}}:"
+        allowed, estimate = await self._script(
+            keys=[f"{base}{index}", f"{base}{index - 1}"],
+            args=[limit, weight, window_seconds * 2],
+        )
+        return _result(bool(int(allowed)), float(estimate), limit, index, window_seconds, now)
+
+    async def reset(self) -> None:
+        async for key in self._client.scan_iter(match=f"{self.prefix}*"):
+            await self._client.delete(key)
+
+    def status(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+def create_rate_limit_backend(url: Optional[str] = None):
+    """Backend for ``url``: ``redis://``/``rediss://`` for Redis, anything else in-process"""
+    if url and url.startswith(("redis://", "rediss://", "unix://")):
+        if REDIS_AVAILABLE:
+            return RedisRateLimitBackend(url)
+        logger.warning("redis package not installed; rate limits apply per process")
+    return MemoryRateLimitBackend()
+
+
+class RateLimiter:
+    """Sliding-window limiter over a pluggable counter backend"""
+
+    def __init__(self, backend=None, window_seconds: int = 60):
+        self.backend = backend if backend is not None else MemoryRateLimitBackend()
+        self.window_seconds = window_seconds
+
+    async def hit(self, key: str, limit: int) -> RateLimitResult:
+        """Count one request for ``key`` unless it would exceed ``limit`` per window"""
+        return await self.backend.hit(key, limit, self.window_seconds)
+
+    async def reset(self) -> None:
+        await self.backend.reset()
+
+    def status(self) -> Dict[str, Any]:
+        return {**self.backend.status(), "window_seconds": self.window_seconds}
+
+
+rate_limiter = RateLimiter(
+    create_rate_limit_backend(settings.rate_limit_storage_url),
+    window_seconds=settings.rate_limit_window_seconds,
+)
@@ -124,6 +124,7 @@ class RecurringInvoiceService:
         
         # Create invoice
         invoice_data = {
+            'tenant_id': template.tenant_id,
             'customer_id': template.customer_id,
             'supplier_id': template.supplier_id,
             'date': datetime.utcnow(),
@@ -140,7 +141,7 @@ class RecurringInvoiceService:
         }
         
         # Generate invoice number
-        invoice_data['invoice_no'] = self._generate_invoice_number()
+        invoice_data['invoice_no'] = self._generate_invoice_number(template.tenant_id)
         
         # Create invoice
         invoice = Invoice(**invoice_data)
@@ -248,10 +249,10 @@ class RecurringInvoiceService:
         else:
             return invoice_date + timedelta(days=30)  # Default to 30 days
     
-    def _generate_invoice_number(self) -> str:
-        """Generate next invoice number"""
-        from .routers import _next_invoice_no
-        return _next_invoice_no(self.db)
+    def _generate_invoice_number(self, tenant_id: Optional[int] = None) -> str:
+        """Generate next invoice number in the tenant's series"""
+        from .main_routers import _next_invoice_no
+        return _next_invoice_no(self.db, tenant_id)
     
     def _update_template_next_generation_date(self, template: RecurringInvoiceTemplate):
         """Update the next generation date for a template"""
@@ -17,22 +17,38 @@ from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
 from cryptography.hazmat.backends import default_backend
 import jwt
-from sqlalchemy import text
+import time
+from collections import deque
+from sqlalchemy import column, insert, table, text
 from sqlalchemy.ext.asyncio import AsyncSession
 from .config import settings
 from .tenant_config import tenant_config_manager
+from .rate_limiter import rate_limiter
+from .audit_writer import AuditWriter
 
 logger = logging.getLogger(__name__)
 
+# Columns the security audit events are written to in each tenant database
+AUDIT_TRAIL = table(
+    'audit_trail',
+    column('tenant_id'), column('event_type'), column('user_id'), column('details'), column('severity'),
+    column('ip_address'), column('user_agent'), column('session_id'), column('created_at')
+)
+
 
 class SecurityManager:
     """Comprehensive security management for multi-tenant architecture"""
     
     def __init__(self):
         self.encryption_keys: Dict[str, bytes] = {}
-        self.audit_logs: List[Dict] = []
-        self.security_events: List[Dict] = []
-        self.rate_limiters: Dict[str, Dict] = {}
+        self.audit_logs: deque = deque(maxlen=settings.security_event_buffer_size)
+        # Most recent events only; the full history is written to audit_trail
+        self.security_events: deque = deque(maxlen=settings.security_event_buffer_size)
+        self.audit_writer = AuditWriter(self._store_audit_logs)
+        # (tenant_id, action) -> (expires at, requests per window)
+        self.rate_limit_policies: Dict[tuple, tuple] = {}
+        # Limits depend on the tenant's domain, so re-resolve them when it changes
+        tenant_config_manager.add_change_listener(self.invalidate_rate_limits)
         self._lock = asyncio.Lock()
         
         # Initialize encryption keys
@@ -128,87 +144,74 @@ class SecurityManager:
             
             self.security_events.append(event)
             
-            # Log to file for persistence
-            logger.info(f"Security Event: {event_type} for tenant {tenant_id} - {severity}")
+            logger.debug(f"Security Event: {event_type} for tenant {tenant_id} - {severity}")
             
-            # Store in database for audit trail
-            await self._store_audit_log(event)
+            # Stored in the audit trail by the background writer
+            self.audit_writer.enqueue(event)
             
         except Exception as e:
             logger.error(f"Failed to log security event: {e}")
     
-    async def _store_audit_log(self, event: Dict):
-        """Store audit log in database"""
+    async def _store_audit_logs(self, tenant_id: str, events: List[Dict]):
+        """Store one tenant's audit events with a single multi-row INSERT"""
+        session = await tenant_config_manager.get_session(tenant_id)
         try:
-            # Get tenant database session
-            session = await tenant_config_manager.get_session(event['tenant_id'])
-            
-            audit_query = text("""
-                INSERT INTO audit_trail (
-                    tenant_id, event_type, user_id, details, severity, 
-                    ip_address, user_agent, session_id, created_at
-                ) VALUES (
-                    :tenant_id, :event_type, :user_id, :details, :severity,
-                    :ip_address, :user_agent, :session_id, :created_at
-                )
-            """)
-            
-            await session.execute(audit_query, {
-                'tenant_id': event['tenant_id'],
-                'event_type': event['event_type'],
-                'user_id': event['user_id'],
-                'details': str(event['details']),
-                'severity': event['severity'],
-                'ip_address': event['ip_address'],
-                'user_agent': event['user_agent'],
-                'session_id': event['session_id'],
-                'created_at': datetime.utcnow()
-            })
-            
+            await session.execute(insert(AUDIT_TRAIL).values([
+                {
+                    'tenant_id': event['tenant_id'],
+                    'event_type': event['event_type'],
+                    'user_id': event['user_id'],
+                    'details': str(event['details']),
+                    'severity': event['severity'],
+                    'ip_address': event['ip_address'],
+                    'user_agent': event['user_agent'],
+                    'session_id': event['session_id'],
+                    # When the event happened, not when its batch was flushed
+                    'created_at': datetime.fromisoformat(event['timestamp'])
+                }
+                for event in events
+            ]))
             await session.commit()
-            
-        except Exception as e:
-            logger.error(f"Failed to store audit log: {e}")
+        finally:
+            await session.close()
+    
+    async def get_audit_status(self) -> Dict[str, Any]:
+        """Audit writer queue and throughput counters"""
+        return {**self.audit_writer.status(), 'buffered_events': len(self.security_events)}
     
     async def check_rate_limit(self, tenant_id: str, user_id: Optional[str] = None, 
                               action: str = "api_call") -> bool:
         """Check rate limiting for tenant/user/action"""
         try:
-            current_time = datetime.utcnow()
             key = f"{tenant_id}:{user_id}:{action}" if user_id else f"{tenant_id}:{action}"
+            limit = await self._get_rate_limit(tenant_id, action)
             
-            if key not in self.rate_limiters:
-                self.rate_limiters[key] = {
-                    'requests': [],
-                    'limit': self._get_rate_limit(tenant_id, action)
-                }
-            
-            limiter = self.rate_limiters[key]
-            
-            # Remove old requests (older than 1 minute)
-            limiter['requests'] = [
-                req_time for req_time in limiter['requests']
-                if current_time - req_time < timedelta(minutes=1)
-            ]
-            
-            # Check if limit exceeded
-            if len(limiter['requests']) >= limiter['limit']:
+            result = await rate_limiter.hit(key, limit)
+            if not result.allowed:
                 await self.log_security_event(
                     'RATE_LIMIT_EXCEEDED', tenant_id, user_id,
-                    {'action': action, 'limit': limiter['limit']}, 'WARNING'
+                    {'action': action, 'limit': limit}, 'WARNING'
                 )
                 return False
             
-            # Add current request
-            limiter['requests'].append(current_time)
             return True
             
         except Exception as e:
             logger.error(f"Failed to check rate limit: {e}")
             return True  # Allow if rate limiting fails
     
-    def _get_rate_limit(self, tenant_id: str, action: str) -> int:
-        """Get rate limit for tenant and action"""
+    async def _get_rate_limit(self, tenant_id: str, action: str) -> int:
+        """Get rate limit for tenant and action, reusing it for ``rate_limit_policy_ttl`` seconds"""
+        cache_key = (tenant_id, action)
+        cached = self.rate_limit_policies.get(cache_key)
+        if cached is not None and cached[0] > time.monotonic():
+            return cached[1]
+        
+        limit = await self._resolve_rate_limit(tenant_id, action)
+        self.rate_limit_policies[cache_key] = (time.monotonic() + settings.rate_limit_policy_ttl, limit)
+        return limit
+    
+    async def _resolve_rate_limit(self, tenant_id: str, action: str) -> int:
         try:
             # Base rate limits
             base_limits = {
@@ -222,7 +225,7 @@ class SecurityManager:
             limit = base_limits.get(action, 50)
             
             # Adjust based on tenant domain
-            config = asyncio.run(tenant_config_manager.get_tenant_config(tenant_id))
+            config = await tenant_config_manager.get_tenant_config(tenant_id)
             if config:
                 if config.domain == 'manufacturing':
                     # Manufacturing firms may have higher usage
@@ -237,9 +240,22 @@ class SecurityManager:
             logger.error(f"Failed to get rate limit: {e}")
             return 50  # Default fallback
     
+    def invalidate_rate_limits(self, tenant_id: Optional[str] = None):
+        """Forget resolved limits for one tenant, or for all tenants"""
+        if tenant_id is None:
+            self.rate_limit_policies.clear()
+        else:
+            for key in [key for key in self.rate_limit_policies if key[0] == tenant_id]:
+                del self.rate_limit_policies[key]
+    
+    async def get_rate_limit_status(self) -> Dict[str, Any]:
+        """Describe the rate limiter backend and cached tenant policies"""
+        return {**rate_limiter.status(), 'cached_policies': len(self.rate_limit_policies)}
+    
     async def validate_data_access(self, tenant_id: str, user_id: str, 
                                   resource_type: str, resource_id: str) -> bool:
         """Validate data access permissions"""
+        session = None
         try:
             # Get user permissions
             session = await tenant_config_manager.get_session(tenant_id)
@@ -279,6 +295,9 @@ class SecurityManager:
         except Exception as e:
             logger.error(f"Failed to validate data access: {e}")
             return False
+        finally:
+            if session is not None:
+                await session.close()
     
     async def sanitize_input(self, data: Union[str, Dict, List]) -> Union[str, Dict, List]:
         """Sanitize user input to prevent injection attacks"""
@@ -416,20 +435,17 @@ class SecurityManager:
             cutoff_date = datetime.utcnow() - timedelta(days=days)
             
             # Clean up in-memory logs
-            self.security_events = [
-                event for event in self.security_events
-                if datetime.fromisoformat(event['timestamp']) > cutoff_date
-            ]
+            self.security_events = deque(
+                (event for event in self.security_events
+                 if datetime.fromisoformat(event['timestamp']) > cutoff_date),
+                maxlen=settings.security_event_buffer_size
+            )
             
-            # Clean up rate limiters
-            current_time = datetime.utcnow()
-            for key, limiter in list(self.rate_limiters.items()):
-                limiter['requests'] = [
-                    req_time for req_time in limiter['requests']
-                    if current_time - req_time < timedelta(minutes=1)
-                ]
-                if not limiter['requests']:
-                    del self.rate_limiters[key]
+            # Drop expired rate limit policies; counters expire on their own
+            now = time.monotonic()
+            for key, (expires_at, _limit) in list(self.rate_limit_policies.items()):
+                if expires_at <= now:
+                    del self.rate_limit_policies[key]
             
             logger.info(f"Cleaned up security logs older than {days} days")
             
@@ -5,14 +5,26 @@ This module provides query optimization utilities and services to improve
 database performance across the IPSC application.
 """
 
+import inspect
 import logging
-from typing import List, Dict, Any, Optional, Union
-from sqlalchemy import text, func, and_, or_, desc, asc
-from sqlalchemy.orm import Session, joinedload, selectinload, subqueryload
+import pickle
+import sys
+import threading
+from collections import OrderedDict, defaultdict
+from functools import wraps
+from typing import List, Dict, Any, Callable, Hashable, Iterable, Optional, Set, Tuple, Union
+from fastapi import params
+from sqlalchemy import event, select, text, func, and_, or_, desc, asc
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session, joinedload, selectinload, subqueryload
 from sqlalchemy.exc import SQLAlchemyError
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 import time
 
+from ..config import settings
+from ..db import dialect_insert
+from ..models import CacheGeneration, Expense, Invoice, Party, Payment, Product, Purchase, PurchasePayment, StockLedgerEntry
+
 logger = logging.getLogger(__name__)
 
 
@@ -409,86 +421,378 @@ class QueryOptimizer:
         return (self.query_stats['optimized_queries'] / self.query_stats['total_queries']) * 100
 
 
+class _CacheEntry:
+    __slots__ = ('value', 'expires_at', 'size', 'tags', 'stamp')
+
+    def __init__(self, value: Any, expires_at: float, size: int, tags: Tuple[str, ...],
+                 stamp: Optional[Hashable] = None):
+        self.value = value
+        self.expires_at = expires_at
+        self.size = size
+        self.tags = tags
+        self.stamp = stamp
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate memory held by ``value``, in bytes"""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
 class QueryCache:
     """
-    Simple query result caching for frequently accessed data.
+    Thread-safe LRU cache of query results, namespaced by tenant.
+
+    Entries expire after ``ttl`` seconds, and the least recently used ones are
+    evicted in O(1) once the cache holds more than ``max_size`` entries or
+    ``max_bytes`` of (estimated) data. Each entry is tagged with the tables it
+    was computed from; committing a change to one of them drops every entry
+    carrying that tag (see the session events below).
+
+    Keys live in a per-tenant namespace. ``tenant_id=None`` is the cross-tenant
+    namespace: its entries are dropped by a write from any tenant, and a write
+    without a tenant drops the tag in every namespace.
+
+    Commits in other worker processes never reach this instance. For those,
+    ``get_or_set`` takes a ``stamp`` (see ``shared_generations``) and treats an
+    entry stored under a different stamp as stale.
     """
     
-    def __init__(self, max_size: int = 1000, ttl: int = 300):
-        self.cache = {}
-        self.max_size = max_size
-        self.ttl = ttl  # Time to live in seconds
-        self.access_times = {}
+    def __init__(self, max_size: Optional[int] = None, ttl: Optional[int] = None,
+                 max_bytes: Optional[int] = None, clock: Callable[[], float] = time.monotonic):
+        self.max_size = max_size if max_size is not None else settings.query_cache_max_entries
+        self.ttl = ttl if ttl is not None else settings.query_cache_ttl  # Time to live in seconds
+        self.max_bytes = max_bytes if max_bytes is not None else settings.query_cache_max_bytes
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        # tag -> keys (tenant_id, key) of the entries carrying it
+        self._tagged: Dict[str, Set[Hashable]] = defaultdict(set)
+        self._bytes = 0
+        # Bumped by every invalidation so results computed across one are not stored
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+        # Entries found but computed before a write committed by another process
+        self.stale = 0
+        # Calls of a cached function that ran uncached because their arguments had no key
+        self.bypasses = 0
     
-    def get(self, key: str) -> Optional[Any]:
+    def get(self, key: Hashable, tenant_id: Optional[int] = None) -> Optional[Any]:
         """
         Get cached value if it exists and is not expired.
         """
-        if key in self.cache:
-            # Check if cache entry is expired
-            if time.time() - self.access_times[key] > self.ttl:
-                self.delete(key)
+        full_key = (tenant_id, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is None:
+                self.misses += 1
                 return None
-            
-            # Update access time
-            self.access_times[key] = time.time()
-            return self.cache[key]
-        
-        return None
+            if entry.expires_at <= self._clock():
+                self._remove(full_key)
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(full_key)
+            self.hits += 1
+            return entry.value
     
-    def set(self, key: str, value: Any):
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = (), tenant_id: Optional[int] = None,
+            ttl: Optional[int] = None, size: Optional[int] = None, stamp: Optional[Hashable] = None):
         """
-        Set cache value with TTL.
+        Set cache value with TTL, tagged with the tables it depends on.
         """
-        # Evict oldest entries if cache is full
-        if len(self.cache) >= self.max_size:
-            self._evict_oldest()
+        size = size if size is not None else _estimate_size(value)
+        if self.max_size <= 0 or size > self.max_bytes:
+            return
+        full_key = (tenant_id, key)
+        tags = tuple(tags)
+        expires_at = self._clock() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._remove(full_key)
+            self._entries[full_key] = _CacheEntry(value, expires_at, size, tags, stamp)
+            self._bytes += size
+            for tag in tags:
+                self._tagged[tag].add(full_key)
+            while len(self._entries) > self.max_size or self._bytes > self.max_bytes:
+                oldest_key = next(iter(self._entries))
+                self._remove(oldest_key)
+                self.evictions += 1
+    
+    def get_or_set(self, key: Hashable, loader: Callable[[], Any], tags: Iterable[str] = (),
+                   tenant_id: Optional[int] = None, ttl: Optional[int] = None,
+                   stamp: Optional[Hashable] = None) -> Any:
+        """
+        Cached value for ``key``, computing and storing it with ``loader`` on a miss.
         
-        self.cache[key] = value
-        self.access_times[key] = time.time()
+        An entry stored with another ``stamp`` is stale and counts as a miss.
+        """
+        full_key = (tenant_id, key)
+        with self._lock:
+            entry = self._entries.get(full_key)
+            if entry is not None and entry.expires_at > self._clock():
+                if entry.stamp == stamp:
+                    self._entries.move_to_end(full_key)
+                    self.hits += 1
+                    return entry.value
+                self.stale += 1
+            self.misses += 1
+            generation = self._generation
+        value = loader()
+        # A write committed while loading may not be reflected in value
+        if generation == self._generation:
+            self.set(key, value, tags=tags, tenant_id=tenant_id, ttl=ttl, stamp=stamp)
+        return value
     
-    def delete(self, key: str):
+    def delete(self, key: Hashable, tenant_id: Optional[int] = None):
         """
         Delete cache entry.
         """
-        if key in self.cache:
-            del self.cache[key]
-            del self.access_times[key]
+        with self._lock:
+            self._remove((tenant_id, key))
     
-    def clear(self):
+    def invalidate(self, tags: Iterable[str], tenant_id: Optional[int] = None) -> int:
         """
-        Clear all cache entries.
+        Drop entries tagged with any of ``tags`` that a write by ``tenant_id`` can affect.
+        
+        Returns the number of entries dropped.
         """
-        self.cache.clear()
-        self.access_times.clear()
+        dropped = 0
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for full_key in list(self._tagged.get(tag, ())):
+                    if tenant_id is None or full_key[0] in (tenant_id, None):
+                        self._remove(full_key)
+                        dropped += 1
+            self.invalidations += dropped
+        return dropped
     
-    def _evict_oldest(self):
+    def record_bypass(self):
+        """
+        Count a call that skipped the cache because its arguments could not be keyed.
         """
-        Evict the oldest cache entry.
+        with self._lock:
+            self.bypasses += 1
+    
+    def clear(self):
         """
-        if not self.access_times:
+        Clear all cache entries.
+        """
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tagged.clear()
+            self._bytes = 0
+    
+    def _remove(self, full_key: Hashable):
+        entry = self._entries.pop(full_key, None)
+        if entry is None:
             return
-        
-        oldest_key = min(self.access_times.keys(), key=lambda k: self.access_times[k])
-        self.delete(oldest_key)
+        self._bytes -= entry.size
+        for tag in entry.tags:
+            keys = self._tagged.get(tag)
+            if keys is not None:
+                keys.discard(full_key)
+                if not keys:
+                    del self._tagged[tag]
     
     def get_stats(self) -> Dict[str, Any]:
         """
         Get cache statistics.
         """
-        return {
-            'size': len(self.cache),
-            'max_size': self.max_size,
-            'ttl': self.ttl,
-            'oldest_entry': min(self.access_times.values()) if self.access_times else None,
-            'newest_entry': max(self.access_times.values()) if self.access_times else None
-        }
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups * 100) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'invalidations': self.invalidations,
+                'stale': self.stale,
+                'bypasses': self.bypasses
+            }
 
 
 # Global query cache instance
 query_cache = QueryCache()
 
 
+# Cache tag of each table whose writes invalidate cached results
+CACHE_TAGS: Dict[Any, str] = {
+    Invoice: 'invoices',
+    Payment: 'payments',
+    Product: 'products',
+    StockLedgerEntry: 'stock',
+    Purchase: 'purchases',
+    PurchasePayment: 'purchase_payments',
+    Expense: 'expenses',
+    Party: 'parties',
+}
+
+# Tag groups for reports over money movements and over stock
+LEDGER_TAGS = ('invoices', 'payments', 'purchases', 'purchase_payments', 'expenses')
+INVENTORY_TAGS = ('products', 'stock')
+
+_CHANGED_TAGS_KEY = 'query_cache_changed_tags'
+
+
+def _mark_changed(session: Session, tenant_id: Optional[int], tag: str):
+    session.info.setdefault(_CHANGED_TAGS_KEY, set()).add((tenant_id, tag))
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_writes(session: Session, flush_context):
+    for obj in (*session.new, *session.deleted):
+        tag = CACHE_TAGS.get(type(obj))
+        if tag is not None:
+            _mark_changed(session, getattr(obj, 'tenant_id', None), tag)
+    for obj in session.dirty:
+        tag = CACHE_TAGS.get(type(obj))
+        if tag is not None and session.is_modified(obj):
+            _mark_changed(session, getattr(obj, 'tenant_id', None), tag)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_writes(state: ORMExecuteState):
+    """Bulk INSERT/UPDATE/DELETE may touch any tenant's rows"""
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return None
+    mapper = state.bind_mapper
+    tag = CACHE_TAGS.get(mapper.class_) if mapper is not None else None
+    if tag is not None:
+        _mark_changed(state.session, None, tag)
+    return None
+
+
+def shared_generations(session: Session, tags: Iterable[str]) -> Tuple[int, ...]:
+    """
+    Current cache_generations of ``tags``, in order (0 for a tag never written).
+    
+    Every commit that changes a tagged table bumps its row, whichever worker
+    process runs it, so a result stored with an older stamp is out of date.
+    """
+    tags = tuple(tags)
+    rows = dict(session.execute(
+        select(CacheGeneration.tag, CacheGeneration.generation).where(CacheGeneration.tag.in_(tags))
+    ).all())
+    return tuple(rows.get(tag, 0) for tag in tags)
+
+
+def bump_shared_generations(connection: Connection, tags: List[str]):
+    """
+    Increment the cache_generations of ``tags`` inside the caller's transaction.
+    """
+    generations = CacheGeneration.__table__
+    stmt = dialect_insert(connection, generations).values([{'tag': tag, 'generation': 1} for tag in tags])
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['tag'],
+        set_={'generation': generations.c.generation + 1},
+    )
+    connection.execute(stmt)
+
+
+@event.listens_for(Session, "before_commit")
+def _bump_generations_before_commit(session: Session):
+    """Publish the changed tags to other processes in the committing transaction"""
+    if session.get_nested_transaction() is not None:
+        return
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    changed = session.info.get(_CHANGED_TAGS_KEY)
+    if changed:
+        # Sorted so concurrent commits lock the rows in the same order
+        bump_shared_generations(session.connection(), sorted({tag for _, tag in changed}))
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session):
+    changed = session.info.pop(_CHANGED_TAGS_KEY, None)
+    if not changed:
+        return
+    by_tenant: Dict[Optional[int], Set[str]] = defaultdict(set)
+    for tenant_id, tag in changed:
+        by_tenant[tenant_id].add(tag)
+    for tenant_id, tags in by_tenant.items():
+        query_cache.invalidate(tags, tenant_id=tenant_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_tags(session: Session):
+    session.info.pop(_CHANGED_TAGS_KEY, None)
+
+
+_KEY_TYPES = (str, int, float, bool, date, type(None))
+
+
+def _key_value(value: Any) -> Any:
+    if isinstance(value, _KEY_TYPES):
+        return value
+    if isinstance(value, (list, tuple)) and all(isinstance(item, _KEY_TYPES) for item in value):
+        return tuple(value)
+    raise TypeError(f"Unhashable cache key argument: {type(value).__name__}")
+
+
+def cached_query(*tags: str, ttl: Optional[int] = None):
+    """
+    Cache a sync endpoint's result in ``query_cache``, keyed by its arguments.
+    
+    Dependency-injected parameters (the session, the current user) and any
+    Session or ORM object are left out of the key. The endpoints this wraps
+    read the legacy database without a tenant filter, so every caller gets
+    the same result: entries live in the cross-tenant namespace and a
+    matching write by any tenant drops them. Keying by the caller's tenant
+    would only store copies that a write by another tenant leaves in place.
+    
+    When the call has a Session argument, the tags' ``shared_generations``
+    are read through it on every call, so a write committed by another worker
+    process is seen at once rather than after the TTL.
+    
+    A call whose other arguments cannot be keyed runs uncached; it is counted
+    in ``query_cache.get_stats()['bypasses']`` and logged once per function.
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        injected = {
+            name for name, parameter in signature.parameters.items()
+            if isinstance(parameter.default, params.Depends)
+        }
+        warned = False
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            nonlocal warned
+            try:
+                arguments = signature.bind_partial(*args, **kwargs).arguments
+                key_params = tuple(sorted(
+                    (name, _key_value(value)) for name, value in arguments.items()
+                    if name not in injected and not isinstance(value, Session) and not hasattr(value, '__table__')
+                ))
+            except TypeError as e:
+                query_cache.record_bypass()
+                if not warned:
+                    warned = True
+                    logger.warning(f"{func.__qualname__} ran uncached: {e}")
+                return func(*args, **kwargs)
+            key = (func.__module__, func.__qualname__, key_params)
+            session = next((value for value in arguments.values() if isinstance(value, Session)), None)
+            stamp = shared_generations(session, tags) if session is not None else None
+            return query_cache.get_or_set(key, lambda: func(*args, **kwargs), tags=tags, ttl=ttl, stamp=stamp)
+        return wrapper
+    return decorator
+
+
 def get_query_optimizer(db: Session) -> QueryOptimizer:
     """
     Factory function to create QueryOptimizer instance.
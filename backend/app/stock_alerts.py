@@ -0,0 +1,150 @@
+"""
+Stock alerts
+Keeps stock_alerts holding every active product at or below its reorder
+level. Products whose stock, status or purchase history changed in a
+transaction are re-evaluated with one set-based DELETE and INSERT ... SELECT
+just before it commits, so reading alerts never scans the catalogue.
+"""
+
+from datetime import datetime
+from typing import Iterable, Optional, Set
+
+from sqlalchemy import case, delete, event, func, insert, literal, select
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .models import Product, StockAlert, StockLedgerEntry
+
+# Products have no reorder settings of their own yet
+DEFAULT_REORDER_LEVEL = 10
+DEFAULT_REORDER_QUANTITY = 20
+
+# Products per IN (...) list when refreshing
+REFRESH_CHUNK_SIZE = 500
+
+_DIRTY_KEY = "stock_alerts_dirty"
+_DIRTY_ALL_KEY = "stock_alerts_dirty_all"
+
+
+def last_purchase_dates():
+    """Subquery of each product's latest incoming ledger row"""
+    return (
+        select(
+            StockLedgerEntry.product_id,
+            func.max(StockLedgerEntry.created_at).label("last_purchase_at"),
+        )
+        .where(StockLedgerEntry.entry_type == "in")
+        .group_by(StockLedgerEntry.product_id)
+        .subquery()
+    )
+
+
+def urgency(stock, reorder_level):
+    """critical when out of stock, high at half the reorder level, then medium"""
+    return case(
+        (stock == 0, "critical"),
+        (stock <= reorder_level * 0.5, "high"),
+        (stock <= reorder_level, "medium"),
+        else_="low",
+    )
+
+
+def low_stock_query(threshold: int = DEFAULT_REORDER_LEVEL):
+    """Active products with stock at or below ``threshold`` and their last purchase date
+
+    Urgency is always judged against the reorder level, whatever the threshold.
+    """
+    purchases = last_purchase_dates()
+    return (
+        select(
+            Product.id.label("product_id"),
+            Product.stock.label("current_stock"),
+            literal(DEFAULT_REORDER_LEVEL).label("reorder_level"),
+            urgency(Product.stock, DEFAULT_REORDER_LEVEL).label("urgency"),
+            purchases.c.last_purchase_at,
+        )
+        .outerjoin(purchases, purchases.c.product_id == Product.id)
+        .where(Product.is_active == True, Product.stock <= threshold)
+    )
+
+
+def refresh_stock_alerts(connection: Connection, product_ids: Optional[Iterable[int]] = None) -> None:
+    """Recompute alerts for ``product_ids``, or for every product when None"""
+    now = datetime.utcnow()
+    columns = ["product_id", "current_stock", "reorder_level", "urgency", "last_purchase_at", "updated_at"]
+
+    def rebuild(chunk: Optional[list]) -> None:
+        source = low_stock_query().add_columns(literal(now).label("updated_at"))
+        clear = delete(StockAlert)
+        if chunk is not None:
+            source = source.where(Product.id.in_(chunk))
+            clear = clear.where(StockAlert.product_id.in_(chunk))
+        connection.execute(clear)
+        connection.execute(insert(StockAlert).from_select(columns, source))
+
+    if product_ids is None:
+        rebuild(None)
+        return
+    product_ids = sorted(set(product_ids))
+    for i in range(0, len(product_ids), REFRESH_CHUNK_SIZE):
+        rebuild(product_ids[i:i + REFRESH_CHUNK_SIZE])
+
+
+def _mark(session: Session, product_ids: Iterable[int]) -> None:
+    session.info.setdefault(_DIRTY_KEY, set()).update(pid for pid in product_ids if pid is not None)
+
+
+@event.listens_for(Session, "before_flush")
+def _drop_alerts_of_deleted_products(session: Session, flush_context, instances) -> None:
+    deleted = [obj.id for obj in session.deleted if isinstance(obj, Product)]
+    if deleted:
+        session.connection().execute(delete(StockAlert).where(StockAlert.product_id.in_(deleted)))
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_products(session: Session, flush_context) -> None:
+    dirty: Set[int] = set()
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Product):
+            dirty.add(obj.id)
+        elif isinstance(obj, StockLedgerEntry) and obj.entry_type == "in":
+            dirty.add(obj.product_id)
+    if dirty:
+        _mark(session, dirty)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(state: ORMExecuteState):
+    """Note products touched by bulk UPDATEs of products and bulk ledger INSERTs"""
+    mapper = state.bind_mapper
+    if mapper is None:
+        return None
+    if mapper.class_ is Product and state.is_update:
+        where = state.statement.whereclause
+        if where is None:
+            state.session.info[_DIRTY_ALL_KEY] = True
+        else:
+            _mark(state.session, state.session.connection().execute(select(Product.id).where(where)).scalars())
+    elif mapper.class_ is StockLedgerEntry and state.is_insert:
+        params = state.parameters
+        rows = params if isinstance(params, list) else [params] if params else []
+        _mark(state.session, (row["product_id"] for row in rows if row.get("entry_type") == "in"))
+    return None
+
+
+@event.listens_for(Session, "before_commit")
+def _refresh_before_commit(session: Session) -> None:
+    if session.new or session.dirty or session.deleted:
+        session.flush()
+    refresh_all = session.info.pop(_DIRTY_ALL_KEY, False)
+    product_ids = session.info.pop(_DIRTY_KEY, None)
+    if refresh_all:
+        refresh_stock_alerts(session.connection())
+    elif product_ids:
+        refresh_stock_alerts(session.connection(), product_ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_dirty(session: Session) -> None:
+    session.info.pop(_DIRTY_KEY, None)
+    session.info.pop(_DIRTY_ALL_KEY, None)
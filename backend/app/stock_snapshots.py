@@ -0,0 +1,284 @@
+"""
+Stock snapshots
+Keeps opening and closing stock, as quantity and value, per product per
+financial year in stock_snapshots. Snapshots are updated in the same
+transaction as the stock ledger rows that move stock, so movement reports read
+one snapshot per product instead of summing the product's whole ledger.
+
+A product's snapshot for a year is seeded from the ledger when stock first
+moves in that year, and ``backfill_snapshots`` seeds the current year for
+every product at startup. Readers never write: ``get_snapshots`` computes a
+missing snapshot from the ledger without storing it.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import bindparam, case, event, func, select, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from .db import dialect_insert
+from .models import Product, StockLedgerEntry, StockSnapshot
+
+logger = logging.getLogger(__name__)
+
+snapshots = StockSnapshot.__table__
+
+# Products per IN (...) list / multi-row insert when seeding
+SEED_CHUNK_SIZE = 500
+
+# (product_id, entry_type, qty, created_at)
+Movement = Tuple[int, str, float, Optional[datetime]]
+
+
+def fy_start_year(moment: datetime) -> int:
+    """Start year of the Indian financial year (April to March) containing ``moment``"""
+    return moment.year if moment.month >= 4 else moment.year - 1
+
+
+def fy_bounds(start_year: int) -> Tuple[datetime, datetime]:
+    """Half-open range [1 April start_year, 1 April start_year + 1) of a financial year"""
+    return datetime(start_year, 4, 1), datetime(start_year + 1, 4, 1)
+
+
+def signed_stock_qty():
+    """Stock effect of a ledger entry: in adds, out removes, adjust is signed
+
+    Some writers store outgoing quantities as positive numbers and others as
+    negative ones, so ``out`` always counts as a removal of ``abs(qty)``.
+    """
+    return case(
+        (StockLedgerEntry.entry_type.in_(('in', 'adjust')), StockLedgerEntry.qty),
+        (StockLedgerEntry.entry_type == 'out', -func.abs(StockLedgerEntry.qty)),
+        else_=0
+    )
+
+
+def signed_qty(entry_type: str, qty: float) -> float:
+    """Python counterpart of ``signed_stock_qty`` for a single entry"""
+    if entry_type in ('in', 'adjust'):
+        return qty or 0
+    if entry_type == 'out':
+        return -abs(qty or 0)
+    return 0
+
+
+def unit_cost():
+    """Price stock is valued at: the purchase price, else the sales price"""
+    return func.coalesce(func.nullif(Product.purchase_price, 0), func.nullif(Product.sales_price, 0), 0)
+
+
+def _ledger_snapshots(connection: Connection, product_ids: List[int], start_year: int) -> Dict[int, dict]:
+    """Snapshot figures of ``product_ids`` for a year computed from the ledger, by product"""
+    start, end = fy_bounds(start_year)
+    signed = signed_stock_qty()
+    value = signed * unit_cost()
+    before = StockLedgerEntry.created_at < start
+    totals = {
+        row.product_id: row for row in connection.execute(
+            select(
+                StockLedgerEntry.product_id,
+                func.sum(case((before, signed), else_=0)).label("opening_qty"),
+                func.sum(case((before, value), else_=0)).label("opening_value"),
+                func.sum(signed).label("closing_qty"),
+                func.sum(value).label("closing_value"),
+            )
+            .join(Product, Product.id == StockLedgerEntry.product_id)
+            .where(StockLedgerEntry.product_id.in_(product_ids), StockLedgerEntry.created_at < end)
+            .group_by(StockLedgerEntry.product_id)
+        )
+    }
+    result = {}
+    for product_id in product_ids:
+        row = totals.get(product_id)
+        result[product_id] = {
+            "product_id": product_id,
+            "fy_start_year": start_year,
+            "opening_qty": float(row.opening_qty or 0) if row else 0.0,
+            "opening_value": float(row.opening_value or 0) if row else 0.0,
+            "closing_qty": float(row.closing_qty or 0) if row else 0.0,
+            "closing_value": float(row.closing_value or 0) if row else 0.0,
+        }
+    return result
+
+
+def seed_snapshots(connection: Connection, product_ids: Iterable[int], start_year: int) -> Set[int]:
+    """Create the missing snapshots of ``product_ids`` for a year from the ledger
+
+    Returns the products whose snapshot this call created. Their figures
+    already include every ledger row visible to the caller's transaction; a
+    snapshot created concurrently by another transaction is left alone.
+    """
+    product_ids = list(dict.fromkeys(product_ids))
+    created: Set[int] = set()
+
+    for i in range(0, len(product_ids), SEED_CHUNK_SIZE):
+        chunk = product_ids[i:i + SEED_CHUNK_SIZE]
+        existing = set(connection.execute(
+            select(snapshots.c.product_id).where(
+                snapshots.c.product_id.in_(chunk),
+                snapshots.c.fy_start_year == start_year
+            )
+        ).scalars())
+        missing = [product_id for product_id in chunk if product_id not in existing]
+        if not missing:
+            continue
+
+        now = datetime.utcnow()
+        rows = [
+            {**row, "updated_at": now}
+            for row in _ledger_snapshots(connection, missing, start_year).values()
+        ]
+        stmt = (
+            dialect_insert(connection, snapshots)
+            .values(rows)
+            .on_conflict_do_nothing(index_elements=["product_id", "fy_start_year"])
+            .returning(snapshots.c.product_id)
+        )
+        created.update(connection.execute(stmt).scalars())
+    return created
+
+
+def backfill_snapshots(connection: Connection, start_year: Optional[int] = None) -> int:
+    """Seed the snapshots every product is missing for a year (default: the current one)
+
+    Returns the number of snapshots created. Run at startup, so reports of
+    the current year find every snapshot stored.
+    """
+    if start_year is None:
+        start_year = fy_start_year(datetime.now())
+    product_ids = list(connection.execute(select(Product.id).order_by(Product.id)).scalars())
+    created = seed_snapshots(connection, product_ids, start_year)
+    if created:
+        logger.info(f"Seeded {len(created)} stock snapshots for FY {start_year}-{start_year + 1}")
+    return len(created)
+
+
+def apply_movements(connection: Connection, movements: Iterable[Movement], sign: int = 1) -> None:
+    """Fold ledger rows just written (``sign`` 1) or removed (``sign`` -1) into the snapshots
+
+    The row's own year moves its closing stock and every later year that has
+    a snapshot moves both opening and closing stock. Work is per year, not per
+    product: one seeding pass and two executemany UPDATEs whatever the number
+    of products moved.
+    """
+    deltas: Dict[int, Dict[int, float]] = defaultdict(lambda: defaultdict(float))
+    now = datetime.utcnow()
+    for product_id, entry_type, qty, created_at in movements:
+        deltas[fy_start_year(created_at or now)][product_id] += sign * signed_qty(entry_type, qty)
+    deltas = {
+        start_year: {product_id: qty for product_id, qty in by_product.items() if qty}
+        for start_year, by_product in deltas.items()
+    }
+    deltas = {start_year: by_product for start_year, by_product in deltas.items() if by_product}
+    if not deltas:
+        return
+
+    product_ids = {product_id for by_product in deltas.values() for product_id in by_product}
+    costs = dict(connection.execute(
+        select(Product.id, unit_cost()).where(Product.id.in_(product_ids))
+    ).all())
+    move_closing = (
+        update(snapshots)
+        .where(snapshots.c.product_id == bindparam("b_product_id"), snapshots.c.fy_start_year == bindparam("b_year"))
+        .values(
+            closing_qty=snapshots.c.closing_qty + bindparam("b_qty"),
+            closing_value=snapshots.c.closing_value + bindparam("b_value"),
+            updated_at=now,
+        )
+    )
+    move_later_years = (
+        update(snapshots)
+        .where(snapshots.c.product_id == bindparam("b_product_id"), snapshots.c.fy_start_year > bindparam("b_year"))
+        .values(
+            opening_qty=snapshots.c.opening_qty + bindparam("b_qty"),
+            opening_value=snapshots.c.opening_value + bindparam("b_value"),
+            closing_qty=snapshots.c.closing_qty + bindparam("b_qty"),
+            closing_value=snapshots.c.closing_value + bindparam("b_value"),
+            updated_at=now,
+        )
+    )
+    for start_year, by_product in sorted(deltas.items()):
+        # Snapshots seeded now already include these rows
+        seeded = seed_snapshots(connection, sorted(by_product), start_year)
+        params = [
+            {
+                "b_product_id": product_id,
+                "b_year": start_year,
+                "b_qty": qty,
+                "b_value": qty * float(costs.get(product_id) or 0),
+            }
+            for product_id, qty in sorted(by_product.items())
+        ]
+        existing = [row for row in params if row["b_product_id"] not in seeded]
+        if existing:
+            connection.execute(move_closing, existing)
+        connection.execute(move_later_years, params)
+
+
+def get_snapshots(db: Session, product_ids: List[int], start_year: int) -> Dict[int, StockSnapshot]:
+    """Snapshots of ``product_ids`` for a year; read-only
+
+    A product without a stored snapshot gets one computed from the ledger,
+    as a transient ``StockSnapshot`` that is not added to the session.
+    """
+    result: Dict[int, StockSnapshot] = {}
+    for i in range(0, len(product_ids), SEED_CHUNK_SIZE):
+        chunk = product_ids[i:i + SEED_CHUNK_SIZE]
+        for snapshot in db.query(StockSnapshot).filter(
+            StockSnapshot.product_id.in_(chunk),
+            StockSnapshot.fy_start_year == start_year
+        ):
+            result[snapshot.product_id] = snapshot
+        missing = [product_id for product_id in chunk if product_id not in result]
+        if missing:
+            for product_id, values in _ledger_snapshots(db.connection(), missing, start_year).items():
+                result[product_id] = StockSnapshot(**values)
+    return result
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_entries(session: Session, flush_context) -> None:
+    added = [obj for obj in session.new if isinstance(obj, StockLedgerEntry)]
+    removed = [obj for obj in session.deleted if isinstance(obj, StockLedgerEntry)]
+    if not added and not removed:
+        return
+    connection = session.connection()
+    apply_movements(connection, [(e.product_id, e.entry_type, e.qty, e.created_at) for e in added])
+    apply_movements(connection, [(e.product_id, e.entry_type, e.qty, e.created_at) for e in removed], sign=-1)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_bulk_statements(state: ORMExecuteState):
+    """Keep snapshots current for bulk INSERT and Query.delete() on the ledger"""
+    if not (state.is_insert or state.is_delete):
+        return None
+    mapper = state.bind_mapper
+    if mapper is None or mapper.class_ is not StockLedgerEntry:
+        return None
+
+    connection = state.session.connection()
+    if state.is_insert:
+        result = state.invoke_statement()
+        params = state.parameters
+        rows = params if isinstance(params, list) else [params] if params else []
+        if not rows:
+            logger.warning("Stock ledger insert without parameters; snapshots not updated")
+        apply_movements(connection, [
+            (row["product_id"], row["entry_type"], row["qty"], row.get("created_at")) for row in rows
+        ])
+        return result
+
+    where = state.statement.whereclause
+    query = select(
+        StockLedgerEntry.product_id, StockLedgerEntry.entry_type, StockLedgerEntry.qty, StockLedgerEntry.created_at
+    )
+    if where is not None:
+        query = query.where(where)
+    removed = connection.execute(query).all()
+    result = state.invoke_statement()
+    apply_movements(connection, [tuple(row) for row in removed], sign=-1)
+    return result
@@ -0,0 +1,228 @@
+"""
+Tenant resolution cache
+In-process cache of tenants by slug, custom domain and id, and of their
+feature flags, so the tenant middleware resolves a request with a dict lookup.
+
+Entries expire after a TTL so changes made by other processes are picked up,
+and TenantService drops them explicitly when a tenant or its settings change.
+Misses are loaded in the threadpool with a short-lived session, keeping
+database I/O off the event loop. Lookup keys come from request headers, so
+each table is an LRU bounded to ``max_entries``.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy import and_, inspect as sa_inspect
+from starlette.concurrency import run_in_threadpool
+
+from .db import LegacySessionLocal
+from .tenant_models import Tenant, TenantSettings
+
+TENANT_CACHE_TTL_SECONDS = float(os.getenv('TENANT_CACHE_TTL_SECONDS', '60'))
+# Unknown slugs/domains are remembered for less time so new tenants show up quickly
+TENANT_CACHE_NEGATIVE_TTL_SECONDS = float(os.getenv('TENANT_CACHE_NEGATIVE_TTL_SECONDS', '10'))
+TENANT_CACHE_MAX_ENTRIES = int(os.getenv('TENANT_CACHE_MAX_ENTRIES', '10000'))
+
+# Lookup kinds; a key is (kind, value)
+BY_ID = "id"
+BY_SLUG = "slug"
+BY_DOMAIN = "domain"
+
+LookupKey = Tuple[str, str]
+
+_MISSING = object()
+
+
+class TenantSnapshot:
+    """Read-only copy of a tenant's columns, safe to share between requests
+
+    Exposes the same attributes as the ``Tenant`` columns, so it can stand in
+    for the model in ``request.state.tenant`` and ``from_attributes`` schemas.
+    """
+    __slots__ = ("_values",)
+
+    def __init__(self, tenant: Tenant):
+        values = {attr.key: getattr(tenant, attr.key) for attr in sa_inspect(Tenant).column_attrs}
+        object.__setattr__(self, "_values", values)
+
+    def __getattr__(self, name: str) -> Any:
+        try:
+            return self._values[name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __setattr__(self, name: str, value: Any) -> None:
+        raise AttributeError("TenantSnapshot is read-only")
+
+    def __repr__(self) -> str:
+        return f"<TenantSnapshot id={self._values.get('id')} slug={self._values.get('slug')!r}>"
+
+
+class TenantCache:
+    """Thread-safe TTL + LRU cache of tenant lookups and feature flags"""
+
+    def __init__(
+        self,
+        ttl_seconds: float = TENANT_CACHE_TTL_SECONDS,
+        negative_ttl_seconds: float = TENANT_CACHE_NEGATIVE_TTL_SECONDS,
+        max_entries: int = TENANT_CACHE_MAX_ENTRIES,
+        clock: Callable[[], float] = time.monotonic
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._tenants: "OrderedDict[LookupKey, Tuple[float, Optional[TenantSnapshot]]]" = OrderedDict()
+        self._features: "OrderedDict[Tuple[int, str], Tuple[float, bool]]" = OrderedDict()
+
+    def _get(self, entries: "OrderedDict[Hashable, Tuple[float, Any]]", key: Hashable) -> Any:
+        with self._lock:
+            entry = entries.get(key)
+            if entry is None:
+                return _MISSING
+            if entry[0] <= self._clock():
+                del entries[key]
+                return _MISSING
+            entries.move_to_end(key)
+            return entry[1]
+
+    def _put(self, entries: "OrderedDict[Hashable, Tuple[float, Any]]", key: Hashable, ttl: float, value: Any) -> None:
+        with self._lock:
+            entries[key] = (self._clock() + ttl, value)
+            entries.move_to_end(key)
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+
+    def get_tenant(self, key: LookupKey) -> Any:
+        """Cached tenant (or None for a known miss) for ``key``; ``_MISSING`` when not cached"""
+        return self._get(self._tenants, key)
+
+    def put_tenant(self, key: LookupKey, tenant: Optional[TenantSnapshot]) -> None:
+        ttl = self.ttl_seconds if tenant is not None else self.negative_ttl_seconds
+        self._put(self._tenants, key, ttl, tenant)
+
+    def get_feature(self, tenant_id: int, feature: str) -> Any:
+        return self._get(self._features, (tenant_id, feature))
+
+    def put_feature(self, tenant_id: int, feature: str, enabled: bool) -> None:
+        self._put(self._features, (tenant_id, feature), self.ttl_seconds, enabled)
+
+    def invalidate_tenant(self, tenant_id: Optional[int] = None) -> None:
+        """Drop every lookup of ``tenant_id`` plus remembered misses
+
+        Misses go too because a created or renamed tenant may now answer a
+        slug or domain that previously matched nothing.
+        """
+        with self._lock:
+            self._tenants = OrderedDict(
+                (key, entry) for key, entry in self._tenants.items()
+                if entry[1] is not None and entry[1].id != tenant_id
+            )
+
+    def invalidate_features(self, tenant_id: int) -> None:
+        with self._lock:
+            self._features = OrderedDict(
+                (key, entry) for key, entry in self._features.items() if key[0] != tenant_id
+            )
+
+    def clear(self) -> None:
+        with self._lock:
+            self._tenants.clear()
+            self._features.clear()
+
+
+tenant_cache = TenantCache()
+
+
+def _load_tenants(keys: Iterable[LookupKey]) -> Dict[LookupKey, Optional[TenantSnapshot]]:
+    db = LegacySessionLocal()
+    try:
+        found: Dict[LookupKey, Optional[TenantSnapshot]] = {}
+        for kind, value in keys:
+            query = db.query(Tenant)
+            if kind == BY_ID:
+                try:
+                    tenant = query.filter(Tenant.id == int(value)).first()
+                except (ValueError, TypeError):
+                    tenant = None
+            elif kind == BY_SLUG:
+                tenant = query.filter(Tenant.slug == value).first()
+            else:
+                tenant = query.filter(Tenant.domain == value).first()
+            found[(kind, value)] = TenantSnapshot(tenant) if tenant is not None else None
+        return found
+    finally:
+        db.close()
+
+
+async def resolve_tenant(keys: Iterable[LookupKey]) -> Optional[TenantSnapshot]:
+    """First tenant matching ``keys`` in order, loading uncached keys in one threadpool call"""
+    keys = list(dict.fromkeys(keys))
+    resolved: Dict[LookupKey, Optional[TenantSnapshot]] = {}
+    missing = []
+    for key in keys:
+        cached = tenant_cache.get_tenant(key)
+        if cached is _MISSING:
+            missing.append(key)
+        else:
+            resolved[key] = cached
+            if cached is not None and not missing:
+                return cached
+
+    if missing:
+        loaded = await run_in_threadpool(_load_tenants, missing)
+        for key, tenant in loaded.items():
+            tenant_cache.put_tenant(key, tenant)
+        resolved.update(loaded)
+
+    for key in keys:
+        if resolved.get(key) is not None:
+            return resolved[key]
+    return None
+
+
+def remember_tenant(tenant: Tenant) -> TenantSnapshot:
+    """Cache ``tenant`` under its id and slug (and domain, if any) and return its snapshot"""
+    snapshot = TenantSnapshot(tenant)
+    tenant_cache.put_tenant((BY_ID, str(snapshot.id)), snapshot)
+    tenant_cache.put_tenant((BY_SLUG, snapshot.slug), snapshot)
+    if snapshot.domain:
+        tenant_cache.put_tenant((BY_DOMAIN, snapshot.domain), snapshot)
+    return snapshot
+
+
+def _load_feature(tenant_id: int, feature: str) -> bool:
+    db = LegacySessionLocal()
+    try:
+        value = db.query(TenantSettings.setting_value).filter(
+            and_(
+                TenantSettings.tenant_id == tenant_id,
+                TenantSettings.category == "features",
+                TenantSettings.setting_key == feature
+            )
+        ).scalar()
+        return bool(value) and value.lower() == "true"
+    finally:
+        db.close()
+
+
+def feature_enabled(tenant_id: int, feature: str) -> bool:
+    """Whether the tenant's ``features`` setting enables ``feature``; blocking on a cache miss"""
+    enabled = tenant_cache.get_feature(tenant_id, feature)
+    if enabled is _MISSING:
+        enabled = _load_feature(tenant_id, feature)
+        tenant_cache.put_feature(tenant_id, feature, enabled)
+    return enabled
+
+
+async def tenant_has_feature(tenant_id: int, feature: str) -> bool:
+    """``feature_enabled`` for async callers, loading misses in the threadpool"""
+    enabled = tenant_cache.get_feature(tenant_id, feature)
+    if enabled is _MISSING:
+        enabled = await run_in_threadpool(feature_enabled, tenant_id, feature)
+    return enabled
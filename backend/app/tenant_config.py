@@ -5,8 +5,11 @@ Handles tenant-specific database connections, branding, and feature configuratio
 
 import os
 import json
+import time
 import asyncio
-from typing import Dict, Any, Optional, List
+import weakref
+from collections import OrderedDict
+from typing import Callable, Dict, Any, Optional, List
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
@@ -28,6 +31,9 @@ class TenantConfig:
         self.gst_number = config.get('gst_number', '')
         self.contact_info = config.get('contact_info', {})
         self.is_active = config.get('is_active', True)
+        # Connection pool of this tenant's engine; None uses the tenant engine defaults
+        self.pool_size = config.get('pool_size')
+        self.max_overflow = config.get('max_overflow')
         
     def to_dict(self) -> Dict[str, Any]:
         """Convert config to dictionary"""
@@ -39,7 +45,196 @@ class TenantConfig:
             'features': self.features,
             'gst_number': self.gst_number,
             'contact_info': self.contact_info,
-            'is_active': self.is_active
+            'is_active': self.is_active,
+            'pool_size': self.pool_size,
+            'max_overflow': self.max_overflow
+        }
+
+
+class TenantEnginesExhausted(RuntimeError):
+    """Raised when a tenant engine would exceed the connection budget and none can be freed"""
+
+
+class _TenantSession(AsyncSession):
+    """AsyncSession that hands its lease on the tenant engine back when closed"""
+
+    _release: Optional[weakref.finalize] = None
+
+    async def close(self) -> None:
+        try:
+            await super().close()
+        finally:
+            if self._release is not None:
+                # A finalizer runs at most once, however often close() is called
+                self._release()
+
+
+class _TenantEngine:
+    __slots__ = ('engine', 'session_factory', 'connections', 'last_used', 'sessions')
+
+    def __init__(self, engine, session_factory, connections: int):
+        self.engine = engine
+        self.session_factory = session_factory
+        self.connections = connections
+        self.last_used = time.monotonic()
+        # Sessions handed out and not yet closed
+        self.sessions = 0
+
+    def checked_out(self) -> int:
+        return self.engine.pool.checkedout()
+
+    def in_use(self) -> bool:
+        """Whether a live session or a checked-out connection still needs the engine"""
+        return self.sessions > 0 or self.checked_out() > 0
+
+    def open_session(self) -> AsyncSession:
+        """New session counted against this engine until it is closed or garbage collected"""
+        session = self.session_factory()
+        self.sessions += 1
+        session._release = weakref.finalize(session, self._release_session)
+        return session
+
+    def _release_session(self) -> None:
+        self.sessions -= 1
+
+
+class TenantEngineRegistry:
+    """Per-tenant async engines within a global connection budget
+
+    Each engine reserves ``pool_size + max_overflow`` connections of
+    ``max_connections``. Engines are kept in least-recently-used order: when a
+    new one would not fit, idle engines are disposed oldest first, and engines
+    unused for ``idle_timeout`` seconds are disposed by a periodic sweep. An
+    engine is idle only once every session it handed out is closed and no
+    connection is checked out, so a session between queries never loses its
+    engine. Looking up an existing engine takes no lock.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = settings.tenant_engine_max_connections,
+        idle_timeout: float = settings.tenant_engine_idle_timeout,
+        sweep_interval: float = 60.0
+    ):
+        self.max_connections = max_connections
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self._engines: "OrderedDict[str, _TenantEngine]" = OrderedDict()
+        self._lock = asyncio.Lock()
+        self._last_sweep = time.monotonic()
+        self._sweep_task: Optional[asyncio.Task] = None
+        self.created = 0
+        self.disposed = 0
+
+    def lookup(self, tenant_id: str) -> Optional[_TenantEngine]:
+        """Existing engine of ``tenant_id``, marked as just used"""
+        entry = self._engines.get(tenant_id)
+        if entry is not None:
+            now = time.monotonic()
+            entry.last_used = now
+            self._engines.move_to_end(tenant_id)
+            if now - self._last_sweep >= self.sweep_interval and (self._sweep_task is None or self._sweep_task.done()):
+                self._last_sweep = now
+                self._sweep_task = asyncio.get_running_loop().create_task(self.dispose_idle())
+        return entry
+
+    @property
+    def reserved_connections(self) -> int:
+        return sum(entry.connections for entry in self._engines.values())
+
+    async def get_or_create(self, tenant_id: str, config: TenantConfig) -> _TenantEngine:
+        entry = self.lookup(tenant_id)
+        if entry is not None:
+            return entry
+        async with self._lock:
+            entry = self.lookup(tenant_id)
+            if entry is not None:
+                return entry
+
+            pool_size = config.pool_size if config.pool_size is not None else settings.tenant_engine_pool_size
+            max_overflow = config.max_overflow if config.max_overflow is not None else settings.tenant_engine_max_overflow
+            await self._make_room(pool_size + max_overflow)
+
+            # Create async engine for tenant
+            engine = create_async_engine(
+                config.database_url,
+                pool_size=pool_size,
+                max_overflow=max_overflow,
+                pool_timeout=settings.database_pool_timeout,
+                pool_pre_ping=True,
+                echo=settings.debug
+            )
+            # Create session factory
+            session_factory = sessionmaker(
+                engine, class_=_TenantSession, expire_on_commit=False
+            )
+            entry = _TenantEngine(engine, session_factory, pool_size + max_overflow)
+            self._engines[tenant_id] = entry
+            self.created += 1
+            return entry
+
+    async def _make_room(self, connections: int) -> None:
+        """Dispose idle engines, least recently used first, until ``connections`` fit the budget"""
+        if connections > self.max_connections:
+            raise TenantEnginesExhausted(
+                f"Tenant pool of {connections} connections exceeds the budget of {self.max_connections}"
+            )
+        for tenant_id in list(self._engines):
+            if self.reserved_connections + connections <= self.max_connections:
+                return
+            if not self._engines[tenant_id].in_use():
+                await self._dispose(tenant_id)
+        if self.reserved_connections + connections > self.max_connections:
+            raise TenantEnginesExhausted(
+                f"All {self.reserved_connections} tenant connections are in use (budget {self.max_connections})"
+            )
+
+    async def _dispose(self, tenant_id: str) -> None:
+        entry = self._engines.pop(tenant_id, None)
+        if entry is not None:
+            await entry.engine.dispose()
+            self.disposed += 1
+            logger.info(f"Disposed database engine for tenant {tenant_id}")
+
+    async def dispose_idle(self) -> int:
+        """Dispose engines unused for ``idle_timeout`` seconds; returns how many were disposed"""
+        async with self._lock:
+            cutoff = time.monotonic() - self.idle_timeout
+            idle = [
+                tenant_id for tenant_id, entry in self._engines.items()
+                if entry.last_used <= cutoff and not entry.in_use()
+            ]
+            for tenant_id in idle:
+                await self._dispose(tenant_id)
+            return len(idle)
+
+    async def dispose(self, tenant_id: str) -> None:
+        async with self._lock:
+            await self._dispose(tenant_id)
+
+    async def dispose_all(self) -> None:
+        async with self._lock:
+            for tenant_id in list(self._engines):
+                await self._dispose(tenant_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            'max_connections': self.max_connections,
+            'reserved_connections': self.reserved_connections,
+            'idle_timeout': self.idle_timeout,
+            'engines_created': self.created,
+            'engines_disposed': self.disposed,
+            'engines': {
+                tenant_id: {
+                    'pool_size': entry.engine.pool.size(),
+                    'reserved_connections': entry.connections,
+                    'checked_out': entry.checked_out(),
+                    'open_sessions': entry.sessions,
+                    'idle_seconds': round(now - entry.last_used, 1)
+                }
+                for tenant_id, entry in self._engines.items()
+            }
         }
 
 
@@ -48,10 +243,19 @@ class TenantConfigManager:
     
     def __init__(self):
         self.tenant_configs: Dict[str, TenantConfig] = {}
-        self.engines: Dict[str, Any] = {}
-        self.sessions: Dict[str, Any] = {}
+        self.engine_registry = TenantEngineRegistry()
+        # Called with the tenant ID whenever its configuration changes
+        self._change_listeners: List[Callable[[str], None]] = []
         self._lock = asyncio.Lock()
         self._load_tenant_configs()
+
+    def add_change_listener(self, listener: Callable[[str], None]) -> None:
+        """Register ``listener`` to be called after a tenant is added, updated or removed"""
+        self._change_listeners.append(listener)
+
+    def _notify_changed(self, tenant_id: str) -> None:
+        for listener in self._change_listeners:
+            listener(tenant_id)
     
     def _load_tenant_configs(self):
         """Load tenant configurations from environment or config file"""
@@ -119,38 +323,22 @@ class TenantConfigManager:
         config = await self.get_tenant_config(tenant_id)
         return config.database_url if config else None
     
+    async def _get_tenant_engine(self, tenant_id: str) -> _TenantEngine:
+        entry = self.engine_registry.lookup(tenant_id)
+        if entry is not None:
+            return entry
+        config = await self.get_tenant_config(tenant_id)
+        if not config:
+            raise ValueError(f"Tenant {tenant_id} not found")
+        return await self.engine_registry.get_or_create(tenant_id, config)
+    
     async def get_engine(self, tenant_id: str):
         """Get database engine for tenant"""
-        async with self._lock:
-            if tenant_id not in self.engines:
-                config = await self.get_tenant_config(tenant_id)
-                if not config:
-                    raise ValueError(f"Tenant {tenant_id} not found")
-                
-                # Create async engine for tenant
-                engine = create_async_engine(
-                    config.database_url,
-                    pool_size=settings.database_pool_size,
-                    max_overflow=settings.database_max_overflow,
-                    pool_timeout=settings.database_pool_timeout,
-                    pool_pre_ping=True,
-                    echo=settings.debug
-                )
-                self.engines[tenant_id] = engine
-                
-                # Create session factory
-                session_factory = sessionmaker(
-                    engine, class_=AsyncSession, expire_on_commit=False
-                )
-                self.sessions[tenant_id] = session_factory
-            
-            return self.engines[tenant_id]
+        return (await self._get_tenant_engine(tenant_id)).engine
     
     async def get_session(self, tenant_id: str) -> AsyncSession:
-        """Get database session for tenant"""
-        if tenant_id not in self.sessions:
-            await self.get_engine(tenant_id)
-        return self.sessions[tenant_id]()
+        """Get database session for tenant; close it so the engine can be evicted"""
+        return (await self._get_tenant_engine(tenant_id)).open_session()
     
     async def has_feature(self, tenant_id: str, feature: str) -> bool:
         """Check if tenant has access to specific feature"""
@@ -186,6 +374,7 @@ class TenantConfigManager:
         async with self._lock:
             self.tenant_configs[tenant_id] = TenantConfig(tenant_id, config)
             logger.info(f"Added tenant configuration for {tenant_id}")
+        self._notify_changed(tenant_id)
     
     async def update_tenant(self, tenant_id: str, config_updates: Dict[str, Any]):
         """Update tenant configuration"""
@@ -197,6 +386,9 @@ class TenantConfigManager:
             updated_config = {**current_config.to_dict(), **config_updates}
             self.tenant_configs[tenant_id] = TenantConfig(tenant_id, updated_config)
             logger.info(f"Updated tenant configuration for {tenant_id}")
+        # Recreated with the new database URL and pool size on next use
+        await self.engine_registry.dispose(tenant_id)
+        self._notify_changed(tenant_id)
     
     async def remove_tenant(self, tenant_id: str):
         """Remove tenant configuration"""
@@ -204,6 +396,8 @@ class TenantConfigManager:
             if tenant_id in self.tenant_configs:
                 del self.tenant_configs[tenant_id]
                 logger.info(f"Removed tenant configuration for {tenant_id}")
+        await self.engine_registry.dispose(tenant_id)
+        self._notify_changed(tenant_id)
 
 
 # Global tenant config manager instance
@@ -13,6 +13,7 @@ import re
 from .models import Tenant, TenantUser, TenantSettings, TenantBranding, User, CompanySettings, Product, Invoice, Purchase
 from .db import get_db
 from .auth import get_password_hash
+from .tenant_cache import tenant_cache
 
 logger = logging.getLogger(__name__)
 
@@ -92,6 +93,8 @@ class TenantService:
                 db.add(setting)
             
             db.commit()
+            # The new slug may have been cached as unknown
+            tenant_cache.invalidate_tenant()
             self.logger.info(f"Created tenant: {tenant.name} (ID: {tenant.id})")
             return tenant
             
@@ -209,6 +212,7 @@ class TenantService:
         
         tenant.updated_at = datetime.utcnow()
         db.commit()
+        tenant_cache.invalidate_tenant(tenant.id)
         
         self.logger.info(f"Updated tenant: {tenant.name} (ID: {tenant.id})")
         return tenant
@@ -222,6 +226,7 @@ class TenantService:
         tenant.is_active = False
         tenant.updated_at = datetime.utcnow()
         db.commit()
+        tenant_cache.invalidate_tenant(tenant.id)
         
         self.logger.info(f"Deleted tenant: {tenant.name} (ID: {tenant.id})")
         return True
@@ -323,6 +328,7 @@ class TenantService:
             setting.updated_at = datetime.utcnow()
         
         db.commit()
+        tenant_cache.invalidate_features(tenant_id)
         return setting
     
     def get_tenant_setting(
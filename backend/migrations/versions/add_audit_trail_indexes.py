@@ -0,0 +1,46 @@
+"""Add composite indexes on audit_trail for the audit listing and export filters
+
+Revision ID: add_audit_trail_indexes
+Revises: add_payment_date_index
+Create Date: 2026-10-16 22:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_audit_trail_indexes'
+down_revision = 'add_payment_date_index'
+branch_labels = None
+depends_on = None
+
+INDEXES = {
+    'ix_audit_trail_created_at_id': ['created_at', 'id'],
+    'ix_audit_trail_table_created_at': ['table_name', 'created_at'],
+    'ix_audit_trail_user_created_at': ['user_id', 'created_at'],
+    'ix_audit_trail_action_created_at': ['action', 'created_at'],
+}
+
+
+def upgrade() -> None:
+    """Create the audit_trail filter indexes that are not already present"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'audit_trail' not in inspector.get_table_names():
+        return
+    existing = {ix['name'] for ix in inspector.get_indexes('audit_trail')}
+    for name, columns in INDEXES.items():
+        if name not in existing:
+            op.create_index(name, 'audit_trail', columns)
+
+
+def downgrade() -> None:
+    """Drop the audit_trail filter indexes"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'audit_trail' not in inspector.get_table_names():
+        return
+    existing = {ix['name'] for ix in inspector.get_indexes('audit_trail')}
+    for name in INDEXES:
+        if name in existing:
+            op.drop_index(name, table_name='audit_trail')
@@ -0,0 +1,37 @@
+"""Add cache_generations table shared by the query caches of all workers
+
+Revision ID: add_cache_generations
+Revises: add_refresh_tokens
+Create Date: 2026-10-17 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_cache_generations'
+down_revision = 'add_refresh_tokens'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create cache_generations; rows appear on the first write to each tag"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'cache_generations' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'cache_generations',
+        sa.Column('tag', sa.String(length=50), primary_key=True),
+        sa.Column('generation', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    """Drop cache_generations"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'cache_generations' in inspector.get_table_names():
+        op.drop_table('cache_generations')
@@ -0,0 +1,47 @@
+"""Add daily_rollups table for dashboard and KPI totals
+
+Revision ID: add_daily_rollups
+Revises: add_stock_alerts
+Create Date: 2026-10-16 20:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_daily_rollups'
+down_revision = 'add_stock_alerts'
+branch_labels = None
+depends_on = None
+
+AMOUNT_COLUMNS = [
+    'income', 'purchase_payments', 'expenses', 'invoiced', 'paid_invoiced', 'tax_collected',
+    'receivables', 'purchased', 'paid_purchased', 'tax_paid', 'payables',
+]
+COUNT_COLUMNS = ['income_count', 'purchase_payment_count', 'expense_count', 'invoice_count', 'purchase_count']
+
+
+def upgrade() -> None:
+    """Create daily_rollups; the application backfills it from existing documents on startup"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'daily_rollups' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'daily_rollups',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('tenant_id', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('day', sa.Date(), nullable=False),
+        *[sa.Column(name, sa.Numeric(14, 2), nullable=False, server_default='0') for name in AMOUNT_COLUMNS],
+        *[sa.Column(name, sa.Integer(), nullable=False, server_default='0') for name in COUNT_COLUMNS],
+        sa.UniqueConstraint('tenant_id', 'day', name='uq_daily_rollup_tenant_day'),
+    )
+
+
+def downgrade() -> None:
+    """Drop daily_rollups"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'daily_rollups' in inspector.get_table_names():
+        op.drop_table('daily_rollups')
@@ -0,0 +1,55 @@
+"""Add email_outbox table for background email delivery
+
+Revision ID: add_email_outbox
+Revises: add_number_sequences
+Create Date: 2026-10-16 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_email_outbox'
+down_revision = 'add_number_sequences'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create email_outbox with the indexes the sender polls on"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'email_outbox' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'email_outbox',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('tenant_id', sa.Integer(), sa.ForeignKey('tenants.id'), nullable=True),
+        sa.Column('document_type', sa.String(length=20), nullable=True),
+        sa.Column('document_id', sa.Integer(), nullable=True),
+        sa.Column('to_email', sa.String(length=255), nullable=False),
+        sa.Column('subject', sa.String(length=255), nullable=False),
+        sa.Column('body', sa.Text(), nullable=False),
+        sa.Column('attachment_filename', sa.String(length=255), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='queued'),
+        sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('next_attempt_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('locked_at', sa.DateTime(), nullable=True),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('sent_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_email_outbox_status_next_attempt', 'email_outbox', ['status', 'next_attempt_at'])
+    op.create_index('ix_email_outbox_document', 'email_outbox', ['document_type', 'document_id'])
+
+
+def downgrade() -> None:
+    """Drop email_outbox"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'email_outbox' in inspector.get_table_names():
+        op.drop_index('ix_email_outbox_document', table_name='email_outbox')
+        op.drop_index('ix_email_outbox_status_next_attempt', table_name='email_outbox')
+        op.drop_table('email_outbox')
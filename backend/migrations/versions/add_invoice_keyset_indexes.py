@@ -0,0 +1,51 @@
+"""Add (sort column, id) indexes for the other invoice list cursor sorts
+
+Revision ID: add_invoice_keyset_indexes
+Revises: add_cache_generations
+Create Date: 2026-10-17 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_invoice_keyset_indexes'
+down_revision = 'add_cache_generations'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_invoices_invoice_no_id', 'invoices', ['invoice_no', 'id']),
+    ('ix_invoices_due_date_id', 'invoices', ['due_date', 'id']),
+    ('ix_invoices_grand_total_id', 'invoices', ['grand_total', 'id']),
+    ('ix_invoices_status_id', 'invoices', ['status', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Create invoice keyset indexes that are not already present"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for name, table, columns in INDEXES:
+        if table not in tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Drop invoice keyset indexes"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for name, table, _columns in INDEXES:
+        if table not in tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if name in existing:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,51 @@
+"""Add composite (sort column, id) indexes for keyset pagination
+
+Revision ID: add_keyset_pagination_indexes
+Revises: add_reference_bill_number
+Create Date: 2026-10-16 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_keyset_pagination_indexes'
+down_revision = 'add_reference_bill_number'
+branch_labels = None
+depends_on = None
+
+
+INDEXES = [
+    ('ix_invoices_date_id', 'invoices', ['date', 'id']),
+    ('ix_purchases_date_id', 'purchases', ['date', 'id']),
+    ('ix_purchase_payments_payment_date_id', 'purchase_payments', ['payment_date', 'id']),
+    ('ix_expenses_expense_date_id', 'expenses', ['expense_date', 'id']),
+]
+
+
+def upgrade() -> None:
+    """Create keyset pagination indexes that are not already present"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for name, table, columns in INDEXES:
+        if table not in tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if name not in existing:
+            op.create_index(name, table, columns)
+
+
+def downgrade() -> None:
+    """Drop keyset pagination indexes"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for name, table, _columns in INDEXES:
+        if table not in tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if name in existing:
+            op.drop_index(name, table_name=table)
@@ -0,0 +1,41 @@
+"""Add number_sequences table for atomic document number allocation
+
+Revision ID: add_number_sequences
+Revises: add_keyset_pagination_indexes
+Create Date: 2026-10-16 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_number_sequences'
+down_revision = 'add_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create number_sequences; rows are seeded lazily from existing documents"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'number_sequences' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'number_sequences',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('tenant_scope', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('series_key', sa.String(length=64), nullable=False),
+        sa.Column('next_value', sa.Integer(), nullable=False, server_default='1'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint('tenant_scope', 'series_key', name='uq_number_sequence_series'),
+    )
+
+
+def downgrade() -> None:
+    """Drop number_sequences"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'number_sequences' in inspector.get_table_names():
+        op.drop_table('number_sequences')
@@ -0,0 +1,37 @@
+"""Add (payment_date, id) index on payments for the cashflow feed
+
+Revision ID: add_payment_date_index
+Revises: add_daily_rollups
+Create Date: 2026-10-16 21:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_payment_date_index'
+down_revision = 'add_daily_rollups'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create ix_payments_payment_date_id if it is not already present"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'payments' not in inspector.get_table_names():
+        return
+    existing = {ix['name'] for ix in inspector.get_indexes('payments')}
+    if 'ix_payments_payment_date_id' not in existing:
+        op.create_index('ix_payments_payment_date_id', 'payments', ['payment_date', 'id'])
+
+
+def downgrade() -> None:
+    """Drop ix_payments_payment_date_id"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'payments' not in inspector.get_table_names():
+        return
+    existing = {ix['name'] for ix in inspector.get_indexes('payments')}
+    if 'ix_payments_payment_date_id' in existing:
+        op.drop_index('ix_payments_payment_date_id', table_name='payments')
@@ -0,0 +1,43 @@
+"""Add refresh_tokens table so refresh tokens can be revoked
+
+Revision ID: add_refresh_tokens
+Revises: add_audit_trail_indexes
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_refresh_tokens'
+down_revision = 'add_audit_trail_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create refresh_tokens keyed by the token's jti"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'refresh_tokens' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'refresh_tokens',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('jti', sa.String(length=64), nullable=False, unique=True),
+        sa.Column('user_id', sa.Integer(), sa.ForeignKey('users.id'), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.Column('revoked_at', sa.DateTime(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index('ix_refresh_tokens_user_id', 'refresh_tokens', ['user_id'])
+
+
+def downgrade() -> None:
+    """Drop refresh_tokens"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'refresh_tokens' in inspector.get_table_names():
+        op.drop_index('ix_refresh_tokens_user_id', table_name='refresh_tokens')
+        op.drop_table('refresh_tokens')
@@ -0,0 +1,54 @@
+"""Add stock ledger (product_id, created_at) index and stock_alerts table
+
+Revision ID: add_stock_alerts
+Revises: add_stock_snapshots
+Create Date: 2026-10-16 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_stock_alerts'
+down_revision = 'add_stock_snapshots'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Index the ledger for per-product latest-movement lookups and create stock_alerts"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    if 'stock_ledger' in tables:
+        existing = {ix['name'] for ix in inspector.get_indexes('stock_ledger')}
+        if 'ix_stock_ledger_product_created_at' not in existing:
+            op.create_index('ix_stock_ledger_product_created_at', 'stock_ledger', ['product_id', 'created_at'])
+
+    if 'stock_alerts' not in tables:
+        # Filled by the first refresh at application startup
+        op.create_table(
+            'stock_alerts',
+            sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id'), nullable=False, unique=True),
+            sa.Column('current_stock', sa.Integer(), nullable=False),
+            sa.Column('reorder_level', sa.Integer(), nullable=False),
+            sa.Column('urgency', sa.String(length=10), nullable=False),
+            sa.Column('last_purchase_at', sa.DateTime(), nullable=True),
+            sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        )
+
+
+def downgrade() -> None:
+    """Drop stock_alerts and the ledger index"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    if 'stock_alerts' in tables:
+        op.drop_table('stock_alerts')
+    if 'stock_ledger' in tables:
+        existing = {ix['name'] for ix in inspector.get_indexes('stock_ledger')}
+        if 'ix_stock_ledger_product_created_at' in existing:
+            op.drop_index('ix_stock_ledger_product_created_at', table_name='stock_ledger')
@@ -0,0 +1,44 @@
+"""Add stock_snapshots table for per-product, per-FY opening and closing stock
+
+Revision ID: add_stock_snapshots
+Revises: add_email_outbox
+Create Date: 2026-10-16 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_stock_snapshots'
+down_revision = 'add_email_outbox'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    """Create stock_snapshots; rows are seeded lazily from the stock ledger"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'stock_snapshots' in inspector.get_table_names():
+        return
+
+    op.create_table(
+        'stock_snapshots',
+        sa.Column('id', sa.Integer(), primary_key=True, autoincrement=True),
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('products.id'), nullable=False),
+        sa.Column('fy_start_year', sa.Integer(), nullable=False),
+        sa.Column('opening_qty', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('opening_value', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('closing_qty', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('closing_value', sa.Numeric(14, 2), nullable=False, server_default='0'),
+        sa.Column('updated_at', sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint('product_id', 'fy_start_year', name='uq_stock_snapshot_product_fy'),
+    )
+
+
+def downgrade() -> None:
+    """Drop stock_snapshots"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    if 'stock_snapshots' in inspector.get_table_names():
+        op.drop_table('stock_snapshots')
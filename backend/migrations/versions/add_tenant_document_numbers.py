@@ -0,0 +1,69 @@
+"""Make invoice, purchase and PO numbers unique per tenant instead of globally
+
+Revision ID: add_tenant_document_numbers
+Revises: add_invoice_keyset_indexes
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = 'add_tenant_document_numbers'
+down_revision = 'add_invoice_keyset_indexes'
+branch_labels = None
+depends_on = None
+
+
+# (table, number column, per-tenant unique index)
+DOCUMENT_NUMBERS = [
+    ('invoices', 'invoice_no', 'uq_invoices_tenant_invoice_no'),
+    ('purchases', 'purchase_no', 'uq_purchases_tenant_purchase_no'),
+    ('purchase_orders', 'po_number', 'uq_purchase_orders_tenant_po_number'),
+]
+
+# Lets batch mode name the unnamed UNIQUE constraints SQLite tables carry
+NAMING_CONVENTION = {'uq': 'uq_%(table_name)s_%(column_0_name)s'}
+
+
+def _global_unique_constraints(inspector, table, column):
+    return [
+        uc for uc in inspector.get_unique_constraints(table)
+        if uc['column_names'] == [column]
+    ]
+
+
+def upgrade() -> None:
+    """Replace the global unique constraint with a unique (tenant scope, number) index"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for table, column, index_name in DOCUMENT_NUMBERS:
+        if table not in tables:
+            continue
+        constraints = _global_unique_constraints(inspector, table, column)
+        if constraints:
+            with op.batch_alter_table(table, naming_convention=NAMING_CONVENTION) as batch_op:
+                for uc in constraints:
+                    batch_op.drop_constraint(uc['name'] or f'uq_{table}_{column}', type_='unique')
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if index_name not in existing:
+            op.create_index(index_name, table, [sa.text('coalesce(tenant_id, 0)'), column], unique=True)
+
+
+def downgrade() -> None:
+    """Restore globally unique document numbers"""
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+    tables = set(inspector.get_table_names())
+
+    for table, column, index_name in DOCUMENT_NUMBERS:
+        if table not in tables:
+            continue
+        existing = {ix['name'] for ix in inspector.get_indexes(table)}
+        if index_name in existing:
+            op.drop_index(index_name, table_name=table)
+        if not _global_unique_constraints(inspector, table, column):
+            with op.batch_alter_table(table) as batch_op:
+                batch_op.create_unique_constraint(f'uq_{table}_{column}', [column])
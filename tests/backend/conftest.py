@@ -0,0 +1,78 @@
+"""
+Shared fixtures for the backend tests: a seeded SQLite database in a
+temporary directory and an authenticated client
+"""
+import os
+import sys
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+
+import pytest
+
+_DB_DIR = tempfile.mkdtemp()
+os.environ["ENVIRONMENT"] = "testing"
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_DB_DIR, 'test.db')}"
+os.environ["SECURITY_ENABLED"] = "false"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "backend"))
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app.db import LegacySessionLocal  # noqa: E402
+from app.main import app  # noqa: E402
+from app.models import Invoice, Party  # noqa: E402
+from app.seed import run_seed  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    run_seed()
+    return TestClient(app)
+
+
+@pytest.fixture(scope="session")
+def auth_headers(client):
+    response = client.post("/api/auth/login", json={"username": "admin", "password": "admin123"})
+    assert response.status_code == 200
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def db(client):
+    session = LegacySessionLocal()
+    yield session
+    session.close()
+
+
+@pytest.fixture(scope="session")
+def parties(client):
+    """(customer_id, vendor_id)"""
+    session = LegacySessionLocal()
+    try:
+        customer = Party(name="Test Customer", is_customer=True, is_vendor=False, gst_enabled=True, billing_state="Karnataka")
+        vendor = Party(name="Test Vendor", is_customer=False, is_vendor=True, gst_enabled=True, billing_state="Maharashtra")
+        session.add_all([customer, vendor])
+        session.commit()
+        return customer.id, vendor.id
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def make_invoice(db, parties):
+    """Commit a zero-value invoice: ``make_invoice(invoice_no, tenant_id=None, status="Draft")``"""
+    customer_id, vendor_id = parties
+
+    def make(invoice_no, tenant_id=None, status="Draft"):
+        invoice = Invoice(
+            tenant_id=tenant_id, customer_id=customer_id, supplier_id=vendor_id, invoice_no=invoice_no,
+            status=status, due_date=datetime.utcnow(), place_of_supply="Karnataka",
+            place_of_supply_state_code="29", bill_to_address="Bill to", ship_to_address="Ship to",
+            taxable_value=Decimal("0"), cgst=Decimal("0"), sgst=Decimal("0"), igst=Decimal("0"),
+            grand_total=Decimal("0"),
+        )
+        db.add(invoice)
+        db.commit()
+        return invoice
+
+    return make
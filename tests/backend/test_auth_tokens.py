@@ -0,0 +1,74 @@
+"""
+Refresh tokens are single use and are revoked by logout and password changes
+"""
+import pytest
+
+from app.auth import _store_password_hash, get_password_hash
+from app.db import LegacySessionLocal
+from app.models import Role, User
+
+
+@pytest.fixture(scope="module")
+def user(client):
+    session = LegacySessionLocal()
+    try:
+        role_id = session.query(Role.id).filter(Role.name == "Admin").scalar()
+        user = User(username="token-user", password_hash=get_password_hash("secret-1"), role_id=role_id)
+        session.add(user)
+        session.commit()
+        return user.id
+    finally:
+        session.close()
+
+
+def _login(client, password="secret-1"):
+    response = client.post("/api/auth/login", json={"username": "token-user", "password": password})
+    assert response.status_code == 200
+    return response.json()["refresh_token"]
+
+
+def test_refresh_token_works_once(client, user):
+    refresh_token = _login(client)
+
+    first = client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+    second = client.post("/api/auth/refresh", json={"refresh_token": refresh_token})
+
+    assert first.status_code == 200
+    assert first.json()["refresh_token"] != refresh_token
+    assert second.status_code == 401
+
+
+def test_reusing_a_rotated_token_revokes_its_successor(client, user):
+    refresh_token = _login(client)
+    rotated = client.post("/api/auth/refresh", json={"refresh_token": refresh_token}).json()["refresh_token"]
+
+    assert client.post("/api/auth/refresh", json={"refresh_token": refresh_token}).status_code == 401
+    assert client.post("/api/auth/refresh", json={"refresh_token": rotated}).status_code == 401
+
+
+def test_logout_revokes_the_refresh_token(client, user):
+    refresh_token = _login(client)
+
+    assert client.post("/api/auth/logout", json={"refresh_token": refresh_token}).status_code == 204
+    assert client.post("/api/auth/refresh", json={"refresh_token": refresh_token}).status_code == 401
+
+
+def test_password_change_revokes_refresh_tokens(client, db, user):
+    refresh_token = _login(client)
+
+    db.get(User, user).password_hash = get_password_hash("secret-2")
+    db.commit()
+
+    try:
+        assert client.post("/api/auth/refresh", json={"refresh_token": refresh_token}).status_code == 401
+    finally:
+        db.get(User, user).password_hash = get_password_hash("secret-1")
+        db.commit()
+
+
+def test_rehashing_the_same_password_keeps_refresh_tokens(client, db, user):
+    refresh_token = _login(client)
+
+    _store_password_hash(db, db.get(User, user), get_password_hash("secret-1"))
+
+    assert client.post("/api/auth/refresh", json={"refresh_token": refresh_token}).status_code == 200
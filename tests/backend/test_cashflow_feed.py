@@ -0,0 +1,171 @@
+"""
+Cashflow feed: invoice payments, purchase payments and expenses read as one
+UNION ALL, filtered per branch and paged in a stable order
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.db import LegacySessionLocal
+from app.models import Expense, Invoice, Payment, Purchase, PurchasePayment
+from app.services.query_optimizer import query_cache
+
+PERIOD = {"start_date": "2004-05-10", "end_date": "2004-05-12"}
+# Several rows share this timestamp, so only the tie-breakers order them
+TIED = datetime(2004, 5, 11, 12, 0)
+
+
+@pytest.fixture(scope="module")
+def feed(client, parties):
+    """Rows of the period in the order the feed must return them, as (source_type, id)"""
+    customer_id, vendor_id = parties
+    session = LegacySessionLocal()
+    try:
+        invoice = Invoice(
+            customer_id=customer_id, supplier_id=vendor_id, invoice_no="CF-INV-1", due_date=datetime(2004, 5, 1),
+            place_of_supply="Karnataka", place_of_supply_state_code="29", bill_to_address="Bill to",
+            ship_to_address="Ship to", taxable_value=Decimal("0"), cgst=Decimal("0"), sgst=Decimal("0"),
+            igst=Decimal("0"), grand_total=Decimal("0"),
+        )
+        purchase = Purchase(
+            vendor_id=vendor_id, purchase_no="CF-PUR-1", due_date=datetime(2004, 5, 1),
+            place_of_supply="Maharashtra", place_of_supply_state_code="27", bill_from_address="Bill from",
+            ship_from_address="Ship from", taxable_value=Decimal("0"), cgst=Decimal("0"), sgst=Decimal("0"),
+            igst=Decimal("0"), grand_total=Decimal("0"),
+        )
+        session.add_all([invoice, purchase])
+        session.flush()
+
+        def payment(day, amount):
+            return Payment(invoice_id=invoice.id, amount=Decimal(amount), payment_date=day, payment_method="Cash")
+
+        def purchase_payment(moment, amount):
+            return PurchasePayment(
+                purchase_id=purchase.id, payment_date=moment, payment_amount=Decimal(amount),
+                payment_method="Bank Transfer", account_head="Bank",
+            )
+
+        def expense(moment, category, amount):
+            return Expense(
+                expense_date=moment, expense_type="Rent", category=category, description=f"{category} expense",
+                amount=Decimal(amount), total_amount=Decimal(amount), payment_method="Cash", account_head="Cash",
+            )
+
+        first_payment = payment(date(2004, 5, 10), "100")
+        last_payment = payment(date(2004, 5, 12), "7")
+        early = [first_payment, purchase_payment(datetime(2004, 5, 10, 14), "40"), expense(datetime(2004, 5, 10, 9), "Indirect", "25")]
+        tied = [expense(TIED, "Direct", "5"), purchase_payment(TIED, "60"), expense(TIED, "Direct", "6"), expense(TIED, "Direct", "7")]
+        outside = [payment(date(2004, 5, 13), "1"), expense(datetime(2004, 5, 9, 23, 59), "Indirect", "1")]
+        session.add_all([*early, last_payment, *tied, *outside])
+        session.commit()
+
+        def key(row):
+            return ({Payment: "invoice_payment", PurchasePayment: "purchase_payment", Expense: "expense"}[type(row)], row.id)
+
+        tied_expenses = sorted((row for row in tied if isinstance(row, Expense)), key=lambda row: -row.id)
+        tied_payment = next(row for row in tied if isinstance(row, PurchasePayment))
+        # Newest first; at equal timestamps by source type, then newest id
+        return [key(row) for row in (last_payment, *tied_expenses, tied_payment, early[1], early[2], first_payment)]
+    finally:
+        session.close()
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    query_cache.clear()
+    yield
+    query_cache.clear()
+
+
+def _report(client, auth_headers, **params):
+    response = client.get("/api/reports/cashflow", params={**PERIOD, **params}, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+def _transactions(client, auth_headers, **params):
+    response = client.get("/api/cashflow/transactions", params={**PERIOD, **params}, headers=auth_headers)
+    assert response.status_code == 200
+    return response.json()
+
+
+_REPORT_TYPES = {"income": "invoice_payment", "purchase_payment": "purchase_payment", "expense": "expense"}
+
+
+def _report_keys(report):
+    return [(_REPORT_TYPES[row["transaction_type"]], row["transaction_id"]) for row in report["transactions"]]
+
+
+def _feed_keys(page):
+    return [(row["source_type"], row["source_id"]) for row in page["transactions"]]
+
+
+def test_report_merges_all_sources_in_feed_order(client, auth_headers, feed):
+    report = _report(client, auth_headers)
+
+    assert _report_keys(report) == feed
+    assert report["total_count"] == len(feed)
+    # Payment dates are plain dates and sort before any time on the same day
+    income = [row for row in report["transactions"] if row["transaction_type"] == "income"]
+    assert [row["transaction_date"] for row in income] == ["2004-05-12", "2004-05-10"]
+    assert {row["party_name"] for row in income} == {"Test Customer"}
+    assert income[0]["reference_number"] == "CF-INV-1"
+
+
+def test_feed_keeps_payment_dates_as_start_of_day(client, auth_headers, feed):
+    page = _transactions(client, auth_headers, limit=50)
+
+    assert _feed_keys(page) == feed
+    dates = {(row["source_type"], row["source_id"]): row["transaction_date"] for row in page["transactions"]}
+    assert dates[feed[0]] == "2004-05-12T00:00:00"
+    assert dates[feed[-1]] == "2004-05-10T00:00:00"
+
+
+@pytest.mark.parametrize("transaction_type, source", [
+    ("income", "invoice_payment"), ("purchase_payment", "purchase_payment"), ("expense", "expense"),
+])
+def test_report_filters_by_transaction_type(client, auth_headers, feed, transaction_type, source):
+    report = _report(client, auth_headers, transaction_type=transaction_type)
+
+    expected = [key for key in feed if key[0] == source]
+    assert _report_keys(report) == expected
+    assert report["total_count"] == len(expected)
+
+
+@pytest.mark.parametrize("category, sources", [
+    ("Sales", {"invoice_payment"}), ("Purchases", {"purchase_payment"}), ("Direct", {"expense"}),
+])
+def test_report_filters_by_category(client, auth_headers, feed, category, sources):
+    report = _report(client, auth_headers, category=category)
+
+    keys = _report_keys(report)
+    assert keys and {source for source, _ in keys} == sources
+    assert {row["category"] for row in report["transactions"]} == {category}
+    if category == "Direct":
+        assert len(keys) == 3
+
+
+def test_feed_filters_by_account_head(client, auth_headers, feed):
+    bank = _transactions(client, auth_headers, account_head="Bank", limit=50)
+    cash = _transactions(client, auth_headers, account_head="Cash", limit=50)
+
+    # Invoice payments have no account head, so any head filter leaves them out
+    assert _feed_keys(bank) == [key for key in feed if key[0] == "purchase_payment"]
+    assert _feed_keys(cash) == [key for key in feed if key[0] == "expense"]
+    assert (bank["total_count"], cash["total_count"]) == (2, 4)
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_pages_neither_overlap_nor_skip_rows(client, auth_headers, feed, limit):
+    report_pages, feed_pages = [], []
+    for page in range(1, len(feed) // limit + 2):
+        report = _report(client, auth_headers, page=page, limit=limit)
+        assert report["total_count"] in (len(feed), 0)
+        report_pages += _report_keys(report)
+        transactions = _transactions(client, auth_headers, page=page, limit=limit)
+        assert transactions["total_count"] == len(feed)
+        feed_pages += _feed_keys(transactions)
+
+    assert report_pages == feed
+    assert feed_pages == feed
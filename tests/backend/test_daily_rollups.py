@@ -0,0 +1,101 @@
+"""
+Daily rollups: deltas are applied once at commit and match a full rebuild
+"""
+from datetime import date, datetime
+from decimal import Decimal
+
+import pytest
+
+from app.daily_rollups import MEASURES, rebuild_rollups, rollup_days, rollup_totals
+from app.models import Expense, Payment
+
+DAY = date(2024, 3, 5)
+
+
+def _expense(amount):
+    return Expense(
+        expense_date=datetime.combine(DAY, datetime.min.time()), expense_type="Rent", category="Indirect",
+        description="Rollup test", amount=Decimal(amount), payment_method="Cash", account_head="Cash",
+        total_amount=Decimal(amount),
+    )
+
+
+def _expenses(db):
+    return rollup_totals(db, DAY, DAY)["expenses"]
+
+
+def _active_days(db):
+    return {
+        day: totals for day, totals in rollup_days(db).items()
+        if any(totals[column] for column in MEASURES)
+    }
+
+
+@pytest.fixture
+def rebuilt(db):
+    """Rollups as ``rebuild_rollups`` computes them from the documents; changes nothing"""
+    def rebuild():
+        nested = db.begin_nested()
+        try:
+            rebuild_rollups(db.connection())
+            return _active_days(db)
+        finally:
+            nested.rollback()
+    return rebuild
+
+
+def test_rollups_are_written_at_commit_not_at_flush(db):
+    before = _expenses(db)
+    db.add(_expense("12.00"))
+    db.flush()
+
+    assert _expenses(db) == before
+
+    db.commit()
+    assert _expenses(db) == before + Decimal("12.00")
+
+
+def test_rolled_back_savepoint_drops_its_deltas(db):
+    before = _expenses(db)
+    db.add(_expense("5.00"))
+    with db.begin_nested() as savepoint:
+        db.add(_expense("7.00"))
+        db.flush()
+        savepoint.rollback()
+    with db.begin_nested():
+        db.add(_expense("11.00"))
+    db.commit()
+
+    assert _expenses(db) == before + Decimal("16.00")
+
+
+def test_edit_of_an_expired_expense_replaces_its_old_amount(db):
+    before = _expenses(db)
+    expense = _expense("6.00")
+    db.add(expense)
+    db.commit()
+
+    db.expire(expense)
+    expense.amount = Decimal("31.00")
+    db.commit()
+
+    assert _expenses(db) == before + Decimal("31.00")
+
+
+def test_incremental_rollups_match_a_rebuild(db, rebuilt):
+    expense = _expense("20.00")
+    payment = Payment(amount=Decimal("40.00"), payment_date=DAY, payment_method="Cash")
+    db.add_all([expense, payment])
+    db.commit()
+
+    db.expire_all()
+    expense.amount = Decimal("31.00")
+    payment.payment_date = date(2024, 3, 6)
+    db.commit()
+    db.query(Expense).filter(Expense.id == expense.id).update({"amount": Decimal("33.00")})
+    db.commit()
+    db.expire_all()
+    db.delete(payment)
+    db.commit()
+
+    assert _active_days(db) == rebuilt()
@@ -0,0 +1,55 @@
+"""
+Document numbering: each tenant gets its own invoice series, unique within the tenant
+"""
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app.main_routers import _next_invoice_no
+from app.number_allocator import financial_year_prefix
+from app.tenant_models import Tenant
+
+
+def _tenant(db, slug):
+    tenant = Tenant(name=slug, slug=slug)
+    db.add(tenant)
+    db.commit()
+    return tenant.id
+
+
+def _seq(invoice_no):
+    return int(invoice_no.split('-')[-1])
+
+
+def test_two_tenants_commit_the_same_invoice_number(db, make_invoice):
+    tenant_a, tenant_b = _tenant(db, "numbering-a"), _tenant(db, "numbering-b")
+
+    first_a = make_invoice(_next_invoice_no(db, tenant_a), tenant_a)
+    first_b = make_invoice(_next_invoice_no(db, tenant_b), tenant_b)
+    second_a = make_invoice(_next_invoice_no(db, tenant_a), tenant_a)
+
+    assert first_a.invoice_no == first_b.invoice_no
+    assert _seq(first_a.invoice_no) == 1
+    assert _seq(second_a.invoice_no) == 2
+    assert _next_invoice_no(db, tenant_b, peek=True) == _next_invoice_no(db, tenant_b)
+
+
+def test_invoice_numbers_stay_unique_within_a_tenant(db, make_invoice):
+    tenant = _tenant(db, "numbering-dup")
+    make_invoice("DUP-0001", tenant)
+
+    with pytest.raises(IntegrityError):
+        make_invoice("DUP-0001", tenant)
+    db.rollback()
+
+    make_invoice("DUP-0001", None)
+    with pytest.raises(IntegrityError):
+        make_invoice("DUP-0001", None)
+    db.rollback()
+
+
+def test_new_series_continues_after_existing_numbers_in_its_scope(db, make_invoice):
+    tenant = _tenant(db, "numbering-seeded")
+    make_invoice(f"{financial_year_prefix()}/INV-0041", tenant)
+
+    assert _seq(_next_invoice_no(db, tenant)) == 42
+    db.commit()
@@ -0,0 +1,189 @@
+"""
+Email outbox: delivery through pooled SMTP sessions against an in-process
+SMTP server, retry and failure classification, and claiming
+"""
+import socketserver
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.config import settings
+from app.db import LegacySessionLocal
+from app.email_outbox import EmailOutboxSender, enqueue_email, retry_delay
+from app.emailer import SMTPConnectionPool
+from app.models import EmailOutbox, Invoice
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """Just enough SMTP: replies are looked up by recipient in ``server.replies``"""
+
+    def _reply(self, line: str) -> None:
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self) -> None:
+        server = self.server
+        recipient = None
+        self._reply("220 stub ESMTP")
+        for raw in self.rfile:
+            command = raw.decode().strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb in ("EHLO", "HELO"):
+                self._reply("250 stub")
+            elif verb == "MAIL":
+                self._reply("250 OK")
+            elif verb == "RCPT":
+                recipient = command.split("<", 1)[1].rstrip(">")
+                self._reply(server.replies.get((recipient, "RCPT"), "250 OK"))
+            elif verb == "DATA":
+                self._reply("354 go ahead")
+                data = []
+                for line in self.rfile:
+                    if line in (b".\r\n", b".\n"):
+                        break
+                    data.append(line)
+                reply = server.replies.get((recipient, "DATA"), "250 OK")
+                if reply.startswith("250"):
+                    server.delivered.append(recipient)
+                self._reply(reply)
+            elif verb == "RSET":
+                recipient = None
+                self._reply("250 OK")
+            elif verb == "QUIT":
+                self._reply("221 bye")
+                return
+            else:
+                self._reply("250 OK")
+
+
+class _SMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), _SMTPHandler)
+        self.replies = {}
+        self.delivered = []
+
+
+@pytest.fixture
+def smtp_server(monkeypatch, db):
+    server = _SMTPServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "smtp_enabled", True)
+    monkeypatch.setattr(settings, "smtp_host", "127.0.0.1")
+    monkeypatch.setattr(settings, "smtp_port", server.server_address[1])
+    monkeypatch.setattr(settings, "smtp_use_tls", False)
+    monkeypatch.setattr(settings, "smtp_user", None)
+    monkeypatch.setattr(settings, "smtp_from", "billing@example.com")
+    # Each test sees only its own messages
+    db.query(EmailOutbox).delete()
+    db.commit()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _sender():
+    return EmailOutboxSender(pool=SMTPConnectionPool(max_size=1))
+
+
+def _queue(db, to, **kwargs):
+    entry = enqueue_email(db, to=to, subject="Invoice", body="<p>Hello</p>", **kwargs)
+    db.commit()
+    return entry.id
+
+
+def _entry(db, entry_id):
+    db.expire_all()
+    return db.get(EmailOutbox, entry_id)
+
+
+def test_delivery_marks_sent_and_moves_only_draft_invoices_to_sent(db, smtp_server, make_invoice):
+    draft = make_invoice("OUTBOX-DRAFT")
+    paid = make_invoice("OUTBOX-PAID", status="Paid")
+    draft_mail = _queue(db, "draft@example.com", document_type="invoice", document_id=draft.id)
+    paid_mail = _queue(db, "paid@example.com", document_type="invoice", document_id=paid.id)
+
+    sender = _sender()
+    assert sender.process_batch() == 2
+    sender.pool.close_all()
+
+    assert sorted(smtp_server.delivered) == ["draft@example.com", "paid@example.com"]
+    for entry_id in (draft_mail, paid_mail):
+        entry = _entry(db, entry_id)
+        assert (entry.status, entry.attempts, entry.locked_at) == ("sent", 1, None)
+        assert entry.sent_at is not None
+    assert db.get(Invoice, draft.id).status == "Sent"
+    assert db.get(Invoice, paid.id).status == "Paid"
+
+
+def test_temporary_failure_is_requeued_with_backoff(db, smtp_server):
+    smtp_server.replies[("busy@example.com", "DATA")] = "451 try again later"
+    entry_id = _queue(db, "busy@example.com")
+
+    before = datetime.utcnow()
+    _sender().process_batch()
+
+    entry = _entry(db, entry_id)
+    assert (entry.status, entry.attempts) == ("queued", 1)
+    assert "451" in entry.last_error
+    assert entry.next_attempt_at >= before + retry_delay(1) - timedelta(seconds=1)
+    # Not due yet, so the next poll leaves it alone
+    assert _sender().process_batch() == 0
+
+
+@pytest.mark.parametrize("command, reply", [("DATA", "554 message rejected"), ("RCPT", "550 no such mailbox")])
+def test_permanent_failure_is_not_retried(db, smtp_server, command, reply):
+    smtp_server.replies[("gone@example.com", command)] = reply
+    entry_id = _queue(db, "gone@example.com")
+
+    _sender().process_batch()
+
+    entry = _entry(db, entry_id)
+    assert (entry.status, entry.attempts) == ("failed", 1)
+    assert reply.split()[0] in entry.last_error
+    assert smtp_server.delivered == []
+
+
+def test_concurrent_senders_deliver_a_message_once(db, smtp_server):
+    entry_id = _queue(db, "once@example.com")
+    other = _sender()
+    raced = []
+
+    def racing_session():
+        """Session whose claiming UPDATE runs only after ``other`` has claimed and sent"""
+        session = LegacySessionLocal()
+        execute = session.execute
+
+        def run(statement, *args, **kwargs):
+            if getattr(statement, "is_update", False) and not raced:
+                raced.append(other.process_batch())
+            return execute(statement, *args, **kwargs)
+
+        session.execute = run
+        return session
+
+    sender = EmailOutboxSender(session_factory=racing_session, pool=SMTPConnectionPool(max_size=1))
+
+    assert sender.process_batch() == 0
+    assert raced == [1]
+    assert smtp_server.delivered == ["once@example.com"]
+    assert _entry(db, entry_id).status == "sent"
+
+
+def test_stale_sending_rows_are_reclaimed(db, smtp_server):
+    stale_id = _queue(db, "stale@example.com")
+    fresh_id = _queue(db, "fresh@example.com")
+    # As left by a sender that crashed long ago, and by one still working
+    now = datetime.utcnow()
+    stale, fresh = db.get(EmailOutbox, stale_id), db.get(EmailOutbox, fresh_id)
+    stale.status, stale.locked_at = "sending", now - timedelta(seconds=settings.email_outbox_lock_timeout + 60)
+    fresh.status, fresh.locked_at = "sending", now
+    db.commit()
+
+    assert _sender().process_batch() == 1
+
+    assert smtp_server.delivered == ["stale@example.com"]
+    assert _entry(db, fresh_id).status == "sending"
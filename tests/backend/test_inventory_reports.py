@@ -0,0 +1,124 @@
+"""
+Inventory reports: stock comes from grouped ledger queries, low stock from
+stock_alerts, and the stock ledger is streamed with running balances
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from app.models import Product, StockLedgerEntry
+from app.pagination import NEXT_CURSOR_HEADER
+
+
+def _product(db, name, movements, stock):
+    product = Product(name=name, sales_price=Decimal("10.00"), purchase_price=Decimal("4.00"), stock=stock)
+    db.add(product)
+    db.flush()
+    db.add_all(StockLedgerEntry(product_id=product.id, qty=qty, entry_type=kind) for kind, qty in movements)
+    return product
+
+
+def _inventory(db):
+    low = _product(db, "Report low", [("in", 3)], stock=3)
+    out = _product(db, "Report out", [("in", 2), ("out", 2)], stock=0)
+    busy = _product(db, "Report busy", [("in", 40), ("out", 5), ("in", 15), ("adjust", 50)], stock=100)
+    db.commit()
+    return low.id, out.id, busy.id
+
+
+def test_inventory_summary_report(client, auth_headers, db):
+    low_id, out_id, busy_id = _inventory(db)
+
+    response = client.get("/api/reports/inventory-summary", headers=auth_headers)
+
+    assert response.status_code == 200
+    items = {item["product_id"]: item for item in response.json()["items"]}
+    assert (items[low_id]["current_stock"], items[low_id]["stock_value"]) == (3, 12)
+    assert items[out_id]["current_stock"] == 0
+    assert items[busy_id]["current_stock"] == 100
+    assert items[busy_id]["last_movement_date"] is not None
+
+    response = client.get("/api/reports/inventory-summary?low_stock_only=true", headers=auth_headers)
+    ids = {item["product_id"] for item in response.json()["items"]}
+    assert {low_id, out_id} <= ids and busy_id not in ids
+
+    response = client.get("/api/reports/inventory-summary?out_of_stock_only=true", headers=auth_headers)
+    ids = {item["product_id"] for item in response.json()["items"]}
+    assert out_id in ids and low_id not in ids
+
+
+def test_inventory_dashboard(client, auth_headers, db):
+    low_id, out_id, busy_id = _inventory(db)
+
+    response = client.get("/api/reports/inventory-dashboard", headers=auth_headers)
+
+    assert response.status_code == 200
+    metrics = response.json()
+    alerts = {alert["product_id"]: alert for alert in metrics["low_stock_alerts"]}
+    assert alerts[low_id]["current_stock"] == 3
+    assert out_id not in alerts and busy_id not in alerts
+    assert metrics["out_of_stock_items"] >= 1
+    assert metrics["low_stock_items"] == len(alerts)
+    assert metrics["recent_movements"] >= 7
+    moving = {p["product_id"]: p for p in metrics["top_moving_products"]}
+    assert moving[busy_id]["movement_count"] == 4
+    assert moving[busy_id]["current_stock"] == 100
+
+
+
+def _ledger(db, name, movements):
+    """Product with ledger entries at the given (month, day) of 2001"""
+    product = Product(name=name, sales_price=Decimal("10.00"), purchase_price=Decimal("4.00"), stock=0)
+    db.add(product)
+    db.flush()
+    db.add_all(
+        StockLedgerEntry(product_id=product.id, qty=qty, entry_type=kind, created_at=datetime(2001, month, day))
+        for (month, day), kind, qty in movements
+    )
+    return product
+
+
+def _stock_ledger(client, auth_headers, **params):
+    response = client.get("/api/reports/stock-ledger", params=params, headers=auth_headers)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/json"
+    return response, json.loads(response.content)
+
+
+def test_stock_ledger_streams_running_balances_per_product(client, auth_headers, db):
+    first = _ledger(db, "Ledger first", [((1, 1), "in", 10), ((1, 2), "out", 3), ((1, 3), "adjust", -2)])
+    second = _ledger(db, "Ledger second", [((1, 1), "in", 5), ((1, 4), "in", 4), ((1, 5), "out", 6)])
+    db.commit()
+
+    _, report = _stock_ledger(client, auth_headers, from_date="2001-01-02", to_date="2001-01-31")
+
+    rows = [(row["product_id"], row["entry_type"], row["running_balance"]) for row in report["transactions"]]
+    # Movements before the period still count towards the balances, which restart per product
+    assert rows == [
+        (first.id, "out", 7), (first.id, "adjust", 5),
+        (second.id, "in", 9), (second.id, "out", 3),
+    ]
+    assert (report["opening_balance"], report["closing_balance"]) == (15, 8)
+    assert (report["total_transactions"], report["total_incoming"], report["total_outgoing"]) == (4, 4, 9)
+
+
+def test_stock_ledger_pages_through_whole_products(client, auth_headers, db):
+    ids = [_ledger(db, f"Ledger page {n}", [((2, 1), "in", n), ((2, 2), "out", 1)]).id for n in (2, 3, 4)]
+    db.commit()
+
+    pages, cursor = [], None
+    while True:
+        params = {"from_date": "2001-02-01", "to_date": "2001-02-28", "limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response, report = _stock_ledger(client, auth_headers, **params)
+        pages.append(report)
+        cursor = response.headers.get(NEXT_CURSOR_HEADER)
+        if not cursor:
+            break
+
+    assert [[row["product_id"] for row in page["transactions"]] for page in pages] == [
+        [ids[0], ids[0], ids[1], ids[1]], [ids[2], ids[2]],
+    ]
+    assert [row["running_balance"] for row in pages[1]["transactions"]] == [4, 3]
+    assert [page["closing_balance"] for page in pages] == [3, 3]
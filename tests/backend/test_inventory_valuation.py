@@ -0,0 +1,132 @@
+"""
+Stock valuation: FIFO, LIFO and WAC cost layers, and a cache that only writes
+that can change a valuation drop
+"""
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import numpy as np
+import pytest
+from sqlalchemy import update
+
+from app.inventory_valuation import GENERATION_TAG, compute_stock_valuation, get_stock_valuation, value_layers
+from app.models import Product, Purchase, PurchaseItem, StockLedgerEntry
+from app.services.query_optimizer import bump_shared_generations
+
+
+def _value(rows, fallback=0.0):
+    """Value one product's ``(qty, cost)`` rows; returns {method: value} and the closing quantity"""
+    qty = np.array([q for q, _ in rows], dtype=float)
+    cost = np.array([c for _, c in rows], dtype=float)
+    valuation = value_layers(np.ones(len(rows), dtype=np.int64), qty, cost, np.full(len(rows), fallback))
+    return {method: float(values[0]) for method, values in valuation.values.items()}, float(valuation.closing_qty[0])
+
+
+def test_partial_issue_leaves_newest_layers_under_fifo_and_oldest_under_lifo():
+    values, closing = _value([(10, 5.0), (10, 8.0), (-12, 0.0)])
+
+    assert closing == 8
+    assert values["fifo"] == pytest.approx(8 * 8.0)
+    assert values["lifo"] == pytest.approx(8 * 5.0)
+    assert values["average"] == pytest.approx(8 * 6.5)
+
+
+def test_issue_before_any_receipt_is_clamped_to_zero():
+    values, closing = _value([(-5, 0.0)], fallback=3.0)
+
+    assert closing == 0
+    assert values == {"fifo": 0.0, "lifo": 0.0, "average": 0.0}
+
+
+def test_stock_without_a_purchase_layer_is_valued_at_the_fallback_cost():
+    # An opening adjustment carries the product's fallback cost, as the layer query gives it
+    values, closing = _value([(5, 3.0), (5, 10.0)], fallback=3.0)
+
+    assert closing == 10
+    assert values["fifo"] == values["lifo"] == pytest.approx(5 * 3.0 + 5 * 10.0)
+    assert values["average"] == pytest.approx(65.0)
+
+
+def test_products_are_valued_independently():
+    valuation = value_layers(
+        np.array([1, 1, 2, 2], dtype=np.int64),
+        np.array([4.0, -1.0, 2.0, 2.0]),
+        np.array([10.0, 0.0, 1.0, 3.0]),
+        np.array([0.0, 0.0, 0.0, 0.0]),
+    )
+
+    assert valuation.by_product("fifo") == {1: (3.0, 30.0), 2: (4.0, 8.0)}
+    assert valuation.by_product("lifo") == {1: (3.0, 30.0), 2: (4.0, 8.0)}
+
+
+def test_compute_stock_valuation_costs_layers_from_purchases(db, parties):
+    _, vendor_id = parties
+    product = Product(name="Layered product", sales_price=Decimal("20.00"), purchase_price=Decimal("3.00"))
+    purchase = Purchase(
+        vendor_id=vendor_id, purchase_no="VAL-LAYERS-1", due_date=datetime.utcnow(),
+        place_of_supply="Karnataka", place_of_supply_state_code="29",
+        bill_from_address="Vendor", ship_from_address="Vendor", taxable_value=Decimal("120"),
+        cgst=Decimal("0"), sgst=Decimal("0"), igst=Decimal("0"), grand_total=Decimal("120"),
+    )
+    db.add_all([product, purchase])
+    db.flush()
+    db.add(PurchaseItem(
+        purchase_id=purchase.id, product_id=product.id, description="Layer", qty=10,
+        expected_rate=Decimal("12.00"), gst_rate=0, amount=Decimal("120")
+    ))
+    start = datetime(2024, 1, 1)
+    db.add_all([
+        StockLedgerEntry(product_id=product.id, qty=5, entry_type="adjust", created_at=start),
+        StockLedgerEntry(product_id=product.id, qty=10, entry_type="in", ref_type="purchase",
+                         ref_id=purchase.id, created_at=start + timedelta(days=1)),
+        StockLedgerEntry(product_id=product.id, qty=7, entry_type="out", created_at=start + timedelta(days=2)),
+    ])
+    db.commit()
+
+    valuation = compute_stock_valuation(db)
+
+    assert valuation.by_product("fifo")[product.id] == (8.0, pytest.approx(8 * 12.0))
+    assert valuation.by_product("lifo")[product.id] == (8.0, pytest.approx(5 * 3.0 + 3 * 12.0))
+    assert valuation.by_product("average")[product.id] == (8.0, pytest.approx(8 * 9.0))
+
+
+def test_stock_counter_updates_keep_the_cached_valuation(db):
+    cached = get_stock_valuation(db)
+
+    product = db.get(Product, 1)
+    product.stock += 1
+    db.commit()
+    db.execute(update(Product).where(Product.id == 1).values(stock=Product.stock - 1))
+    db.commit()
+
+    assert get_stock_valuation(db) is cached
+
+
+def test_price_edit_invalidates_the_cached_valuation(db):
+    cached = get_stock_valuation(db)
+
+    product = db.get(Product, 1)
+    product.purchase_price = (product.purchase_price or 0) + Decimal("1")
+    db.commit()
+
+    assert get_stock_valuation(db) is not cached
+
+
+def test_bulk_price_update_invalidates_the_cached_valuation(db):
+    cached = get_stock_valuation(db)
+
+    db.execute(update(Product).where(Product.id == 1).values(sales_price=Product.sales_price + 1))
+    db.commit()
+
+    assert get_stock_valuation(db) is not cached
+
+
+def test_cost_change_committed_by_another_process_invalidates_the_cached_valuation(db):
+    cached = get_stock_valuation(db)
+    assert get_stock_valuation(db) is cached
+
+    # What such a commit leaves behind: only the shared generation moves
+    bump_shared_generations(db.connection(), [GENERATION_TAG])
+    db.commit()
+
+    assert get_stock_valuation(db) is not cached
@@ -0,0 +1,90 @@
+"""
+Bulk invoice import: each chunk is one transaction with a savepoint per row
+"""
+from sqlalchemy.exc import OperationalError
+
+from app import main_routers
+from app.main_routers import InvoiceCreate, InvoiceLookupCache, _import_invoice_chunk
+from app.models import Invoice, Party
+
+
+def _payload(customer_id, vendor_id):
+    return InvoiceCreate(
+        customer_id=customer_id,
+        supplier_id=vendor_id,
+        date="2025-06-01",
+        place_of_supply="Karnataka",
+        place_of_supply_state_code="29",
+        bill_to_address="Bill to",
+        ship_to_address="Ship to",
+        items=[{"product_id": 1, "qty": 1, "rate": 100}],
+    )
+
+
+def test_savepoints_stay_inside_the_outer_transaction(db):
+    before = db.query(Party).count()
+
+    for name in ("Savepoint A", "Savepoint B"):
+        with db.begin_nested():
+            db.add(Party(name=name, is_customer=True, is_vendor=False))
+    db.rollback()
+
+    assert db.query(Party).count() == before
+
+
+def test_rolling_back_a_chunk_undoes_every_row(db, parties):
+    customer_id, vendor_id = parties
+    before = db.query(Invoice).count()
+    chunk = [(row, _payload(customer_id, vendor_id)) for row in (2, 3)]
+    results = []
+    # Stand in for a failure at the chunk's commit
+    db.commit = db.rollback
+
+    created = _import_invoice_chunk(db, chunk, InvoiceLookupCache(), results)
+
+    assert created == 2
+    assert [r["status"] for r in results] == ["created", "created"]
+    assert db.query(Invoice).count() == before
+
+
+def test_committed_chunk_is_kept(db, parties):
+    customer_id, vendor_id = parties
+    before = db.query(Invoice).count()
+
+    _import_invoice_chunk(db, [(2, _payload(customer_id, vendor_id))], InvoiceLookupCache(), [])
+
+    assert db.query(Invoice).count() == before + 1
+
+
+def test_unexpected_row_errors_are_reported_per_row(db, parties, monkeypatch):
+    customer_id, vendor_id = parties
+    before = db.query(Invoice).count()
+    create = main_routers._create_invoice_record
+    failures = {
+        "3": KeyError("gst_rate"),
+        "4": TypeError("unsupported operand"),
+        "5": ZeroDivisionError("division by zero"),
+        "6": OperationalError("INSERT INTO invoices", {}, Exception("disk I/O error")),
+    }
+
+    def create_or_fail(db, payload, cache):
+        invoice = create(db, payload, cache)
+        if payload.notes in failures:
+            raise failures[payload.notes]
+        return invoice
+
+    monkeypatch.setattr(main_routers, "_create_invoice_record", create_or_fail)
+    chunk = [(row, _payload(customer_id, vendor_id).model_copy(update={"notes": str(row)})) for row in (2, 3, 4, 5, 6, 7)]
+    results = []
+
+    created = _import_invoice_chunk(db, chunk, InvoiceLookupCache(), results)
+
+    assert created == 2
+    assert [(r["row"], r["status"]) for r in results] == [
+        (2, "created"), (3, "error"), (4, "error"), (5, "error"), (6, "error"), (7, "created"),
+    ]
+    assert results[1]["error"] == "Invalid invoice data: KeyError: 'gst_rate'"
+    assert results[3]["error"] == "Invalid invoice data: ZeroDivisionError: division by zero"
+    assert results[4]["error"] == "Could not save invoice"
+    # The failed rows' savepoints were rolled back and the rest committed
+    assert db.query(Invoice).count() == before + 2
@@ -0,0 +1,48 @@
+"""
+Rendered invoice PDF cache: keys change with everything the PDF shows
+"""
+from sqlalchemy import update
+
+from app.models import CompanySettings, Party, Product
+from app.pdf_renderer import invoice_pdf_inputs_stamp
+
+
+def test_party_edit_changes_the_inputs_stamp(db, parties):
+    stamp = invoice_pdf_inputs_stamp(db)
+
+    party = db.query(Party).first()
+    party.billing_address_line1 = (party.billing_address_line1 or "") + " "
+    db.commit()
+
+    assert invoice_pdf_inputs_stamp(db) != stamp
+
+
+def test_bulk_company_update_changes_the_inputs_stamp(db):
+    stamp = invoice_pdf_inputs_stamp(db)
+
+    db.execute(update(CompanySettings).values(name=CompanySettings.name))
+    db.commit()
+
+    assert invoice_pdf_inputs_stamp(db) != stamp
+
+
+def test_stock_updates_keep_the_inputs_stamp(db):
+    stamp = invoice_pdf_inputs_stamp(db)
+
+    product = db.get(Product, 1)
+    product.stock += 1
+    db.commit()
+    db.execute(update(Product).where(Product.id == 1).values(stock=Product.stock - 1))
+    db.commit()
+
+    assert invoice_pdf_inputs_stamp(db) == stamp
+
+
+def test_product_rename_changes_the_inputs_stamp(db):
+    stamp = invoice_pdf_inputs_stamp(db)
+
+    product = db.get(Product, 1)
+    product.name = product.name + " "
+    db.commit()
+
+    assert invoice_pdf_inputs_stamp(db) != stamp
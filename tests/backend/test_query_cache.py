@@ -0,0 +1,134 @@
+"""
+Report caching: repeated report requests are served from query_cache
+"""
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from app.models import Party, Payment
+from app.services.query_optimizer import bump_shared_generations, cached_query, query_cache
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    query_cache.clear()
+    yield
+    query_cache.clear()
+
+
+@pytest.mark.parametrize("path", ["/api/reports/income", "/api/reports/inventory-summary", "/api/cashflow/summary"])
+def test_second_identical_report_call_is_a_cache_hit(client, auth_headers, path):
+    before = query_cache.get_stats()
+
+    first = client.get(path, headers=auth_headers)
+    second = client.get(path, headers=auth_headers)
+
+    assert first.status_code == 200
+    assert second.json() == first.json()
+    stats = query_cache.get_stats()
+    assert stats["misses"] == before["misses"] + 1
+    assert stats["hits"] == before["hits"] + 1
+    assert stats["size"] == 1
+    assert stats["bypasses"] == before["bypasses"]
+
+
+def test_different_filters_are_cached_separately(client, auth_headers):
+    client.get("/api/reports/income", headers=auth_headers)
+    client.get("/api/reports/income?customer_id=1", headers=auth_headers)
+
+    assert query_cache.get_stats()["size"] == 2
+
+
+def test_unkeyable_arguments_are_counted_as_bypasses():
+    calls = []
+
+    @cached_query("invoices")
+    def report(filters=None):
+        calls.append(filters)
+        return len(calls)
+
+    before = query_cache.get_stats()["bypasses"]
+    assert report(filters={"a": 1}) == 1
+    assert report(filters={"a": 1}) == 2
+    assert query_cache.get_stats()["bypasses"] == before + 2
+
+
+def _payment():
+    return Payment(amount=Decimal("100.00"), payment_date=date(2025, 6, 1), payment_method="Cash")
+
+
+def test_committed_write_invalidates_tagged_reports(client, auth_headers, db):
+    client.get("/api/reports/income", headers=auth_headers)
+    db.add(_payment())
+    db.commit()
+    before = query_cache.get_stats()
+
+    client.get("/api/reports/income", headers=auth_headers)
+
+    stats = query_cache.get_stats()
+    assert stats["invalidations"] >= 1
+    assert stats["misses"] == before["misses"] + 1
+    assert stats["hits"] == before["hits"]
+
+
+def test_renamed_party_invalidates_the_cashflow_report(client, auth_headers, db, make_invoice):
+    party = Party(name="Cached Customer", is_customer=True, is_vendor=False)
+    db.add(party)
+    db.flush()
+    invoice = make_invoice("CACHE-PARTY-1")
+    invoice.customer_id = party.id
+    db.add(Payment(invoice_id=invoice.id, amount=Decimal("10.00"), payment_date=date(2003, 3, 3), payment_method="Cash"))
+    db.commit()
+    path = "/api/reports/cashflow?start_date=2003-03-03&end_date=2003-03-03"
+
+    assert [row["party_name"] for row in client.get(path, headers=auth_headers).json()["transactions"]] == ["Cached Customer"]
+    party.name = "Renamed Customer"
+    db.commit()
+
+    assert [row["party_name"] for row in client.get(path, headers=auth_headers).json()["transactions"]] == ["Renamed Customer"]
+
+
+def test_write_committed_by_another_worker_makes_reports_stale(client, auth_headers, db):
+    client.get("/api/reports/income", headers=auth_headers)
+    # What a commit in another process leaves behind: only the shared counter moves
+    bump_shared_generations(db.connection(), ["payments"])
+    db.commit()
+    before = query_cache.get_stats()
+
+    client.get("/api/reports/income", headers=auth_headers)
+    client.get("/api/reports/income", headers=auth_headers)
+
+    stats = query_cache.get_stats()
+    assert stats["stale"] == before["stale"] + 1
+    assert stats["misses"] == before["misses"] + 1
+    assert stats["hits"] == before["hits"] + 1
+
+
+def test_rolled_back_write_keeps_cached_reports(client, auth_headers, db):
+    client.get("/api/reports/income", headers=auth_headers)
+    db.add(_payment())
+    db.flush()
+    db.rollback()
+    # Tags recorded by the rolled-back flush must not fire on the next commit
+    db.commit()
+    before = query_cache.get_stats()
+
+    client.get("/api/reports/income", headers=auth_headers)
+
+    stats = query_cache.get_stats()
+    assert stats["hits"] == before["hits"] + 1
+    assert stats["misses"] == before["misses"]
+    assert stats["invalidations"] == before["invalidations"]
+
+
+def test_result_loaded_across_an_invalidation_is_not_stored():
+    def loader():
+        query_cache.invalidate({"payments"})
+        return "stale"
+
+    assert query_cache.get_or_set(("report",), loader, tags=("payments",)) == "stale"
+    assert query_cache.get_stats()["size"] == 0
+
+    assert query_cache.get_or_set(("report",), lambda: "fresh", tags=("payments",)) == "fresh"
+    assert query_cache.get_stats()["size"] == 1
@@ -0,0 +1,103 @@
+"""
+Rate limiter: sliding-window arithmetic, LRU bounds, and one limit shared by
+every worker through the Redis script
+"""
+import asyncio
+
+import pytest
+
+from app.rate_limiter import MemoryRateLimitBackend, RedisRateLimitBackend
+
+WINDOW = 60
+
+
+class _Clock:
+    def __init__(self, now: float = 6000.0):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+async def _hits(backend, key, limit, times):
+    return [(await backend.hit(key, limit, WINDOW)).allowed for _ in range(times)]
+
+
+def _allowed(backend, key, limit, times):
+    return asyncio.run(_hits(backend, key, limit, times))
+
+
+def test_memory_backend_stops_at_the_limit():
+    clock = _Clock()
+    backend = MemoryRateLimitBackend(clock=clock)
+
+    assert _allowed(backend, "client", 3, 4) == [True, True, True, False]
+
+    result = asyncio.run(backend.hit("client", 3, WINDOW))
+    assert (result.allowed, result.remaining, result.retry_after) == (False, 0, WINDOW)
+    assert _allowed(backend, "other", 3, 1) == [True]
+
+
+def test_memory_backend_carries_over_the_weighted_previous_window():
+    clock = _Clock()
+    backend = MemoryRateLimitBackend(clock=clock)
+    assert _allowed(backend, "client", 3, 3) == [True, True, True]
+
+    # Halfway through the next window half of the previous count still applies
+    clock.now += WINDOW * 1.5
+    assert _allowed(backend, "client", 3, 2) == [True, False]
+
+    # A window with no traffic in between leaves nothing to carry over
+    clock.now += WINDOW * 2
+    assert _allowed(backend, "client", 3, 4) == [True, True, True, False]
+
+
+def test_memory_backend_evicts_the_least_recently_used_key():
+    backend = MemoryRateLimitBackend(max_keys=2, clock=_Clock())
+
+    assert _allowed(backend, "a", 1, 1) == [True]
+    assert _allowed(backend, "b", 1, 1) == [True]
+    assert _allowed(backend, "a", 1, 1) == [False]  # a is now the most recent
+    assert _allowed(backend, "c", 1, 1) == [True]   # evicts b
+
+    assert backend.status()["tracked_keys"] == 2
+    assert _allowed(backend, "a", 1, 1) == [False]
+    assert _allowed(backend, "b", 1, 1) == [True]
+
+
+def _redis_workers(clock, count=2):
+    """Backends of ``count`` workers sharing one in-process Redis server with Lua"""
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    return [
+        RedisRateLimitBackend("redis://shared", clock=clock, client=fakeredis.FakeAsyncRedis(server=server))
+        for _ in range(count)
+    ]
+
+
+def test_redis_backend_shares_one_limit_between_workers():
+    async def run():
+        first, second = _redis_workers(_Clock())
+        results = []
+        for backend in (first, second, first, second, first):
+            results.append((await backend.hit("client", 3, WINDOW)).allowed)
+        assert results == [True, True, True, False, False]
+        assert await _hits(second, "other", 3, 1) == [True]
+
+    asyncio.run(run())
+
+
+def test_redis_backend_matches_the_memory_window_arithmetic():
+    async def run():
+        clock = _Clock()
+        first, second = _redis_workers(clock)
+        assert await _hits(first, "client", 3, 3) == [True, True, True]
+
+        clock.now += WINDOW * 1.5
+        assert await _hits(second, "client", 3, 2) == [True, False]
+
+        result = await first.hit("client", 3, WINDOW)
+        assert (result.allowed, result.remaining, result.retry_after) == (False, 0, WINDOW / 2)
+
+    asyncio.run(run())
@@ -0,0 +1,54 @@
+"""
+Stock snapshots: movement reports read them without writing
+"""
+from datetime import datetime
+from decimal import Decimal
+
+from app.models import Product, StockLedgerEntry, StockSnapshot
+
+
+def _product_with_movements(db):
+    product = Product(name="Snapshot test product", sales_price=Decimal("10.00"))
+    db.add(product)
+    db.flush()
+    db.add_all([
+        StockLedgerEntry(product_id=product.id, qty=8, entry_type="in", created_at=datetime(2022, 6, 1)),
+        StockLedgerEntry(product_id=product.id, qty=3, entry_type="out", created_at=datetime(2022, 9, 1)),
+    ])
+    db.commit()
+    return product.id
+
+
+def _stored_years(db, product_id):
+    return {
+        year for (year,) in db.query(StockSnapshot.fy_start_year).filter(StockSnapshot.product_id == product_id)
+    }
+
+
+def test_movement_history_computes_missing_snapshots_without_storing_them(client, auth_headers, db):
+    product_id = _product_with_movements(db)
+    assert _stored_years(db, product_id) == {2022}
+
+    response = client.get(
+        f"/api/stock/movement-history?financial_year=2024-2025&product_id={product_id}", headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    [summary] = response.json()
+    assert summary["opening_stock"] == 5
+    assert summary["closing_stock"] == 5
+    db.rollback()
+    assert _stored_years(db, product_id) == {2022}
+
+
+def test_product_history_across_years_is_read_only(client, auth_headers, db):
+    product_id = _product_with_movements(db)
+
+    response = client.get(
+        f"/api/stock/movement-history/{product_id}?from_year=2021&to_year=2023", headers=auth_headers
+    )
+
+    assert response.status_code == 200
+    assert [(m["opening_stock"], m["closing_stock"]) for m in response.json()] == [(0, 0), (0, 5), (5, 5)]
+    db.rollback()
+    assert _stored_years(db, product_id) == {2022}
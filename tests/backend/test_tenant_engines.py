@@ -0,0 +1,52 @@
+"""
+Tenant engine registry: engines with open sessions are never evicted
+"""
+import asyncio
+import gc
+
+import pytest
+
+from app.tenant_config import TenantConfig, TenantEngineRegistry, TenantEnginesExhausted
+
+
+def _config(tmp_path, name):
+    return TenantConfig(name, {
+        'database_url': f"sqlite+aiosqlite:///{tmp_path / name}.db",
+        'pool_size': 1,
+        'max_overflow': 0,
+    })
+
+
+def test_engine_with_an_open_session_is_not_evicted(tmp_path):
+    async def scenario():
+        registry = TenantEngineRegistry(max_connections=1)
+        first = await registry.get_or_create('first', _config(tmp_path, 'first'))
+        session = first.open_session()
+
+        # Idle between queries: no connection is checked out, but the session is live
+        assert first.checked_out() == 0
+        with pytest.raises(TenantEnginesExhausted):
+            await registry.get_or_create('second', _config(tmp_path, 'second'))
+        assert registry.lookup('first') is first
+
+        await session.close()
+        await session.close()
+        assert first.sessions == 0
+        await registry.get_or_create('second', _config(tmp_path, 'second'))
+        assert registry.lookup('first') is None
+        await registry.dispose_all()
+
+    asyncio.run(scenario())
+
+
+def test_garbage_collected_session_releases_its_engine(tmp_path):
+    async def scenario():
+        registry = TenantEngineRegistry(max_connections=1, idle_timeout=0)
+        entry = await registry.get_or_create('first', _config(tmp_path, 'first'))
+        entry.open_session()
+        gc.collect()
+
+        assert entry.sessions == 0
+        assert await registry.dispose_idle() == 1
+
+    asyncio.run(scenario())